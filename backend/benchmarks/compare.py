@@ -0,0 +1,89 @@
+"""
+Compare two benchmark result files.
+
+Runs are matched by source, model and backend. Prints the change of
+throughput and of each stage's p50 and p99 latency, and exits with status 1
+when any of them regressed by more than ``--threshold`` percent.
+
+Usage, from the backend directory:
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+import sys
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+RunKey = Tuple[str, Optional[str], str]
+
+
+def load_runs(path: str) -> Dict[RunKey, Dict[str, Any]]:
+    with open(path) as f:
+        report = json.load(f)
+    return {(run["source"], run["model"], run["backend"]): run for run in report["runs"]}
+
+
+def change(old: float, new: float) -> float:
+    """Relative change in percent."""
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(baseline: Dict[RunKey, Dict[str, Any]], current: Dict[RunKey, Dict[str, Any]],
+            threshold: float) -> Tuple[List[str], List[str]]:
+    """
+    Compare matching runs.
+
+    Returns:
+        (lines, regressions): the report and a description of each metric
+        that got worse by more than ``threshold`` percent.
+    """
+    lines, regressions = [], []
+    for key in sorted(baseline.keys() & current.keys(), key=str):
+        old, new = baseline[key], current[key]
+        source, model, backend = key
+        lines.append(f"{source} {model or '-'} {backend}")
+
+        # Higher throughput is better, lower latency is better
+        metrics = [("throughput_fps", old["throughput_fps"], new["throughput_fps"], -1)]
+        for stage in new["stages"]:
+            if stage in old["stages"]:
+                for statistic in ("p50_ms", "p99_ms"):
+                    metrics.append(
+                        (f"{stage} {statistic}", old["stages"][stage][statistic], new["stages"][stage][statistic], 1)
+                    )
+        for name, old_value, new_value, direction in metrics:
+            delta = change(old_value, new_value)
+            marker = ""
+            if delta * direction > threshold:
+                marker = "  REGRESSION"
+                regressions.append(f"{source} {model or '-'} {backend} {name} {delta:+.1f}%")
+            lines.append(f"  {name:<18} {old_value:>10.3f} -> {new_value:>10.3f} {delta:+7.1f}%{marker}")
+
+    for source, model, backend in sorted(baseline.keys() ^ current.keys(), key=str):
+        where = "baseline" if (source, model, backend) in baseline else "current"
+        lines.append(f"{source} {model or '-'} {backend}: only in {where}")
+    return lines, regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent change that counts as a regression")
+    args = parser.parse_args(argv)
+
+    lines, regressions = compare(load_runs(args.baseline), load_runs(args.current), args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regressions over {args.threshold}%:")
+        print("\n".join(f"  {regression}" for regression in regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
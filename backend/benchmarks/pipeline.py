@@ -0,0 +1,338 @@
+"""
+Benchmark the capture -> detect -> encode -> fan-out pipeline.
+
+Frames come from synthetic sources or local video files, so no camera or
+network is needed. Every combination of source, model and backend runs the
+same number of frames through the stages the stream publisher uses:
+
+- capture: CameraService.read_frame into a reused buffer (decode included)
+- detect: ObjectDetectionService in process ("local") or an InferencePool
+  of worker processes ("pool"); "none" skips detection
+- encode: JPEG encode plus the framed message
+- fan_out: CameraStreamManager._fan_out to in-memory subscribers
+
+Latency percentiles come from a timed pass; allocation peaks per stage from
+a shorter second pass under tracemalloc, so its overhead does not distort
+the timings. Results are written as JSON together with the environment and
+git commit; compare two result files with ``benchmarks.compare``.
+
+Usage, from the backend directory:
+
+    python -m benchmarks.pipeline --frames 300 --models yolov8n.pt,yolov8s.pt \\
+        --backends local,pool --source synthetic://1280x720@0 --source clip.mp4
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from src.core.config import settings
+from src.services.detection import CameraService
+from src.services.detection import ObjectDetectionService
+from src.services.stream_protocol import encode_frame_message
+from src.services.streaming import CameraStreamManager
+
+STAGES = ("capture", "detect", "encode", "fan_out")
+BACKENDS = ("local", "pool", "none")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class NullSubscriber:
+    """WebSocket stand-in that accepts every message immediately."""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    async def send_bytes(self, data: bytes):
+        self.messages += 1
+        self.bytes += len(data)
+
+
+class LoopingSource:
+    """Reads a capture into one reused buffer, reopening file sources when they run out of frames."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.cap = self._open()
+        self.buffer: Optional[np.ndarray] = None
+
+    def _open(self):
+        if source_is_synthetic(self.source):
+            cap = CameraService.open_capture(self.source, "synthetic")
+        else:
+            cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise SystemExit(f"Cannot open source {self.source}")
+        return cap
+
+    def read(self) -> np.ndarray:
+        ret, frame = CameraService.read_frame(self.cap, self.buffer)
+        if not ret:
+            self.cap.release()
+            self.cap = self._open()
+            ret, frame = CameraService.read_frame(self.cap, self.buffer)
+            if not ret:
+                raise SystemExit(f"Source {self.source} returned no frames")
+        self.buffer = frame
+        return frame
+
+    def release(self):
+        self.cap.release()
+
+
+def source_is_synthetic(source: str) -> bool:
+    return source.startswith("synthetic://")
+
+
+def create_detector(model: str, backend: str, workers: int):
+    """Return (detect, close) for a backend, or (None, None) when detection is skipped."""
+    if backend == "none":
+        return None, None
+    if backend == "local":
+        service = ObjectDetectionService(model)
+        return service.detect, None
+
+    from src.services.inference_pool import InferencePool
+
+    pool = InferencePool(model, workers=workers)
+    if not pool.wait_ready(settings.INFERENCE_READY_TIMEOUT):
+        pool.close()
+        raise SystemExit(f"Inference workers for {model} did not start")
+    return pool.detect, pool.close
+
+
+def percentiles(samples_ns: List[int]) -> Dict[str, float]:
+    values = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    return {
+        "mean_ms": round(float(values.mean()), 4),
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+        "max_ms": round(float(values.max()), 4),
+    }
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+class Timings:
+    """Collects per-stage durations, and allocation peaks when tracing memory."""
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.durations: Dict[str, List[int]] = {stage: [] for stage in STAGES}
+        self.peaks: Dict[str, int] = {stage: 0 for stage in STAGES}
+
+    def __call__(self, stage: str, function: Callable):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter_ns()
+        result = function()
+        elapsed = time.perf_counter_ns() - started
+        peak = tracemalloc.get_traced_memory()[1] - baseline if self.trace_memory else 0
+        self.record(stage, elapsed, peak)
+        return result
+
+    def record(self, stage: str, elapsed_ns: int, peak_bytes: int):
+        self.durations[stage].append(elapsed_ns)
+        self.peaks[stage] = max(self.peaks[stage], peak_bytes)
+
+
+async def run_frames(
+    frames: int,
+    source: LoopingSource,
+    detect: Optional[Callable],
+    manager: CameraStreamManager,
+    measure: Timings,
+) -> int:
+    """
+    Push frames through every stage, timing each call with ``measure``.
+
+    Returns:
+        The JPEG bytes encoded.
+    """
+    jpeg_bytes = 0
+    for sequence in range(1, frames + 1):
+        captured_at = time.time()
+        frame = measure("capture", source.read)
+        detections = measure("detect", lambda: detect(frame)) if detect is not None else None
+
+        def encode():
+            _, encoded = cv2.imencode(".jpg", frame)
+            jpeg = encoded.tobytes()
+            height, width = frame.shape[:2]
+            return jpeg, encode_frame_message(sequence, captured_at, jpeg, (width, height), detections)
+
+        jpeg, framed = measure("encode", encode)
+        jpeg_bytes += len(jpeg)
+        started = time.perf_counter_ns()
+        await manager._fan_out(jpeg, framed, captured_at)
+        measure.record("fan_out", time.perf_counter_ns() - started, 0)
+    return jpeg_bytes
+
+
+async def benchmark(source_spec: str, model: str, backend: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one source, model and backend combination and summarize it."""
+    detect, close = create_detector(model, backend, args.workers)
+    source = LoopingSource(source_spec)
+    manager = CameraStreamManager(source_spec, "synthetic" if source_is_synthetic(source_spec) else "local")
+    subscribers = [NullSubscriber() for _ in range(args.subscribers)]
+    manager.subscribers = list(subscribers)
+    manager.framed_subscribers = set(subscribers[:args.framed_subscribers])
+    try:
+        await run_frames(args.warmup, source, detect, manager, Timings())
+
+        timings = Timings()
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        jpeg_bytes = await run_frames(args.frames, source, detect, manager, timings)
+        elapsed = time.perf_counter() - started
+        rss_after = rss_mb()
+
+        memory = Timings(trace_memory=True)
+        if args.memory_frames:
+            tracemalloc.start()
+            try:
+                await run_frames(args.memory_frames, source, detect, manager, memory)
+            finally:
+                tracemalloc.stop()
+    finally:
+        source.release()
+        if close is not None:
+            close()
+
+    measured = [durations for durations in timings.durations.values() if durations]
+    totals = [sum(values) for values in zip(*measured)]
+    return {
+        "source": source_spec,
+        "model": model if backend != "none" else None,
+        "backend": backend,
+        "frames": args.frames,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_fps": round(args.frames / elapsed, 2),
+        "stages": {
+            stage: {
+                **percentiles(timings.durations[stage]),
+                "alloc_peak_kb": round(memory.peaks[stage] / 1024, 1),
+            }
+            for stage in STAGES
+            if timings.durations[stage]
+        },
+        "total": percentiles(totals),
+        "jpeg_bytes_per_frame": jpeg_bytes // args.frames,
+        "memory": {
+            "rss_start_mb": round(rss_before, 1),
+            "rss_end_mb": round(rss_after, 1),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine and software a result was measured with."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (subprocess.SubprocessError, FileNotFoundError):
+        commit = None
+    import torch
+
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "torch": torch.__version__,
+        "cuda": torch.cuda.is_available(),
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--source", action="append", dest="sources",
+                        help="synthetic://WIDTHxHEIGHT[@FPS] spec or video file; repeatable "
+                             "(default synthetic://1280x720@0)")
+    parser.add_argument("--models", default=settings.DEFAULT_MODEL,
+                        help=f"Comma separated models or 'all' for {','.join(settings.SUPPORTED_MODELS)}")
+    parser.add_argument("--backends", default="local", help=f"Comma separated, from {','.join(BACKENDS)}")
+    parser.add_argument("--workers", type=int, default=max(settings.INFERENCE_WORKERS, 1),
+                        help="Worker processes of the pool backend")
+    parser.add_argument("--frames", type=int, default=300, help="Timed frames per run")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed frames before each run")
+    parser.add_argument("--memory-frames", type=int, default=20,
+                        help="Frames of the allocation pass, 0 to skip it")
+    parser.add_argument("--subscribers", type=int, default=4, help="In-memory subscribers to fan out to")
+    parser.add_argument("--framed-subscribers", type=int, default=1,
+                        help="How many of the subscribers receive framed messages")
+    parser.add_argument("--output", help=f"Result file (default {RESULTS_DIR}/pipeline-<time>.json)")
+    args = parser.parse_args(argv)
+
+    args.sources = args.sources or ["synthetic://1280x720@0"]
+    args.models = settings.SUPPORTED_MODELS if args.models == "all" else args.models.split(",")
+    args.backends = args.backends.split(",")
+    unknown = set(args.backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"Unknown backends {', '.join(sorted(unknown))}")
+    if args.frames < 1:
+        parser.error("--frames must be at least 1")
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    started_at = datetime.now(timezone.utc)
+    runs = []
+    for source in args.sources:
+        for backend in args.backends:
+            for model in args.models if backend != "none" else [None]:
+                print(f"{source} {model or '-'} {backend}: {args.frames} frames", file=sys.stderr)
+                result = asyncio.run(benchmark(source, model, backend, args))
+                runs.append(result)
+                stages = ", ".join(
+                    f"{stage} p50 {values['p50_ms']:.2f}ms p99 {values['p99_ms']:.2f}ms"
+                    for stage, values in result["stages"].items()
+                )
+                print(f"  {result['throughput_fps']} fps; {stages}", file=sys.stderr)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{started_at:%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {
+        "benchmark": "pipeline",
+        "created_at": started_at.isoformat(),
+        "environment": environment(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output",)
+        },
+        "runs": runs,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
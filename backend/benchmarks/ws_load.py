@@ -0,0 +1,321 @@
+"""
+Load test the stream WebSocket fan-out with many, optionally slow, viewers.
+
+Opens N concurrent connections to ``/api/v1/ws/streams/{id}`` of a running
+backend. Slow clients emulate viewers on poor links: they read at most
+``--bandwidth`` KiB/s and pause ``--read-delay`` ms after every message.
+Each client buffers at most ``--max-queue`` messages before it stops
+reading from the socket, so a slow reader pushes back on the server through
+TCP like a real browser would.
+
+Per client the report has the delivered fps, throughput, frames missing
+from the sequence (framed mode) and the latency from capture to receipt
+(framed mode; the capture time comes from the server clock, so run the tool
+on the server host or with synchronised clocks). Framed clients connect with
+``detect=false`` so the server does not run detection on every frame for
+them; ``--detect`` measures the fan-out including inference. Server CPU usage,
+captured and dropped frames, and the frames the server skipped for viewers
+that fell behind are taken from the difference of two /metrics scrapes
+around the run.
+
+With ``--synthetic`` a synthetic camera and stream are created for the
+run and deleted afterwards, so no camera is needed:
+
+    python -m benchmarks.ws_load --synthetic synthetic://1280x720@30 \\
+        --clients 50 --slow-clients 10 --bandwidth 500 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import urllib.request
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import numpy as np
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from src.services.stream_protocol import HEADER
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+API_PREFIX = "/api/v1"
+
+
+@dataclass
+class ClientProfile:
+    name: str
+    bandwidth: Optional[float] = None  # bytes per second
+    read_delay: float = 0.0  # seconds after each message
+
+
+@dataclass
+class ClientStats:
+    index: int
+    profile: str
+    messages: int = 0
+    bytes: int = 0
+    dropped: int = 0
+    first_at: Optional[float] = None
+    last_at: Optional[float] = None
+    last_sequence: Optional[int] = None
+    latencies: List[float] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def on_frame(self, message: bytes, received_at: float, framed: bool):
+        self.messages += 1
+        self.bytes += len(message)
+        self.first_at = self.first_at or received_at
+        self.last_at = received_at
+        if not framed:
+            return
+        _, _, _, sequence, timestamp, _, _ = HEADER.unpack_from(message)
+        if self.last_sequence is not None and sequence > self.last_sequence + 1:
+            self.dropped += sequence - self.last_sequence - 1
+        self.last_sequence = sequence
+        self.latencies.append(received_at - timestamp)
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = (self.last_at - self.first_at) if self.messages > 1 else 0.0
+        result = {
+            "client": self.index,
+            "profile": self.profile,
+            "frames": self.messages,
+            "fps": round((self.messages - 1) / elapsed, 2) if elapsed else 0.0,
+            "kib_per_s": round(self.bytes / 1024 / elapsed, 1) if elapsed else 0.0,
+            "dropped": self.dropped,
+            "error": self.error,
+        }
+        if self.latencies:
+            result["latency_ms"] = latency_summary(self.latencies)
+        return result
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    values = np.asarray(latencies) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "max": round(float(values.max()), 2),
+    }
+
+
+async def run_client(url: str, profile: ClientProfile, stats: ClientStats, framed: bool,
+                     max_queue: int, stop_at: float):
+    """Receive frames until the run ends, reading no faster than the profile allows."""
+    try:
+        async with connect(url, max_size=None, max_queue=max_queue, compression=None,
+                           close_timeout=1) as websocket:
+            started = time.monotonic()
+            while True:
+                remaining = stop_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(websocket.recv(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if isinstance(message, str):
+                    continue  # Class names of framed mode
+                stats.on_frame(message, time.time(), framed)
+
+                wait = profile.read_delay
+                if profile.bandwidth:
+                    # Hold the next read until the bytes so far fit the bandwidth
+                    wait = max(wait, started + stats.bytes / profile.bandwidth - time.monotonic())
+                if wait > 0:
+                    await asyncio.sleep(min(wait, stop_at - time.monotonic()))
+    except (ConnectionClosed, OSError) as e:
+        stats.error = f"{type(e).__name__}: {e}"
+
+
+def request_json(method: str, url: str, body: Optional[Dict[str, Any]] = None) -> Any:
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read() or b"null")
+
+
+def scrape_metrics(server: str) -> Dict[str, float]:
+    """Return the samples of /metrics keyed by name and labels, e.g. 'name{camera="1"}'."""
+    with urllib.request.urlopen(f"{server}/metrics", timeout=10) as response:
+        text = response.read().decode()
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, _, value = line.rpartition(" ")
+            samples[key] = float(value)
+    return samples
+
+
+def server_summary(before: Dict[str, float], after: Dict[str, float], elapsed: float,
+                   camera_id: int) -> Dict[str, Any]:
+    def delta(key: str) -> float:
+        return after.get(key, 0.0) - before.get(key, 0.0)
+
+    label = f'{{camera="{camera_id}"}}'
+    captured = delta(f"carcara_frames_captured_total{label}")
+    return {
+        "cpu_percent": round(delta("process_cpu_seconds_total") / elapsed * 100, 1),
+        "rss_mb": round(after.get("process_resident_memory_bytes", 0.0) / 2**20, 1),
+        "captured_fps": round(captured / elapsed, 2),
+        "frames_captured": captured,
+        "frames_dropped": delta(f"carcara_frames_dropped_total{label}"),
+        "ws_frames_dropped": sum(
+            delta(key) for key in after if key.startswith(f'carcara_ws_frames_dropped_total{{camera="{camera_id}",')
+        ),
+    }
+
+
+def profile_summary(clients: List[Dict[str, Any]], stats: List[ClientStats]) -> Dict[str, Any]:
+    """Aggregate the clients of each profile."""
+    groups = {}
+    for summary, client in zip(clients, stats):
+        group = groups.setdefault(summary["profile"], {"summaries": [], "latencies": []})
+        group["summaries"].append(summary)
+        group["latencies"].extend(client.latencies)
+    result = {}
+    for name, group in groups.items():
+        fps = [summary["fps"] for summary in group["summaries"]]
+        result[name] = {
+            "clients": len(fps),
+            "failed": sum(1 for summary in group["summaries"] if summary["error"]),
+            "fps_min": min(fps),
+            "fps_mean": round(sum(fps) / len(fps), 2),
+            "dropped": sum(summary["dropped"] for summary in group["summaries"]),
+        }
+        if group["latencies"]:
+            result[name]["latency_ms"] = latency_summary(group["latencies"])
+    return result
+
+
+def create_synthetic_stream(server: str, spec: str) -> Dict[str, int]:
+    camera = request_json("POST", f"{server}{API_PREFIX}/cameras/", {
+        "name": f"load test {spec}",
+        "camera_type": "synthetic",
+        "rtsp_url": spec,
+    })
+    stream = request_json("POST", f"{server}{API_PREFIX}/streams/", {"camera_id": camera["id"]})
+    return {"camera_id": camera["id"], "stream_id": stream["id"]}
+
+
+def delete_synthetic_stream(server: str, created: Dict[str, int]):
+    request_json("DELETE", f"{server}{API_PREFIX}/streams/{created['stream_id']}")
+    request_json("DELETE", f"{server}{API_PREFIX}/cameras/{created['camera_id']}")
+
+
+async def load_test(args: argparse.Namespace, stream_id: int, camera_id: int) -> Dict[str, Any]:
+    ws_server = args.server.replace("http", "ws", 1)
+    url = f"{ws_server}{API_PREFIX}/ws/streams/{stream_id}?mode={args.mode}&detect={str(args.detect).lower()}"
+    fast = ClientProfile("fast")
+    slow = ClientProfile(
+        "slow",
+        bandwidth=args.bandwidth * 1024 if args.bandwidth else None,
+        read_delay=args.read_delay / 1000,
+    )
+    stats = [
+        ClientStats(index, (slow if index < args.slow_clients else fast).name)
+        for index in range(args.clients)
+    ]
+
+    metrics_before = await asyncio.to_thread(scrape_metrics, args.server)
+    started = time.monotonic()
+    stop_at = started + args.ramp_up + args.duration
+    tasks = []
+    for index, client in enumerate(stats):
+        profile = slow if index < args.slow_clients else fast
+        tasks.append(asyncio.create_task(
+            run_client(url, profile, client, args.mode == "framed", args.max_queue, stop_at)
+        ))
+        if args.ramp_up:
+            await asyncio.sleep(args.ramp_up / args.clients)
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    metrics_after = await asyncio.to_thread(scrape_metrics, args.server)
+
+    clients = [client.summary() for client in stats]
+    return {
+        "server": server_summary(metrics_before, metrics_after, elapsed, camera_id),
+        "profiles": profile_summary(clients, stats),
+        "clients": clients,
+    }
+
+
+def stream_camera_id(server: str, stream_id: int) -> int:
+    return request_json("GET", f"{server}{API_PREFIX}/streams/{stream_id}")["camera_id"]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--stream-id", type=int, help="Existing stream to connect to")
+    target.add_argument("--synthetic", metavar="SPEC",
+                        help="Create a synthetic camera, e.g. synthetic://1280x720@30, for the run")
+    parser.add_argument("--server", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent connections")
+    parser.add_argument("--slow-clients", type=int, default=0, help="How many of the clients are slow")
+    parser.add_argument("--bandwidth", type=float, help="Read bandwidth of slow clients in KiB/s")
+    parser.add_argument("--read-delay", type=float, default=0.0, help="Pause of slow clients per message in ms")
+    parser.add_argument("--max-queue", type=int, default=4,
+                        help="Messages a client buffers before it stops reading the socket")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to measure after the ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which clients connect")
+    parser.add_argument("--mode", choices=("framed", "jpeg"), default="framed",
+                        help="Stream mode; only framed messages carry sequence numbers and capture times")
+    parser.add_argument("--detect", action="store_true",
+                        help="Have the server detect on every frame for framed clients, as for real viewers")
+    parser.add_argument("--output", help=f"Result file (default {RESULTS_DIR}/ws-load-<time>.json)")
+    args = parser.parse_args(argv)
+    args.server = args.server.rstrip("/")
+    if args.clients < 1:
+        parser.error("--clients must be at least 1")
+    if not 0 <= args.slow_clients <= args.clients:
+        parser.error("--slow-clients must be between 0 and --clients")
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    started_at = datetime.now(timezone.utc)
+    created = create_synthetic_stream(args.server, args.synthetic) if args.synthetic else None
+    try:
+        stream_id = created["stream_id"] if created else args.stream_id
+        camera_id = created["camera_id"] if created else stream_camera_id(args.server, stream_id)
+        result = asyncio.run(load_test(args, stream_id, camera_id))
+    finally:
+        if created:
+            delete_synthetic_stream(args.server, created)
+
+    server = result["server"]
+    print(f"server: {server['cpu_percent']}% CPU, {server['captured_fps']} fps captured, "
+          f"{server['frames_dropped']:.0f} frames dropped", file=sys.stderr)
+    for name, profile in result["profiles"].items():
+        latency = profile.get("latency_ms")
+        latency_text = f", latency p50 {latency['p50']}ms p99 {latency['p99']}ms" if latency else ""
+        print(f"{name}: {profile['clients']} clients ({profile['failed']} failed), "
+              f"fps min {profile['fps_min']} mean {profile['fps_mean']}, "
+              f"{profile['dropped']} frames missed{latency_text}", file=sys.stderr)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"ws-load-{started_at:%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "benchmark": "ws_load",
+            "created_at": started_at.isoformat(),
+            "config": {key: value for key, value in vars(args).items() if key != "output"},
+            **result,
+        }, f, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
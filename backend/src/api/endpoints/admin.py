@@ -0,0 +1,43 @@
+from fastapi import APIRouter
+from fastapi import Query
+from fastapi.responses import JSONResponse
+
+from ...core.tracing import tracer
+
+router = APIRouter()
+
+
+@router.get("/trace")
+def export_trace(clear: bool = False):
+    """
+    Download the sampled pipeline spans as Chrome trace JSON.
+
+    Open the file in ui.perfetto.dev or chrome://tracing.
+
+    Args:
+        clear: Empty the span buffer after exporting
+    """
+    trace = tracer.export_chrome_trace()
+    if clear:
+        tracer.clear()
+    return JSONResponse(trace, headers={"Content-Disposition": 'attachment; filename="carcara-trace.json"'})
+
+
+@router.get("/trace/sampling")
+def get_trace_sampling():
+    """Get the fraction of frames traced and the number of buffered spans."""
+    return {"sample_rate": tracer.sample_rate, "spans": len(tracer)}
+
+
+@router.put("/trace/sampling")
+def set_trace_sampling(sample_rate: float = Query(..., ge=0.0, le=1.0)):
+    """Change the fraction of frames traced at runtime, 0 disables tracing."""
+    tracer.sample_rate = sample_rate
+    return {"sample_rate": tracer.sample_rate, "spans": len(tracer)}
+
+
+@router.delete("/trace")
+def clear_trace():
+    """Drop all buffered spans."""
+    tracer.clear()
+    return {"message": "Trace buffer cleared"}
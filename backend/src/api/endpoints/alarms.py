@@ -5,6 +5,7 @@ from typing import List
 from ...db.session import get_db
 from ...models.alarm import Alarm
 from ...schemas.alarm import AlarmCreate, AlarmUpdate, AlarmResponse
+from ...services.config_cache import config_cache
 
 router = APIRouter()
 
@@ -14,8 +15,7 @@ def read_alarms(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """
     Get a list of alarms.
     """
-    alarms = db.query(Alarm).offset(skip).limit(limit).all()
-    return alarms
+    return config_cache.list(db, "alarm")[skip:skip + limit]
 
 
 @router.get("/{alarm_id}", response_model=AlarmResponse)
@@ -23,7 +23,7 @@ def read_alarm(alarm_id: int, db: Session = Depends(get_db)):
     """
     Get an alarm by its ID.
     """
-    alarm = db.query(Alarm).filter(Alarm.id == alarm_id).first()
+    alarm = config_cache.get(db, "alarm", alarm_id)
     if alarm is None:
         raise HTTPException(status_code=404, detail="Alarm not found")
     return alarm
@@ -38,6 +38,7 @@ def create_alarm(alarm: AlarmCreate, db: Session = Depends(get_db)):
     db.add(db_alarm)
     db.commit()
     db.refresh(db_alarm)
+    config_cache.invalidate("alarm", db_alarm.id)
     return db_alarm
 
 
@@ -55,6 +56,7 @@ def update_alarm(alarm_id: int, alarm: AlarmUpdate, db: Session = Depends(get_db
 
     db.commit()
     db.refresh(db_alarm)
+    config_cache.invalidate("alarm", alarm_id)
     return db_alarm
 
 
@@ -69,4 +71,5 @@ def delete_alarm(alarm_id: int, db: Session = Depends(get_db)):
 
     db.delete(db_alarm)
     db.commit()
+    config_cache.invalidate("alarm", alarm_id)
     return {"message": "Alarm deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,104 @@
+import os
+from datetime import datetime
+from typing import List
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from ...api.models.analysis_job import AnalysisJobCreate
+from ...api.models.analysis_job import AnalysisJobResponse
+from ...core.config import settings
+from ...db.session import get_db
+from ...models.analysis_job import AnalysisJob
+from ...models.camera import Camera
+from ...services.batch_analysis import batch_analysis_service
+
+router = APIRouter()
+
+
+@router.post("/", response_model=AnalysisJobResponse, status_code=202)
+def create_analysis_job(
+    job: AnalysisJobCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Analyse a local video file offline, as fast as the cores allow.
+
+    The detections are stored for the camera like live ones. The job is
+    returned as pending; poll it for progress and throughput.
+    """
+    camera = db.query(Camera).filter(Camera.id == job.camera_id).first()
+    if not camera:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    file_path = job.file_path or camera.file_path
+    if not file_path:
+        raise HTTPException(status_code=400, detail="No file_path given and the camera has no file")
+    if not os.path.isfile(file_path):
+        raise HTTPException(status_code=400, detail=f"File not found: {file_path}")
+    detection_model_name = job.detection_model_name or settings.DEFAULT_MODEL
+    if detection_model_name not in settings.SUPPORTED_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unsupported model {detection_model_name}")
+
+    db_job = AnalysisJob(
+        camera_id=camera.id,
+        file_path=file_path,
+        detection_model_name=detection_model_name,
+        frame_step=job.frame_step,
+        status="pending",
+        video_start=job.video_start or datetime.utcnow(),
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+
+    batch_analysis_service.submit(db_job.id)
+    return db_job
+
+
+@router.get("/", response_model=List[AnalysisJobResponse])
+def list_analysis_jobs(
+    skip: int = 0,
+    limit: int = 100,
+    camera_id: Optional[int] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """List analysis jobs, newest first."""
+    query = db.query(AnalysisJob)
+
+    if camera_id:
+        query = query.filter(AnalysisJob.camera_id == camera_id)
+    if status:
+        query = query.filter(AnalysisJob.status == status)
+
+    return query.order_by(AnalysisJob.created_at.desc()).offset(skip).limit(limit).all()
+
+
+@router.get("/{job_id}", response_model=AnalysisJobResponse)
+def get_analysis_job(
+    job_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get a job's status, progress and throughput."""
+    job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return job
+
+
+@router.post("/{job_id}/cancel", response_model=AnalysisJobResponse)
+def cancel_analysis_job(
+    job_id: int,
+    db: Session = Depends(get_db)
+):
+    """Cancel a job; chunks already being analysed still finish and are stored."""
+    job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    if job.status not in ("pending", "running"):
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+    batch_analysis_service.cancel(job_id)
+    return job
@@ -1,20 +1,36 @@
+import asyncio
+import time
+from datetime import datetime
+from datetime import timezone
 from typing import List
 from typing import Optional
 from typing import Tuple
 
+import cv2
+import numpy as np
 from fastapi import APIRouter
 from fastapi import Depends
+from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from ...api.models.camera import CameraCreate
 from ...api.models.camera import CameraResponse
 from ...api.models.camera import CameraUpdate
+from ...core.config import settings
 from ...db.session import get_db
 from ...models.camera import Camera
-from ...services.detection import CameraService
+from ...services.camera_inventory import camera_inventory
+from ...services.config_cache import config_cache
 from ...services.detection import ObjectDetectionService
+from ...services.heatmaps import heatmap_store
+from ...services.heatmaps import render_heatmap
+from ...services.snapshots import etag_matches
+from ...services.snapshots import snapshot_cache
+from ...services.streaming import get_stream_manager
 
 router = APIRouter()
 detection_service = ObjectDetectionService()
@@ -31,11 +47,13 @@ def create_camera(
         camera_type=camera.camera_type,
         device_id=camera.device_id,
         rtsp_url=camera.rtsp_url,
+        file_path=camera.file_path,
         is_active=camera.is_active
     )
     db.add(db_camera)
     db.commit()
     db.refresh(db_camera)
+    config_cache.invalidate("camera", db_camera.id)
     return db_camera
 
 
@@ -46,8 +64,7 @@ def list_cameras(
     db: Session = Depends(get_db)
 ):
     """List all cameras."""
-    cameras = db.query(Camera).offset(skip).limit(limit).all()
-    return cameras
+    return config_cache.list(db, "camera")[skip:skip + limit]
 
 
 class CameraInfo(BaseModel):
@@ -65,25 +82,29 @@ class CameraInfo(BaseModel):
 @router.get("/scan", response_model=List[CameraInfo])
 async def scan_local_cameras(
     max_devices: int = 10,
-    camera_service: CameraService = Depends(
-        lambda: CameraService()
-    )
+    refresh: bool = False
 ) -> List[CameraInfo]:
     """
-    Scan for available local camera devices.
+    List available local camera devices from the background inventory.
+
+    The inventory is kept up to date by hotplug events, so this does not
+    open any device unless a refresh is requested.
 
     Args:
         max_devices: Maximum number of devices to scan (default: 10)
+        refresh: Re-probe every device before answering
 
     Returns:
         List of available camera devices with their properties
     """
     try:
-        cameras = camera_service.scan_local_cameras(max_devices)
-        for camera in cameras:
-            if isinstance(camera["resolution"], tuple):
-                camera["resolution"] = list(camera["resolution"])
-        return [CameraInfo(**camera) for camera in cameras]
+        if not camera_inventory.is_running:
+            camera_inventory.start()
+        if refresh:
+            await asyncio.to_thread(camera_inventory.refresh)
+        elif not camera_inventory.ready.is_set():
+            await asyncio.to_thread(camera_inventory.ready.wait, settings.CAMERA_INVENTORY_READY_TIMEOUT)
+        return [CameraInfo(**camera) for camera in camera_inventory.snapshot(max_devices)]
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -97,7 +118,7 @@ def get_camera(
     db: Session = Depends(get_db)
 ):
     """Get a specific camera by ID."""
-    camera = db.query(Camera).filter(Camera.id == camera_id).first()
+    camera = config_cache.get(db, "camera", camera_id)
     if camera is None:
         raise HTTPException(status_code=404, detail="Camera not found")
     return camera
@@ -117,7 +138,7 @@ def get_camera_status(
     Returns:
         A dictionary containing the camera's status.
     """
-    camera = db.query(Camera).filter(Camera.id == camera_id).first()
+    camera = config_cache.get(db, "camera", camera_id)
     if camera is None:
         raise HTTPException(status_code=404, detail="Camera not found")
 
@@ -126,6 +147,101 @@ def get_camera_status(
     return {"status": status}
 
 
+@router.get("/{camera_id}/snapshot")
+async def get_camera_snapshot(
+    camera_id: int,
+    width: Optional[int] = Query(None, gt=0, le=7680),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the latest frame of a streaming camera as JPEG.
+
+    The frame comes from memory, the camera is never opened. The strong
+    ETag changes with every new frame, so a poller sending If-None-Match
+    gets 304 Not Modified until the camera has produced a new frame.
+
+    Args:
+        camera_id: ID of the camera.
+        width: Downscale the frame to this width, keeping the aspect ratio.
+    """
+    camera = config_cache.get(db, "camera", camera_id)
+    if camera is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    manager = get_stream_manager(camera)
+    snapshot = manager.snapshot if manager is not None else None
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No frame in memory, the camera is not streaming")
+
+    sequence, jpeg = snapshot
+    etag = f'"{camera_id}-{manager.token}-{sequence}-{width or 0}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if width is not None:
+        key = (camera_id, manager.token, sequence, width)
+        jpeg = snapshot_cache.get(key) or await asyncio.to_thread(snapshot_cache.resized, key, jpeg, width)
+    return Response(content=jpeg, media_type="image/jpeg", headers=headers)
+
+
+def _utc_seconds(moment: datetime) -> float:
+    """Seconds since the epoch of a datetime, naive ones are taken as UTC like the stored timestamps."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+@router.get("/{camera_id}/heatmap")
+async def get_camera_heatmap(
+    camera_id: int,
+    class_name: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    width: int = Query(640, gt=0, le=7680),
+    background: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Get where objects were seen by a camera over a time range as a PNG heatmap.
+
+    The heatmap is summed from stored hourly and daily grids, so any range
+    costs a few dozen small reads. Values are object seconds per cell,
+    rendered on a log scale.
+
+    Args:
+        camera_id: ID of the camera.
+        class_name: Only objects of this class, all classes by default.
+        start: Start of the range in UTC, widened to the hour; 24 hours before end by default.
+        end: End of the range in UTC, widened to the hour; now by default.
+        width: Width of the image. The height follows the latest frame's aspect ratio with background,
+            otherwise the grid's HEATMAP_ROWS x HEATMAP_COLUMNS (36x64 by default).
+        background: Blend onto the camera's latest frame instead of returning a transparent overlay.
+    """
+    camera = config_cache.get(db, "camera", camera_id)
+    if camera is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    end_time = _utc_seconds(end) if end is not None else time.time()
+    start_time = _utc_seconds(start) if start is not None else end_time - 24 * 3600
+    if start_time >= end_time:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    frame = None
+    if background:
+        manager = get_stream_manager(camera)
+        snapshot = manager.snapshot if manager is not None else None
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="No frame in memory, the camera is not streaming")
+        frame = await asyncio.to_thread(cv2.imdecode, np.frombuffer(snapshot[1], np.uint8), cv2.IMREAD_COLOR)
+    height = round(width * frame.shape[0] / frame.shape[1]) if frame is not None else \
+        round(width * settings.HEATMAP_ROWS / settings.HEATMAP_COLUMNS)
+
+    grid = await asyncio.to_thread(heatmap_store.query, camera_id, start_time, end_time, class_name)
+    png = await asyncio.to_thread(render_heatmap, grid, width, height, frame)
+    headers = {"Cache-Control": "no-cache", "X-Heatmap-Max-Seconds": f"{grid.max():.1f}"}
+    return Response(content=png, media_type="image/png", headers=headers)
+
+
 @router.put("/{camera_id}", response_model=CameraResponse)
 def update_camera(
     camera_id: int,
@@ -142,6 +258,7 @@ def update_camera(
 
     db.commit()
     db.refresh(db_camera)
+    config_cache.invalidate("camera", camera_id)
     return db_camera
 
 
@@ -157,4 +274,5 @@ def delete_camera(
 
     db.delete(db_camera)
     db.commit()
+    config_cache.invalidate("camera", camera_id)
     return {"message": "Camera deleted successfully"}
@@ -0,0 +1,127 @@
+import os
+import time
+from datetime import datetime
+from typing import List
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from ...api.models.clip import ClipCreate
+from ...api.models.clip import ClipResponse
+from ...db.session import get_db
+from ...models.alarm import Alarm
+from ...models.camera import Camera
+from ...models.clip import Clip
+from ...models.detection import Detection
+from ...services.clips import clip_service
+from ...services.streaming import get_stream_manager
+
+router = APIRouter()
+
+
+@router.post("/", response_model=ClipResponse, status_code=202)
+async def create_clip(
+    clip: ClipCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Save a clip around the current moment from the camera's pre-roll buffer.
+
+    The clip is returned as pending and saved once the post-roll has been
+    captured; poll it until its status is "saved" or "failed". Clips of
+    fired alarms are saved without a request.
+    """
+    camera = db.query(Camera).filter(Camera.id == clip.camera_id).first()
+    if not camera:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    if clip.alarm_id and not db.query(Alarm).filter(Alarm.id == clip.alarm_id).first():
+        raise HTTPException(status_code=404, detail="Alarm not found")
+    if clip.detection_id and not db.query(Detection).filter(Detection.id == clip.detection_id).first():
+        raise HTTPException(status_code=404, detail="Detection not found")
+
+    manager = get_stream_manager(camera)
+    if manager is None:
+        raise HTTPException(status_code=409, detail="Camera is not streaming, no pre-roll is buffered")
+
+    event_time = time.time()
+    db_clip = Clip(
+        camera_id=camera.id,
+        alarm_id=clip.alarm_id,
+        detection_id=clip.detection_id,
+        status="pending",
+        event_time=datetime.utcfromtimestamp(event_time),
+    )
+    db.add(db_clip)
+    db.commit()
+    db.refresh(db_clip)
+
+    clip_service.trigger(manager, db_clip.id, event_time, clip.pre_roll, clip.post_roll)
+    return db_clip
+
+
+@router.get("/", response_model=List[ClipResponse])
+def list_clips(
+    skip: int = 0,
+    limit: int = 100,
+    camera_id: Optional[int] = None,
+    alarm_id: Optional[int] = None,
+    detection_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """List clips, newest first, with optional filtering."""
+    query = db.query(Clip)
+
+    if camera_id:
+        query = query.filter(Clip.camera_id == camera_id)
+    if alarm_id:
+        query = query.filter(Clip.alarm_id == alarm_id)
+    if detection_id:
+        query = query.filter(Clip.detection_id == detection_id)
+
+    return query.order_by(Clip.event_time.desc()).offset(skip).limit(limit).all()
+
+
+@router.get("/{clip_id}", response_model=ClipResponse)
+def get_clip(
+    clip_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get a specific clip by ID."""
+    clip = db.query(Clip).filter(Clip.id == clip_id).first()
+    if clip is None:
+        raise HTTPException(status_code=404, detail="Clip not found")
+    return clip
+
+
+@router.get("/{clip_id}/video")
+def get_clip_video(
+    clip_id: int,
+    db: Session = Depends(get_db)
+):
+    """Serve the clip file, Range requests are answered with 206 partial content."""
+    clip = db.query(Clip).filter(Clip.id == clip_id).first()
+    if clip is None:
+        raise HTTPException(status_code=404, detail="Clip not found")
+    if clip.status != "saved" or not clip.file_path or not os.path.isfile(clip.file_path):
+        raise HTTPException(status_code=404, detail=f"Clip video not available (status {clip.status})")
+    return FileResponse(clip.file_path, media_type="video/mp4")
+
+
+@router.delete("/{clip_id}")
+def delete_clip(
+    clip_id: int,
+    db: Session = Depends(get_db)
+):
+    """Delete a clip and its file."""
+    clip = db.query(Clip).filter(Clip.id == clip_id).first()
+    if clip is None:
+        raise HTTPException(status_code=404, detail="Clip not found")
+    if clip.file_path and os.path.isfile(clip.file_path):
+        os.remove(clip.file_path)
+    db.delete(clip)
+    db.commit()
+    return {"message": "Clip deleted successfully"}
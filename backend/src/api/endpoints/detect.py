@@ -0,0 +1,118 @@
+import asyncio
+import json
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from fastapi import APIRouter
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import UploadFile
+
+from ...core.config import settings
+from ...services.batch_detection import DETECTION_COLUMNS
+from ...services.batch_detection import Upload
+from ...services.batch_detection import detect_uploads
+from ...services.batch_detection import split_length_prefixed
+from ...services.detection import ObjectDetectionService
+from ...services.detection import get_detection_service
+
+router = APIRouter()
+
+NDJSON = "application/x-ndjson"
+
+
+def _load_model(model: str) -> Tuple[ObjectDetectionService, Dict[int, str]]:
+    """Return the detection service of a model and its class names, blocking until the model is loaded."""
+    service = get_detection_service(model)
+    return service, service.class_names
+
+
+async def _read_uploads(request: Request) -> List[Upload]:
+    content_type = request.headers.get("content-type", "")
+    if int(request.headers.get("content-length") or 0) > settings.DETECT_BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Request exceeds {settings.DETECT_BATCH_MAX_BYTES} bytes")
+
+    if content_type.startswith("multipart/form-data"):
+        async with request.form(max_files=settings.DETECT_BATCH_MAX_IMAGES) as form:
+            return [
+                (value.filename, await value.read())
+                for _, value in form.multi_items()
+                if isinstance(value, UploadFile)
+            ]
+
+    if content_type.startswith("application/octet-stream"):
+        body = bytearray()
+        async for chunk in request.stream():
+            body += chunk
+            if len(body) > settings.DETECT_BATCH_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Request exceeds {settings.DETECT_BATCH_MAX_BYTES} bytes")
+        try:
+            return [(None, image) for image in split_length_prefixed(bytes(body))]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    raise HTTPException(status_code=415, detail="Send multipart/form-data or application/octet-stream")
+
+
+@router.post("/batch")
+async def detect_batch(
+    request: Request,
+    model: str = settings.DEFAULT_MODEL,
+    format: Optional[str] = Query(None, pattern="^(columnar|ndjson)$"),
+):
+    """
+    Detect objects on many uploaded images in one request.
+
+    Send the images as files of a multipart form, any field name, or as an
+    application/octet-stream body where each image is preceded by its size
+    as a little-endian uint32. They are decoded in parallel and analysed in
+    batches of DETECT_BATCH_SIZE.
+
+    The columnar response has an ``images`` table and a ``detections``
+    table whose ``image`` column indexes into it. Requests of more than
+    DETECT_BATCH_STREAM_THRESHOLD images, or with ``format=ndjson`` or
+    ``Accept: application/x-ndjson``, are answered with NDJSON instead: a
+    header line with the model and classes, then one line per image as
+    soon as its batch is analysed.
+    """
+    if model not in settings.SUPPORTED_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unsupported model {model}")
+    uploads = await _read_uploads(request)
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No images in the request")
+    if len(uploads) > settings.DETECT_BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=413, detail=f"More than {settings.DETECT_BATCH_MAX_IMAGES} images")
+
+    try:
+        service, class_names = await asyncio.to_thread(_load_model, model)
+    except RuntimeError as e:
+        # The inference workers have not loaded the model within INFERENCE_READY_TIMEOUT
+        raise HTTPException(status_code=503, detail=str(e))
+    header = {"model": model, "classes": class_names, "count": len(uploads)}
+    if format is None:
+        streamed = NDJSON in request.headers.get("accept", "") or len(uploads) > settings.DETECT_BATCH_STREAM_THRESHOLD
+        format = "ndjson" if streamed else "columnar"
+
+    if format == "ndjson":
+        async def lines():
+            yield json.dumps(header) + "\n"
+            async for batch in detect_uploads(service, uploads):
+                yield "".join(json.dumps(image) + "\n" for image in batch)
+
+        return StreamingResponse(lines(), media_type=NDJSON)
+
+    images: Dict[str, List[Any]] = {"name": [], "width": [], "height": [], "error": []}
+    detections: Dict[str, List[Any]] = {"image": [], **{name: [] for name in DETECTION_COLUMNS}}
+    async for batch in detect_uploads(service, uploads):
+        for image in batch:
+            for name in images:
+                images[name].append(image[name])
+            detections["image"].extend([image["index"]] * len(image["class_id"]))
+            for name in DETECTION_COLUMNS:
+                detections[name].extend(image[name])
+    return {**header, "images": images, "detections": detections}
@@ -1,20 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import asyncio
+from contextlib import nullcontext
+from datetime import datetime
+import importlib.util
+
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import cv2
 import numpy as np
 
+from ...core.config import settings
 from ...db.session import get_db
 from ...models.detection import Detection
 from ...models.camera import Camera
 from ...models.stream import Stream
+from ...services.crops import crop_store
+from ...services.detection import CameraService
 from ...services.detection import ObjectDetectionService
-from ...api.models.detection import DetectionCreate, DetectionResponse
+from ...services.events import to_polygon
+from ...services.export import EXPORT_MEDIA_TYPES, export_detections, export_statement
+from ...services.snapshots import etag_matches
+from ...services.spatial_index import index_detection, query_area
+from ...services.streaming import get_stream_manager
+from ...api.models.detection import AreaQuery, AreaQueryResponse, DetectionCreate, DetectionResponse
 
 router = APIRouter()
 detection_service = ObjectDetectionService()
 
 
+def _detect_camera_frame(camera: Camera, manager) -> Optional[List[dict]]:
+    """
+    Detect objects on the current frame of a camera.
+
+    The live frame is used in place when the camera is streaming, opening
+    the camera again would steal it from the stream.
+
+    Returns:
+        The detections, or None if no frame could be read.
+    """
+    with manager.ring.latest_frame() if manager else nullcontext() as slot:
+        if slot is not None:
+            frame = slot.array
+        else:
+            frame = CameraService.process_stream(
+                camera.file_path if camera.camera_type == "file" else camera.rtsp_url,
+                camera_type=camera.camera_type,
+                device_id=camera.device_id
+            )
+        if frame is None:
+            return None
+        return detection_service.detect(frame)
+
+
 @router.post("/", response_model=DetectionResponse)
 async def create_detection(
     detection: DetectionCreate,
@@ -31,30 +69,26 @@ async def create_detection(
     if not stream:
         raise HTTPException(status_code=404, detail="Stream not found")
 
-    # Process frame and perform detection
-    frame = detection_service.process_stream(
-        camera.rtsp_url,
-        camera_type=camera.camera_type,
-        device_id=camera.device_id
-    )
-    if frame is None:
+    # Reading the camera and inference block, keep them off the event loop
+    detections = await asyncio.to_thread(_detect_camera_frame, camera, get_stream_manager(camera))
+    if detections is None:
         raise HTTPException(status_code=400, detail="Could not process stream")
 
-    detections = detection_service.detect(frame)
-
     # Store detection results
     db_detection = Detection(
         camera_id=detection.camera_id,
         stream_id=detection.stream_id,
         frame_number=detection.frame_number,
-        model_name=detection_service.model_name,
+        detection_model_name=detection_service.detection_model_name,
         confidence=detections[0]["confidence"] if detections else 0.0,
         class_name=detections[0]["class_name"] if detections else "",
         bbox=detections[0]["bbox"] if detections else [],
-        metadata={"detections": detections}
+        detection_metadata={"detections": detections}
     )
 
     db.add(db_detection)
+    db.flush()
+    index_detection(db, db_detection)
     db.commit()
     db.refresh(db_detection)
     return db_detection
@@ -80,6 +114,57 @@ def list_detections(
     return detections
 
 
+@router.get("/export")
+def export_detections_endpoint(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+    camera_id: Optional[int] = None,
+    stream_id: Optional[int] = None,
+    class_name: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    min_confidence: Optional[float] = None,
+    include_metadata: bool = False
+):
+    """
+    Stream every matching detection in one response, ordered by ID.
+
+    Rows are fetched with a server-side cursor and encoded batch by batch,
+    so any range can be exported with constant memory. ``end`` is
+    exclusive. Parquet requires the optional pyarrow package.
+    """
+    if format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    statement = export_statement(camera_id, stream_id, class_name, start, end, min_confidence, include_metadata)
+    return StreamingResponse(
+        export_detections(statement, format, include_metadata),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="detections.{format}"'},
+    )
+
+
+@router.post("/area", response_model=AreaQueryResponse)
+def query_detections_in_area(query: AreaQuery, db: Session = Depends(get_db)):
+    """
+    Find the detections of a camera inside a polygon during a time range.
+
+    Boxes overlapping the polygon match, or with ``match=centre`` only boxes
+    whose centre lies inside it. Answered from the grid index of detection
+    boxes, in time order.
+    """
+    try:
+        polygon = to_polygon(query.polygon)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if polygon is None:
+        raise HTTPException(status_code=400, detail="polygon must not be empty")
+    rows, truncated = query_area(
+        db, query.camera_id, polygon, query.start, query.end,
+        class_name=query.class_name, min_confidence=query.min_confidence, match=query.match,
+        limit=min(query.limit, settings.SPATIAL_QUERY_MAX_RESULTS),
+    )
+    return {"count": len(rows), "truncated": truncated, "detections": [row._asdict() for row in rows]}
+
+
 @router.get("/{detection_id}", response_model=DetectionResponse)
 def get_detection(
     detection_id: int,
@@ -92,6 +177,35 @@ def get_detection(
     return detection
 
 
+@router.get("/{detection_id}/crop")
+def get_detection_crop(
+    detection_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the image of a detected object as JPEG.
+
+    Crops are content addressed, so the ETag is the crop's digest and the
+    response can be cached forever.
+    """
+    row = db.query(Detection.detection_metadata).filter(Detection.id == detection_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Detection not found")
+    digest = (row.detection_metadata or {}).get("crop")
+    if digest is None:
+        raise HTTPException(status_code=404, detail="No crop was stored for this detection")
+
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    crop = crop_store.get(bytes.fromhex(digest))
+    if crop is None:
+        raise HTTPException(status_code=404, detail="Crop not found in the crop store")
+    return Response(content=crop, media_type="image/jpeg", headers=headers)
+
+
 @router.delete("/{detection_id}")
 def delete_detection(
     detection_id: int,
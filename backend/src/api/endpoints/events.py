@@ -0,0 +1,143 @@
+import asyncio
+import json
+import logging
+from typing import List
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi import WebSocket
+from fastapi import WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.websockets import WebSocketState
+
+from ...core.config import settings
+from ...db.session import get_db
+from ...services.config_cache import config_cache
+from ...services.events import EVENT_TYPES
+from ...services.events import EventFilter
+from ...services.events import event_bus
+from ...services.events import to_polygon
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _event_filter(db: Session, camera_id: Optional[List[int]], class_name: Optional[List[str]],
+                  min_confidence: float, roi_id: Optional[int], types: str) -> EventFilter:
+    """Build a subscription filter; an ROI limits the events to its camera."""
+    event_types = frozenset(types.split(","))
+    if not event_types or not event_types <= EVENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"types must be a subset of {', '.join(sorted(EVENT_TYPES))}")
+    camera_ids = frozenset(camera_id) if camera_id else None
+    region = None
+    if roi_id is not None:
+        roi = config_cache.get(db, "roi", roi_id)
+        if roi is None:
+            raise HTTPException(status_code=404, detail="ROI not found")
+        try:
+            region = to_polygon(roi.points)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"ROI {roi_id} is not a polygon: {e}")
+        camera_ids = frozenset({roi.camera_id}) & camera_ids if camera_ids is not None else frozenset({roi.camera_id})
+    return EventFilter(
+        camera_ids=camera_ids,
+        class_names=frozenset(class_name) if class_name else None,
+        min_confidence=min_confidence,
+        region=region,
+        types=event_types,
+    )
+
+
+@router.get("/")
+async def stream_events(
+    camera_id: Optional[List[int]] = Query(None),
+    class_name: Optional[List[str]] = Query(None),
+    min_confidence: float = 0.0,
+    roi_id: Optional[int] = None,
+    types: str = "detection,alarm",
+    db: Session = Depends(get_db)
+):
+    """
+    Subscribe to live detection and alarm events as Server-Sent Events.
+
+    Each ``events`` message carries everything that matched the filters since
+    the previous one, at most one message per EVENTS_TICK_SECONDS. Events are
+    published by cameras that are streaming; ``dropped`` counts detection
+    events discarded because the client read too slowly.
+    """
+    event_filter = _event_filter(db, camera_id, class_name, min_confidence, roi_id, types)
+
+    async def messages():
+        subscription = event_bus.subscribe(event_filter)
+        try:
+            yield b"retry: 1000\n\n"
+            while True:
+                batch = await subscription.next_batch(timeout=settings.EVENTS_SSE_KEEPALIVE_SECONDS)
+                if batch is None:
+                    yield b": keepalive\n\n"
+                    continue
+                yield f"event: events\ndata: {json.dumps(batch)}\n\n".encode()
+                await asyncio.sleep(settings.EVENTS_TICK_SECONDS)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        messages(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def stream_events_ws(
+    websocket: WebSocket,
+    camera_id: Optional[List[int]] = Query(None),
+    class_name: Optional[List[str]] = Query(None),
+    min_confidence: float = 0.0,
+    roi_id: Optional[int] = None,
+    types: str = "detection,alarm",
+    db: Session = Depends(get_db)
+):
+    """
+    Subscribe to live detection and alarm events over a WebSocket.
+
+    Takes the same filters as the SSE endpoint and sends the same ``events``
+    messages as JSON text. Invalid filters close the connection with 1008.
+    """
+    await websocket.accept()
+    try:
+        event_filter = _event_filter(db, camera_id, class_name, min_confidence, roi_id, types)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+
+    subscription = event_bus.subscribe(event_filter)
+    receiver = asyncio.create_task(websocket.receive())
+    try:
+        while True:
+            getter = asyncio.create_task(subscription.next_batch())
+            done, _ = await asyncio.wait({receiver, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                # Sent first, the batch was already taken from the subscription and would be lost
+                await websocket.send_text(json.dumps(getter.result()))
+            else:
+                getter.cancel()
+            if receiver in done:
+                if receiver.result()["type"] == "websocket.disconnect":
+                    break
+                receiver = asyncio.create_task(websocket.receive())
+            if getter in done:
+                await asyncio.sleep(settings.EVENTS_TICK_SECONDS)
+    except WebSocketDisconnect:
+        pass  # The client went away while a batch was being sent
+    except Exception as e:
+        logger.error(f"Error in event WebSocket: {e}", exc_info=True)
+    finally:
+        event_bus.unsubscribe(subscription)
+        if not receiver.done():
+            receiver.cancel()
+        if websocket.client_state != WebSocketState.DISCONNECTED:
+            await websocket.close()
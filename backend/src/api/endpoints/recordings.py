@@ -0,0 +1,108 @@
+import os
+import time
+from typing import List
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from ...api.models.recording import RecordingStatus
+from ...api.models.recording import SeekResponse
+from ...api.models.recording import SegmentResponse
+from ...core.config import settings
+from ...db.session import get_db
+from ...services.config_cache import config_cache
+from ...services.recording import recording_service
+from ...services.recording import segment_file_name
+
+router = APIRouter()
+
+
+def _segment_response(camera_id: int, record: np.void) -> SegmentResponse:
+    number = int(record["number"])
+    return SegmentResponse(
+        number=number,
+        start=float(record["start"]),
+        end=float(record["end"]),
+        url=f"{settings.API_V1_STR}/recordings/{camera_id}/segments/{number}",
+    )
+
+
+@router.post("/{camera_id}/start", response_model=RecordingStatus)
+async def start_recording(camera_id: int, db: Session = Depends(get_db)):
+    """Start continuous recording of a camera."""
+    # Async so the recorder task is created on the server's event loop, a recorder of an old URL is stopped first
+    camera = config_cache.get(db, "camera", camera_id)
+    if camera is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    try:
+        recorder = await recording_service.start_camera(camera)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return RecordingStatus(camera_id=camera_id, status=recorder.status, segments=len(recorder.index.records()))
+
+
+@router.post("/{camera_id}/stop", response_model=RecordingStatus)
+async def stop_recording(camera_id: int):
+    """Stop recording a camera, finishing its current segment."""
+    await recording_service.stop_camera(camera_id)
+    index = recording_service.get_index(camera_id)
+    return RecordingStatus(camera_id=camera_id, status="stopped", segments=len(index.records()))
+
+
+@router.get("/{camera_id}", response_model=RecordingStatus)
+def get_recording_status(camera_id: int):
+    """Get whether a camera is recording, stopped, or its recorder failed, e.g. because ffmpeg could not run."""
+    recorder = recording_service.recorders.get(camera_id)
+    status = recorder.status if recorder is not None else "stopped"
+    index = recording_service.get_index(camera_id)
+    return RecordingStatus(camera_id=camera_id, status=status, segments=len(index.records()))
+
+
+@router.get("/{camera_id}/segments", response_model=List[SegmentResponse])
+def list_segments(
+    camera_id: int,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+):
+    """
+    List the recorded segments overlapping a time range.
+
+    Args:
+        start: Range start in seconds since the epoch (default: one hour ago)
+        end: Range end in seconds since the epoch (default: now)
+    """
+    end = time.time() if end is None else end
+    start = end - 3600 if start is None else start
+    records = recording_service.get_index(camera_id).overlapping(start, end)
+    return [_segment_response(camera_id, record) for record in records]
+
+
+@router.get("/{camera_id}/seek", response_model=SeekResponse)
+def seek(camera_id: int, at: float):
+    """
+    Locate the segment recording at a timestamp.
+
+    Args:
+        at: Timestamp in seconds since the epoch
+
+    Returns:
+        The segment and the offset to seek to within it.
+    """
+    record = recording_service.get_index(camera_id).find(at)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Nothing recorded at this time")
+    return SeekResponse(segment=_segment_response(camera_id, record), offset=at - float(record["start"]))
+
+
+@router.get("/{camera_id}/segments/{number}")
+def get_segment(camera_id: int, number: int):
+    """Serve a segment file; Range requests are answered with 206 partial content."""
+    path = os.path.join(settings.RECORDINGS_DIR, str(camera_id), segment_file_name(number))
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Segment not found")
+    return FileResponse(path, media_type="video/mp4")
@@ -5,6 +5,7 @@ from typing import List
 from ...db.session import get_db
 from ...models.roi import RegionOfInterest
 from ...schemas.roi import ROICreate, ROIUpdate, ROIResponse
+from ...services.config_cache import config_cache
 
 router = APIRouter()
 
@@ -16,11 +17,10 @@ def read_rois(
     """
     Get a list of regions of interest.
     """
-    query = db.query(RegionOfInterest)
+    rois = config_cache.list(db, "roi")
     if camera_id is not None:
-        query = query.filter(RegionOfInterest.camera_id == camera_id)
-    rois = query.offset(skip).limit(limit).all()
-    return rois
+        rois = [roi for roi in rois if roi.camera_id == camera_id]
+    return rois[skip:skip + limit]
 
 
 @router.get("/{roi_id}", response_model=ROIResponse)
@@ -28,7 +28,7 @@ def read_roi(roi_id: int, db: Session = Depends(get_db)):
     """
     Get a region of interest by its ID.
     """
-    roi = db.query(RegionOfInterest).filter(RegionOfInterest.id == roi_id).first()
+    roi = config_cache.get(db, "roi", roi_id)
     if roi is None:
         raise HTTPException(status_code=404, detail="Region of interest not found")
     return roi
@@ -43,6 +43,7 @@ def create_roi(roi: ROICreate, db: Session = Depends(get_db)):
     db.add(db_roi)
     db.commit()
     db.refresh(db_roi)
+    config_cache.invalidate("roi", db_roi.id)
     return db_roi
 
 
@@ -60,6 +61,7 @@ def update_roi(roi_id: int, roi: ROIUpdate, db: Session = Depends(get_db)):
 
     db.commit()
     db.refresh(db_roi)
+    config_cache.invalidate("roi", roi_id)
     return db_roi
 
 
@@ -74,4 +76,5 @@ def delete_roi(roi_id: int, db: Session = Depends(get_db)):
 
     db.delete(db_roi)
     db.commit()
+    config_cache.invalidate("roi", roi_id)
     return {"message": "Region of interest deleted successfully"}
\ No newline at end of file
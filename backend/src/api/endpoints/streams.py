@@ -11,8 +11,8 @@ from ...api.models.stream import StreamCreate
 from ...api.models.stream import StreamResponse
 from ...api.models.stream import StreamUpdate
 from ...db.session import get_db
-from ...models.camera import Camera
 from ...models.stream import Stream
+from ...services.config_cache import config_cache
 from ...services.detection import ObjectDetectionService
 
 router = APIRouter()
@@ -26,7 +26,7 @@ def create_stream(
 ):
     """Create a new stream for a camera."""
     # Verify camera exists
-    camera = db.query(Camera).filter(Camera.id == stream.camera_id).first()
+    camera = config_cache.get(db, "camera", stream.camera_id)
     if not camera:
         raise HTTPException(status_code=404, detail="Camera not found")
 
@@ -38,6 +38,7 @@ def create_stream(
     db.add(db_stream)
     db.commit()
     db.refresh(db_stream)
+    config_cache.invalidate("stream", db_stream.id)
     return db_stream
 
 
@@ -48,8 +49,7 @@ def list_streams(
     db: Session = Depends(get_db)
 ):
     """List all streams."""
-    streams = db.query(Stream).offset(skip).limit(limit).all()
-    return streams
+    return config_cache.list(db, "stream")[skip:skip + limit]
 
 
 @router.get("/{stream_id}", response_model=StreamResponse)
@@ -58,7 +58,7 @@ def get_stream(
     db: Session = Depends(get_db)
 ):
     """Get a specific stream by ID."""
-    stream = db.query(Stream).filter(Stream.id == stream_id).first()
+    stream = config_cache.get(db, "stream", stream_id)
     if stream is None:
         raise HTTPException(status_code=404, detail="Stream not found")
     return stream
@@ -80,6 +80,7 @@ def update_stream(
 
     db.commit()
     db.refresh(db_stream)
+    config_cache.invalidate("stream", stream_id)
     return db_stream
 
 
@@ -95,4 +96,5 @@ def delete_stream(
 
     db.delete(db_stream)
     db.commit()
+    config_cache.invalidate("stream", stream_id)
     return {"message": "Stream deleted successfully"}
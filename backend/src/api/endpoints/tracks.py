@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import List
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from ...api.models.track import TrackResponse
+from ...db.session import get_db
+from ...models.track import Track
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[TrackResponse])
+def list_tracks(
+    skip: int = 0,
+    limit: int = 100,
+    camera_id: Optional[int] = None,
+    class_name: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """List finished tracks, newest first, optionally only those overlapping [start, end]."""
+    query = db.query(Track)
+
+    if camera_id:
+        query = query.filter(Track.camera_id == camera_id)
+    if class_name:
+        query = query.filter(Track.class_name == class_name)
+    if start:
+        query = query.filter(Track.last_seen >= start)
+    if end:
+        query = query.filter(Track.first_seen <= end)
+
+    return query.order_by(Track.first_seen.desc()).offset(skip).limit(limit).all()
+
+
+@router.get("/{track_id}", response_model=TrackResponse)
+def get_track(
+    track_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get a specific track by ID."""
+    track = db.query(Track).filter(Track.id == track_id).first()
+    if track is None:
+        raise HTTPException(status_code=404, detail="Track not found")
+    return track
@@ -1,154 +1,167 @@
 import asyncio
-from collections import defaultdict
-from threading import Lock
+import logging
 
-import cv2
 from fastapi import APIRouter
 from fastapi import Depends
 from fastapi import HTTPException
 from fastapi import WebSocket
-from fastapi import WebSocketDisconnect
 from sqlalchemy.orm import Session
+from starlette.websockets import WebSocketState
 
+from ...core.config import settings
 from ...db.session import get_db
-from ...models.stream import Stream
+from ...models.camera import Camera
+from ...services.config_cache import config_cache
+from ...services.detection import get_detection_service
+from ...services.fmp4 import Fmp4StreamManager
+from ...services.streaming import WS_BYTES_SENT
+from ...services.streaming import WS_SUBSCRIBERS
+from ...services.streaming import CameraStreamManager
+from ...services.streaming import camera_stream_lockers
+from ...services.streaming import camera_stream_managers
+from ...services.streaming import local_device_probes
+from ...services.streaming import stream_source_key
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-class CameraStreamManager:
-    def __init__(self, camera_device_id: int):
-        self.camera_device_id = camera_device_id
-        self.streamer = None
-        self.subscribers = []
-        self.lock = Lock()
-        self.status = "stopped"
-
-    def start_stream(self, camera_device_id: int):
-        with self.lock:
-            cap = cv2.VideoCapture(camera_device_id)
-            if not cap.isOpened():
-                print(f"==============================================================================")
-                print(f"STARTING for camera")
-                print(f"==============================================================================")
-                cap.release()
-                raise HTTPException(status_code=400, detail=f"Cannot open camera {camera_device_id}")
-
-            self.streamer = cap
-            self.status = "started"
-            print(f"==============================================================================")
-            print(f"STARTING for camera {camera_device_id}")
-            print(f"==============================================================================")
-
-    def stop_stream(self):
-        print(f"==============================================================================")
-        print(f"Stopping stream for camera {self.streamer} - cameras {len(self.subscribers)}")
-        print(f"==============================================================================")
-        self.streamer.release()
-        self.streamer = None
-        self.subscribers = []
-
-    def kill_stream(self):
-        """Forcefully stop the stream and remove all subscribers."""
-        with self.lock:
-            print(f"==============================================================================")
-            print(f"Killing stream for camera {self.camera_device_id}")
-            print(f"==============================================================================")
-            if self.streamer:
-                self.streamer.release()
-                self.streamer = None
-            self.subscribers.clear()
-            self.status = "stopped"
-
-    async def publish_frames(self):
-        cap = self.streamer
+async def stream_fmp4(websocket: WebSocket, camera: Camera):
+    """
+    Send the camera's H.264 remuxed as fMP4 for Media Source Extensions.
+
+    The client first receives a JSON text message with the MIME type to pass
+    to ``MediaSource.addSourceBuffer``, then binary messages to append in
+    order: the init segment followed by media fragments starting at a
+    keyframe.
+    """
+    if camera.camera_type != "rtsp" or not camera.rtsp_url:
+        raise HTTPException(status_code=400, detail="fMP4 passthrough requires an RTSP camera")
+
+    with camera_stream_lockers["fmp4"][camera.rtsp_url]:
+        manager = camera_stream_managers["fmp4"].get(camera.rtsp_url)
+        if manager is None:
+            manager = Fmp4StreamManager(camera.rtsp_url, camera.id)
+            camera_stream_managers["fmp4"][camera.rtsp_url] = manager
+    await manager.start_stream()
+    WS_SUBSCRIBERS.labels(camera.id, "fmp4").set_function(lambda: len(manager.subscribers))
+    bytes_sent = WS_BYTES_SENT.labels(camera.id, "fmp4")
+
+    subscriber = None
+    receiver = None
+    try:
+        await asyncio.wait_for(manager.init_ready.wait(), timeout=settings.FMP4_INIT_TIMEOUT)
+        subscriber = manager.add_subscriber()
+        await websocket.send_json({"type": "init", "mime": manager.mime_type})
+        await websocket.send_bytes(manager.init_segment)
 
+        receiver = asyncio.create_task(websocket.receive())
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            _, buffer = cv2.imencode('.jpg', frame)
-            for subscriber in self.subscribers:
-                try:
-                    await subscriber.send_bytes(buffer.tobytes())
-                except WebSocketDisconnect:
-                    self.subscribers.remove(subscriber)  # Remove disconnected subscriber
-            await asyncio.sleep(1 / 30)
-
-    def add_subscriber(self, websocket: WebSocket):
-        self.subscribers.append(websocket)  # Add WebSocket to the list
-
-    def remove_subscriber(self, websocket: WebSocket):
-        with self.lock:
-            print(f"==============================================================================")
-            print(f" REMOVING SUBSCRIBER  {len(self.subscribers)}")
-            print(f"==============================================================================")
-            if websocket in self.subscribers:
-                self.subscribers.remove(websocket)  # Remove WebSocket from the list
-            if not self.subscribers:
-                self.stop_stream()
-
-
-camera_stream_managers = {
-    "local": defaultdict(list),
-    "remote": defaultdict(list)
-}
-
-camera_stream_lockers = {
-    "local": defaultdict(Lock),
-    "remote": defaultdict(Lock)
-}
+            getter = asyncio.create_task(subscriber.queue.get())
+            done, _ = await asyncio.wait({receiver, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                getter.cancel()
+                if receiver.result()["type"] == "websocket.disconnect":
+                    break
+                receiver = asyncio.create_task(websocket.receive())
+                continue
+            fragment = getter.result()
+            if fragment is None:
+                # Stopped by restart_camera_streams, the client's close reply ends the loop
+                await websocket.close(code=1012, reason="Camera configuration changed")
+                continue
+            await websocket.send_bytes(fragment)
+            bytes_sent.inc(len(fragment))
+    finally:
+        if receiver is not None and not receiver.done():
+            receiver.cancel()
+        if subscriber is not None:
+            await manager.remove_subscriber(subscriber)
+        elif not manager.subscribers:
+            await manager.stop_stream()
 
 
 @router.websocket("/{stream_id}")
 async def stream_camera(websocket: WebSocket,
                         stream_id: int,
+                        mode: str = "jpeg",
+                        detect: bool = True,
                         db: Session = Depends(get_db)):
+    """
+    Stream a camera to the client.
+
+    Args:
+        mode: "jpeg" sends one JPEG per frame; "framed" sends each JPEG in a
+            binary frame message with its sequence number, capture time and
+            detections (see services.stream_protocol), preceded by a JSON
+            class names message; "fmp4" passes the RTSP camera's H.264
+            through as fragmented MP4 without transcoding.
+        detect: In framed mode, run detection on every frame (default). With
+            false the frame messages are sent without the class names message
+            and carry detections only of frames detected for other reasons,
+            e.g. to measure delivery without inference.
+    """
     await websocket.accept()
+    camera_stream_manager = None
     try:
-        # Retrieve the camera_id associated with the stream_id
-        stream = db.query(Stream).filter(Stream.id == stream_id).first()
+        # Retrieve the camera associated with the stream_id
+        stream = config_cache.get(db, "stream", stream_id)
         if not stream:
             raise HTTPException(status_code=404, detail="Stream not found")
 
-        # Ensure the camera is local
-        if stream.camera.camera_type != "local":
-            raise HTTPException(status_code=400, detail="Only local cameras are supported")
-
-        camera_device_id = stream.camera.device_id
-
-        # Safely access or create the CameraStreamManager
-        with camera_stream_lockers["local"][camera_device_id]:
-            camera_stream_manager = camera_stream_managers["local"].get(camera_device_id)
-            if camera_stream_manager is None:
-                # Create a new CameraStreamManager if it doesn't exist
-                camera_stream_manager = CameraStreamManager(camera_device_id)
-                camera_stream_managers["local"][camera_device_id] = camera_stream_manager
-
-            # if len(camera_stream_manager.subscribers) == 0:
-                camera_stream_manager.start_stream(camera_device_id)
-
-            # Add the subscriber to the manager
-            camera_stream_manager.add_subscriber(websocket)
-
-        # If there is just one subscriber, start the frame publishing
-        if len(camera_stream_manager.subscribers) == 1:
-            await camera_stream_manager.publish_frames()
-        else:
-            # If there are multiple subscribers, just wait for the frames to be published
-            while True:
-                await asyncio.sleep(1)
+        camera = config_cache.get(db, "camera", stream.camera_id)
+        if not camera:
+            raise HTTPException(status_code=404, detail="Camera not found")
+        if mode == "fmp4":
+            await stream_fmp4(websocket, camera)
+            return
+        if mode not in ("jpeg", "framed"):
+            raise HTTPException(status_code=400, detail=f"Unsupported stream mode {mode}")
+        if camera.camera_type not in ("local", "rtsp", "file", "synthetic"):
+            raise HTTPException(status_code=400, detail=f"Unsupported camera type {camera.camera_type}")
+        kind, source = stream_source_key(camera)
+        if source is None:
+            raise HTTPException(status_code=400, detail="Camera has no device or URL")
+
+        if mode == "framed" and detect:
+            # Load the model up front so the class names precede the first frame
+            class_names = await asyncio.to_thread(lambda: get_detection_service().class_names)
+            await websocket.send_json({"type": "classes", "names": class_names})
+
+        # Safely access or create the CameraStreamManager, one per device or URL
+        while True:
+            with camera_stream_lockers[kind][source]:
+                probe = local_device_probes.get(source) if kind == "local" else None
+                if probe is None:
+                    camera_stream_manager = camera_stream_managers[kind].get(source)
+                    if camera_stream_manager is None:
+                        # Create a new CameraStreamManager if it doesn't exist
+                        camera_stream_manager = CameraStreamManager(source, camera.camera_type, camera.id)
+                        camera_stream_managers[kind][source] = camera_stream_manager
+
+                    # Add the subscriber to the manager, it keeps the inventory from probing the device from now on
+                    camera_stream_manager.add_subscriber(websocket, framed=mode == "framed", detect=detect)
+                    break
+            # The camera inventory has the device open, wait off the event loop until it is closed
+            await asyncio.to_thread(probe.wait)
+
+        await camera_stream_manager.start_stream()
+        camera_stream_manager.ensure_publisher()
+
+        # Frames are pushed by the publisher, wait here until the client leaves
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
     except Exception as e:
-        print(f"Error in WebSocket stream: {e}")
-    except:
-        # Print the trace of the error
-        import traceback
-        traceback.print_exc()
-        print(f"Error in WebSocket stream: {e}")
+        logger.error(f"Error in WebSocket stream: {e}", exc_info=True)
     finally:
         # Remove the subscriber and close the WebSocket
-        camera_stream_manager.remove_subscriber(websocket)
-        await websocket.close()
+        if camera_stream_manager is not None:
+            camera_stream_manager.remove_subscriber(websocket)
+        if websocket.client_state != WebSocketState.DISCONNECTED:
+            await websocket.close()
 
 
 @router.delete("/kill/{camera_device_id}")
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class AnalysisJobCreate(BaseModel):
+    camera_id: int
+    file_path: Optional[str] = None  # Defaults to the file of a file camera
+    detection_model_name: Optional[str] = None  # Defaults to DEFAULT_MODEL
+    frame_step: int = Field(1, ge=1)  # Detect on every n-th frame
+    video_start: Optional[datetime] = None  # Wall-clock time of the first frame, defaults to now
+
+
+class AnalysisJobResponse(BaseModel):
+    id: int
+    camera_id: int
+    file_path: str
+    detection_model_name: str
+    frame_step: int
+    status: str
+    video_start: datetime
+    duration: Optional[float] = None
+    fps: Optional[float] = None
+    total_frames: Optional[int] = None
+    chunks_total: int
+    chunks_done: int
+    frames_processed: int
+    video_seconds_processed: float
+    detections_count: int
+    progress: float
+    elapsed_seconds: Optional[float] = None
+    frames_per_second: Optional[float] = None
+    realtime_factor: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
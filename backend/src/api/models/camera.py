@@ -10,6 +10,7 @@ class CameraBase(BaseModel):
     camera_type: str = "rtsp"
     device_id: Optional[int] = None
     rtsp_url: Optional[str] = None
+    file_path: Optional[str] = None
     is_active: bool = True
 
 
@@ -22,6 +23,7 @@ class CameraUpdate(BaseModel):
     camera_type: Optional[str] = None
     device_id: Optional[int] = None
     rtsp_url: Optional[str] = None
+    file_path: Optional[str] = None
     is_active: Optional[bool] = None
 
 
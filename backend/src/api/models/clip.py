@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ClipCreate(BaseModel):
+    camera_id: int
+    alarm_id: Optional[int] = None
+    detection_id: Optional[int] = None
+    pre_roll: Optional[float] = None  # Seconds, default PREROLL_SECONDS
+    post_roll: Optional[float] = None  # Seconds, default CLIP_POST_ROLL_SECONDS
+
+
+class ClipResponse(BaseModel):
+    id: int
+    camera_id: int
+    alarm_id: Optional[int] = None
+    detection_id: Optional[int] = None
+    status: str
+    event_time: datetime
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    frames: int
+    fps: Optional[float] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
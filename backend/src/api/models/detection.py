@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
 
 
@@ -19,8 +19,35 @@ class DetectionResponse(DetectionBase):
     confidence: float
     class_name: str
     bbox: List[float]
-    metadata: Dict[str, Any]
+    metadata: Optional[Dict[str, Any]] = Field(None, validation_alias="detection_metadata")
     timestamp: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class AreaQuery(BaseModel):
+    camera_id: int
+    polygon: List[float]  # [x1, y1, x2, y2, ...] in frame pixels, four values are a box
+    start: datetime
+    end: datetime  # Exclusive
+    class_name: Optional[str] = None
+    min_confidence: Optional[float] = None
+    match: Literal["intersects", "centre"] = "intersects"
+    limit: int = Field(1000, ge=1)
+
+
+class AreaDetection(BaseModel):
+    id: int
+    timestamp: datetime
+    stream_id: Optional[int] = None
+    frame_number: Optional[int] = None
+    class_name: str
+    confidence: float
+    bbox: List[float]
+
+
+class AreaQueryResponse(BaseModel):
+    count: int
+    truncated: bool  # More than limit detections matched
+    detections: List[AreaDetection]
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+
+
+class SegmentResponse(BaseModel):
+    number: int
+    start: float  # Seconds since the epoch
+    end: float
+    url: str
+
+
+class SeekResponse(BaseModel):
+    segment: SegmentResponse
+    offset: float  # Seconds into the segment
+
+
+class RecordingStatus(BaseModel):
+    camera_id: int
+    status: str
+    segments: int
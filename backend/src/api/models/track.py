@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import List
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class TrackResponse(BaseModel):
+    id: int
+    camera_id: int
+    track_id: int
+    detection_model_name: Optional[str] = None
+    class_name: str
+    confidence: float
+    hits: int
+    first_seen: datetime
+    last_seen: datetime
+    path: List[List[float]]
+
+    class Config:
+        from_attributes = True
@@ -29,10 +29,147 @@ class Settings(BaseSettings):
     CONFIDENCE_THRESHOLD: float = 0.5
     SUPPORTED_MODELS: List[str] = ["yolov8n.pt", "yolov8s.pt", "yolov8m.pt", "yolov8l.pt", "yolov8x.pt"]
 
+    # Inference worker processes (0 runs detection in the server process)
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", "0"))
+    INFERENCE_WORKER_CPUS: Optional[str] = os.getenv("INFERENCE_WORKER_CPUS", None)  # e.g. "0-3;4-7"
+    INFERENCE_SLOTS_PER_WORKER: int = 2
+    INFERENCE_MAX_FRAME_BYTES: int = 3840 * 2160 * 3
+    INFERENCE_SUPERVISE_INTERVAL: float = 0.5
+    INFERENCE_MAX_ATTEMPTS: int = 3
+    INFERENCE_RESTART_INITIAL_DELAY: float = 0.5  # Doubles while a worker keeps crashing before it is ready
+    INFERENCE_RESTART_MAX_DELAY: float = 30.0
+    INFERENCE_READY_TIMEOUT: float = 120.0
+
+    # Multi-object tracking: detect every DETECTION_INTERVAL frames, predict in between
+    TRACKING_ENABLED: bool = os.getenv("TRACKING_ENABLED", "False").lower() == "true"
+    DETECTION_INTERVAL: int = int(os.getenv("DETECTION_INTERVAL", "3"))
+    TRACK_HIGH_THRESHOLD: float = 0.6
+    TRACK_LOW_THRESHOLD: float = 0.1
+    TRACK_MATCH_IOU: float = 0.3
+    TRACK_MAX_LOST_FRAMES: int = 30
+    TRACK_MIN_HITS: int = 3
+    TRACK_PATH_INTERVAL: float = 1.0  # Seconds between stored path points
+    TRACK_PATH_MAX_POINTS: int = 64
+
+    # Batched database writes
+    DB_WRITER_BATCH_SIZE: int = 500
+    DB_WRITER_FLUSH_INTERVAL: float = 1.0
+    DB_WRITER_QUEUE_SIZE: int = 10000
+
     # Hardware Acceleration
     CUDA_VISIBLE_DEVICES: Optional[str] = os.getenv("CUDA_VISIBLE_DEVICES", None)
     USE_GPU: bool = os.getenv("USE_GPU", "False").lower() == "true"
 
+    # Local camera inventory
+    CAMERA_INVENTORY_MAX_DEVICES: int = 64
+    CAMERA_INVENTORY_PROBE_WORKERS: int = 8
+    CAMERA_INVENTORY_SETTLE_DELAY: float = 1.0
+    CAMERA_INVENTORY_READY_TIMEOUT: float = 10.0
+
+    # Frame buffers per streaming camera, shared by capture, inference and encoding
+    FRAME_RING_SIZE: int = 4
+
+    # Frames queued per stream viewer, a viewer that falls behind skips the oldest instead of stalling the others
+    STREAM_SUBSCRIBER_QUEUE_SIZE: int = 2
+
+    # RTSP Streaming
+    RTSP_TRANSPORT: str = os.getenv("RTSP_TRANSPORT", "tcp")  # tcp or udp
+    RTSP_OPEN_TIMEOUT_MS: int = 5000
+    RTSP_READ_TIMEOUT_MS: int = 5000
+    RTSP_RECONNECT_INITIAL_DELAY: float = 0.5
+    RTSP_RECONNECT_MAX_DELAY: float = 30.0
+
+    # H.264 passthrough (fragmented MP4)
+    FFMPEG_BINARY: str = os.getenv("FFMPEG_BINARY", "ffmpeg")
+    FFPROBE_BINARY: str = os.getenv("FFPROBE_BINARY", "ffprobe")
+    FMP4_FRAGMENT_DURATION_MS: int = 500
+    FMP4_SUBSCRIBER_QUEUE_SIZE: int = 64
+    FMP4_INIT_TIMEOUT: float = 10.0
+
+    # Continuous recording (RTSP cameras, remuxed without transcoding)
+    RECORDING_ENABLED: bool = os.getenv("RECORDING_ENABLED", "False").lower() == "true"
+    RECORDINGS_DIR: str = os.getenv("RECORDINGS_DIR", "recordings")
+    RECORDING_SEGMENT_SECONDS: int = 60
+
+    # Event clips from the in-memory pre-roll of streaming cameras
+    PREROLL_SECONDS: float = 10.0
+    PREROLL_MAX_BYTES: int = 64 * 1024 * 1024
+    CLIP_POST_ROLL_SECONDS: float = 5.0
+    CLIPS_DIR: str = os.getenv("CLIPS_DIR", "clips")
+
+    # Resized snapshot encodes kept for polling dashboards
+    SNAPSHOT_CACHE_SIZE: int = 256
+
+    # Pipeline tracing, fraction of frames recorded as spans (0 disables)
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.0"))
+    TRACE_BUFFER_SIZE: int = 20000
+
+    # Logging, written from a background thread through a bounded queue
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")  # text or json
+    LOG_FILE: Optional[str] = os.getenv("LOG_FILE", "app.log") or None  # Empty logs to the console only
+    LOG_FILE_MAX_BYTES: int = 10 * 1024 * 1024
+    LOG_FILE_BACKUP_COUNT: int = 5
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SQL: bool = os.getenv("LOG_SQL", "false").lower() == "true"  # Every SQL statement at INFO
+    LOG_ACCESS: bool = os.getenv("LOG_ACCESS", "true").lower() == "true"  # uvicorn access log
+    # Hot-path loggers as logger=number lists; filters apply to records of exactly that logger
+    LOG_RATE_LIMITS: str = os.getenv(
+        "LOG_RATE_LIMITS", "src.services.streaming=10,src.services.db_writer=1,src.services.fmp4=10"
+    )  # Records per second
+    LOG_SAMPLE_RATES: str = os.getenv("LOG_SAMPLE_RATES", "")  # Fraction kept, e.g. uvicorn.access=0.1
+
+    # Offline analysis of video files, chunks start at keyframes
+    BATCH_WORKERS: int = int(os.getenv("BATCH_WORKERS", "0"))  # 0 uses every core
+    BATCH_WORKER_THREADS: int = 1  # PyTorch threads per worker process
+    BATCH_CHUNK_SECONDS: float = 10.0
+    BATCH_HEARTBEAT_INTERVAL: float = 30.0
+    BATCH_HEARTBEAT_TIMEOUT: float = 300.0  # A job of another host without a heartbeat for this long is failed
+
+    # Uploaded image detection (POST /detect/batch)
+    DETECT_BATCH_SIZE: int = int(os.getenv("DETECT_BATCH_SIZE", "16"))  # Images per model call
+    DETECT_BATCH_MAX_IMAGES: int = 1000
+    DETECT_BATCH_MAX_BYTES: int = 256 * 1024 * 1024
+    DETECT_BATCH_STREAM_THRESHOLD: int = 64  # Larger requests get NDJSON as each batch finishes
+    DETECT_DECODE_WORKERS: int = 4
+
+    # Configuration changes pushed to every worker through Postgres LISTEN/NOTIFY
+    CONFIG_NOTIFY_ENABLED: bool = os.getenv("CONFIG_NOTIFY_ENABLED", "True").lower() == "true"
+    CONFIG_NOTIFY_CHANNEL: str = "carcara_config"
+    CONFIG_LISTEN_RECONNECT_DELAY: float = 1.0  # Seconds, doubles after each failed attempt
+    CONFIG_LISTEN_MAX_RECONNECT_DELAY: float = 30.0
+
+    # Bulk detection export, rows per server-side cursor fetch and per Parquet row group
+    EXPORT_BATCH_ROWS: int = 50000
+
+    # Live detection and alarm events (GET /events, /events/ws)
+    EVENTS_TICK_SECONDS: float = 0.25  # Pending events of a subscriber are sent as one message per tick
+    EVENTS_MAX_PENDING: int = 256  # Detection events held per subscriber, the oldest are dropped beyond
+    EVENTS_SSE_KEEPALIVE_SECONDS: float = 15.0
+    ALARM_COOLDOWN_SECONDS: float = 10.0  # An alarm fires at most once per cooldown
+
+    # Spatial index of detection boxes, grid cells double in size per level
+    SPATIAL_CELL_SIZE: int = 64  # Pixels per cell side at level 0
+    SPATIAL_LEVELS: int = 8
+    SPATIAL_QUERY_MAX_RESULTS: int = 10000
+
+    # Occupancy heatmaps, hourly and daily grids per camera and class
+    HEATMAPS_DIR: str = os.getenv("HEATMAPS_DIR", "heatmaps")
+    HEATMAP_COLUMNS: int = 64
+    HEATMAP_ROWS: int = 36
+    HEATMAP_FLUSH_SECONDS: float = 60.0  # Checkpoint interval of the grids in memory
+    HEATMAP_MAX_WEIGHT: float = 2.0  # Seconds one live detection pass counts for at most, e.g. after a stall
+    HEATMAP_MAX_OPACITY: float = 0.6
+
+    # Object crops of stored detections, content addressed in append-only pack files
+    CROPS_ENABLED: bool = os.getenv("CROPS_ENABLED", "True").lower() == "true"
+    CROPS_DIR: str = os.getenv("CROPS_DIR", "crops")
+    CROP_PADDING: float = 0.1  # Fraction of the box width and height added on each side
+    CROP_MAX_SIDE: int = 256  # Larger crops are downscaled
+    CROP_JPEG_QUALITY: int = 85
+    CROP_PACK_MAX_BYTES: int = 256 * 1024 * 1024
+    CROP_INDEX_INITIAL_SLOTS: int = 1 << 16  # Doubles whenever it is 70 % full
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.SQLALCHEMY_DATABASE_URI = (
@@ -1,77 +1,237 @@
+"""
+Non-blocking logging.
+
+Every logger hands its records to a QueueHandler on the root logger; a
+QueueListener thread formats them and writes them to the console and a
+rotating file, so request handlers and the video pipeline never wait on
+formatting or disk I/O. The queue is bounded and records are dropped and
+counted when it is full rather than blocking the caller.
+
+Output is plain text or one JSON object per line (LOG_FORMAT). Hot-path
+loggers can be rate limited (LOG_RATE_LIMITS, records per second with a
+burst of the same size) or sampled (LOG_SAMPLE_RATES, fraction kept); both
+always pass warnings and errors.
+"""
+import atexit
+import json
 import logging
+import logging.config
+import logging.handlers
+import queue
+import random
 import sys
-from typing import Any
+import threading
+import time
+from datetime import datetime
+from datetime import timezone
 from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
 
-# Logging configuration
-LOGGING_CONFIG: Dict[str, Any] = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "default": {
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            "datefmt": "%Y-%m-%d %H:%M:%S",
-        },
-        "detailed": {
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s - [%(filename)s:%(lineno)d]",
-            "datefmt": "%Y-%m-%d %H:%M:%S",
-        },
-    },
-    "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "detailed",
-            "stream": sys.stdout,
-        },
-        "file": {
-            "class": "logging.FileHandler",
-            "formatter": "detailed",
-            "filename": "app.log",
-            "mode": "a",
-        },
-    },
-    "loggers": {
-        "": {  # Root logger
-            "handlers": ["console", "file"],
-            "level": "DEBUG",
-            "propagate": True,
-        },
-        "uvicorn": {
-            "handlers": ["console", "file"],
-            "level": "DEBUG",
-            "propagate": False,
-        },
-        "uvicorn.access": {
-            "handlers": ["console", "file"],
-            "level": "DEBUG",
-            "propagate": False,
-        },
-        "fastapi": {
-            "handlers": ["console", "file"],
-            "level": "DEBUG",
-            "propagate": False,
-        },
-        "sqlalchemy.engine": {
-            "handlers": ["console", "file"],
-            "level": "DEBUG",
-            "propagate": False,
-        },
-        "websockets": {
-            "handlers": ["console", "file"],
-            "level": "INFO",  # Change from DEBUG to INFO to suppress debug messages
-            "propagate": False,
-        },
-        "uvicorn.error": {
-            "handlers": ["console", "file"],
-            "level": "INFO",  # Adjust level if needed
-            "propagate": False,
-        },
-    },
-}
+from .config import settings
+from .metrics import Counter
+
+LOG_RECORDS_DROPPED = Counter(
+    "carcara_log_records_dropped_total", "Log records dropped because the logging queue was full."
+).labels()
+LOG_RECORDS_FILTERED = Counter(
+    "carcara_log_records_filtered_total", "Log records suppressed by rate limits and sampling.", ("logger",)
+)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s - [%(filename)s:%(lineno)d]"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_filters: List[Tuple[logging.Logger, logging.Filter]] = []
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object, including fields passed with ``extra``."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "file": f"{record.filename}:{record.lineno}",
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket over the records of a logger.
+
+    Lets ``rate`` records per second through with bursts of up to ``burst``
+    records. The next record let through after a suppression reports how
+    many records were suppressed in between, in its message and as
+    ``suppressed``.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                self._suppressed += 1
+                LOG_RECORDS_FILTERED.labels(record.name).inc()
+                return False
+            self._tokens -= 1
+            if self._suppressed:
+                record.msg = f"{record.getMessage()} ({self._suppressed} records suppressed)"
+                record.args = None
+                record.suppressed = self._suppressed
+                self._suppressed = 0
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """Keeps a random ``rate`` fraction of the records of a logger."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or random.random() < self.rate:
+            return True
+        LOG_RECORDS_FILTERED.labels(record.name).inc()
+        return False
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener is a thread of this process, so the record is not
+        # pickled or copied; only the message is rendered now in case its
+        # arguments change before the listener gets to it.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def parse_logger_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse a comma separated list of logger=number pairs.
+
+    Raises:
+        ValueError: If an entry is not of that form.
+    """
+    rates = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, separator, value = entry.partition("=")
+        if not separator or not name.strip():
+            raise ValueError(f"Invalid logger rate {entry!r}, expected logger=number")
+        rates[name.strip()] = float(value)
+    return rates
+
+
+def _output_handlers() -> List[logging.Handler]:
+    formatter: logging.Formatter = (
+        JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT, DATE_FORMAT)
+    )
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+    if settings.LOG_FILE:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            settings.LOG_FILE,
+            maxBytes=settings.LOG_FILE_MAX_BYTES,
+            backupCount=settings.LOG_FILE_BACKUP_COUNT,
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def _logger_levels() -> Dict[str, str]:
+    return {
+        "uvicorn": settings.LOG_LEVEL,
+        "uvicorn.error": settings.LOG_LEVEL,
+        "uvicorn.access": "INFO" if settings.LOG_ACCESS else "WARNING",
+        "fastapi": settings.LOG_LEVEL,
+        # INFO logs every statement, DEBUG also every result row
+        "sqlalchemy.engine": "INFO" if settings.LOG_SQL else "WARNING",
+        "websockets": "INFO",
+        "multipart": "INFO",
+    }
 
 
 def setup_logging():
-    """Configure logging for the application."""
-    logging.config.dictConfig(LOGGING_CONFIG)
+    """Configure logging for the application; calling it again replaces the previous setup."""
+    global _listener
+    stop_logging()
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(log_queue, *_output_handlers(), respect_handler_level=True)
+    _listener.start()
+
+    logging.config.dictConfig({
+        "version": 1,
+        "disable_existing_loggers": False,
+        "handlers": {"queue": {"()": lambda: _NonBlockingQueueHandler(log_queue)}},
+        "root": {"handlers": ["queue"], "level": settings.LOG_LEVEL},
+        # Everything else propagates to the root's queue handler
+        "loggers": {
+            name: {"handlers": [], "level": level, "propagate": True}
+            for name, level in _logger_levels().items()
+        },
+    })
+    for name, rate in parse_logger_rates(settings.LOG_RATE_LIMITS).items():
+        _add_filter(logging.getLogger(name), RateLimitFilter(rate))
+    for name, rate in parse_logger_rates(settings.LOG_SAMPLE_RATES).items():
+        _add_filter(logging.getLogger(name), SampleFilter(rate))
+
     logger = logging.getLogger(__name__)
     logger.info("Logging configured successfully")
+
+
+def _add_filter(logger: logging.Logger, log_filter: logging.Filter):
+    logger.addFilter(log_filter)
+    _filters.append((logger, log_filter))
+
+
+def stop_logging():
+    """Write out the queued records, stop the listener thread and remove the filters."""
+    global _listener
+    while _filters:
+        logger, log_filter = _filters.pop()
+        logger.removeFilter(log_filter)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,289 @@
+"""
+Minimal Prometheus metrics for the video pipeline.
+
+Counters and histograms are updated without locks: every thread adds to
+its own preallocated shard (an array of doubles) and a scrape sums the
+shards, so an update is a dict lookup and an in-place add. Label children
+are created once and should be cached by the caller, e.g. once per stream
+manager, so the per-frame path never builds label tuples. Gauges are either
+set by their single writer or computed by a callback at scrape time.
+"""
+import os
+import time
+from array import array
+from bisect import bisect_left
+from threading import get_ident
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        for value in values
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class _Sharded:
+    """Per-thread arrays of ``width`` doubles, summed on read."""
+
+    __slots__ = ("_width", "_shards")
+
+    def __init__(self, width: int):
+        self._width = width
+        self._shards: Dict[int, array] = {}
+
+    def _shard(self) -> array:
+        ident = get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            # Only this thread writes under its ident, so no lock is needed
+            shard = self._shards[ident] = array("d", bytes(8 * self._width))
+        return shard
+
+    def _totals(self) -> List[float]:
+        totals = [0.0] * self._width
+        for shard in list(self._shards.values()):
+            for index in range(self._width):
+                totals[index] += shard[index]
+        return totals
+
+
+class CounterChild(_Sharded):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1.0):
+        self._shard()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._totals()[0]
+
+
+class GaugeChild:
+    __slots__ = ("_value", "_function")
+
+    def __init__(self):
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1.0):
+        self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self._value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Compute the value at scrape time instead of storing it."""
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        return float(self._function()) if self._function is not None else self._value
+
+
+class HistogramChild(_Sharded):
+    __slots__ = ("_bounds",)
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        # One count per bucket including +Inf, then the sum
+        super().__init__(len(bounds) + 1)
+        self._bounds = bounds
+
+    def observe(self, value: float):
+        shard = self._shard()
+        shard[bisect_left(self._bounds, value)] += 1
+        shard[-1] += value
+
+    def time(self) -> "_Timer":
+        """Observe the duration of a with block."""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[float], float]:
+        """Return the cumulative bucket counts and the sum."""
+        totals = self._totals()
+        cumulative, running = [], 0.0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1]
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Return the child for a label combination, creating it once."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def remove(self, *values):
+        self._children.pop(tuple(str(value) for value in values), None)
+
+    def _samples(self, labels: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, child in list(self._children.items()):
+            lines.extend(self._samples(labels, child))
+        return lines
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self, labels, child: CounterChild) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(child.value)}"]
+
+
+class Gauge(_Family):
+    kind = "gauge"
+
+    def _new_child(self) -> GaugeChild:
+        return GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def _samples(self, labels, child: GaugeChild) -> List[str]:
+        try:
+            value = child.value
+        except Exception:
+            return []
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"]
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self, labels, child: HistogramChild) -> List[str]:
+        cumulative, total = child.snapshot()
+        names = self.labelnames + ("le",)
+        lines = [
+            f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {_format_value(count)}"
+            for bound, count in zip(self.buckets, cumulative)
+        ]
+        base = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{base} {_format_value(total)}")
+        lines.append(f"{self.name}_count{base} {_format_value(cumulative[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+
+    def register(self, family: _Family):
+        if family.name in self._families:
+            raise ValueError(f"Metric {family.name} is already registered")
+        self._families[family.name] = family
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = _process_metrics()
+        for family in list(self._families.values()):
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+_START_TIME = time.time()
+
+
+def _process_metrics() -> List[str]:
+    """CPU, memory and start time of this process, read at scrape time."""
+    times = os.times()
+    lines = [
+        "# HELP process_cpu_seconds_total Total user and system CPU time spent in seconds.",
+        "# TYPE process_cpu_seconds_total counter",
+        f"process_cpu_seconds_total {_format_value(times.user + times.system)}",
+        "# HELP process_start_time_seconds Start time of the process since unix epoch in seconds.",
+        "# TYPE process_start_time_seconds gauge",
+        f"process_start_time_seconds {_format_value(_START_TIME)}",
+    ]
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        lines += [
+            "# HELP process_resident_memory_bytes Resident memory size in bytes.",
+            "# TYPE process_resident_memory_bytes gauge",
+            f"process_resident_memory_bytes {resident_pages * os.sysconf('SC_PAGE_SIZE')}",
+        ]
+    except (OSError, ValueError, IndexError):
+        pass
+    return lines
+
+
+REGISTRY = Registry()
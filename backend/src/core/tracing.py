@@ -0,0 +1,164 @@
+"""
+Sampled per-stage timing spans for the video pipeline.
+
+A stream publisher opens a frame trace for each frame; only a
+TRACE_SAMPLE_RATE fraction of frames is sampled. Stages call span(), which
+returns a shared no-op object unless the current frame is sampled, so
+unsampled frames cost one context variable lookup per stage. The sampled
+trace follows the frame into worker threads because asyncio.to_thread
+copies the context.
+
+Finished spans go into a bounded in-memory ring and can be exported as
+Chrome trace JSON, which chrome://tracing and ui.perfetto.dev open
+directly.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .config import settings
+
+# (name, category, start_ns, duration_ns, thread_id, args)
+SpanRecord = Tuple[str, str, int, int, int, Dict[str, Any]]
+
+_current_frame: ContextVar[Optional[Dict[str, Any]]] = ContextVar("trace_frame", default=None)
+
+
+class Tracer:
+    """Bounded ring of finished spans."""
+
+    def __init__(self, sample_rate: float = settings.TRACE_SAMPLE_RATE, capacity: int = settings.TRACE_BUFFER_SIZE):
+        self.sample_rate = sample_rate
+        self._spans: Deque[SpanRecord] = deque(maxlen=capacity)
+        self._thread_names: Dict[int, str] = {}
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def record(self, name: str, category: str, start_ns: int, duration_ns: int, args: Dict[str, Any]):
+        thread = threading.current_thread()
+        self._thread_names.setdefault(thread.ident, thread.name)
+        # deque.append with maxlen is atomic, old spans fall off the other end
+        self._spans.append((name, category, start_ns, duration_ns, thread.ident, args))
+
+    def clear(self):
+        self._spans.clear()
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def export_chrome_trace(self) -> Dict[str, Any]:
+        """Return the buffered spans in the Chrome trace event format."""
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self._thread_names.items())
+        ]
+        for name, category, start_ns, duration_ns, tid, args in list(self._spans):
+            events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start_ns / 1000,
+                "dur": duration_ns / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class _Span:
+    __slots__ = ("name", "args", "frame", "start_ns")
+
+    def __init__(self, name: str, frame: Dict[str, Any], args: Dict[str, Any]):
+        self.name = name
+        self.frame = frame
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        tracer.record(self.name, self.frame["category"], self.start_ns,
+                      time.perf_counter_ns() - self.start_ns, {**self.frame["args"], **self.args})
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+class _FrameTrace:
+    """Root span of one frame; makes the frame's stages record spans when sampled."""
+
+    __slots__ = ("frame", "token", "span")
+
+    def __init__(self, name: str, category: str, args: Dict[str, Any]):
+        self.frame = {"category": category, "args": args} if tracer.should_sample() else None
+        self.span = _Span(name, self.frame, {}) if self.frame is not None else _NOOP
+
+    def __enter__(self):
+        self.token = _current_frame.set(self.frame)
+        self.span.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.span.__exit__(*exc_info)
+        _current_frame.reset(self.token)
+
+    @property
+    def sampled(self) -> bool:
+        return self.frame is not None
+
+
+def frame_trace(name: str, category: str = "pipeline", **args) -> _FrameTrace:
+    """
+    Start the trace of one frame, sampled at TRACE_SAMPLE_RATE.
+
+    Args:
+        name: Root span name
+        category: Trace category shown in the viewer
+        args: Attached to every span of the frame, e.g. camera and sequence
+    """
+    return _FrameTrace(name, category, args)
+
+
+def span(name: str, **args):
+    """Time a pipeline stage if the current frame is sampled."""
+    frame = _current_frame.get()
+    if frame is None:
+        return _NOOP
+    return _Span(name, frame, args)
+
+
+def is_sampled() -> bool:
+    return _current_frame.get() is not None
+
+
+def add_span(name: str, start_ns: int, duration_ns: int, **args):
+    """Record a stage measured elsewhere, e.g. timings reported by a library."""
+    frame = _current_frame.get()
+    if frame is not None:
+        tracer.record(name, frame["category"], start_ns, duration_ns, {**frame["args"], **args})
+
+
+tracer = Tracer()
@@ -1,13 +1,15 @@
 from sqlalchemy.orm import Session
 
 from .base_class import Base
-from ..models import camera, stream, detection
+from ..models import alarm, camera, stream, detection, detection_cell, track, clip, analysis_job, roi
 from ..db.session import engine
+from ..services.config_events import install_notify_triggers
 
 
 def init_db() -> None:
     # Create all tables
     Base.metadata.create_all(bind=engine)
+    install_notify_triggers(engine)
 
 
 if __name__ == "__main__":
@@ -5,10 +5,14 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from src.db.base_class import Base
 from src.models import alarm
+from src.models import analysis_job
 from src.models import camera
+from src.models import clip
 from src.models import detection
+from src.models import detection_cell
 from src.models import roi
 from src.models import stream
+from src.models import track
 
 config = context.config
 
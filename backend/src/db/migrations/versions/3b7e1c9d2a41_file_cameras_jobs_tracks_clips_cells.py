@@ -0,0 +1,129 @@
+"""file cameras, analysis jobs, tracks, clips and detection cells
+
+Revision ID: 3b7e1c9d2a41
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+Brings databases created by init_db before these models existed up to
+date: create_all creates missing tables but never alters existing ones.
+Each step is skipped when its table, column or index exists, because
+init_db may have created them already. On an empty database there is
+nothing to upgrade; init_db creates the current schema when the app starts.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1c9d2a41'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    if "cameras" not in tables:
+        return
+
+    if "file_path" not in {column["name"] for column in inspector.get_columns("cameras")}:
+        op.add_column("cameras", sa.Column("file_path", sa.String(), nullable=True))
+
+    if "ix_detections_camera_timestamp" not in {index["name"] for index in inspector.get_indexes("detections")}:
+        op.create_index("ix_detections_camera_timestamp", "detections", ["camera_id", "timestamp"])
+
+    if "analysis_jobs" not in tables:
+        op.create_table(
+            "analysis_jobs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("camera_id", sa.Integer(), nullable=True),
+            sa.Column("file_path", sa.String(), nullable=True),
+            sa.Column("detection_model_name", sa.String(), nullable=True),
+            sa.Column("frame_step", sa.Integer(), nullable=True),
+            sa.Column("status", sa.String(), nullable=True),
+            sa.Column("video_start", sa.DateTime(), nullable=True),
+            sa.Column("duration", sa.Float(), nullable=True),
+            sa.Column("fps", sa.Float(), nullable=True),
+            sa.Column("total_frames", sa.Integer(), nullable=True),
+            sa.Column("chunks_total", sa.Integer(), nullable=True),
+            sa.Column("chunks_done", sa.Integer(), nullable=True),
+            sa.Column("frames_processed", sa.Integer(), nullable=True),
+            sa.Column("video_seconds_processed", sa.Float(), nullable=True),
+            sa.Column("detections_count", sa.Integer(), nullable=True),
+            sa.Column("error", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("started_at", sa.DateTime(), nullable=True),
+            sa.Column("finished_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["camera_id"], ["cameras.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_analysis_jobs_id", "analysis_jobs", ["id"])
+        op.create_index("ix_analysis_jobs_camera_id", "analysis_jobs", ["camera_id"])
+
+    if "tracks" not in tables:
+        op.create_table(
+            "tracks",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("camera_id", sa.Integer(), nullable=True),
+            sa.Column("track_id", sa.Integer(), nullable=True),
+            sa.Column("detection_model_name", sa.String(), nullable=True),
+            sa.Column("class_name", sa.String(), nullable=True),
+            sa.Column("confidence", sa.Float(), nullable=True),
+            sa.Column("hits", sa.Integer(), nullable=True),
+            sa.Column("first_seen", sa.DateTime(), nullable=True),
+            sa.Column("last_seen", sa.DateTime(), nullable=True),
+            sa.Column("path", sa.JSON(), nullable=True),
+            sa.ForeignKeyConstraint(["camera_id"], ["cameras.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_tracks_id", "tracks", ["id"])
+        op.create_index("ix_tracks_class_name", "tracks", ["class_name"])
+        op.create_index("ix_tracks_camera_first_seen", "tracks", ["camera_id", "first_seen"])
+
+    if "clips" not in tables:
+        op.create_table(
+            "clips",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("camera_id", sa.Integer(), nullable=True),
+            sa.Column("alarm_id", sa.Integer(), nullable=True),
+            sa.Column("detection_id", sa.Integer(), nullable=True),
+            sa.Column("status", sa.String(), nullable=True),
+            sa.Column("event_time", sa.DateTime(), nullable=True),
+            sa.Column("start_time", sa.DateTime(), nullable=True),
+            sa.Column("end_time", sa.DateTime(), nullable=True),
+            sa.Column("frames", sa.Integer(), nullable=True),
+            sa.Column("fps", sa.Float(), nullable=True),
+            sa.Column("file_path", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["camera_id"], ["cameras.id"]),
+            sa.ForeignKeyConstraint(["alarm_id"], ["alarms.id"]),
+            sa.ForeignKeyConstraint(["detection_id"], ["detections.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_clips_id", "clips", ["id"])
+        op.create_index("ix_clips_alarm_id", "clips", ["alarm_id"])
+        op.create_index("ix_clips_detection_id", "clips", ["detection_id"])
+
+    if "detection_cells" not in tables:
+        op.create_table(
+            "detection_cells",
+            sa.Column("detection_id", sa.Integer(), nullable=False),
+            sa.Column("cell", sa.BigInteger(), nullable=False),
+            sa.Column("camera_id", sa.Integer(), nullable=True),
+            sa.Column("timestamp", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["detection_id"], ["detections.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("detection_id", "cell"),
+        )
+        op.create_index(
+            "ix_detection_cells_lookup", "detection_cells", ["camera_id", "cell", "timestamp", "detection_id"]
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("detection_cells")
+    op.drop_table("clips")
+    op.drop_table("tracks")
+    op.drop_table("analysis_jobs")
+    op.drop_index("ix_detections_camera_timestamp", table_name="detections")
+    op.drop_column("cameras", "file_path")
@@ -0,0 +1,35 @@
+"""analysis job owner and heartbeat
+
+Revision ID: 8d4f2a6c1e57
+Revises: 3b7e1c9d2a41
+Create Date: 2026-10-19 12:00:00.000000
+
+Records which process runs a job, so a starting worker only fails the jobs
+of processes that are gone. Columns that init_db created already are
+skipped.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4f2a6c1e57'
+down_revision = '3b7e1c9d2a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "analysis_jobs" not in inspector.get_table_names():
+        return
+    columns = {column["name"] for column in inspector.get_columns("analysis_jobs")}
+    if "owner" not in columns:
+        op.add_column("analysis_jobs", sa.Column("owner", sa.String(), nullable=True))
+    if "heartbeat_at" not in columns:
+        op.add_column("analysis_jobs", sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("analysis_jobs", "heartbeat_at")
+    op.drop_column("analysis_jobs", "owner")
@@ -1,4 +1,5 @@
 # include fast api
+import asyncio
 import logging
 import time
 from contextlib import asynccontextmanager
@@ -10,27 +11,48 @@ from fastapi import Depends
 from fastapi import FastAPI
 from fastapi import HTTPException
 from fastapi import Request
+from fastapi import Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
+from .api.endpoints import admin
 from .api.endpoints import alarms
+from .api.endpoints import analysis_jobs
 from .api.endpoints import cameras
+from .api.endpoints import clips
+from .api.endpoints import detect
 from .api.endpoints import detections
+from .api.endpoints import events
 from .api.endpoints import models
+from .api.endpoints import recordings
 from .api.endpoints import roi as roi_endpoints
 from .api.endpoints import streams
+from .api.endpoints import tracks
 from .api.endpoints import ws_streams
 from .core.config import settings
 from .core.logging import setup_logging
+from .core.metrics import CONTENT_TYPE
+from .core.metrics import REGISTRY
 from .db.init_db import init_db
 from .db.session import get_db
 from .models import alarm
+from .models import analysis_job
 from .models import camera
+from .models import clip
 from .models import detection
+from .models import detection_cell
 from .models import roi
 from .models import stream
+from .models import track
+from .services.batch_analysis import batch_analysis_service
+from .services.camera_inventory import camera_inventory
+from .services.config_events import config_listener
 from .services.detection import ObjectDetectionService
+from .services.heatmaps import heatmap_store
+from .services.recording import recording_service
+from .services.streaming import stop_all_streams
+from .services.streaming import track_writer
 
 # Setup logging
 setup_logging()
@@ -39,12 +61,38 @@ logger = logging.getLogger(__name__)
 # Initialize database
 init_db()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup Logic
+    logger.info("Application starting up...")
+    logger.info(f"Environment: {settings.PROJECT_NAME} v{settings.VERSION}")
+    logger.info(f"Database URI: {settings.SQLALCHEMY_DATABASE_URI}")
+    logger.info(f"Using GPU: {settings.USE_GPU}")
+    camera_inventory.start()
+    batch_analysis_service.fail_interrupted()
+    if settings.RECORDING_ENABLED:
+        await recording_service.start_all()
+    config_listener.start()
+    yield
+    # Shutdown Logic
+    logger.info("Application shutting down...")
+    await config_listener.stop()
+    await stop_all_streams()
+    await asyncio.to_thread(track_writer.close)
+    await recording_service.stop_all()
+    batch_analysis_service.shutdown()
+    heatmap_store.flush()
+    camera_inventory.stop()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -98,6 +146,31 @@ app.include_router(
     prefix=f"{settings.API_V1_STR}/detections",
     tags=["detections"]
 )
+app.include_router(
+    detect.router,
+    prefix=f"{settings.API_V1_STR}/detect",
+    tags=["detect"]
+)
+app.include_router(
+    events.router,
+    prefix=f"{settings.API_V1_STR}/events",
+    tags=["events"]
+)
+app.include_router(
+    tracks.router,
+    prefix=f"{settings.API_V1_STR}/tracks",
+    tags=["tracks"]
+)
+app.include_router(
+    recordings.router,
+    prefix=f"{settings.API_V1_STR}/recordings",
+    tags=["recordings"]
+)
+app.include_router(
+    clips.router,
+    prefix=f"{settings.API_V1_STR}/clips",
+    tags=["clips"]
+)
 app.include_router(
     models.router,
     prefix=f"{settings.API_V1_STR}/models",
@@ -113,6 +186,16 @@ app.include_router(
     prefix=f"{settings.API_V1_STR}/roi",
     tags=["roi"]
 )
+app.include_router(
+    analysis_jobs.router,
+    prefix=f"{settings.API_V1_STR}/analysis-jobs",
+    tags=["analysis_jobs"]
+)
+app.include_router(
+    admin.router,
+    prefix=f"{settings.API_V1_STR}/admin",
+    tags=["admin"]
+)
 app.include_router(
     ws_streams.router,
     prefix=f"{settings.API_V1_STR}/ws/streams",
@@ -120,6 +203,12 @@ app.include_router(
 )
 
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Expose pipeline metrics in the Prometheus text format."""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/")
 def read_root():
     logger.info("Root endpoint accessed")
@@ -128,15 +217,3 @@ def read_root():
         "version": settings.VERSION,
         "docs_url": "/docs"
     }
-
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup Logic
-    logger.info("Application starting up...")
-    logger.info(f"Environment: {settings.PROJECT_NAME} v{settings.VERSION}")
-    logger.info(f"Database URI: {settings.SQLALCHEMY_DATABASE_URI}")
-    logger.info(f"Using GPU: {settings.USE_GPU}")
-    yield
-    # Shutdown Logic
-    logger.info("Application shutting down...")
@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import Float
+from sqlalchemy import ForeignKey
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy import Text
+from sqlalchemy.orm import relationship
+
+from ..db.base_class import Base
+
+
+class AnalysisJob(Base):
+    """Offline detection over a local video file, run in parallel chunks."""
+    __tablename__ = "analysis_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    camera_id = Column(Integer, ForeignKey("cameras.id"), index=True)
+    file_path = Column(String)
+    detection_model_name = Column(String)
+    frame_step = Column(Integer, default=1)  # Detect on every n-th frame
+    status = Column(String, default="pending")  # pending, running, completed, failed, cancelled
+    video_start = Column(DateTime)  # Wall-clock time of the first frame, for detection timestamps
+    duration = Column(Float, nullable=True)  # Seconds of video
+    fps = Column(Float, nullable=True)
+    total_frames = Column(Integer, nullable=True)
+    chunks_total = Column(Integer, default=0)
+    chunks_done = Column(Integer, default=0)
+    frames_processed = Column(Integer, default=0)
+    video_seconds_processed = Column(Float, default=0.0)
+    detections_count = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    owner = Column(String, nullable=True)  # "host:pid" of the process running the job
+    heartbeat_at = Column(DateTime, nullable=True)  # Refreshed while the job runs
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    camera = relationship("Camera", back_populates="analysis_jobs")
+
+    @property
+    def elapsed_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+
+    @property
+    def progress(self) -> float:
+        """Fraction of the video analysed so far."""
+        if not self.duration:
+            return 1.0 if self.status == "completed" else 0.0
+        return min((self.video_seconds_processed or 0.0) / self.duration, 1.0)
+
+    @property
+    def frames_per_second(self) -> Optional[float]:
+        """Decoded frames per wall-clock second."""
+        elapsed = self.elapsed_seconds
+        return self.frames_processed / elapsed if elapsed else None
+
+    @property
+    def realtime_factor(self) -> Optional[float]:
+        """Seconds of video analysed per wall-clock second."""
+        elapsed = self.elapsed_seconds
+        return self.video_seconds_processed / elapsed if elapsed else None
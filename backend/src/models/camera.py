@@ -10,9 +10,10 @@ class Camera(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    camera_type = Column(String, default="rtsp")  # rtsp or local
+    camera_type = Column(String, default="rtsp")  # rtsp, local, file or synthetic
     device_id = Column(Integer, nullable=True)  # For local cameras
     rtsp_url = Column(String, unique=True, index=True, nullable=True)  # For RTSP cameras
+    file_path = Column(String, nullable=True)  # For file cameras, a local video file
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -21,4 +22,7 @@ class Camera(Base):
     streams = relationship("Stream", back_populates="camera")
     detections = relationship("Detection", back_populates="camera")
     alarms = relationship("Alarm", back_populates="camera")
-    rois = relationship("RegionOfInterest", back_populates="camera")
\ No newline at end of file
+    rois = relationship("RegionOfInterest", back_populates="camera")
+    tracks = relationship("Track", back_populates="camera")
+    clips = relationship("Clip", back_populates="camera")
+    analysis_jobs = relationship("AnalysisJob", back_populates="camera")
\ No newline at end of file
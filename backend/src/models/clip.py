@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import Float
+from sqlalchemy import ForeignKey
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy.orm import relationship
+
+from ..db.base_class import Base
+
+
+class Clip(Base):
+    """A short video saved around an event from the camera's pre-roll buffer."""
+    __tablename__ = "clips"
+
+    id = Column(Integer, primary_key=True, index=True)
+    camera_id = Column(Integer, ForeignKey("cameras.id"))
+    alarm_id = Column(Integer, ForeignKey("alarms.id"), nullable=True, index=True)
+    detection_id = Column(Integer, ForeignKey("detections.id"), nullable=True, index=True)
+    status = Column(String, default="pending")  # pending, saved, failed
+    event_time = Column(DateTime)
+    start_time = Column(DateTime, nullable=True)
+    end_time = Column(DateTime, nullable=True)
+    frames = Column(Integer, default=0)
+    fps = Column(Float, nullable=True)
+    file_path = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    camera = relationship("Camera", back_populates="clips")
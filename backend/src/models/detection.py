@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -21,4 +21,8 @@ class Detection(Base):
 
     # Relationships
     camera = relationship("Camera", back_populates="detections")
-    stream = relationship("Stream", back_populates="detections")
\ No newline at end of file
+    stream = relationship("Stream", back_populates="detections")
+
+    __table_args__ = (
+        Index("ix_detections_camera_timestamp", "camera_id", "timestamp"),
+    )
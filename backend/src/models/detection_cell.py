@@ -0,0 +1,23 @@
+from sqlalchemy import BigInteger
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import Integer
+
+from ..db.base_class import Base
+
+
+class DetectionCell(Base):
+    """A grid cell covered by a detection box, see services.spatial_index."""
+    __tablename__ = "detection_cells"
+
+    detection_id = Column(Integer, ForeignKey("detections.id", ondelete="CASCADE"), primary_key=True)
+    cell = Column(BigInteger, primary_key=True)  # Level, row and column packed by spatial_index.cell_key
+    camera_id = Column(Integer)  # Copied from the detection so lookups never touch the detections table
+    timestamp = Column(DateTime)
+
+    __table_args__ = (
+        # Equality on camera and cell, a range on time, and the ID without reading the table
+        Index("ix_detection_cells_lookup", "camera_id", "cell", "timestamp", "detection_id"),
+    )
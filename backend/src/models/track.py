@@ -0,0 +1,34 @@
+from sqlalchemy import JSON
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import Float
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy.orm import relationship
+
+from ..db.base_class import Base
+
+
+class Track(Base):
+    """One tracked object over its lifetime, stored once when the track ends."""
+    __tablename__ = "tracks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    camera_id = Column(Integer, ForeignKey("cameras.id"))
+    track_id = Column(Integer)  # Tracker ID, unique per camera stream run
+    detection_model_name = Column(String)
+    class_name = Column(String, index=True)
+    confidence = Column(Float)  # Highest confidence over the track
+    hits = Column(Integer)  # Number of detections matched to the track
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    path = Column(JSON)  # [[timestamp, cx, cy], ...] sampled every TRACK_PATH_INTERVAL
+
+    # Relationships
+    camera = relationship("Camera", back_populates="tracks")
+
+    __table_args__ = (
+        Index("ix_tracks_camera_first_seen", "camera_id", "first_seen"),
+    )
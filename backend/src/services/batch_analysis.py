@@ -0,0 +1,369 @@
+"""
+Offline detection over local video files.
+
+A job probes the file's keyframes with ffprobe and cuts the video into
+chunks of about BATCH_CHUNK_SECONDS that each start at a keyframe, so every
+chunk decodes independently without decoding frames of its neighbour. The
+chunks are decoded and analysed in a pool of worker processes, one model
+instance per process, using every core, and the workers put the crop of
+every detected object into the crop store; the job thread bulk-inserts the
+detections of each finished chunk, adds them to the camera's heatmaps
+when the job names a camera, and updates the job's progress.
+
+A running job records its process as ``owner`` and refreshes
+``heartbeat_at`` every BATCH_HEARTBEAT_INTERVAL, so a starting worker fails
+only the jobs whose process is gone, not those of other live workers.
+"""
+import json
+import logging
+import multiprocessing as mp
+import os
+import socket
+import subprocess
+import threading
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+import cv2
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..models.analysis_job import AnalysisJob
+from .crops import store_crop
+from .heatmaps import heatmap_store
+from .spatial_index import insert_detections
+
+logger = logging.getLogger(__name__)
+
+Chunk = Tuple[float, float]  # (start, end) in seconds of video, end exclusive
+
+
+def probe_video(path: str) -> Dict[str, Any]:
+    """
+    Read duration, frame rate, frame count and keyframe times of a video file.
+
+    Uses ffprobe; without it the keyframes are unknown and the other values
+    come from OpenCV.
+
+    Returns:
+        A dict with "duration", "fps", "frames" and "keyframes" (None when unknown).
+
+    Raises:
+        ValueError: If the file has no readable video stream.
+    """
+    try:
+        info = json.loads(subprocess.run(
+            [settings.FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=avg_frame_rate,nb_frames,duration:format=duration",
+             "-of", "json", path],
+            capture_output=True, text=True, check=True,
+        ).stdout)
+        keyframes = subprocess.run(
+            [settings.FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+             "-show_entries", "frame=best_effort_timestamp_time", "-of", "csv=p=0", path],
+            capture_output=True, text=True, check=True,
+        ).stdout
+    except (FileNotFoundError, subprocess.CalledProcessError) as e:
+        logger.warning(f"ffprobe failed for {path}, splitting without keyframes: {e}")
+        return _probe_with_opencv(path)
+
+    if not info.get("streams"):
+        raise ValueError(f"No video stream in {path}")
+    stream = info["streams"][0]
+    numerator, _, denominator = stream.get("avg_frame_rate", "0/1").partition("/")
+    fps = float(numerator) / float(denominator or 1) if float(denominator or 1) else 0.0
+    duration = float(stream.get("duration") or info.get("format", {}).get("duration") or 0.0)
+    frames = int(stream["nb_frames"]) if str(stream.get("nb_frames", "")).isdigit() else round(duration * fps)
+    times = sorted(float(line) for line in keyframes.split() if line.strip() not in ("", "N/A"))
+    return {"duration": duration, "fps": fps, "frames": frames, "keyframes": times}
+
+
+def _probe_with_opencv(path: str) -> Dict[str, Any]:
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video {path}")
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+    return {"duration": frames / fps if fps else 0.0, "fps": fps, "frames": frames, "keyframes": None}
+
+
+def plan_chunks(duration: float, keyframes: Optional[List[float]], chunk_seconds: float) -> List[Chunk]:
+    """
+    Split a video into chunks of at least ``chunk_seconds``.
+
+    Chunks start at keyframes when they are known; otherwise the video is
+    split at fixed times and each worker seeks to its start.
+    """
+    if duration <= 0:
+        return [(0.0, float("inf"))]
+    if keyframes is None:
+        starts = [index * chunk_seconds for index in range(int(duration // chunk_seconds) + 1)]
+    else:
+        starts = [0.0]
+        for keyframe in keyframes:
+            if keyframe - starts[-1] >= chunk_seconds and keyframe < duration:
+                starts.append(keyframe)
+    starts = [start for start in starts if start < duration] or [0.0]
+    return list(zip(starts, starts[1:] + [duration]))
+
+
+_services: Dict[str, Any] = {}
+
+
+def _init_worker(threads: int):
+    import torch
+
+    cv2.setNumThreads(1)
+    torch.set_num_threads(threads)
+
+
+def process_owner() -> str:
+    """Identify this process as the owner of the jobs it runs."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, owned by another user
+    return True
+
+
+def analyse_chunk(path: str, detection_model_name: str, start: float, end: float,
+                  fps: float, frame_step: int) -> Dict[str, Any]:
+    """
+    Decode one chunk and detect on every ``frame_step``-th frame. Runs in a worker process.
+
+    Returns:
+        The number of decoded frames, the (width, height) of the analysed
+        frames and the detections as (frame_number, seconds, class_id,
+        class_name, confidence, bbox, crop) tuples, where crop is the hex
+        digest of the object's crop in the crop store, or None.
+    """
+    from .detection import ObjectDetectionService
+
+    service = _services.get(detection_model_name)
+    if service is None:
+        service = _services[detection_model_name] = ObjectDetectionService(detection_model_name)
+
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video {path}")
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_MSEC, start * 1000)
+    frames, rows, size = 0, [], None
+    try:
+        while cap.grab():
+            seconds = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            if seconds >= end:
+                break
+            frames += 1
+            frame_number = round(seconds * fps) if fps else frames - 1
+            if frame_number % frame_step:
+                continue  # Decoded but not converted or analysed
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            size = (frame.shape[1], frame.shape[0])
+            for detection in service.detect(frame):
+                crop = store_crop(frame, detection["bbox"]) if settings.CROPS_ENABLED else None
+                rows.append((frame_number, seconds, detection["class_id"], detection["class_name"],
+                             detection["confidence"], detection["bbox"], crop))
+    finally:
+        cap.release()
+    return {"frames": frames, "size": size, "rows": rows}
+
+
+class BatchAnalysisService:
+    """Runs analysis jobs, one thread per job, sharing one pool of worker processes."""
+
+    def __init__(self, workers: int = settings.BATCH_WORKERS):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cancelled: Set[int] = set()
+        self._running: Set[int] = set()  # Jobs of this process
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=mp.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(settings.BATCH_WORKER_THREADS,),
+                )
+            return self._executor
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """Drop a pool whose worker died, the next job starts a new one."""
+        with self._lock:
+            if self._executor is pool:
+                self._executor = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, job_id: int):
+        """Start a pending job in the background."""
+        threading.Thread(target=self._run, args=(job_id,), name=f"analysis-job-{job_id}", daemon=True).start()
+
+    def cancel(self, job_id: int):
+        """Stop a job after its running chunks; chunks not started yet are skipped."""
+        self._cancelled.add(job_id)
+
+    def fail_interrupted(self):
+        """
+        Mark jobs left behind by a process that is gone as failed.
+
+        Jobs of other live workers, e.g. other uvicorn workers or the
+        process a --reload replaces only once it has exited, keep running.
+        """
+        db = SessionLocal()
+        try:
+            jobs = db.query(AnalysisJob).filter(AnalysisJob.status.in_(("pending", "running"))).all()
+            orphaned = [job.id for job in jobs if self._is_orphaned(job)]
+            if orphaned:
+                db.query(AnalysisJob).filter(AnalysisJob.id.in_(orphaned)).update(
+                    {"status": "failed", "error": "Interrupted by a restart", "finished_at": datetime.utcnow()},
+                    synchronize_session=False,
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    def _is_orphaned(self, job: AnalysisJob) -> bool:
+        """
+        Whether the process of a pending or running job is gone.
+
+        The owner's process is checked directly on this host; otherwise, or
+        when its PID was reused, a heartbeat older than
+        BATCH_HEARTBEAT_TIMEOUT means the owner is gone.
+        """
+        if job.id in self._running:
+            return False
+        host, _, pid = (job.owner or "").rpartition(":")
+        if host == socket.gethostname() and pid.isdigit():
+            # This process only runs the jobs in _running, its own PID can be left from a restarted container
+            if int(pid) == os.getpid() or not _process_exists(int(pid)):
+                return True
+        last_seen = job.heartbeat_at or job.created_at
+        return last_seen is None or datetime.utcnow() - last_seen > timedelta(seconds=settings.BATCH_HEARTBEAT_TIMEOUT)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _run(self, job_id: int):
+        db = SessionLocal()
+        job = db.get(AnalysisJob, job_id)
+        self._running.add(job_id)
+        pool = None
+        pending: Dict[Future, Chunk] = {}
+        try:
+            job.status = "running"
+            job.owner = process_owner()
+            job.started_at = job.heartbeat_at = datetime.utcnow()
+            db.commit()
+
+            video = probe_video(job.file_path)
+            chunks = plan_chunks(video["duration"], video["keyframes"], settings.BATCH_CHUNK_SECONDS)
+            job.duration = video["duration"]
+            job.fps = video["fps"]
+            job.total_frames = video["frames"]
+            job.chunks_total = len(chunks)
+            db.commit()
+            logger.info(f"Analysis job {job_id}: {len(chunks)} chunks of {job.file_path} on {self.workers} workers")
+
+            pool = self._pool()
+            pending = {
+                pool.submit(analyse_chunk, job.file_path, job.detection_model_name, start, end,
+                            video["fps"], job.frame_step): (start, end)
+                for start, end in chunks
+            }
+            while pending:
+                done, _ = wait(pending, timeout=settings.BATCH_HEARTBEAT_INTERVAL, return_when=FIRST_COMPLETED)
+                job.heartbeat_at = datetime.utcnow()
+                if not done:
+                    db.commit()
+                for future in done:
+                    start, end = pending.pop(future)
+                    result = future.result()
+                    if job.duration:
+                        seconds = min(end, job.duration) - start
+                    else:
+                        seconds = result["frames"] / (video["fps"] or 30)
+                    self._store_chunk(db, job, result, seconds)
+                if job_id in self._cancelled:
+                    for future in pending:
+                        future.cancel()
+                    job.status = "cancelled"
+                    break
+            else:
+                job.status = "completed"
+        except Exception as e:
+            logger.error(f"Analysis job {job_id} failed: {e}", exc_info=True)
+            for future in pending:
+                future.cancel()
+            if isinstance(e, BrokenProcessPool):
+                self._discard_pool(pool)
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            self._cancelled.discard(job_id)
+            self._running.discard(job_id)
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            logger.info(f"Analysis job {job_id} {job.status}")
+            db.close()
+
+    def _store_chunk(self, db, job: AnalysisJob, result: Dict[str, Any], seconds: float):
+        """Bulk insert the detections of a chunk and count it in the job's progress."""
+        rows = [
+            {
+                "camera_id": job.camera_id,
+                "frame_number": frame_number,
+                "timestamp": job.video_start + timedelta(seconds=position),
+                "detection_model_name": job.detection_model_name,
+                "confidence": confidence,
+                "class_name": class_name,
+                "bbox": bbox,
+                "detection_metadata": {"analysis_job_id": job.id, "class_id": class_id, "crop": crop},
+            }
+            for frame_number, position, class_id, class_name, confidence, bbox, crop in result["rows"]
+        ]
+        for offset in range(0, len(rows), settings.DB_WRITER_BATCH_SIZE):
+            insert_detections(db, rows[offset:offset + settings.DB_WRITER_BATCH_SIZE])
+        if job.camera_id is not None and result["size"] is not None:
+            # Each analysed frame stands for frame_step frames of video
+            weight = job.frame_step / (job.fps or 30)
+            for row in rows:
+                heatmap_store.add(job.camera_id, row["timestamp"].replace(tzinfo=timezone.utc).timestamp(),
+                                  result["size"], [(row["class_name"], row["bbox"])], weight)
+        job.chunks_done += 1
+        job.frames_processed += result["frames"]
+        job.video_seconds_processed += seconds
+        job.detections_count += len(rows)
+        db.commit()
+
+
+batch_analysis_service = BatchAnalysisService()
@@ -0,0 +1,125 @@
+"""
+Detection on uploaded images.
+
+Images are decoded in a thread pool, cv2.imdecode releases the GIL, and go
+through the model DETECT_BATCH_SIZE at a time, decoding the next batch while
+the current one is analysed. Results are columnar: one array per field with
+an image index column instead of one object per box, which keeps responses
+for thousands of boxes small and quick to load into a data frame.
+"""
+import asyncio
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import AsyncIterator
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+from ..core.config import settings
+
+IMAGE_SIZE = struct.Struct("<I")
+DETECTION_COLUMNS = ("class_id", "confidence", "x1", "y1", "x2", "y2")
+
+Upload = Tuple[Optional[str], bytes]  # (file name, encoded image)
+
+_decode_pool = ThreadPoolExecutor(max_workers=settings.DETECT_DECODE_WORKERS, thread_name_prefix="image-decode")
+
+
+def split_length_prefixed(body: bytes) -> List[memoryview]:
+    """
+    Split a binary request body into images.
+
+    Each image is preceded by its size in bytes as a little-endian uint32.
+
+    Raises:
+        ValueError: If the body ends inside a size or an image.
+    """
+    view = memoryview(body)
+    images, offset = [], 0
+    while offset < len(view):
+        if offset + IMAGE_SIZE.size > len(view):
+            raise ValueError(f"Truncated image size at byte {offset}")
+        (size,) = IMAGE_SIZE.unpack_from(view, offset)
+        offset += IMAGE_SIZE.size
+        if offset + size > len(view):
+            raise ValueError(f"Image {len(images)} needs {size} bytes, {len(view) - offset} left")
+        images.append(view[offset:offset + size])
+        offset += size
+    return images
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """
+    Decode a JPEG, PNG or other image OpenCV reads into a BGR frame.
+
+    Raises:
+        ValueError: If the data is not a readable image.
+    """
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Not a readable image")
+    return frame
+
+
+def to_columns(detections: List[Dict[str, Any]]) -> Dict[str, List]:
+    """Turn the detections of an image into class_id, confidence and box corner columns."""
+    columns: Dict[str, List] = {name: [] for name in DETECTION_COLUMNS}
+    for detection in detections:
+        x1, y1, x2, y2 = detection["bbox"]
+        columns["class_id"].append(detection["class_id"])
+        columns["confidence"].append(round(detection["confidence"], 4))
+        columns["x1"].append(round(x1, 1))
+        columns["y1"].append(round(y1, 1))
+        columns["x2"].append(round(x2, 1))
+        columns["y2"].append(round(y2, 1))
+    return columns
+
+
+async def _decode_batch(uploads: List[Upload]) -> List[Any]:
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(
+        *(loop.run_in_executor(_decode_pool, decode_image, data) for _, data in uploads),
+        return_exceptions=True,
+    )
+
+
+async def detect_uploads(service, uploads: List[Upload],
+                         batch_size: int = settings.DETECT_BATCH_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Decode and detect on uploaded images one batch at a time.
+
+    Images that fail to decode are reported with an error and skipped by
+    the model; the rest of their batch is still analysed.
+
+    Yields:
+        For each batch, one dict per image with its index, name, width,
+        height, error and detection columns.
+    """
+    decoding = asyncio.ensure_future(_decode_batch(uploads[:batch_size])) if uploads else None
+    try:
+        for start in range(0, len(uploads), batch_size):
+            decoded = await decoding
+            next_start = start + batch_size
+            if next_start < len(uploads):
+                decoding = asyncio.ensure_future(_decode_batch(uploads[next_start:next_start + batch_size]))
+
+            frames = [frame for frame in decoded if isinstance(frame, np.ndarray)]
+            detections = iter(await asyncio.to_thread(service.detect_batch, frames) if frames else [])
+            batch = []
+            for offset, frame in enumerate(decoded):
+                image = {"index": start + offset, "name": uploads[start + offset][0]}
+                if isinstance(frame, np.ndarray):
+                    image.update(width=frame.shape[1], height=frame.shape[0], error=None,
+                                 **to_columns(next(detections)))
+                else:
+                    image.update(width=None, height=None, error=str(frame), **to_columns([]))
+                batch.append(image)
+            yield batch
+    finally:
+        if decoding is not None and not decoding.done():
+            decoding.cancel()  # The client went away mid-stream
@@ -0,0 +1,268 @@
+import ctypes
+import ctypes.util
+import glob
+import logging
+import os
+import re
+import select
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from threading import Lock
+from threading import Thread
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from ..core.config import settings
+from .detection import CameraService
+from .streaming import camera_stream_lockers
+from .streaming import camera_stream_managers
+from .streaming import local_device_probes
+
+logger = logging.getLogger(__name__)
+
+NETLINK_KOBJECT_UEVENT = 15
+KERNEL_UEVENT_GROUP = 1
+
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+INOTIFY_EVENT = struct.Struct("iIII")
+
+_VIDEO_NODE = re.compile(r"^video(\d+)$")
+
+
+def parse_uevent(message: bytes) -> Optional[Tuple[str, int]]:
+    """
+    Extract the action and device ID from a kernel video4linux uevent.
+
+    Args:
+        message: Raw netlink payload ("add@/devices/...\\0ACTION=add\\0...")
+
+    Returns:
+        ("add" | "remove", device_id) for video nodes, otherwise None.
+    """
+    fields = {}
+    for part in message.split(b"\0")[1:]:
+        key, sep, value = part.partition(b"=")
+        if sep:
+            fields[key.decode(errors="replace")] = value.decode(errors="replace")
+    if fields.get("SUBSYSTEM") != "video4linux":
+        return None
+    match = _VIDEO_NODE.match(os.path.basename(fields.get("DEVNAME", "")))
+    if match is None or fields.get("ACTION") not in ("add", "remove"):
+        return None
+    return fields["ACTION"], int(match.group(1))
+
+
+class CameraInventory:
+    """
+    Background inventory of local camera devices.
+
+    All devices are probed concurrently at startup; afterwards only the
+    devices named by hotplug events are re-probed. Events come from the
+    kernel uevent netlink socket, or from inotify on /dev where netlink is not
+    available. A device with an active CameraStreamManager is never opened;
+    its previous entry is kept instead. Otherwise the check marks the device
+    in ``local_device_probes`` under its stream lock, and a stream waits for
+    the mark to clear before opening the device. Readers get the cached list
+    without touching any device.
+    """
+
+    def __init__(self, max_devices: int = settings.CAMERA_INVENTORY_MAX_DEVICES):
+        self.max_devices = max_devices
+        self.ready = Event()
+        self._cameras: Dict[int, Dict[str, Any]] = {}
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.CAMERA_INVENTORY_PROBE_WORKERS,
+            thread_name_prefix="camera-probe",
+        )
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Probe all devices and start watching for hotplug events."""
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="camera-inventory", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def snapshot(self, max_devices: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Return the cached cameras ordered by device ID.
+
+        Args:
+            max_devices: Only include devices with an ID below this value
+        """
+        with self._lock:
+            cameras = [self._cameras[device_id] for device_id in sorted(self._cameras)]
+        if max_devices is not None:
+            cameras = [camera for camera in cameras if camera["device_id"] < max_devices]
+        return CameraService.unique_cameras(cameras)
+
+    def refresh(self):
+        """Re-probe every device present now, concurrently."""
+        device_ids = self._present_device_ids()
+        with self._lock:
+            for device_id in set(self._cameras) - set(device_ids):
+                del self._cameras[device_id]
+        list(self._executor.map(self.probe, device_ids))
+        self.ready.set()
+
+    def probe(self, device_id: int):
+        """Update the cache entry of one device."""
+        lock = camera_stream_lockers["local"][device_id]
+        while True:
+            with lock:
+                running = local_device_probes.get(device_id)
+                if running is None:
+                    manager = camera_stream_managers["local"].get(device_id)
+                    # A manager with subscribers has the device open or is opening it
+                    streaming = manager is not None and (manager.streamer is not None or bool(manager.subscribers))
+                    if not streaming:
+                        probed = local_device_probes[device_id] = Event()
+                    break
+            # Another probe of the device is running, probe again once it is done
+            running.wait()
+        camera_info = None
+        if not streaming:
+            # The device is opened without the lock, a viewer connecting meanwhile waits for the mark only
+            try:
+                camera_info = CameraService.probe_local_camera(device_id)
+            except Exception as e:
+                logger.warning(f"Error probing camera {device_id}: {e}")
+            finally:
+                with lock:
+                    del local_device_probes[device_id]
+                probed.set()
+        if streaming:
+            # The device is streaming, opening it again would steal it
+            with self._lock:
+                if device_id in self._cameras:
+                    return
+            self._add_streaming_device(device_id)
+            return
+        with self._lock:
+            if camera_info is None:
+                self._cameras.pop(device_id, None)
+            else:
+                camera_info["resolution"] = list(camera_info["resolution"])
+                self._cameras[device_id] = camera_info
+
+    def _add_streaming_device(self, device_id: int):
+        """List a busy device from its metadata alone, it is known to deliver frames."""
+        metadata = CameraService.get_device_metadata(device_id)
+        if metadata is None or metadata["is_capture"] is False or not metadata["physical_address"]:
+            return
+        camera_info = {
+            "device_id": device_id,
+            "physical_address": metadata["physical_address"],
+            "usb_id": metadata["usb_id"],
+            "name": metadata["name"],
+            "friendly_name": metadata["friendly_name"],
+            "resolution": [0, 0],
+            "fps": 0.0,
+            "is_available": True,
+            "supported_resolutions": metadata["supported_resolutions"]
+        }
+        with self._lock:
+            self._cameras.setdefault(device_id, camera_info)
+
+    def remove(self, device_id: int):
+        with self._lock:
+            self._cameras.pop(device_id, None)
+
+    def _present_device_ids(self) -> List[int]:
+        device_ids = set()
+        for path in glob.glob("/dev/video*") + glob.glob("/sys/class/video4linux/video*"):
+            match = _VIDEO_NODE.match(os.path.basename(path))
+            if match is not None and int(match.group(1)) < self.max_devices:
+                device_ids.add(int(match.group(1)))
+        return sorted(device_ids)
+
+    def _handle_event(self, action: str, device_id: int):
+        if device_id >= self.max_devices:
+            return
+        logger.info(f"Camera hotplug: {action} /dev/video{device_id}")
+        if action == "remove":
+            self.remove(device_id)
+        else:
+            # Give udev time to create the node and its database entry
+            self._executor.submit(self._delayed_probe, device_id)
+
+    def _delayed_probe(self, device_id: int):
+        time.sleep(settings.CAMERA_INVENTORY_SETTLE_DELAY)
+        self.probe(device_id)
+
+    def _run(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Initial camera inventory failed: {e}", exc_info=True)
+            self.ready.set()
+
+        for watch in (self._watch_netlink, self._watch_inotify):
+            try:
+                watch()
+                return
+            except OSError as e:
+                logger.info(f"{watch.__name__} unavailable: {e}")
+        logger.warning("No hotplug source available, camera inventory will only refresh on demand")
+
+    def _watch_netlink(self):
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        try:
+            sock.bind((0, KERNEL_UEVENT_GROUP))
+            while not self._stop.is_set():
+                readable, _, _ = select.select([sock], [], [], 1.0)
+                if not readable:
+                    continue
+                event = parse_uevent(sock.recv(16384))
+                if event is not None:
+                    self._handle_event(*event)
+        finally:
+            sock.close()
+
+    def _watch_inotify(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        try:
+            if libc.inotify_add_watch(fd, b"/dev", IN_CREATE | IN_DELETE) < 0:
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+            while not self._stop.is_set():
+                readable, _, _ = select.select([fd], [], [], 1.0)
+                if not readable:
+                    continue
+                data = os.read(fd, 4096)
+                offset = 0
+                while offset + INOTIFY_EVENT.size <= len(data):
+                    _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                    offset += INOTIFY_EVENT.size
+                    name = data[offset:offset + length].split(b"\0", 1)[0].decode(errors="replace")
+                    offset += length
+                    match = _VIDEO_NODE.match(name)
+                    if match is not None:
+                        self._handle_event("remove" if mask & IN_DELETE else "add", int(match.group(1)))
+        finally:
+            os.close(fd)
+
+
+camera_inventory = CameraInventory()
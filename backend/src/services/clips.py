@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..models.clip import Clip
+from .events import event_bus
+from .streaming import CameraStreamManager
+from .streaming import find_stream_manager
+
+logger = logging.getLogger(__name__)
+
+
+def write_clip(path: str, frames: List[Tuple[float, bytes]]) -> float:
+    """
+    Decode JPEG frames and write them as an MP4 file.
+
+    The frame rate is derived from the capture timestamps so the clip plays
+    back in real time.
+
+    Returns:
+        The frame rate of the written clip.
+    """
+    duration = frames[-1][0] - frames[0][0]
+    fps = (len(frames) - 1) / duration if duration > 0 else 1.0
+    writer = None
+    try:
+        for _, jpeg in frames:
+            image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                continue
+            if writer is None:
+                height, width = image.shape[:2]
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+                if not writer.isOpened():
+                    raise RuntimeError(f"Cannot open {path} for writing")
+            writer.write(image)
+    finally:
+        if writer is not None:
+            writer.release()
+    return fps
+
+
+class ClipService:
+    """
+    Saves event clips from the pre-roll buffer of streaming cameras.
+
+    Triggering a clip only snapshots references to the buffered JPEGs; the
+    post-roll is collected while the stream keeps running and decoding and
+    writing happen in a worker thread, so capture is never blocked. Every
+    fired alarm of a streaming camera saves a clip linked to the alarm.
+    """
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    def trigger(
+        self,
+        manager: CameraStreamManager,
+        clip_id: int,
+        event_time: float,
+        pre_roll: Optional[float] = None,
+        post_roll: Optional[float] = None,
+    ) -> asyncio.Task:
+        """
+        Start saving a clip around an event in the background.
+
+        Args:
+            manager: Stream manager of the camera
+            clip_id: ID of the pending Clip row to complete
+            event_time: Event time in seconds since the epoch
+            pre_roll: Seconds before the event, at most PREROLL_SECONDS
+            post_roll: Seconds after the event, at most PREROLL_SECONDS
+        """
+        frames, post_roll = self._snapshot(manager, event_time, pre_roll, post_roll)
+        return self._start(self._save(manager, clip_id, frames, event_time, post_roll))
+
+    def trigger_alarm(self, alarm: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """
+        Start saving a clip around a fired alarm in the background.
+
+        Args:
+            alarm: Alarm event of the event bus
+
+        Returns:
+            The saving task, or None if the camera is not streaming.
+        """
+        manager = find_stream_manager(alarm["camera_id"])
+        if manager is None:
+            return None
+        frames, post_roll = self._snapshot(manager, alarm["timestamp"])
+        return self._start(self._save_alarm_clip(manager, alarm["alarm_id"], frames, alarm["timestamp"], post_roll))
+
+    def _snapshot(
+        self,
+        manager: CameraStreamManager,
+        event_time: float,
+        pre_roll: Optional[float] = None,
+        post_roll: Optional[float] = None,
+    ) -> Tuple[List[Tuple[float, bytes]], float]:
+        pre_roll = min(settings.PREROLL_SECONDS if pre_roll is None else pre_roll, settings.PREROLL_SECONDS)
+        post_roll = min(settings.CLIP_POST_ROLL_SECONDS if post_roll is None else post_roll, settings.PREROLL_SECONDS)
+        # Take the pre-roll now, it would age out of the buffer during the post-roll
+        return manager.preroll.since(event_time - pre_roll), post_roll
+
+    def _start(self, coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _save_alarm_clip(self, manager: CameraStreamManager, alarm_id: int, frames: List[Tuple[float, bytes]],
+                               event_time: float, post_roll: float):
+        try:
+            clip_id = await asyncio.to_thread(self._create, manager.camera_id, alarm_id, event_time)
+            await self._save(manager, clip_id, frames, event_time, post_roll)
+        except Exception as e:
+            logger.error(f"Failed to save the clip of alarm {alarm_id}: {e}", exc_info=True)
+
+    async def _save(self, manager: CameraStreamManager, clip_id: int, frames: List[Tuple[float, bytes]],
+                    event_time: float, post_roll: float):
+        await asyncio.sleep(max(event_time + post_roll - time.time(), 0))
+        after = frames[-1][0] if frames else event_time - 1e-6
+        frames = frames + [frame for frame in manager.preroll.since(after) if frame[0] > after]
+        frames = [frame for frame in frames if frame[0] <= event_time + post_roll]
+        await asyncio.to_thread(self._write, clip_id, manager.camera_id, frames)
+
+    def _create(self, camera_id: int, alarm_id: int, event_time: float) -> int:
+        db = SessionLocal()
+        try:
+            clip = Clip(
+                camera_id=camera_id,
+                alarm_id=alarm_id,
+                status="pending",
+                event_time=datetime.utcfromtimestamp(event_time),
+            )
+            db.add(clip)
+            db.commit()
+            return clip.id
+        finally:
+            db.close()
+
+    def _write(self, clip_id: int, camera_id: Optional[int], frames: List[Tuple[float, bytes]]):
+        db = SessionLocal()
+        try:
+            clip = db.query(Clip).filter(Clip.id == clip_id).first()
+            if clip is None:
+                return
+            if not frames:
+                clip.status = "failed"
+                db.commit()
+                logger.warning(f"No frames buffered for clip {clip_id}")
+                return
+
+            directory = os.path.join(settings.CLIPS_DIR, str(camera_id))
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{clip_id}.mp4")
+            try:
+                clip.fps = write_clip(path, frames)
+                clip.status = "saved"
+                clip.file_path = path
+                clip.frames = len(frames)
+                clip.start_time = datetime.utcfromtimestamp(frames[0][0])
+                clip.end_time = datetime.utcfromtimestamp(frames[-1][0])
+            except Exception as e:
+                logger.error(f"Failed to write clip {clip_id}: {e}", exc_info=True)
+                clip.status = "failed"
+            db.commit()
+        finally:
+            db.close()
+
+
+clip_service = ClipService()
+event_bus.on_alarm(clip_service.trigger_alarm)
@@ -0,0 +1,156 @@
+"""
+In-process read-through cache of the configuration tables.
+
+Cameras, streams, ROIs and alarms change rarely but are read on every stream
+connect and by per-frame logic. Each table is loaded whole on first read and
+kept as detached, read-only row snapshots, so hot paths and list endpoints
+answer without a database round trip and no ORM instance is shared between
+sessions or threads.
+
+Writes invalidate single rows: the row is marked stale, its version is
+bumped and the next read reloads just that row. A load that raced with an
+invalidation is returned to its caller but not stored, so a stale row can
+never overwrite a newer invalidation.
+"""
+import copy
+import logging
+import threading
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from ..core.metrics import Counter
+from ..models.alarm import Alarm
+from ..models.camera import Camera
+from ..models.roi import RegionOfInterest
+from ..models.stream import Stream
+
+logger = logging.getLogger(__name__)
+
+CONFIG_CACHE_LOOKUPS = Counter(
+    "carcara_config_cache_lookups_total", "Configuration cache reads by table and result.", ("table", "result")
+)
+
+CONFIG_MODELS = {
+    "camera": Camera,
+    "stream": Stream,
+    "roi": RegionOfInterest,
+    "alarm": Alarm,
+}
+
+
+def snapshot(instance) -> SimpleNamespace:
+    """Copy the column values of an ORM instance into a detached row."""
+    return SimpleNamespace(**{
+        column.key: copy.deepcopy(getattr(instance, column.key))
+        for column in inspect(instance).mapper.column_attrs
+    })
+
+
+class _Table:
+    def __init__(self):
+        self.rows: Dict[int, SimpleNamespace] = {}
+        self.ordered: Optional[List[SimpleNamespace]] = None
+        self.loaded = False
+        self.stale: Set[int] = set()
+        self.versions: Dict[int, int] = defaultdict(int)
+        self.writes = 0  # Invalidations so far, a load is stored only if none happened meanwhile
+
+
+class ConfigCache:
+    """Versioned read-through cache of camera, stream, ROI and alarm rows."""
+
+    def __init__(self):
+        self._tables = {table: _Table() for table in CONFIG_MODELS}
+        self._lock = threading.Lock()
+        self._hits = {table: CONFIG_CACHE_LOOKUPS.labels(table, "hit") for table in CONFIG_MODELS}
+        self._misses = {table: CONFIG_CACHE_LOOKUPS.labels(table, "miss") for table in CONFIG_MODELS}
+
+    def get(self, db: Session, table: str, row_id: int) -> Optional[SimpleNamespace]:
+        """
+        Return a row by ID, or None if it does not exist.
+
+        An ID missing from the cached table is looked up in the database, it
+        may have been created by another process.
+        """
+        rows = self._rows(db, table)
+        if row_id in rows:
+            return rows[row_id]
+        return self._rows(db, table, missing=row_id).get(row_id)
+
+    def list(self, db: Session, table: str) -> List[SimpleNamespace]:
+        """Return every row of a table ordered by ID."""
+        rows = self._rows(db, table)
+        state = self._tables[table]
+        ordered = state.ordered if rows is state.rows else None
+        if ordered is None:
+            ordered = sorted(rows.values(), key=lambda row: row.id)
+            with self._lock:
+                if rows is state.rows:
+                    state.ordered = ordered
+        return ordered
+
+    def version(self, table: str, row_id: int) -> int:
+        """Return how often a row has been invalidated, to detect changes since an earlier read."""
+        return self._tables[table].versions[row_id]
+
+    def table_version(self, table: str) -> int:
+        """Return how often any row of a table has been invalidated, to rebuild data derived from all rows."""
+        return self._tables[table].writes
+
+    def invalidate(self, table: str, row_id: Optional[int] = None):
+        """Mark a row, or the whole table when no ID is given, for reloading on the next read."""
+        state = self._tables[table]
+        with self._lock:
+            state.writes += 1
+            if row_id is None:
+                state.loaded = False
+                state.stale.clear()
+                for key in state.versions:
+                    state.versions[key] += 1
+            else:
+                state.stale.add(row_id)
+                state.versions[row_id] += 1
+
+    def clear(self):
+        for table in self._tables:
+            self.invalidate(table)
+
+    def _rows(self, db: Session, table: str, missing: Optional[int] = None) -> Dict[int, SimpleNamespace]:
+        state = self._tables[table]
+        with self._lock:
+            if state.loaded and not state.stale and missing is None:
+                self._hits[table].inc()
+                return state.rows
+            writes = state.writes
+            pending = (state.stale | {missing}) - {None} if state.loaded else None
+        self._misses[table].inc()
+
+        model = CONFIG_MODELS[table]
+        query = db.query(model).execution_options(populate_existing=True)  # Not rows the session already holds
+        if pending is not None:
+            query = query.filter(model.id.in_(pending))
+        loaded = {row.id: snapshot(row) for row in query.all()}
+
+        with self._lock:
+            if pending is None:
+                rows = loaded
+            else:
+                rows = {row_id: row for row_id, row in state.rows.items() if row_id not in pending}
+                rows.update(loaded)
+            if state.writes == writes:
+                # Replaced rather than updated in place, readers may still iterate the old dict
+                state.rows = rows
+                state.ordered = None
+                state.loaded = True
+                state.stale.clear()
+        return rows
+
+
+config_cache = ConfigCache()
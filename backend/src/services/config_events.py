@@ -0,0 +1,228 @@
+"""
+Configuration changes pushed to every worker through Postgres LISTEN/NOTIFY.
+
+Triggers on the cameras, streams, roi and alarms tables call pg_notify for
+every inserted, updated or deleted row, so any write, through the API of any
+worker or straight into the database, is announced once its transaction
+commits. Each worker keeps one connection LISTENing on the channel and
+watches its socket from the event loop: a notification invalidates that row
+in the config cache and is handed to the subscribers of its table, e.g. to
+restart the stream of a camera whose URL changed. Nothing polls.
+
+Notifications sent while the listener is reconnecting are lost, so after a
+reconnect the whole cache is dropped and subscribers are told that every
+row of their table may have changed.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from ..core.config import settings
+from ..core.metrics import Counter
+from ..core.metrics import Histogram
+from ..db.session import SessionLocal
+from ..db.session import engine
+from .config_cache import config_cache
+
+logger = logging.getLogger(__name__)
+
+CONFIG_NOTIFICATIONS = Counter(
+    "carcara_config_notifications_total", "Configuration change notifications received.", ("table",)
+)
+CONFIG_NOTIFY_LAG = Histogram(
+    "carcara_config_notify_lag_seconds", "Time from a configuration write to its notification being handled."
+)
+
+# Database table -> config cache table
+NOTIFY_TABLES = {"cameras": "camera", "streams": "stream", "roi": "roi", "alarms": "alarm"}
+
+_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION carcara_notify_config_change() RETURNS trigger AS $$
+DECLARE
+    changed jsonb := CASE WHEN TG_OP = 'DELETE' THEN to_jsonb(OLD) ELSE to_jsonb(NEW) END;
+BEGIN
+    PERFORM pg_notify(TG_ARGV[0], json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'id', changed->'id',
+        'camera_id', changed->'camera_id',
+        'at', extract(epoch FROM clock_timestamp())
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+@dataclass
+class ConfigChange:
+    table: str  # Config cache table, e.g. "camera"
+    op: str  # INSERT, UPDATE, DELETE, or RESYNC when any row may have changed
+    id: Optional[int] = None
+    camera_id: Optional[int] = None
+    at: Optional[float] = None  # Database clock at the write, seconds since the epoch
+
+
+def parse_notification(payload: str) -> ConfigChange:
+    """
+    Parse the JSON payload sent by the notify trigger.
+
+    Raises:
+        ValueError: If the payload is not JSON of a known table.
+    """
+    data = json.loads(payload)
+    table = NOTIFY_TABLES.get(data.get("table"))
+    if table is None:
+        raise ValueError(f"Notification for unknown table {data.get('table')!r}")
+    return ConfigChange(table, data.get("op", "UPDATE"), data.get("id"), data.get("camera_id"), data.get("at"))
+
+
+def install_notify_triggers(bind: Engine, channel: str = settings.CONFIG_NOTIFY_CHANNEL):
+    """Create or replace the notify triggers; only Postgres has LISTEN/NOTIFY."""
+    if bind.dialect.name != "postgresql" or not settings.CONFIG_NOTIFY_ENABLED:
+        return
+    with bind.begin() as conn:
+        # Workers starting together would otherwise replace the same catalog rows concurrently
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('carcara_notify_config_change'))"))
+        conn.execute(text(_TRIGGER_FUNCTION))
+        for table in NOTIFY_TABLES:
+            conn.execute(text(
+                f"CREATE OR REPLACE TRIGGER carcara_config_change AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION carcara_notify_config_change('{channel}')"
+            ))
+
+
+def load_config_row(table: str, row_id: int):
+    """Read a row through the config cache with a short-lived session, for use from a thread."""
+    db = SessionLocal()
+    try:
+        return config_cache.get(db, table, row_id)
+    finally:
+        db.close()
+
+
+class ConfigListener:
+    """LISTENs for configuration changes and dispatches them to the subscribers of each table."""
+
+    def __init__(self, channel: str = settings.CONFIG_NOTIFY_CHANNEL):
+        self.channel = channel
+        self._subscribers: Dict[str, List[Callable]] = defaultdict(list)
+        self._task: Optional[asyncio.Task] = None
+        self._received = {table: CONFIG_NOTIFICATIONS.labels(table) for table in NOTIFY_TABLES.values()}
+
+    def subscribe(self, table: str, callback: Callable):
+        """
+        Call ``callback(change)`` for every change of a table.
+
+        Coroutine functions are run as tasks. They run after the cache row
+        was invalidated, so reading the row through the cache returns the
+        new values.
+        """
+        self._subscribers[table].append(callback)
+
+    def dispatch(self, change: ConfigChange):
+        """Invalidate the changed row and notify the subscribers of its table."""
+        config_cache.invalidate(change.table, change.id)
+        for callback in self._subscribers[change.table]:
+            try:
+                result = callback(change)
+                if inspect.isawaitable(result):
+                    asyncio.ensure_future(result).add_done_callback(self._log_failure)
+            except Exception as e:
+                logger.error(f"Handling {change.op} of {change.table} {change.id} failed: {e}", exc_info=True)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Handling a configuration change failed: {task.exception()}", exc_info=task.exception())
+
+    def start(self):
+        """Start listening when the database is Postgres; other databases keep the per-worker cache only."""
+        if engine.dialect.name != "postgresql" or not settings.CONFIG_NOTIFY_ENABLED or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        import psycopg2
+
+        loop = asyncio.get_running_loop()
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        delay = settings.CONFIG_LISTEN_RECONNECT_DELAY
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = await asyncio.to_thread(psycopg2.connect, dsn, keepalives=1, keepalives_idle=10,
+                                               keepalives_interval=5, keepalives_count=3)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                logger.info(f"Listening for configuration changes on {self.channel}")
+                delay = settings.CONFIG_LISTEN_RECONNECT_DELAY
+                if connected_before:
+                    self._resync()
+                connected_before = True
+
+                lost = loop.create_future()
+                loop.add_reader(conn.fileno(), self._drain, conn, lost)
+                try:
+                    await lost
+                finally:
+                    loop.remove_reader(conn.fileno())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Configuration listener lost its connection, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, settings.CONFIG_LISTEN_MAX_RECONNECT_DELAY)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _drain(self, conn, lost: asyncio.Future):
+        try:
+            conn.poll()
+        except Exception as e:
+            if not lost.done():
+                lost.set_exception(e)
+            return
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            try:
+                change = parse_notification(notify.payload)
+            except ValueError as e:
+                logger.warning(f"Ignoring configuration notification {notify.payload!r}: {e}")
+                continue
+            self._received[change.table].inc()
+            if change.at is not None:
+                CONFIG_NOTIFY_LAG.observe(max(time.time() - change.at, 0.0))
+            logger.debug(f"{change.op} of {change.table} {change.id}")
+            self.dispatch(change)
+
+    def _resync(self):
+        logger.info("Reloading all configuration after reconnecting")
+        for table in NOTIFY_TABLES.values():
+            self.dispatch(ConfigChange(table, "RESYNC"))
+
+
+config_listener = ConfigListener()
@@ -0,0 +1,286 @@
+"""
+Content-addressed store of detected object crops.
+
+A crop is JPEG encoded and addressed by the BLAKE2b digest of its bytes, so
+a crop seen before, e.g. of a parked car in a static scene or from a video
+analysed twice, is stored once. Crops are appended to pack files of up to
+CROP_PACK_MAX_BYTES, each record prefixed with its digest and length, so
+the packs alone are enough to rebuild the index.
+
+The index is an open-addressing hash table of CROP_SLOT entries mapped with
+np.memmap. A lookup hashes the digest to a slot and probes the few slots
+after it, without reading a pack or the database. A slot is published by
+writing its length last, so readers do not lock. At CROP_INDEX_LOAD the
+table is rebuilt at twice the size into a new file that replaces the old
+one; a reader that misses checks whether the file was replaced.
+
+Writers of every process serialise on an flock of index.lock, so the worker
+processes of analysis jobs and the API workers share one store.
+"""
+import fcntl
+import hashlib
+import logging
+import math
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+CROPS_STORED = Counter("carcara_crops_stored_total", "Object crops offered to the crop store by result.", ("result",))
+
+INDEX_MAGIC = b"CRPIDX01"
+CROP_HEADER = np.dtype([("magic", "S8"), ("count", "<u8"), ("pack", "<u4"), ("reserved", "V12")])
+CROP_SLOT = np.dtype([("digest", "V16"), ("offset", "<u8"), ("pack", "<u4"), ("length", "<u4")])  # length 0: empty
+CROP_INDEX_LOAD = 0.7
+DIGEST_SIZE = 16
+RECORD_HEADER = DIGEST_SIZE + 4  # Digest and little-endian length before the JPEG bytes of each record
+
+
+def crop_digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def pack_file_name(number: int) -> str:
+    return f"{number:06d}.pack"
+
+
+def encode_crop(frame: np.ndarray, bbox: Sequence[float]) -> Optional[bytes]:
+    """
+    JPEG encode the box of a frame with CROP_PADDING around it, downscaled to at most CROP_MAX_SIDE.
+
+    Returns:
+        The JPEG bytes, or None if the box lies outside the frame.
+    """
+    height, width = frame.shape[:2]
+    x1, y1, x2, y2 = bbox
+    pad_x, pad_y = (x2 - x1) * settings.CROP_PADDING, (y2 - y1) * settings.CROP_PADDING
+    left, top = max(int(x1 - pad_x), 0), max(int(y1 - pad_y), 0)
+    right, bottom = min(math.ceil(x2 + pad_x), width), min(math.ceil(y2 + pad_y), height)
+    if right <= left or bottom <= top:
+        return None
+    crop = frame[top:bottom, left:right]
+    scale = settings.CROP_MAX_SIDE / max(crop.shape[:2])
+    if scale < 1:
+        size = (max(round(crop.shape[1] * scale), 1), max(round(crop.shape[0] * scale), 1))
+        crop = cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+    ret, buffer = cv2.imencode(".jpg", crop, [cv2.IMWRITE_JPEG_QUALITY, settings.CROP_JPEG_QUALITY])
+    return buffer.tobytes() if ret else None
+
+
+def _probe(slots: np.ndarray, digest: bytes) -> Tuple[int, bool]:
+    """Return the slot holding a digest and True, or the empty slot where it belongs and False."""
+    mask = len(slots) - 1
+    position = int.from_bytes(digest[:8], "little") & mask
+    while True:
+        slot = slots[position]
+        if slot["length"] == 0:
+            return position, False
+        if slot["digest"].tobytes() == digest:
+            return position, True
+        position = (position + 1) & mask
+
+
+def _insert(slots: np.ndarray, digest: bytes, pack: int, offset: int, length: int) -> bool:
+    position, found = _probe(slots, digest)
+    if found:
+        return False
+    slots["digest"][position] = np.void(digest)
+    slots["offset"][position] = offset
+    slots["pack"][position] = pack
+    slots["length"][position] = length  # Last, a non-zero length publishes the slot
+    return True
+
+
+class CropStore:
+    """Append-only pack files of JPEG crops with an mmap hash index from digest to pack location."""
+
+    def __init__(self, directory: str = settings.CROPS_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.bin")
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._lock_file: Optional[int] = None
+        self._inode: Optional[int] = None
+        self._header: Optional[np.ndarray] = None
+        self._slots: Optional[np.ndarray] = None
+        self._packs: Dict[int, int] = {}  # Pack number -> file descriptor for reading
+
+    def pack_path(self, number: int) -> str:
+        return os.path.join(self.directory, pack_file_name(number))
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the store's file lock, shared by every process."""
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _ensure_open(self):
+        """Open the store once per process, creating or rebuilding a missing index. Call with _lock held."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._inode = self._header = self._slots = None
+        self._packs = {}
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = os.open(os.path.join(self.directory, "index.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        with self._exclusive():
+            self._refresh()
+
+    def _map(self):
+        self._inode = os.stat(self.index_path).st_ino
+        self._header = np.memmap(self.index_path, dtype=CROP_HEADER, mode="r+", shape=(1,))
+        if self._header["magic"][0] != INDEX_MAGIC:
+            raise ValueError(f"{self.index_path} is not a crop index")
+        self._slots = np.memmap(self.index_path, dtype=CROP_SLOT, mode="r+", offset=CROP_HEADER.itemsize)
+
+    def _replaced(self) -> bool:
+        try:
+            return os.stat(self.index_path).st_ino != self._inode
+        except FileNotFoundError:
+            return True
+
+    def _refresh(self):
+        """Map the current index, grown by another process or rebuilt if it was removed. Call with both locks held."""
+        if not os.path.exists(self.index_path):
+            self._rebuild()
+        self._map()
+
+    def _write_index(self, slots: np.ndarray, count: int, pack: int):
+        """Write a complete index next to the current one and swap it in, readers never see a partial table."""
+        header = np.zeros(1, dtype=CROP_HEADER)
+        header["magic"], header["count"], header["pack"] = INDEX_MAGIC, count, pack
+        temporary = f"{self.index_path}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(header.tobytes())
+            file.write(slots.tobytes())
+        os.replace(temporary, self.index_path)
+
+    def _rebuild(self):
+        """Index every record of the packs, for a new store or after the index file was removed."""
+        numbers = sorted(
+            int(name[:-len(".pack")]) for name in os.listdir(self.directory)
+            if name.endswith(".pack") and name[:-len(".pack")].isdigit()
+        )
+        records = []
+        for number in numbers:
+            path = self.pack_path(number)
+            with open(path, "rb") as file:
+                offset = 0
+                while True:
+                    prefix = file.read(RECORD_HEADER)
+                    length = int.from_bytes(prefix[DIGEST_SIZE:], "little")
+                    if len(prefix) < RECORD_HEADER or len(file.read(length)) < length:
+                        break
+                    records.append((prefix[:DIGEST_SIZE], number, offset, length))
+                    offset += RECORD_HEADER + length
+            if os.path.getsize(path) > offset:
+                os.truncate(path, offset)  # Drop a record cut short by a crash, it was never indexed
+        capacity = max(settings.CROP_INDEX_INITIAL_SLOTS, 1)
+        while capacity * CROP_INDEX_LOAD < len(records) + 1:
+            capacity *= 2
+        slots = np.zeros(1 << (capacity - 1).bit_length(), dtype=CROP_SLOT)
+        count = sum(_insert(slots, *record) for record in records)
+        self._write_index(slots, count, numbers[-1] if numbers else 0)
+        if records:
+            logger.info(f"Rebuilt the crop index from {len(numbers)} packs, {count} crops")
+
+    def _grow(self):
+        """Double the table into a new file. Call with both locks held."""
+        used = self._slots[self._slots["length"] != 0]
+        slots = np.zeros(len(self._slots) * 2, dtype=CROP_SLOT)
+        for slot in used:
+            _insert(slots, slot["digest"].tobytes(), int(slot["pack"]), int(slot["offset"]), int(slot["length"]))
+        self._write_index(slots, int(self._header["count"][0]), int(self._header["pack"][0]))
+        self._map()
+        logger.info(f"Crop index grown to {len(slots)} slots")
+
+    def _locate(self, digest: bytes) -> Optional[Tuple[int, int, int]]:
+        position, found = _probe(self._slots, digest)
+        if not found:
+            return None
+        slot = self._slots[position]
+        return int(slot["pack"]), int(slot["offset"]), int(slot["length"])
+
+    def put(self, data: bytes) -> str:
+        """
+        Store a crop unless identical bytes are stored already.
+
+        Returns:
+            The hex digest that addresses the crop.
+        """
+        digest = crop_digest(data)
+        with self._lock:
+            self._ensure_open()
+            if self._locate(digest) is not None:
+                CROPS_STORED.labels("duplicate").inc()
+                return digest.hex()
+            with self._exclusive():
+                if self._replaced():
+                    self._refresh()
+                if self._locate(digest) is not None:
+                    CROPS_STORED.labels("duplicate").inc()
+                    return digest.hex()
+                pack = int(self._header["pack"][0])
+                path = self.pack_path(pack)
+                offset = os.path.getsize(path) if os.path.exists(path) else 0
+                if offset and offset + RECORD_HEADER + len(data) > settings.CROP_PACK_MAX_BYTES:
+                    pack, offset = pack + 1, 0
+                    path = self.pack_path(pack)
+                with open(path, "ab") as file:
+                    file.write(digest + len(data).to_bytes(4, "little") + data)
+                if self._header["count"][0] + 1 > len(self._slots) * CROP_INDEX_LOAD:
+                    self._grow()
+                _insert(self._slots, digest, pack, offset, len(data))
+                self._header["pack"][0] = pack
+                self._header["count"][0] += 1
+        CROPS_STORED.labels("new").inc()
+        return digest.hex()
+
+    def get(self, digest: bytes) -> Optional[bytes]:
+        """Return the JPEG bytes of a crop, or None if it is not stored."""
+        with self._lock:
+            self._ensure_open()
+            located = self._locate(digest)
+            if located is None and self._replaced():
+                with self._exclusive():
+                    self._refresh()
+                located = self._locate(digest)
+            if located is None:
+                return None
+            pack, offset, length = located
+            descriptor = self._packs.get(pack)
+            if descriptor is None:
+                descriptor = self._packs[pack] = os.open(self.pack_path(pack), os.O_RDONLY)
+        return os.pread(descriptor, length, offset + RECORD_HEADER)
+
+    def close(self):
+        with self._lock:
+            for descriptor in self._packs.values():
+                os.close(descriptor)
+            if self._lock_file is not None and self._pid == os.getpid():
+                os.close(self._lock_file)
+            self._pid = self._lock_file = self._inode = self._header = self._slots = None
+            self._packs = {}
+
+
+def store_crop(frame: np.ndarray, bbox: Sequence[float]) -> Optional[str]:
+    """Store the crop of a box of a frame, returning its hex digest or None if the box is empty."""
+    data = encode_crop(frame, bbox)
+    return crop_store.put(data) if data is not None else None
+
+
+crop_store = CropStore()
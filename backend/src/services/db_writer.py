@@ -0,0 +1,133 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from sqlalchemy import insert
+
+from ..core.config import settings
+from ..core.metrics import SIZE_BUCKETS
+from ..core.metrics import Counter
+from ..core.metrics import Gauge
+from ..core.metrics import Histogram
+from ..db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = Histogram("carcara_db_writer_flush_seconds", "Time to insert one batch.", ("table",))
+BATCH_ROWS = Histogram("carcara_db_writer_batch_rows", "Rows per inserted batch.", ("table",), buckets=SIZE_BUCKETS)
+QUEUE_DEPTH = Gauge("carcara_db_writer_queue_depth", "Rows waiting to be inserted.", ("table",))
+DROPPED_ROWS = Counter("carcara_db_writer_dropped_rows_total", "Rows dropped because the queue was full.", ("table",))
+
+
+class BatchWriter:
+    """
+    Inserts rows of one model from a background thread in batches.
+
+    Producers such as the stream publisher only put a dict on a bounded
+    queue; the writer thread collects up to ``batch_size`` rows or waits at
+    most ``flush_interval`` seconds, then inserts them with a single
+    executemany. Rows are dropped with a warning when the queue is full so a
+    slow database never stalls a stream. ``close`` inserts the rows still
+    queued and stops the thread, call it at shutdown.
+    """
+
+    def __init__(
+        self,
+        model,
+        batch_size: int = settings.DB_WRITER_BATCH_SIZE,
+        flush_interval: float = settings.DB_WRITER_FLUSH_INTERVAL,
+        queue_size: int = settings.DB_WRITER_QUEUE_SIZE,
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        table = model.__tablename__
+        self._flush_seconds = FLUSH_SECONDS.labels(table)
+        self._batch_rows = BATCH_ROWS.labels(table)
+        self._dropped_rows = DROPPED_ROWS.labels(table)
+        QUEUE_DEPTH.labels(table).set_function(self._queue.qsize)
+
+    def add(self, row: Dict[str, Any]):
+        """Queue a row for insertion, starting the writer thread on first use."""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            self._dropped_rows.inc()
+            logger.warning(f"{self.model.__tablename__} writer queue full, dropped {self.dropped} rows so far")
+
+    def close(self, timeout: float = 10.0):
+        """Insert the queued rows and wait for the writer thread to exit."""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)  # Rows queued before it are inserted first
+        except queue.Full:
+            logger.warning(f"{self.model.__tablename__} writer did not drain its queue, rows are lost")
+            return
+        thread.join(timeout)
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"db-writer-{self.model.__tablename__}", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Block for the first row, then gather more until the batch is full or the interval ends.
+
+        Returns:
+            (rows, closed) where closed tells that ``close`` was called.
+        """
+        rows = []
+        row = self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while row is not None:
+            rows.append(row)
+            remaining = deadline - time.monotonic()
+            if len(rows) >= self.batch_size or remaining <= 0:
+                return rows, False
+            try:
+                row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return rows, False
+        return rows, True
+
+    def _run(self):
+        closed = False
+        while not closed:
+            rows, closed = self._collect()
+            try:
+                self.flush(rows)
+            except Exception as e:
+                logger.error(f"Failed to write {len(rows)} {self.model.__tablename__} rows: {e}", exc_info=True)
+
+    def flush(self, rows: List[Dict[str, Any]]):
+        """Insert rows in one transaction."""
+        if not rows:
+            return
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.execute(insert(self.model), rows)
+            db.commit()
+        finally:
+            db.close()
+        self._flush_seconds.observe(time.perf_counter() - started)
+        self._batch_rows.observe(len(rows))
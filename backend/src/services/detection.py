@@ -1,10 +1,14 @@
-import hashlib
+import logging
 import os
 import subprocess
+import time
+from collections import defaultdict
+from threading import Lock
 from typing import Any
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Union
 
 import cv2
 import numpy as np
@@ -12,146 +16,174 @@ import torch
 from ultralytics import YOLO
 
 from ..core.config import settings
+from ..core.metrics import SIZE_BUCKETS
+from ..core.metrics import Histogram
+from ..core.tracing import add_span
+from ..core.tracing import is_sampled
+from ..core.tracing import span
+from . import v4l2
+from .replay import ReplayCapture
+from .synthetic import SyntheticCapture
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_SECONDS = Histogram(
+    "carcara_inference_seconds", "Detection latency per frame.", ("model", "backend")
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    "carcara_inference_batch_size", "Frames per batched detection call.", ("model", "backend"),
+    buckets=SIZE_BUCKETS,
+)
 
 
 class CameraService:
     """Handles camera-related operations such as scanning and streaming."""
 
     @staticmethod
-    def get_camera_name(device_id: int) -> str:
-        """Retrieve the product name of the camera using v4l2-ctl."""
-        try:
-            result = subprocess.run(
-                ["v4l2-ctl", "--device", f"/dev/video{device_id}", "--all"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True
-            )
-            for line in result.stdout.splitlines():
-                if "Card type" in line:
-                    return line.split(":")[1].strip()
-        except Exception as e:
-            print(f"Error retrieving name for camera {device_id}: {str(e)}")
-        return f"Camera {device_id}"
-
-    @staticmethod
-    def get_camera_physical_address(device_id: int) -> Optional[str]:
+    def get_device_metadata_with_tools(device_id: int) -> Optional[Dict[str, Any]]:
         """
-        Retrieve the physical address of the camera using udevadm.
+        Retrieve device metadata with one udevadm and one v4l2-ctl call.
+
+        Fallback for hosts where sysfs or the udev database is not visible,
+        e.g. containers without /run/udev mounted.
 
         Args:
             device_id: The ID of the video device (e.g., 0 for /dev/video0).
 
         Returns:
-            A string representing the physical address of the camera, or None if unavailable.
+            A dictionary with the same keys as v4l2.read_device_metadata, or None if unavailable.
         """
+        device = f"/dev/video{device_id}"
         try:
-            result = subprocess.run(
-                ["udevadm", "info", f"/dev/video{device_id}"],
+            udev_result = subprocess.run(
+                ["udevadm", "info", "--query=property", f"--name={device}"],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
                 check=True
             )
-            for line in result.stdout.splitlines():
-                if "DEVPATH=" in line:
-                    return line.split("=")[1].strip()
         except Exception as e:
-            print(f"Error retrieving physical address for camera {device_id}: {str(e)}")
+            logger.error(f"Error retrieving udev properties for camera {device_id}: {str(e)}")
             return None
+        properties = dict(
+            line.split("=", 1) for line in udev_result.stdout.splitlines() if "=" in line
+        )
 
-    @staticmethod
-    def get_camera_usb_id(device_id: int) -> Optional[str]:
-        """
-        Retrieve the USB ID of the camera using udevadm.
-
-        Args:
-            device_id: The ID of the video device (e.g., 0 for /dev/video0).
-
-        Returns:
-            A string representing the USB ID of the camera (e.g., "1d6b:0002"), or None if unavailable.
-        """
+        name = f"Camera {device_id}"
+        resolutions = []
         try:
-            result = subprocess.run(
-                ["udevadm", "info", f"/dev/video{device_id}"],
+            v4l2_result = subprocess.run(
+                ["v4l2-ctl", "--device", device, "--info", "--list-formats-ext"],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
                 check=True
             )
-            vendor_id = None
-            model_id = None
-            for line in result.stdout.splitlines():
-                if "ID_VENDOR_ID" in line:
-                    vendor_id = line.split("=")[1].strip()
-                if "ID_MODEL_ID" in line:
-                    model_id = line.split("=")[1].strip()
-            if vendor_id and model_id:
-                return f"{vendor_id}:{model_id}"
+            for line in v4l2_result.stdout.splitlines():
+                if "Card type" in line:
+                    name = line.split(":", 1)[1].strip()
+                elif "Size:" in line:
+                    # Extract resolution from the line (e.g., "Size: Discrete 1920x1080")
+                    parts = line.split()
+                    if len(parts) >= 3 and "x" in parts[2]:
+                        width, height = map(int, parts[2].split("x"))
+                        resolutions.append((width, height))
         except Exception as e:
-            print(f"Error retrieving USB ID for camera {device_id}: {str(e)}")
-            return None
+            logger.error(f"Error retrieving V4L2 information for camera {device_id}: {str(e)}")
+
+        usb_id = None
+        if properties.get("ID_VENDOR_ID") and properties.get("ID_MODEL_ID"):
+            usb_id = f"{properties['ID_VENDOR_ID']}:{properties['ID_MODEL_ID']}"
+        return {
+            "name": name,
+            "physical_address": properties.get("DEVPATH"),
+            "usb_id": usb_id,
+            "friendly_name": properties.get("ID_MODEL_FROM_DATABASE") or properties.get("ID_MODEL"),
+            "supported_resolutions": resolutions,
+            "is_capture": None,
+        }
 
     @staticmethod
-    def get_camera_friendly_name(device_id: int) -> Optional[str]:
+    def get_device_metadata(device_id: int) -> Optional[Dict[str, Any]]:
         """
-        Retrieve the friendly name of the camera using udevadm.
+        Retrieve device metadata, natively when possible.
+
+        Reads sysfs, the udev database and V4L2 ioctls directly and falls back
+        to udevadm/v4l2-ctl when sysfs does not list the device.
 
         Args:
             device_id: The ID of the video device (e.g., 0 for /dev/video0).
 
         Returns:
-            A string representing the friendly name of the camera, or None if unavailable.
+            A dictionary with name, physical_address, usb_id, friendly_name,
+            supported_resolutions and is_capture, or None if unavailable.
         """
-        try:
-            result = subprocess.run(
-                ["udevadm", "info", f"/dev/video{device_id}"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True
-            )
-            for line in result.stdout.splitlines():
-                if "ID_MODEL_FROM_DATABASE" in line:
-                    return line.split("=")[1].strip()
-                elif "ID_MODEL" in line:  # Fallback to ID_MODEL if ID_MODEL_FROM_DATABASE is unavailable
-                    return line.split("=")[1].strip()
-        except Exception as e:
-            print(f"Error retrieving friendly name for camera {device_id}: {str(e)}")
+        if os.path.isdir(v4l2.SYSFS_VIDEO4LINUX):
+            metadata = v4l2.read_device_metadata(device_id)
+            if metadata is not None:
+                return metadata
+        if not os.path.exists(f"/dev/video{device_id}"):
             return None
+        return CameraService.get_device_metadata_with_tools(device_id)
 
     @staticmethod
-    def get_supported_resolutions(device_id: int) -> List[tuple]:
+    def probe_local_camera(device_id: int, metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """
-        Retrieve the list of supported resolutions for a camera using v4l2-ctl.
+        Open a local camera device and read its properties and one frame.
 
         Args:
             device_id: The ID of the video device (e.g., 0 for /dev/video0).
+            metadata: Metadata from get_device_metadata, read if not given
 
         Returns:
-            A list of tuples representing supported resolutions (width, height).
+            A dictionary containing device information, or None if the device
+            is missing, is not a capture node or cannot be opened.
         """
+        if metadata is None:
+            metadata = CameraService.get_device_metadata(device_id)
+        # Skip missing devices and non-capture nodes such as UVC metadata nodes
+        if metadata is None or metadata["is_capture"] is False or not metadata["physical_address"]:
+            return None
+
+        cap = cv2.VideoCapture(device_id)
         try:
-            result = subprocess.run(
-                ["v4l2-ctl", "--device", f"/dev/video{device_id}", "--list-formats-ext"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True
-            )
-            resolutions = []
-            for line in result.stdout.splitlines():
-                if "Size:" in line:
-                    # Extract resolution from the line (e.g., "Size: Discrete 1920x1080")
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        width, height = map(int, parts[2].split("x"))
-                        resolutions.append((width, height))
-            return resolutions
-        except Exception as e:
-            print(f"Error retrieving supported resolutions for camera {device_id}: {str(e)}")
-            return []
+            if not cap.isOpened():
+                return None
+
+            # Get camera properties
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps = cap.get(cv2.CAP_PROP_FPS)
+
+            # Try to get a frame to confirm camera is working
+            ret, frame = cap.read()
+            is_available = ret and frame is not None
+        finally:
+            cap.release()
+
+        return {
+            "device_id": device_id,
+            "physical_address": metadata["physical_address"],
+            "usb_id": metadata["usb_id"],
+            "name": metadata["name"],
+            "friendly_name": metadata["friendly_name"],
+            "resolution": (width, height),
+            "fps": fps,
+            "is_available": is_available,
+            "supported_resolutions": metadata["supported_resolutions"]
+        }
+
+    @staticmethod
+    def unique_cameras(cameras: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop cameras whose physical address and USB ID were already listed."""
+        unique = []
+        seen_devices = set()  # Track unique combinations of physical address and USB ID
+        for camera in cameras:
+            unique_device_key = (camera["physical_address"], camera["usb_id"])
+            if unique_device_key not in seen_devices:
+                unique.append(camera)
+                seen_devices.add(unique_device_key)
+        return unique
 
     @staticmethod
     def scan_local_cameras(max_devices: int = 10) -> List[Dict[str, Any]]:
@@ -165,56 +197,78 @@ class CameraService:
             List of dictionaries containing device information.
         """
         available_cameras = []
-        seen_devices = set()  # Track unique combinations of physical address and USB ID
-
         for device_id in range(max_devices):
             try:
-                cap = cv2.VideoCapture(device_id)
-                if cap.isOpened():
-                    # Get physical address
-                    physical_address = CameraService.get_camera_physical_address(device_id)
-                    # Get USB ID
-                    usb_id = CameraService.get_camera_usb_id(device_id)
-
-                    # Use a combination of physical address and USB ID to ensure uniqueness
-                    unique_device_key = (physical_address, usb_id)
-                    if not physical_address or unique_device_key in seen_devices:
-                        cap.release()
-                        continue
-
-                    # Get camera properties
-                    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                    fps = cap.get(cv2.CAP_PROP_FPS)
-
-                    # Try to get a frame to confirm camera is working
-                    ret, frame = cap.read()
-                    is_available = ret and frame is not None
-
-                    # Use the method to get supported resolutions
-                    supported_resolutions = CameraService.get_supported_resolutions(device_id)
-
-                    camera_info = {
-                        "device_id": device_id,
-                        "physical_address": physical_address,
-                        "usb_id": usb_id,
-                        "name": CameraService.get_camera_name(device_id),
-                        "friendly_name": CameraService.get_camera_friendly_name(device_id),  # Add friendly name
-                        "resolution": (width, height),
-                        "fps": fps,
-                        "is_available": is_available,
-                        "supported_resolutions": supported_resolutions
-                    }
-
-                    # Add camera to the list and mark its unique key as seen
+                camera_info = CameraService.probe_local_camera(device_id)
+                if camera_info is not None:
                     available_cameras.append(camera_info)
-                    seen_devices.add(unique_device_key)
-                cap.release()
             except Exception as e:
-                print(f"Error accessing camera {device_id}: {str(e)}")
+                logger.error(f"Error accessing camera {device_id}: {str(e)}")
                 continue
 
-        return available_cameras
+        return CameraService.unique_cameras(available_cameras)
+
+    @staticmethod
+    def open_capture(source: Union[int, str], camera_type: str = "rtsp") -> cv2.VideoCapture:
+        """
+        Open a video capture for a local device, an RTSP URL, a video file or a synthetic source.
+
+        RTSP captures go through the FFmpeg backend with the configured
+        transport, bounded open/read timeouts and low-latency demuxer flags,
+        and keep a single-frame buffer so readers always get the newest frame.
+        Files are replayed in a loop at their own frame rate, see
+        ReplayCapture; synthetic sources render frames in process, see
+        SyntheticCapture.
+
+        Args:
+            source: Device ID for local cameras, URL for RTSP cameras, path
+                for file cameras or a spec such as "synthetic://1280x720@30"
+                for synthetic cameras
+            camera_type: Type of camera ("rtsp", "local", "file" or "synthetic")
+
+        Returns:
+            The capture object; callers must check ``isOpened()``.
+        """
+        if camera_type == "local":
+            return cv2.VideoCapture(source)
+        if camera_type == "file":
+            return ReplayCapture(source)
+        if camera_type == "synthetic":
+            return SyntheticCapture(source)
+
+        # FFmpeg demuxer options are read from the environment when opening
+        os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = (
+            f"rtsp_transport;{settings.RTSP_TRANSPORT}|fflags;nobuffer|flags;low_delay"
+        )
+        cap = cv2.VideoCapture(
+            source,
+            cv2.CAP_FFMPEG,
+            [
+                cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, settings.RTSP_OPEN_TIMEOUT_MS,
+                cv2.CAP_PROP_READ_TIMEOUT_MSEC, settings.RTSP_READ_TIMEOUT_MS,
+            ]
+        )
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    @staticmethod
+    def read_frame(cap: cv2.VideoCapture, image: Optional[np.ndarray] = None):
+        """
+        Read the next frame, decoding into ``image`` when given.
+
+        For traced frames the read is split into grab (capture) and
+        retrieve (decode) so both stages get their own span.
+
+        Returns:
+            (ret, frame) like ``cv2.VideoCapture.read``.
+        """
+        if not is_sampled():
+            return cap.read() if image is None else cap.read(image)
+        with span("capture"):
+            if not cap.grab():
+                return False, None
+        with span("decode"):
+            return cap.retrieve() if image is None else cap.retrieve(image)
 
     @staticmethod
     def process_stream(stream_url: str, camera_type: str = "rtsp", device_id: Optional[int] = None) -> Optional[np.ndarray]:
@@ -229,17 +283,18 @@ class CameraService:
         Returns:
             Current frame as numpy array or None if stream is not available.
         """
-        if camera_type == "local":
-            if device_id is None:
-                return None
-            cap = cv2.VideoCapture(device_id)
-        else:
-            cap = cv2.VideoCapture(stream_url)
+        with span("open_capture"):
+            if camera_type == "local":
+                if device_id is None:
+                    return None
+                cap = CameraService.open_capture(device_id, camera_type)
+            else:
+                cap = CameraService.open_capture(stream_url, camera_type)
 
         if not cap.isOpened():
             return None
 
-        ret, frame = cap.read()
+        ret, frame = CameraService.read_frame(cap)
         cap.release()
 
         if not ret:
@@ -256,6 +311,9 @@ class ObjectDetectionService:
         self.device = self._get_device()
         self.model = self._load_model()
         self.confidence_threshold = settings.CONFIDENCE_THRESHOLD
+        self._lock = Lock()  # The YOLO predictor is not safe to call from several threads
+        self._inference_seconds = INFERENCE_SECONDS.labels(detection_model_name, "local")
+        self._batch_size = INFERENCE_BATCH_SIZE.labels(detection_model_name, "local")
 
     def _get_device(self) -> str:
         """Detect if CUDA is available and return appropriate device."""
@@ -271,7 +329,7 @@ class ObjectDetectionService:
 
     def _load_model(self) -> YOLO:
         """Load the YOLO model with appropriate device settings."""
-        print(f"Loading model on {self.device} device...")
+        logger.info(f"Loading model {self.detection_model_name} on {self.device} device")
         return YOLO(self.detection_model_name).to(self.device)
 
     def detect(self, frame: np.ndarray) -> List[Dict[str, Any]]:
@@ -284,7 +342,42 @@ class ObjectDetectionService:
         Returns:
             List of detections with bounding boxes and class information.
         """
-        results = self.model(frame, conf=self.confidence_threshold)[0]
+        with self._lock:
+            started = time.perf_counter_ns()
+            results = self.model(frame, conf=self.confidence_threshold)[0]
+            elapsed = time.perf_counter_ns() - started
+        self._inference_seconds.observe(elapsed / 1e9)
+        if is_sampled():
+            self._trace_stages(results, started, elapsed)
+        return self._to_detections(results)
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """
+        Perform object detection on several frames in one model call.
+
+        The frames are letterboxed into a single input batch, which keeps a
+        GPU busy far better than one call per frame.
+
+        Args:
+            frames: images, which may differ in size
+
+        Returns:
+            The detections of each frame, in the order of the frames.
+        """
+        if not frames:
+            return []
+        with self._lock:
+            started = time.perf_counter_ns()
+            results = self.model(frames, conf=self.confidence_threshold, batch=len(frames))
+            elapsed = time.perf_counter_ns() - started
+        self._batch_size.observe(len(frames))
+        per_frame = elapsed / len(frames) / 1e9
+        for _ in frames:
+            self._inference_seconds.observe(per_frame)
+        return [self._to_detections(result) for result in results]
+
+    @staticmethod
+    def _to_detections(results) -> List[Dict[str, Any]]:
         detections = []
 
         for box in results.boxes:
@@ -298,6 +391,53 @@ class ObjectDetectionService:
 
         return detections
 
+    def _trace_stages(self, results, started: int, elapsed: int):
+        """Record the model call and the stage timings ultralytics reports for it, in milliseconds."""
+        add_span("detect", started, elapsed, model=self.detection_model_name)
+        speed = getattr(results, "speed", None) or {}
+        offset = started
+        for stage in ("preprocess", "inference", "postprocess"):
+            duration = int((speed.get(stage) or 0.0) * 1e6)
+            add_span(stage, offset, duration, model=self.detection_model_name)
+            offset += duration
+
+    @property
+    def class_names(self) -> Dict[int, str]:
+        """Return the class ID to class name mapping of the loaded model."""
+        return self.model.names
+
     def get_available_models(self) -> List[str]:
         """Return list of available YOLO models."""
         return settings.SUPPORTED_MODELS
+
+
+_detection_services: Dict[str, ObjectDetectionService] = {}
+_detection_service_locks = defaultdict(Lock)  # Concurrent first calls for a model load it once
+
+
+def get_detection_service(detection_model_name: Optional[str] = None) -> ObjectDetectionService:
+    """
+    Return the process-wide detection service for a model, loading it on first use.
+
+    With INFERENCE_WORKERS set, detection runs in a pool of worker processes
+    that exposes the same detect() interface. The first call blocks while
+    the model loads, call it from a worker thread rather than the event loop.
+
+    Args:
+        detection_model_name: Model to detect with, DEFAULT_MODEL when omitted
+    """
+    detection_model_name = detection_model_name or settings.DEFAULT_MODEL
+    with _detection_service_locks[detection_model_name]:
+        service = _detection_services.get(detection_model_name)
+        if service is not None:
+            return service
+        if settings.INFERENCE_WORKERS > 0:
+            from .inference_pool import InferencePool
+
+            service = InferencePool(detection_model_name)
+            if not service.wait_ready(settings.INFERENCE_READY_TIMEOUT):
+                logger.warning(f"Inference workers for {detection_model_name} are not ready yet")
+        else:
+            service = ObjectDetectionService(detection_model_name)
+        _detection_services[detection_model_name] = service
+        return service
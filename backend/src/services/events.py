@@ -0,0 +1,288 @@
+"""
+Live detection and alarm events pushed from the streaming pipeline.
+
+The stream publisher hands the detections of each frame to the event bus,
+which evaluates the active alarms of the camera and offers the detections
+and fired alarms to every subscription whose filter matches. Offering only
+appends to the subscription's pending events; the subscriber's own task
+sends them, at most once per EVENTS_TICK_SECONDS, as one message. A slow
+client therefore never blocks the pipeline: once more than
+EVENTS_MAX_PENDING detection events are waiting the oldest are dropped and
+the count is reported with the next message. Alarm events are never dropped.
+
+ROI polygons and alarm regions are flat [x1, y1, x2, y2, ...] lists in
+frame pixels, four values are an axis-aligned box. A detection is inside
+when the centre of its box is.
+"""
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import FrozenSet
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
+
+from ..core.config import settings
+from ..core.metrics import Counter
+from ..core.metrics import Gauge
+from ..db.session import SessionLocal
+from .config_cache import config_cache
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PUBLISHED = Counter("carcara_events_published_total", "Live events offered to subscribers.", ("type",))
+EVENTS_DROPPED = Counter("carcara_events_dropped_total", "Detection events dropped because a subscriber fell behind.")
+EVENT_SUBSCRIBERS = Gauge("carcara_event_subscribers", "Attached live event subscribers.")
+
+EVENT_TYPES = frozenset({"detection", "alarm"})
+
+Polygon = Tuple[Tuple[float, float], ...]
+
+
+def to_polygon(points: Optional[Sequence[float]]) -> Optional[Polygon]:
+    """
+    Convert a flat point list to polygon vertices.
+
+    Returns:
+        The vertices, or None for an empty list, which stands for the whole frame.
+
+    Raises:
+        ValueError: If the list is neither a box nor at least three points.
+    """
+    if not points:
+        return None
+    if len(points) == 4:
+        x1, y1, x2, y2 = points
+        return (x1, y1), (x2, y1), (x2, y2), (x1, y2)
+    if len(points) < 6 or len(points) % 2:
+        raise ValueError(f"A region needs 4 values or at least 3 points, got {len(points)} values")
+    return tuple(zip(points[::2], points[1::2]))
+
+
+def point_in_polygon(x: float, y: float, polygon: Polygon) -> bool:
+    """Even-odd rule test of a point against a polygon."""
+    inside = False
+    x1, y1 = polygon[-1]
+    for x2, y2 in polygon:
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def in_region(detection: Dict[str, Any], polygon: Optional[Polygon]) -> bool:
+    if polygon is None:
+        return True
+    x1, y1, x2, y2 = detection["bbox"]
+    return point_in_polygon((x1 + x2) / 2, (y1 + y2) / 2, polygon)
+
+
+@dataclass(frozen=True)
+class EventFilter:
+    """Server-side filter of a subscription, None matches anything."""
+
+    camera_ids: Optional[FrozenSet[int]] = None
+    class_names: Optional[FrozenSet[str]] = None
+    min_confidence: float = 0.0
+    region: Optional[Polygon] = None
+    types: FrozenSet[str] = EVENT_TYPES
+
+    def matches_camera(self, camera_id: int) -> bool:
+        return self.camera_ids is None or camera_id in self.camera_ids
+
+    def select(self, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the detections that pass the class, confidence and region filters."""
+        return [
+            detection for detection in detections
+            if (self.class_names is None or detection["class_name"] in self.class_names)
+            and detection["confidence"] >= self.min_confidence
+            and in_region(detection, self.region)
+        ]
+
+
+@dataclass(frozen=True)
+class AlarmRule:
+    id: int
+    name: str
+    camera_id: int
+    class_name: Optional[str]
+    confidence_threshold: float
+    region: Optional[Polygon]
+
+    def first_match(self, detections: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        for detection in detections:
+            if ((not self.class_name or detection["class_name"] == self.class_name)
+                    and detection["confidence"] >= self.confidence_threshold
+                    and in_region(detection, self.region)):
+                return detection
+        return None
+
+
+class EventSubscription:
+    """Pending events of one subscriber, collected until its next tick."""
+
+    def __init__(self, event_filter: EventFilter):
+        self.filter = event_filter
+        self._detections: deque = deque()
+        self._alarms: List[Dict[str, Any]] = []
+        self._dropped = 0
+        self._ready = asyncio.Event()
+
+    def offer(self, event: Dict[str, Any]):
+        if event["type"] == "alarm":
+            self._alarms.append(event)
+        else:
+            if len(self._detections) >= settings.EVENTS_MAX_PENDING:
+                self._detections.popleft()
+                self._dropped += 1
+                EVENTS_DROPPED.inc()
+            self._detections.append(event)
+        self._ready.set()
+
+    async def next_batch(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Wait for events and take everything pending as one message.
+
+        Returns:
+            {"type": "events", "events": [...], "dropped": n} with the events
+            in capture order, or None if nothing arrived within the timeout.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+        events = sorted([*self._alarms, *self._detections], key=lambda event: event["timestamp"])
+        self._alarms = []
+        self._detections.clear()
+        dropped, self._dropped = self._dropped, 0
+        return {"type": "events", "events": events, "dropped": dropped}
+
+
+def _read_alarms():
+    db = SessionLocal()
+    try:
+        return config_cache.list(db, "alarm")
+    finally:
+        db.close()
+
+
+class EventBus:
+    """Evaluates alarms on published detections and offers events to the matching subscriptions."""
+
+    def __init__(self):
+        self._subscriptions: Set[EventSubscription] = set()
+        self._alarms: Dict[int, List[AlarmRule]] = {}  # Active rules by camera ID
+        self._alarm_version: Optional[int] = None  # Config cache version the rules were built from
+        self._loading: Optional[asyncio.Task] = None
+        self._fired: Dict[int, float] = {}  # Alarm ID -> when it last fired
+        self._alarm_listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._published = {event_type: EVENTS_PUBLISHED.labels(event_type) for event_type in EVENT_TYPES}
+        EVENT_SUBSCRIBERS.labels().set_function(lambda: len(self._subscriptions))
+
+    def subscribe(self, event_filter: EventFilter) -> EventSubscription:
+        subscription = EventSubscription(event_filter)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: EventSubscription):
+        self._subscriptions.discard(subscription)
+
+    def on_alarm(self, callback: Callable[[Dict[str, Any]], None]):
+        """Call a function with every fired alarm event, on the event loop; it must not block."""
+        self._alarm_listeners.append(callback)
+
+    def wants(self, camera_id: Optional[int]) -> bool:
+        """Whether detections of a camera are needed, for a subscriber or an active alarm."""
+        if camera_id is None:
+            return False
+        self._refresh_alarms()
+        return camera_id in self._alarms or any(
+            subscription.filter.matches_camera(camera_id) for subscription in self._subscriptions
+        )
+
+    def publish_detections(self, camera_id: int, sequence: int, timestamp: float,
+                           detections: List[Dict[str, Any]]):
+        """Evaluate alarms and offer the detections of a frame; called from the event loop, never blocks."""
+        self._refresh_alarms()
+        alarms = self._evaluate_alarms(camera_id, sequence, timestamp, detections)
+        for alarm in alarms:
+            for callback in self._alarm_listeners:
+                try:
+                    callback(alarm)
+                except Exception as e:
+                    logger.error(f"Alarm {alarm['alarm_id']} listener failed: {e}", exc_info=True)
+        for subscription in list(self._subscriptions):
+            event_filter = subscription.filter
+            if not event_filter.matches_camera(camera_id):
+                continue
+            if "detection" in event_filter.types:
+                selected = event_filter.select(detections)
+                if selected:
+                    subscription.offer({
+                        "type": "detection", "camera_id": camera_id, "sequence": sequence,
+                        "timestamp": timestamp, "detections": selected,
+                    })
+                    self._published["detection"].inc()
+            if "alarm" in event_filter.types:
+                for alarm in alarms:
+                    if event_filter.select([alarm["detection"]]):
+                        subscription.offer(alarm)
+                        self._published["alarm"].inc()
+
+    def _evaluate_alarms(self, camera_id: int, sequence: int, timestamp: float,
+                         detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        fired = []
+        for rule in self._alarms.get(camera_id, ()):
+            if timestamp - self._fired.get(rule.id, float("-inf")) < settings.ALARM_COOLDOWN_SECONDS:
+                continue
+            detection = rule.first_match(detections)
+            if detection is None:
+                continue
+            self._fired[rule.id] = timestamp
+            logger.info(f"Alarm {rule.id} ({rule.name}) fired on camera {camera_id}: {detection['class_name']}")
+            fired.append({
+                "type": "alarm", "alarm_id": rule.id, "name": rule.name, "camera_id": camera_id,
+                "sequence": sequence, "timestamp": timestamp, "detection": detection,
+            })
+        return fired
+
+    def _refresh_alarms(self):
+        """Rebuild the rules in the background whenever an alarm was written since they were built."""
+        if self._alarm_version == config_cache.table_version("alarm"):
+            return
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.get_running_loop().create_task(self._load_alarms())
+
+    async def _load_alarms(self):
+        version = config_cache.table_version("alarm")
+        try:
+            alarms = await asyncio.to_thread(_read_alarms)
+        except Exception as e:
+            logger.error(f"Loading alarms failed: {e}", exc_info=True)
+            await asyncio.sleep(settings.ALARM_COOLDOWN_SECONDS)  # Retried on a later frame
+            return
+        rules: Dict[int, List[AlarmRule]] = {}
+        for alarm in alarms:
+            if not alarm.is_active or alarm.camera_id is None:
+                continue
+            try:
+                region = to_polygon(alarm.region_of_interest)
+            except ValueError as e:
+                logger.warning(f"Ignoring alarm {alarm.id}: {e}")
+                continue
+            rules.setdefault(alarm.camera_id, []).append(AlarmRule(
+                alarm.id, alarm.name, alarm.camera_id, alarm.class_name, alarm.confidence_threshold or 0.0, region
+            ))
+        self._alarms = rules
+        self._alarm_version = version
+        logger.debug(f"Loaded {sum(map(len, rules.values()))} active alarms")
+
+
+event_bus = EventBus()
@@ -0,0 +1,203 @@
+"""
+Bulk export of detections.
+
+Rows are read through a server-side cursor EXPORT_BATCH_ROWS at a time, as
+plain tuples instead of ORM objects, and each batch is encoded and handed to
+the response before the next one is fetched, so memory stays flat however
+long the exported range is. The database unpacks the box corners from the
+bbox JSON, and metadata is passed through as JSON text without parsing.
+
+Parquet needs the optional pyarrow package; each batch is written as one
+row group.
+"""
+import csv
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+from sqlalchemy import Select
+from sqlalchemy import Text
+from sqlalchemy import cast
+from sqlalchemy import select
+
+from ..core.config import settings
+from ..db.session import engine
+from ..models.detection import Detection
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = (
+    "id", "timestamp", "camera_id", "stream_id", "frame_number", "model",
+    "class_name", "confidence", "x1", "y1", "x2", "y2",
+)
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def export_statement(camera_id: Optional[int] = None, stream_id: Optional[int] = None,
+                     class_name: Optional[str] = None, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None, min_confidence: Optional[float] = None,
+                     include_metadata: bool = False) -> Select:
+    """Select the export columns of the matching detections in ID order; ``end`` is exclusive."""
+    columns = [
+        Detection.id, Detection.timestamp, Detection.camera_id, Detection.stream_id, Detection.frame_number,
+        Detection.detection_model_name, Detection.class_name, Detection.confidence,
+        *(Detection.bbox[index].as_float() for index in range(4)),
+    ]
+    if include_metadata:
+        columns.append(cast(Detection.detection_metadata, Text))
+    statement = select(*columns).order_by(Detection.id)
+    if camera_id is not None:
+        statement = statement.where(Detection.camera_id == camera_id)
+    if stream_id is not None:
+        statement = statement.where(Detection.stream_id == stream_id)
+    if class_name is not None:
+        statement = statement.where(Detection.class_name == class_name)
+    if start is not None:
+        statement = statement.where(Detection.timestamp >= start)
+    if end is not None:
+        statement = statement.where(Detection.timestamp < end)
+    if min_confidence is not None:
+        statement = statement.where(Detection.confidence >= min_confidence)
+    return statement
+
+
+def _json_string(value: Optional[str], memo: Dict[Optional[str], str]) -> str:
+    # Models and class names repeat on almost every row, encode each once
+    encoded = memo.get(value)
+    if encoded is None:
+        encoded = json.dumps(value)
+        if len(memo) < 4096:
+            memo[value] = encoded
+    return encoded
+
+
+def _json_value(value) -> str:
+    return "null" if value is None else value
+
+
+def encode_ndjson(rows: Sequence[Sequence], include_metadata: bool = False) -> str:
+    """Encode rows as one JSON object per line, with EXPORT_COLUMNS as keys."""
+    memo: Dict[Optional[str], str] = {}
+    lines = []
+    for row in rows:
+        row_id, timestamp, camera_id, stream_id, frame_number, model, class_name, confidence = row[:8]
+        x1, y1, x2, y2 = row[8:12]
+        timestamp = f'"{timestamp.isoformat()}"' if timestamp is not None else "null"
+        line = (
+            f'{{"id":{row_id},"timestamp":{timestamp},'
+            f'"camera_id":{_json_value(camera_id)},"stream_id":{_json_value(stream_id)},'
+            f'"frame_number":{_json_value(frame_number)},"model":{_json_string(model, memo)},'
+            f'"class_name":{_json_string(class_name, memo)},"confidence":{_json_value(confidence)},'
+            f'"x1":{_json_value(x1)},"y1":{_json_value(y1)},"x2":{_json_value(x2)},"y2":{_json_value(y2)}'
+        )
+        if include_metadata:
+            line += f',"metadata":{row[12] or "null"}'
+        lines.append(line + "}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def encode_csv(rows: Sequence[Sequence], include_metadata: bool = False, header: bool = False) -> str:
+    """Encode rows as CSV lines, optionally preceded by the header."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(EXPORT_COLUMNS + (("metadata",) if include_metadata else ()))
+    writer.writerows(
+        (row[0], row[1].isoformat() if row[1] is not None else None, *row[2:])
+        for row in rows
+    )
+    return buffer.getvalue()
+
+
+def _parquet_schema(include_metadata: bool):
+    import pyarrow as pa
+
+    fields = [
+        ("id", pa.int64()), ("timestamp", pa.timestamp("us")), ("camera_id", pa.int32()),
+        ("stream_id", pa.int32()), ("frame_number", pa.int64()), ("model", pa.string()),
+        ("class_name", pa.string()), ("confidence", pa.float32()),
+        ("x1", pa.float32()), ("y1", pa.float32()), ("x2", pa.float32()), ("y2", pa.float32()),
+    ]
+    if include_metadata:
+        fields.append(("metadata", pa.string()))
+    return pa.schema(fields)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what the Parquet writer produced since the last take()."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _partitions(statement: Select, batch_rows: int) -> Iterator[List]:
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_rows).execute(statement)
+        yield from result.partitions()
+
+
+def export_detections(statement: Select, format: str, include_metadata: bool = False,
+                      batch_rows: int = settings.EXPORT_BATCH_ROWS) -> Iterator[bytes]:
+    """
+    Stream the rows of an export statement encoded as NDJSON, CSV or Parquet.
+
+    Meant to be iterated by the response from a worker thread; the database
+    connection is held until the iteration ends.
+    """
+    started = time.perf_counter()
+    exported = 0
+    if format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = _parquet_schema(include_metadata)
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+            for rows in _partitions(statement, batch_rows):
+                columns = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+                ), row_group_size=len(rows))
+                exported += len(rows)
+                yield sink.take()
+        yield sink.take()
+    else:
+        if format == "csv":
+            yield encode_csv([], include_metadata, header=True).encode()
+        for rows in _partitions(statement, batch_rows):
+            if format == "csv":
+                yield encode_csv(rows, include_metadata).encode()
+            else:
+                yield encode_ndjson(rows, include_metadata).encode()
+            exported += len(rows)
+    elapsed = time.perf_counter() - started
+    logger.info(f"Exported {exported} detections as {format} in {elapsed:.1f}s")
@@ -0,0 +1,316 @@
+import asyncio
+import logging
+import struct
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sample flags bit marking a sample that is not a sync (key) frame
+SAMPLE_IS_NON_SYNC = 0x00010000
+
+
+def iter_boxes(data: bytes, offset: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    Iterate over the ISO BMFF boxes in a buffer.
+
+    Args:
+        data: Buffer containing whole boxes
+        offset: Position of the first box
+        end: Position after the last box (default: end of buffer)
+
+    Yields:
+        (box type, payload start, box end) tuples.
+    """
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _find_box(data: bytes, box_type: bytes, offset: int, end: int) -> Optional[Tuple[int, int]]:
+    for found_type, start, stop in iter_boxes(data, offset, end):
+        if found_type == box_type:
+            return start, stop
+    return None
+
+
+def fragment_starts_with_keyframe(fragment: bytes) -> bool:
+    """
+    Tell whether a moof+mdat fragment starts with a sync sample.
+
+    Looks at the first track fragment's trun first-sample flags, the first
+    sample's own flags, or the tfhd default sample flags, in that order.
+    """
+    moof = _find_box(fragment, b"moof", 0, len(fragment))
+    if moof is None:
+        return False
+    traf = _find_box(fragment, b"traf", *moof)
+    if traf is None:
+        return False
+
+    default_flags = None
+    tfhd = _find_box(fragment, b"tfhd", *traf)
+    if tfhd is not None:
+        tf_flags = struct.unpack_from(">I", fragment, tfhd[0])[0] & 0xFFFFFF
+        pos = tfhd[0] + 8  # version/flags and track_ID
+        pos += 8 if tf_flags & 0x01 else 0  # base_data_offset
+        pos += 4 if tf_flags & 0x02 else 0  # sample_description_index
+        pos += 4 if tf_flags & 0x08 else 0  # default_sample_duration
+        pos += 4 if tf_flags & 0x10 else 0  # default_sample_size
+        if tf_flags & 0x20:
+            default_flags = struct.unpack_from(">I", fragment, pos)[0]
+
+    sample_flags = default_flags
+    trun = _find_box(fragment, b"trun", *traf)
+    if trun is not None:
+        tr_flags = struct.unpack_from(">I", fragment, trun[0])[0] & 0xFFFFFF
+        pos = trun[0] + 8  # version/flags and sample_count
+        pos += 4 if tr_flags & 0x001 else 0  # data_offset
+        if tr_flags & 0x004:
+            sample_flags = struct.unpack_from(">I", fragment, pos)[0]
+        elif tr_flags & 0x400:
+            pos += 4 if tr_flags & 0x100 else 0  # sample_duration
+            pos += 4 if tr_flags & 0x200 else 0  # sample_size
+            sample_flags = struct.unpack_from(">I", fragment, pos)[0]
+
+    if sample_flags is None:
+        return False
+    return not sample_flags & SAMPLE_IS_NON_SYNC
+
+
+def codec_mime_type(init_segment: bytes) -> str:
+    """
+    Build the Media Source Extensions MIME type for an H.264 init segment.
+
+    The RFC 6381 codec string comes from the profile, compatibility and level
+    bytes of the avcC configuration record.
+    """
+    index = init_segment.find(b"avcC")
+    if index < 0 or index + 8 > len(init_segment):
+        return 'video/mp4; codecs="avc1.42e01e"'
+    profile, compatibility, level = init_segment[index + 5:index + 8]
+    return f'video/mp4; codecs="avc1.{profile:02x}{compatibility:02x}{level:02x}"'
+
+
+class Fmp4Subscriber:
+    """A viewer receiving fMP4 segments through a bounded queue."""
+
+    def __init__(self, maxsize: int = settings.FMP4_SUBSCRIBER_QUEUE_SIZE):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.waiting_keyframe = False
+
+    def offer(self, fragment: bytes, is_keyframe: bool):
+        """
+        Queue a fragment without blocking the remuxer.
+
+        A viewer that falls behind loses its backlog and resumes at the next
+        keyframe fragment, since fMP4 fragments cannot be dropped
+        individually without breaking the decoder.
+        """
+        if self.waiting_keyframe:
+            if not is_keyframe:
+                return
+            self.waiting_keyframe = False
+        try:
+            self.queue.put_nowait(fragment)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.waiting_keyframe = True
+            if is_keyframe:
+                self.offer(fragment, is_keyframe)
+
+    def reset(self, init_segment: bytes):
+        """Drop the backlog and re-initialise the viewer's decoder at the next keyframe."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(init_segment)
+        self.waiting_keyframe = True
+
+    def close(self):
+        """Drop the backlog and queue None, on which the viewer is disconnected."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class Fmp4StreamManager:
+    """
+    Remuxes an RTSP camera's H.264 into fragmented MP4 without transcoding.
+
+    One ffmpeg process per URL copies the video track into fMP4 fragments.
+    The init segment and the fragments of the latest GOP are cached, so a new
+    viewer gets a decodable stream immediately, starting at a keyframe.
+    """
+
+    def __init__(self, rtsp_url: str, camera_id: Optional[int] = None):
+        self.rtsp_url = rtsp_url
+        self.camera_id = camera_id
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.reader: Optional[asyncio.Task] = None
+        self.subscribers: List[Fmp4Subscriber] = []
+        self.init_segment: Optional[bytes] = None
+        self.mime_type: Optional[str] = None
+        self.gop: List[bytes] = []
+        self.init_ready = asyncio.Event()
+        self.status = "stopped"
+        self._transition = asyncio.Lock()  # Serialises start_stream and stop_stream
+
+    def _reset(self):
+        """Forget the cached init segment and GOP, they belong to the previous ffmpeg run."""
+        self.init_segment = None
+        self.mime_type = None
+        self.gop = []
+        self.init_ready.clear()
+
+    def _command(self) -> List[str]:
+        return [
+            settings.FFMPEG_BINARY,
+            "-hide_banner", "-loglevel", "error",
+            "-rtsp_transport", settings.RTSP_TRANSPORT,
+            "-fflags", "nobuffer", "-flags", "low_delay",
+            "-i", self.rtsp_url,
+            "-map", "0:v:0", "-c:v", "copy", "-an",
+            "-f", "mp4",
+            "-movflags", "empty_moov+default_base_moof+frag_keyframe",
+            "-frag_duration", str(settings.FMP4_FRAGMENT_DURATION_MS * 1000),
+            "pipe:1",
+        ]
+
+    async def start_stream(self):
+        """Start the remuxing task unless it is already running, after a stop in progress has finished."""
+        async with self._transition:
+            if self.reader is None or self.reader.done():
+                self._reset()
+                self.status = "started"
+                self.reader = asyncio.create_task(self._run())
+
+    async def stop_stream(self):
+        """Stop ffmpeg, drop all subscribers and wait until the remuxing task has ended."""
+        async with self._transition:
+            self.status = "stopped"
+            self.subscribers = []
+            reader, self.reader = self.reader, None
+            if reader is not None and reader is not asyncio.current_task():
+                reader.cancel()
+                await asyncio.wait({reader})  # Does not raise the reader's CancelledError into the caller
+            await self._terminate()
+            self._reset()
+
+    async def _terminate(self):
+        process, self.process = self.process, None
+        if process is not None and process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                process.kill()
+
+    async def _read_box(self, stdout: asyncio.StreamReader) -> Tuple[bytes, bytes]:
+        header = await stdout.readexactly(8)
+        size, box_type = struct.unpack(">I4s", header)
+        if size == 1:
+            extended = await stdout.readexactly(8)
+            header += extended
+            size = struct.unpack(">Q", extended)[0]
+        return box_type, header + await stdout.readexactly(size - len(header))
+
+    async def _run(self):
+        """Run ffmpeg, reconnecting with exponential backoff while viewers remain."""
+        delay = settings.RTSP_RECONNECT_INITIAL_DELAY
+        while self.status == "started":
+            self.process = await asyncio.create_subprocess_exec(
+                *self._command(),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            try:
+                received = await self._read_fragments(self.process.stdout)
+            finally:
+                await self._terminate()
+            if self.status != "started":
+                break
+            if received:
+                delay = settings.RTSP_RECONNECT_INITIAL_DELAY
+            logger.warning(f"fMP4 remuxer for {self.rtsp_url} exited, restarting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.RTSP_RECONNECT_MAX_DELAY)
+
+    async def _read_fragments(self, stdout: asyncio.StreamReader) -> int:
+        """Publish the output of one ffmpeg run, returning how many init segments and fragments it had."""
+        init_parts = []
+        pending = b""
+        received = 0
+        while True:
+            try:
+                box_type, box = await self._read_box(stdout)
+            except asyncio.IncompleteReadError:
+                return received
+            if box_type in (b"ftyp", b"moov"):
+                init_parts.append(box)
+                if box_type == b"moov":
+                    self._set_init_segment(b"".join(init_parts), restarted=received == 0)
+                    init_parts = []
+                    received += 1
+            elif box_type == b"mdat":
+                self._publish(pending + box)
+                pending = b""
+                received += 1
+            else:
+                # moof and any styp/sidx/prft prefix belong to the next fragment
+                pending += box
+
+    def _set_init_segment(self, init_segment: bytes, restarted: bool = False):
+        if self.init_segment is not None and (restarted or init_segment != self.init_segment):
+            # A new ffmpeg run starts its decode times over, even with identical init bytes, and the
+            # upstream may have changed (e.g. reconnect with a new SPS), so viewers must re-initialise
+            for subscriber in self.subscribers:
+                subscriber.reset(init_segment)
+        self.init_segment = init_segment
+        self.mime_type = codec_mime_type(init_segment)
+        self.gop = []
+        self.init_ready.set()
+
+    def _publish(self, fragment: bytes):
+        is_keyframe = fragment_starts_with_keyframe(fragment)
+        if is_keyframe:
+            self.gop = [fragment]
+        elif self.gop:
+            self.gop.append(fragment)
+        for subscriber in self.subscribers:
+            subscriber.offer(fragment, is_keyframe)
+
+    def add_subscriber(self) -> Fmp4Subscriber:
+        """
+        Attach a viewer, preloading its queue with the cached GOP.
+
+        The caller sends the init segment first; nothing awaits between taking
+        the GOP snapshot and registering, so no live fragment is missed.
+        """
+        subscriber = Fmp4Subscriber()
+        for index, fragment in enumerate(self.gop):
+            subscriber.offer(fragment, index == 0)
+        if not self.gop:
+            subscriber.waiting_keyframe = True
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    async def remove_subscriber(self, subscriber: Fmp4Subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+        if not self.subscribers:
+            await self.stop_stream()
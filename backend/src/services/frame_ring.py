@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+
+from ..core.config import settings
+
+
+class FrameSlot:
+    """A preallocated frame buffer and the metadata of the frame it holds."""
+
+    __slots__ = ("index", "array", "sequence", "timestamp", "refs")
+
+    def __init__(self, index: int, array: np.ndarray):
+        self.index = index
+        self.array = array
+        self.sequence = 0
+        self.timestamp = 0.0
+        self.refs = 0
+
+
+class FrameRing:
+    """
+    Fixed set of reference-counted frame buffers for one camera.
+
+    Capture decodes straight into a free slot (``cap.read(image=slot.array)``),
+    then publishes it as the latest frame. Consumers take a reference to the
+    latest slot and read its array in place, so a frame is never copied
+    between capture, inference and encoding, and memory per camera stays at
+    ``size`` frames. A slot is only rewritten once every reference to it has
+    been released.
+    """
+
+    def __init__(self, size: int = settings.FRAME_RING_SIZE):
+        self.size = size
+        self.slots: List[FrameSlot] = []
+        self.latest: Optional[FrameSlot] = None
+        self.drops = 0
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._lock = Lock()
+
+    def _allocate(self, shape: Tuple[int, ...], dtype: np.dtype):
+        self._shape = shape
+        self.latest = None
+        self.slots = [FrameSlot(index, np.empty(shape, dtype=dtype)) for index in range(self.size)]
+
+    def acquire_write(self, shape: Tuple[int, ...], dtype: np.dtype = np.uint8) -> Optional[FrameSlot]:
+        """
+        Take a free slot to write the next frame into.
+
+        The buffers are (re)allocated when the frame shape changes and no
+        slot is referenced.
+
+        Returns:
+            The slot, holding one reference for the writer, or None when every
+            slot is still referenced by a consumer (the frame should be dropped).
+        """
+        with self._lock:
+            if shape != self._shape and not any(slot.refs for slot in self.slots):
+                self._allocate(shape, dtype)
+            # Reuse the free slot holding the oldest frame
+            free = [slot for slot in self.slots if slot.refs == 0 and slot is not self.latest]
+            if not free or shape != self._shape:
+                self.drops += 1
+                return None
+            slot = min(free, key=lambda candidate: candidate.sequence)
+            slot.refs = 1
+            return slot
+
+    def publish(self, slot: FrameSlot, sequence: int, timestamp: float):
+        """
+        Make a written slot the latest frame.
+
+        The writer's reference becomes a read reference, release it once done
+        with the frame.
+        """
+        with self._lock:
+            slot.sequence = sequence
+            slot.timestamp = timestamp
+            self.latest = slot
+
+    def acquire_latest(self) -> Optional[FrameSlot]:
+        """Take a reference to the latest frame, or None if there is none yet."""
+        with self._lock:
+            slot = self.latest
+            if slot is not None:
+                slot.refs += 1
+            return slot
+
+    def release(self, slot: FrameSlot):
+        with self._lock:
+            slot.refs -= 1
+
+    @contextmanager
+    def latest_frame(self) -> Iterator[Optional[FrameSlot]]:
+        """Hold the latest frame for the duration of the block."""
+        slot = self.acquire_latest()
+        try:
+            yield slot
+        finally:
+            if slot is not None:
+                self.release(slot)
@@ -0,0 +1,230 @@
+"""
+Incremental occupancy heatmaps per camera and class.
+
+Each box adds its weight, the seconds of video the detection stands for,
+to the cells of a HEATMAP_ROWS x HEATMAP_COLUMNS grid that it covers, in
+place and in frame-relative coordinates. A cell therefore holds object
+seconds whatever the detection rate or frame size. Every box goes into the
+grid of its UTC hour and of its UTC day, so a heatmap for any range is the
+sum of at most 46 hourly grids at its edges plus one daily grid per whole
+day in between.
+
+Grids are checkpointed every HEATMAP_FLUSH_SECONDS as .npy files named
+after their bucket and the writing process, e.g. 7/person/h493400-host-12.npy,
+so several workers never overwrite each other and a query sums the files
+of every writer. Grids not written to during a checkpoint interval are
+dropped from memory, and reloaded from their file if their bucket is
+written to again.
+"""
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+GridKey = Tuple[int, str, str, int]  # (camera_id, class_name, "h" or "d", bucket)
+
+
+def plan_buckets(start: float, end: float) -> Tuple[List[int], List[int]]:
+    """
+    Cover [start, end) with whole days where possible and hours at the edges.
+
+    The range is widened to whole hours.
+
+    Returns:
+        (hours, days) as bucket numbers since the epoch.
+    """
+    hour = int(start // HOUR)
+    end_hour = -int(-end // HOUR)
+    hours, days = [], []
+    while hour < end_hour:
+        if hour % 24 == 0 and hour + 24 <= end_hour:
+            days.append(hour // 24)
+            hour += 24
+        else:
+            hours.append(hour)
+            hour += 1
+    return hours, days
+
+
+def _box_cells(bbox: Sequence[float], frame_size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """Return the grid rows and columns covered by a box as (row0, row1, column0, column1), end exclusive."""
+    width, height = frame_size
+    x1, y1, x2, y2 = bbox
+    columns, rows = settings.HEATMAP_COLUMNS, settings.HEATMAP_ROWS
+    column0 = min(max(int(x1 / width * columns), 0), columns - 1)
+    column1 = min(max(math.ceil(x2 / width * columns), column0 + 1), columns)
+    row0 = min(max(int(y1 / height * rows), 0), rows - 1)
+    row1 = min(max(math.ceil(y2 / height * rows), row0 + 1), rows)
+    return row0, row1, column0, column1
+
+
+def render_heatmap(grid: np.ndarray, width: int, height: int, background: Optional[np.ndarray] = None) -> bytes:
+    """
+    Render a grid as a PNG, log scaled so short visits stay visible next to busy spots.
+
+    Without a background the PNG is a transparent overlay whose opacity
+    follows the intensity; with one the colours are blended onto it.
+    """
+    peak = float(grid.max())
+    intensity = np.log1p(grid) / np.log1p(peak) if peak > 0 else np.zeros_like(grid)
+    intensity = cv2.resize(intensity.astype(np.float32), (width, height), interpolation=cv2.INTER_CUBIC)
+    intensity = np.clip(intensity, 0.0, 1.0)
+    colours = cv2.applyColorMap((intensity * 255).astype(np.uint8), cv2.COLORMAP_JET)
+    alpha = (intensity * settings.HEATMAP_MAX_OPACITY)[..., None]
+    if background is None:
+        image = np.dstack([colours, (alpha[..., 0] * 255).astype(np.uint8)])
+    else:
+        background = cv2.resize(background, (width, height), interpolation=cv2.INTER_AREA)
+        image = (background * (1 - alpha) + colours * alpha).astype(np.uint8)
+    _, buffer = cv2.imencode(".png", image)
+    return buffer.tobytes()
+
+
+class HeatmapStore:
+    """In-memory accumulators of the current buckets, checkpointed to HEATMAPS_DIR."""
+
+    def __init__(self, directory: str = settings.HEATMAPS_DIR):
+        self.directory = directory
+        self.writer = f"{socket.gethostname()}-{os.getpid()}"
+        self._grids: Dict[GridKey, np.ndarray] = {}
+        self._dirty: Set[GridKey] = set()
+        self._last_pass: Dict[int, float] = {}  # Camera ID -> time of its previous live detection pass
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # A grid is evicted only once its last checkpoint is on disk
+        self._thread: Optional[threading.Thread] = None
+
+    def _path(self, key: GridKey) -> str:
+        camera_id, class_name, kind, bucket = key
+        return os.path.join(
+            self.directory, str(camera_id), class_name.replace(os.sep, "_"), f"{kind}{bucket}-{self.writer}.npy"
+        )
+
+    def _grid(self, key: GridKey) -> np.ndarray:
+        grid = self._grids.get(key)
+        if grid is None:
+            path = self._path(key)
+            if os.path.exists(path):
+                grid = np.load(path)
+            else:
+                grid = np.zeros((settings.HEATMAP_ROWS, settings.HEATMAP_COLUMNS), dtype=np.float32)
+            self._grids[key] = grid
+        return grid
+
+    def add(self, camera_id: int, timestamp: float, frame_size: Tuple[int, int],
+            boxes: Iterable[Tuple[str, Sequence[float]]], weight: float):
+        """
+        Accumulate boxes of one frame.
+
+        Args:
+            timestamp: Capture time in seconds since the epoch
+            frame_size: (width, height) the boxes are relative to
+            boxes: (class_name, [x1, y1, x2, y2]) pairs
+            weight: Seconds of video the frame stands for
+        """
+        hour, day = int(timestamp // HOUR), int(timestamp // DAY)
+        with self._lock:
+            for class_name, bbox in boxes:
+                row0, row1, column0, column1 = _box_cells(bbox, frame_size)
+                for key in ((camera_id, class_name, "h", hour), (camera_id, class_name, "d", day)):
+                    self._grid(key)[row0:row1, column0:column1] += weight
+                    self._dirty.add(key)
+        self._ensure_thread()
+
+    def add_detections(self, camera_id: int, timestamp: float, frame_shape: Tuple[int, ...],
+                       detections: List[Dict[str, Any]]):
+        """Accumulate a live detection pass, weighted by the time since the camera's previous pass."""
+        previous = self._last_pass.get(camera_id)
+        self._last_pass[camera_id] = timestamp
+        if previous is None or not detections:
+            return
+        weight = min(max(timestamp - previous, 0.0), settings.HEATMAP_MAX_WEIGHT)
+        height, width = frame_shape[:2]
+        self.add(camera_id, timestamp, (width, height),
+                 ((detection["class_name"], detection["bbox"]) for detection in detections), weight)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="heatmap-checkpoint", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.HEATMAP_FLUSH_SECONDS)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Heatmap checkpoint failed: {e}", exc_info=True)
+
+    def flush(self):
+        """Write the grids changed since the last checkpoint and drop the idle ones from memory."""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                grids = {key: self._grids[key].copy() for key in dirty}
+                for key in list(self._grids):
+                    if key not in dirty:
+                        del self._grids[key]
+            for key, grid in grids.items():
+                path = self._path(key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temporary = f"{path}.tmp"
+                with open(temporary, "wb") as file:
+                    np.save(file, grid)
+                os.replace(temporary, path)  # Readers never see a partly written grid
+        if grids:
+            logger.debug(f"Checkpointed {len(grids)} heatmap grids")
+
+    def classes(self, camera_id: int) -> List[str]:
+        directory = os.path.join(self.directory, str(camera_id))
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def query(self, camera_id: int, start: float, end: float, class_name: Optional[str] = None) -> np.ndarray:
+        """
+        Sum the checkpointed grids of every writer covering [start, end), widened to whole hours.
+
+        Grids of this process are checkpointed first; those of other workers
+        may lag by up to HEATMAP_FLUSH_SECONDS.
+        """
+        self.flush()
+        hours, days = plan_buckets(start, end)
+        wanted = {("h", hour) for hour in hours} | {("d", day) for day in days}
+        total = np.zeros((settings.HEATMAP_ROWS, settings.HEATMAP_COLUMNS), dtype=np.float64)
+        files: Dict[str, int] = defaultdict(int)
+        for name in [class_name] if class_name is not None else self.classes(camera_id):
+            directory = os.path.join(self.directory, str(camera_id), name.replace(os.sep, "_"))
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                bucket, _, rest = entry.name.partition("-")
+                if not rest.endswith(".npy") or not bucket[1:].isdigit() or (bucket[0], int(bucket[1:])) not in wanted:
+                    continue
+                grid = np.load(entry.path)
+                if grid.shape == total.shape:
+                    total += grid
+                    files[bucket[0]] += 1
+        logger.debug(f"Heatmap of camera {camera_id} summed {files['h']} hourly and {files['d']} daily grids")
+        return total
+
+
+heatmap_store = HeatmapStore()
@@ -0,0 +1,381 @@
+import atexit
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from multiprocessing.connection import wait
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import Gauge
+from ..core.tracing import span
+from .detection import INFERENCE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_IN_FLIGHT = Gauge(
+    "carcara_inference_in_flight", "Frames queued or running in inference workers.", ("model",)
+)
+INFERENCE_FREE_SLOTS = Gauge(
+    "carcara_inference_free_slots", "Free shared memory frame slots of the inference pool.", ("model",)
+)
+
+
+def parse_cpu_sets(spec: Optional[str], workers: int) -> List[Set[int]]:
+    """
+    Split CPUs between inference workers.
+
+    Args:
+        spec: Explicit per-worker CPU lists separated by ";" with ranges,
+            e.g. "0-3;4-7". When empty the CPUs this process may run on are
+            divided evenly.
+        workers: Number of workers
+
+    Returns:
+        One CPU set per worker.
+    """
+    if spec:
+        cpu_sets = []
+        for group in spec.split(";"):
+            cpus = set()
+            for part in group.split(","):
+                first, _, last = part.strip().partition("-")
+                cpus.update(range(int(first), int(last or first) + 1))
+            cpu_sets.append(cpus)
+        return [cpu_sets[index % len(cpu_sets)] for index in range(workers)]
+
+    available = sorted(os.sched_getaffinity(0))
+    size = max(len(available) // workers, 1)
+    return [
+        set(available[(index * size) % len(available):][:size]) or set(available)
+        for index in range(workers)
+    ]
+
+
+def _worker_main(generation: int, detection_model_name: str, cpus: Set[int], slot_names: List[str],
+                 tasks: mp.Queue, results: Connection):
+    """
+    Inference worker: detect on frames handed over through shared memory slots.
+
+    Args:
+        generation: Unique number of this worker process, reported with "ready"
+        results: Write end of the worker's own pipe, a crash while writing cannot block other workers
+    """
+    os.sched_setaffinity(0, cpus)
+    import cv2
+    import torch
+
+    from .detection import ObjectDetectionService
+
+    torch.set_num_threads(len(cpus))
+    cv2.setNumThreads(1)
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    service = ObjectDetectionService(detection_model_name)
+    results.send(("ready", generation, dict(service.class_names)))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        request_id, slot, shape, dtype = task
+        frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=slots[slot].buf)
+        try:
+            results.send(("result", request_id, service.detect(frame)))
+        except Exception as e:
+            results.send(("error", request_id, str(e)))
+        del frame
+
+    for shm in slots:
+        shm.close()
+
+
+class _Request:
+    __slots__ = ("future", "slot", "shape", "dtype", "worker", "generation", "attempts", "submitted")
+
+    def __init__(self, future: Future, slot: int, shape: tuple, dtype: str):
+        self.future = future
+        self.slot = slot
+        self.shape = shape
+        self.dtype = dtype
+        self.worker: Optional[int] = None
+        self.generation: Optional[int] = None  # Worker process it was sent to, None while no worker is alive
+        self.attempts = 0
+        self.submitted = time.perf_counter()
+
+
+class InferencePool:
+    """
+    Runs ObjectDetectionService in separate worker processes.
+
+    Each worker is pinned to its own CPU subset so PyTorch threads do not
+    compete with capture, encoding and request handling in the server
+    process. Frames are copied once into preallocated shared memory slots
+    and only the slot index travels through the task queue, so no frame is
+    pickled. Each worker answers through its own pipe, as a process that
+    dies while writing to a shared queue leaves its lock held for the
+    others. A supervisor thread hands the in-flight requests of a crashed
+    worker, whose frames are still in their slots, to the remaining workers
+    and restarts it after a delay that doubles up to
+    INFERENCE_RESTART_MAX_DELAY while it keeps crashing before it is ready.
+    Requests are matched to worker processes by generation, a number unique
+    to each started process, so a restarted worker's new requests are never
+    taken for the crashed one's.
+
+    The pool exposes the same detect() interface as ObjectDetectionService.
+    """
+
+    _worker_target = staticmethod(_worker_main)  # Run in each worker process
+
+    def __init__(
+        self,
+        detection_model_name: str = settings.DEFAULT_MODEL,
+        workers: int = settings.INFERENCE_WORKERS,
+        slots_per_worker: int = settings.INFERENCE_SLOTS_PER_WORKER,
+        max_frame_bytes: int = settings.INFERENCE_MAX_FRAME_BYTES,
+    ):
+        self.detection_model_name = detection_model_name
+        self.workers = workers
+        self.max_frame_bytes = max_frame_bytes
+        self._class_names: Dict[int, str] = {}
+        self._context = mp.get_context("spawn")
+        self._cpu_sets = parse_cpu_sets(settings.INFERENCE_WORKER_CPUS, workers)
+        self._slots = [
+            shared_memory.SharedMemory(create=True, size=max_frame_bytes)
+            for _ in range(workers * slots_per_worker)
+        ]
+        self._free_slots: queue.Queue = queue.Queue()
+        for slot in range(len(self._slots)):
+            self._free_slots.put(slot)
+
+        self._result_readers: Set[Connection] = set()  # Pipes of live and crashed workers, until drained
+        self._processes: List[Optional[mp.Process]] = [None] * workers
+        self._task_queues: List[Optional[mp.Queue]] = [None] * workers
+        self._generations: List[Optional[int]] = [None] * workers
+        self._restart_delays = [settings.INFERENCE_RESTART_INITIAL_DELAY] * workers
+        self._restart_at = [0.0] * workers  # Monotonic time a dead worker may be started again
+        self._started_generations = itertools.count()
+        self._in_flight: Dict[int, _Request] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._ready = threading.Event()
+        self._closed = threading.Event()
+        self._inference_seconds = INFERENCE_SECONDS.labels(detection_model_name, "pool")
+        INFERENCE_IN_FLIGHT.labels(detection_model_name).set_function(lambda: len(self._in_flight))
+        INFERENCE_FREE_SLOTS.labels(detection_model_name).set_function(self._free_slots.qsize)
+
+        for index in range(workers):
+            self._start_worker(index)
+        threading.Thread(target=self._collect_results, name="inference-results", daemon=True).start()
+        threading.Thread(target=self._supervise, name="inference-supervisor", daemon=True).start()
+        atexit.register(self.close)
+
+    def _start_worker(self, index: int):
+        """Start the process of a worker slot and send it the requests waiting for a live worker."""
+        generation = next(self._started_generations)
+        tasks = self._context.Queue()
+        reader, writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=self._worker_target,
+            args=(
+                generation,
+                self.detection_model_name,
+                self._cpu_sets[index],
+                [shm.name for shm in self._slots],
+                tasks,
+                writer,
+            ),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        writer.close()  # Only the worker holds the write end, so its exit ends the pipe
+        with self._lock:
+            self._result_readers.add(reader)
+            self._processes[index] = process
+            self._task_queues[index] = tasks
+            self._generations[index] = generation
+            for request_id, request in self._in_flight.items():
+                if request.generation is None:
+                    self._dispatch(request_id, request)
+        logger.info(
+            f"Started inference worker {index} generation {generation} (pid {process.pid}) "
+            f"on CPUs {sorted(self._cpu_sets[index])}"
+        )
+
+    def _dispatch(self, request_id: int, request: _Request):
+        """
+        Send a request to the live worker with the fewest requests in flight. Caller holds the lock.
+
+        Without a live worker the request waits in _in_flight until _start_worker sends it.
+        """
+        load = {index: 0 for index, process in enumerate(self._processes) if process and process.is_alive()}
+        if not load:
+            request.worker = request.generation = None
+            return
+        for pending in self._in_flight.values():
+            if pending.worker in load and pending.generation is not None:
+                load[pending.worker] += 1
+        worker = min(load, key=load.get)
+        request.worker = worker
+        request.generation = self._generations[worker]
+        request.attempts += 1
+        self._task_queues[worker].put((request_id, request.slot, request.shape, request.dtype))
+
+    def submit(self, frame: np.ndarray) -> Future:
+        """
+        Queue a frame for detection.
+
+        Blocks while every shared memory slot is in use.
+
+        Returns:
+            A future resolving to the detections of the frame.
+        """
+        if frame.nbytes > self.max_frame_bytes:
+            raise ValueError(f"Frame of {frame.nbytes} bytes exceeds INFERENCE_MAX_FRAME_BYTES")
+        slot = self._free_slots.get()
+        view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._slots[slot].buf)
+        view[...] = frame
+        del view
+
+        future: Future = Future()
+        request = _Request(future, slot, frame.shape, frame.dtype.str)
+        with self._lock:
+            request_id = next(self._ids)
+            self._in_flight[request_id] = request
+            self._dispatch(request_id, request)
+        return future
+
+    def detect(self, frame: np.ndarray) -> List[Dict[str, Any]]:
+        """Perform object detection on a single frame in a worker process."""
+        with span("detect", model=self.detection_model_name, backend="pool"):
+            return self.submit(frame).result()
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """Perform object detection on several frames, spread over the worker processes."""
+        with span("detect_batch", model=self.detection_model_name, backend="pool", frames=len(frames)):
+            futures = [self.submit(frame) for frame in frames]
+            return [future.result() for future in futures]
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until a worker has loaded the model and reported the class names."""
+        return self._ready.wait(timeout)
+
+    @property
+    def class_names(self) -> Dict[int, str]:
+        """Return the class ID to class name mapping, waiting up to INFERENCE_READY_TIMEOUT for a worker."""
+        if not self._ready.wait(settings.INFERENCE_READY_TIMEOUT):
+            raise RuntimeError(f"No inference worker for {self.detection_model_name} has loaded the model")
+        return self._class_names
+
+    def _finish(self, request_id: int) -> Optional[_Request]:
+        with self._lock:
+            request = self._in_flight.pop(request_id, None)
+        if request is not None:
+            self._free_slots.put(request.slot)
+        return request
+
+    def _collect_results(self):
+        while not self._closed.is_set():
+            with self._lock:
+                readers = list(self._result_readers)
+            if not readers:
+                self._closed.wait(settings.INFERENCE_SUPERVISE_INTERVAL)
+                continue
+            for reader in wait(readers, timeout=settings.INFERENCE_SUPERVISE_INTERVAL):
+                try:
+                    message = reader.recv()
+                except (EOFError, OSError):
+                    with self._lock:
+                        self._result_readers.discard(reader)
+                    reader.close()
+                    continue
+                self._handle_result(*message)
+
+    def _handle_result(self, kind: str, key: int, payload: Any):
+        if kind == "ready":
+            self._class_names = payload
+            self._ready.set()
+            with self._lock:
+                for index, generation in enumerate(self._generations):
+                    if generation == key:
+                        # Loaded the model, a later crash restarts it without delay again
+                        self._restart_delays[index] = settings.INFERENCE_RESTART_INITIAL_DELAY
+            return
+        request = self._finish(key)
+        if request is None:
+            return  # Answered twice after a reroute
+        if kind == "result":
+            # Includes the wait for a worker, which is what callers experience
+            self._inference_seconds.observe(time.perf_counter() - request.submitted)
+            request.future.set_result(payload)
+        else:
+            request.future.set_exception(RuntimeError(payload))
+
+    def _supervise(self):
+        while not self._closed.wait(settings.INFERENCE_SUPERVISE_INTERVAL):
+            for index, process in enumerate(self._processes):
+                if self._closed.is_set():
+                    break
+                if process is not None and not process.is_alive():
+                    delay = self._restart_delays[index]
+                    logger.error(
+                        f"Inference worker {index} exited with code {process.exitcode}, restarting in {delay:.1f}s"
+                    )
+                    with self._lock:
+                        self._processes[index] = None
+                        dead_generation = self._generations[index]
+                        self._restart_delays[index] = min(delay * 2, settings.INFERENCE_RESTART_MAX_DELAY)
+                    self._restart_at[index] = time.monotonic() + delay
+                    self._reroute(dead_generation)
+                if self._processes[index] is None and time.monotonic() >= self._restart_at[index]:
+                    self._start_worker(index)
+
+    def _reroute(self, dead_generation: int):
+        """Hand the requests of a crashed worker process to the live workers."""
+        failed = []
+        with self._lock:
+            for request_id, request in self._in_flight.items():
+                if request.generation != dead_generation:
+                    continue
+                if request.attempts >= settings.INFERENCE_MAX_ATTEMPTS:
+                    failed.append(request_id)
+                else:
+                    self._dispatch(request_id, request)
+        for request_id in failed:
+            request = self._finish(request_id)
+            if request is not None:
+                request.future.set_exception(RuntimeError("Inference worker crashed on this frame"))
+
+    def close(self):
+        """Stop the workers and release the shared memory slots."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        for tasks in self._task_queues:
+            if tasks is not None:
+                tasks.put(None)
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        with self._lock:
+            pending = list(self._in_flight.values())
+            self._in_flight.clear()
+        for request in pending:
+            request.future.set_exception(RuntimeError("Inference pool closed"))
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,44 @@
+from collections import deque
+from threading import Lock
+from typing import Deque
+from typing import List
+from typing import Tuple
+
+from ..core.config import settings
+
+
+class PrerollBuffer:
+    """
+    Recent JPEG frames of one camera, bounded by age and total size.
+
+    The stream publisher appends the JPEG it already encoded for viewers, so
+    keeping the pre-roll costs no extra encoding and only compressed bytes
+    are held in memory.
+    """
+
+    def __init__(self, max_seconds: float = settings.PREROLL_SECONDS, max_bytes: int = settings.PREROLL_MAX_BYTES):
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._frames: Deque[Tuple[float, bytes]] = deque()
+        self._lock = Lock()
+
+    def append(self, timestamp: float, jpeg: bytes):
+        with self._lock:
+            self._frames.append((timestamp, jpeg))
+            self.size += len(jpeg)
+            while self._frames and (
+                self.size > self.max_bytes or timestamp - self._frames[0][0] > self.max_seconds
+            ):
+                _, dropped = self._frames.popleft()
+                self.size -= len(dropped)
+
+    def since(self, timestamp: float) -> List[Tuple[float, bytes]]:
+        """Return the buffered frames captured at or after a timestamp, oldest first."""
+        with self._lock:
+            return [frame for frame in self._frames if frame[0] >= timestamp]
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.size = 0
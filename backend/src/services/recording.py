@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import os
+import shutil
+import time
+from collections import defaultdict
+from threading import Lock
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import numpy as np
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..models.camera import Camera
+from .config_events import ConfigChange
+from .config_events import config_listener
+from .config_events import load_config_row
+
+logger = logging.getLogger(__name__)
+
+# One index record per finished segment, start/end in seconds since the epoch
+SEGMENT_RECORD = np.dtype([("start", "<f8"), ("end", "<f8"), ("number", "<u8")])
+
+
+def segment_file_name(number: int) -> str:
+    return f"{number:08d}.mp4"
+
+
+class SegmentIndex:
+    """
+    Append-only binary index of the recorded segments of one camera.
+
+    The file is a packed array of SEGMENT_RECORD entries in recording order,
+    so both the start and end columns are sorted. Readers map it with
+    np.memmap and locate a timestamp with a binary search instead of
+    listing the segment directory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._records = np.empty(0, dtype=SEGMENT_RECORD)
+        self._lock = Lock()
+
+    def append(self, start: float, end: float, number: int):
+        record = np.array([(start, end, number)], dtype=SEGMENT_RECORD)
+        with self._lock, open(self.path, "ab") as f:
+            f.write(record.tobytes())
+
+    def records(self) -> np.ndarray:
+        """Return all complete records, remapping the file when it has grown."""
+        try:
+            count = os.path.getsize(self.path) // SEGMENT_RECORD.itemsize
+        except FileNotFoundError:
+            count = 0
+        with self._lock:
+            if count != len(self._records):
+                self._records = (
+                    np.memmap(self.path, dtype=SEGMENT_RECORD, mode="r", shape=(count,))
+                    if count else np.empty(0, dtype=SEGMENT_RECORD)
+                )
+            return self._records
+
+    def find(self, timestamp: float) -> Optional[np.void]:
+        """Return the segment recording at a timestamp, or None if there is a gap."""
+        records = self.records()
+        position = int(np.searchsorted(records["start"], timestamp, side="right")) - 1
+        if position < 0 or timestamp >= records["end"][position]:
+            return None
+        return records[position]
+
+    def overlapping(self, start: float, end: float) -> np.ndarray:
+        """Return the segments that overlap [start, end)."""
+        records = self.records()
+        first = int(np.searchsorted(records["end"], start, side="right"))
+        last = int(np.searchsorted(records["start"], end, side="left"))
+        return records[first:last]
+
+    def next_number(self) -> int:
+        records = self.records()
+        return int(records["number"][-1]) + 1 if len(records) else 0
+
+
+class CameraRecorder:
+    """
+    Records one RTSP camera continuously into fixed-length MP4 segments.
+
+    ffmpeg copies the video track without transcoding and cuts a new file at
+    the first keyframe after every RECORDING_SEGMENT_SECONDS. It prints each
+    finished segment on stdout, which is appended to the camera's
+    SegmentIndex with wall clock start and end times.
+    """
+
+    def __init__(self, camera_id: int, rtsp_url: str):
+        self.camera_id = camera_id
+        self.rtsp_url = rtsp_url
+        self.directory = os.path.join(settings.RECORDINGS_DIR, str(camera_id))
+        self.index = SegmentIndex(os.path.join(self.directory, "index.bin"))
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.task: Optional[asyncio.Task] = None
+        self.status = "stopped"
+
+    def segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, segment_file_name(number))
+
+    def _command(self) -> List[str]:
+        return [
+            settings.FFMPEG_BINARY,
+            "-hide_banner", "-loglevel", "error",
+            "-rtsp_transport", settings.RTSP_TRANSPORT,
+            "-i", self.rtsp_url,
+            "-map", "0:v:0", "-c:v", "copy", "-an",
+            "-f", "segment",
+            "-segment_time", str(settings.RECORDING_SEGMENT_SECONDS),
+            "-segment_format", "mp4",
+            "-segment_format_options", "movflags=+faststart",
+            "-reset_timestamps", "1",
+            "-segment_start_number", str(self.index.next_number()),
+            "-segment_list", "pipe:1",
+            "-segment_list_type", "csv",
+            os.path.join(self.directory, "%08d.mp4"),
+        ]
+
+    def start(self):
+        """Start recording unless already running, on the running event loop."""
+        if self.task is None or self.task.done():
+            if shutil.which(settings.FFMPEG_BINARY) is None:
+                raise ValueError(f"Recording requires ffmpeg, {settings.FFMPEG_BINARY} was not found")
+            os.makedirs(self.directory, exist_ok=True)
+            self.status = "recording"
+            self.task = asyncio.create_task(self._run())
+            self.task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        """Report a recorder that ended on an error as failed instead of still recording."""
+        if not task.cancelled() and task.exception() is not None:
+            self.status = "failed"
+            logger.error(f"Recorder for camera {self.camera_id} failed: {task.exception()}", exc_info=task.exception())
+        elif self.status == "recording":
+            self.status = "stopped"
+
+    async def stop(self):
+        self.status = "stopped"
+        process = self.process
+        if process is not None and process.returncode is None:
+            # Let ffmpeg finish the current segment and report it
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                process.kill()
+        if self.task is not None:
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def _run(self):
+        """Run ffmpeg, restarting with exponential backoff when the camera drops."""
+        delay = settings.RTSP_RECONNECT_INITIAL_DELAY
+        while self.status == "recording":
+            self.process = await asyncio.create_subprocess_exec(
+                *self._command(),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            if self.status != "recording":
+                # Stopped while ffmpeg was starting, stop() did not see the process
+                self.process.terminate()
+            recorded = await self._read_segment_list(self.process.stdout)
+            await self.process.wait()
+            self.process = None
+            if self.status != "recording":
+                break
+            if recorded:
+                delay = settings.RTSP_RECONNECT_INITIAL_DELAY
+            logger.warning(f"Recorder for camera {self.camera_id} exited, restarting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.RTSP_RECONNECT_MAX_DELAY)
+
+    async def _read_segment_list(self, stdout: asyncio.StreamReader) -> int:
+        """Index each finished segment, returning how many were recorded."""
+        recorded = 0
+        while True:
+            line = await stdout.readline()
+            if not line:
+                return recorded
+            try:
+                name, start, end = line.decode().strip().rsplit(",", 2)
+                number = int(os.path.splitext(os.path.basename(name))[0])
+                duration = float(end) - float(start)
+            except ValueError:
+                logger.warning(f"Unexpected segment list entry from camera {self.camera_id}: {line!r}")
+                continue
+            # ffmpeg reports the segment once it is closed, so it ended now
+            finished = time.time()
+            self.index.append(finished - duration, finished, number)
+            recorded += 1
+
+
+class RecordingService:
+    """Keeps one CameraRecorder per recorded camera."""
+
+    def __init__(self):
+        self.recorders: Dict[int, CameraRecorder] = {}
+        self._transitions = defaultdict(asyncio.Lock)  # Serialises starting and stopping per camera
+
+    def get_index(self, camera_id: int) -> SegmentIndex:
+        """Return the segment index of a camera, recording or not."""
+        recorder = self.recorders.get(camera_id)
+        if recorder is not None:
+            return recorder.index
+        return SegmentIndex(os.path.join(settings.RECORDINGS_DIR, str(camera_id), "index.bin"))
+
+    async def start_camera(self, camera: Camera) -> CameraRecorder:
+        """
+        Start recording a camera unless it is recording already.
+
+        A recorder of the camera's previous URL is stopped first, two ffmpeg
+        processes must never write the same segments and index.
+        """
+        if camera.camera_type != "rtsp" or not camera.rtsp_url:
+            raise ValueError("Recording without transcoding requires an RTSP camera")
+        async with self._transitions[camera.id]:
+            recorder = self.recorders.get(camera.id)
+            if recorder is not None and recorder.rtsp_url != camera.rtsp_url:
+                logger.info(f"Stopping recorder of camera {camera.id}, its URL changed")
+                await recorder.stop()
+                recorder = None
+            if recorder is None:
+                recorder = CameraRecorder(camera.id, camera.rtsp_url)
+                self.recorders[camera.id] = recorder
+            recorder.start()
+            return recorder
+
+    async def stop_camera(self, camera_id: int):
+        async with self._transitions[camera_id]:
+            recorder = self.recorders.pop(camera_id, None)
+            if recorder is not None:
+                await recorder.stop()
+
+    async def start_all(self):
+        """Start recording every active RTSP camera."""
+        db = SessionLocal()
+        try:
+            cameras = db.query(Camera).filter(Camera.is_active.is_(True), Camera.camera_type == "rtsp").all()
+            for camera in cameras:
+                try:
+                    await self.start_camera(camera)
+                except ValueError as e:
+                    logger.error(f"Cannot record camera {camera.id}: {e}")
+                    continue
+                logger.info(f"Recording camera {camera.id}")
+        finally:
+            db.close()
+
+    async def stop_all(self):
+        await asyncio.gather(*(self.stop_camera(camera_id) for camera_id in list(self.recorders)))
+
+    async def apply_camera_change(self, change: ConfigChange):
+        """
+        Follow a changed camera: stop recording it when it was deleted or
+        deactivated and restart the recorder when its URL changed. Active
+        RTSP cameras start recording when RECORDING_ENABLED is set.
+        """
+        camera_ids = {change.id} if change.id is not None else set(self.recorders)
+        for camera_id in camera_ids:
+            camera = await asyncio.to_thread(load_config_row, "camera", camera_id)
+            recordable = (
+                camera is not None and camera.is_active and camera.camera_type == "rtsp" and bool(camera.rtsp_url)
+            )
+            recorder = self.recorders.get(camera_id)
+            if recorder is not None and (not recordable or recorder.rtsp_url != camera.rtsp_url):
+                logger.info(f"Stopping recorder of camera {camera_id} after a configuration change")
+                await self.stop_camera(camera_id)
+            if recordable and (recorder is not None or settings.RECORDING_ENABLED):
+                try:
+                    await self.start_camera(camera)
+                except ValueError as e:
+                    logger.error(f"Cannot record camera {camera_id}: {e}")
+
+
+recording_service = RecordingService()
+config_listener.subscribe("camera", recording_service.apply_camera_change)
@@ -0,0 +1,59 @@
+import time
+from typing import Optional
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+
+class ReplayCapture:
+    """
+    Plays a local video file like a live camera.
+
+    Frames are released at the file's own frame rate and playback starts
+    over at the end of the file, so a file camera can be streamed, recorded
+    into clips and analysed like any other camera. Batch analysis reads the
+    file directly instead, as fast as it can be decoded.
+    """
+
+    def __init__(self, path: str, loop: bool = True):
+        self.path = path
+        self.loop = loop
+        self._cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+        fps = self._cap.get(cv2.CAP_PROP_FPS) if self._cap.isOpened() else 0
+        self._interval = 1 / fps if 0 < fps < 1000 else 1 / 30
+        self._next_frame_at: Optional[float] = None
+
+    def isOpened(self) -> bool:
+        return self._cap.isOpened()
+
+    def grab(self) -> bool:
+        """Advance to the next frame once it is due, rewinding at the end of the file."""
+        if not self._cap.grab():
+            if not self.loop or not self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0) or not self._cap.grab():
+                return False
+        now = time.monotonic()
+        if self._next_frame_at is None or self._next_frame_at < now - 1:
+            # First frame, or the reader fell far behind: restart the clock instead of bursting
+            self._next_frame_at = now
+        elif self._next_frame_at > now:
+            time.sleep(self._next_frame_at - now)
+        self._next_frame_at += self._interval
+        return True
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        return self._cap.retrieve() if image is None else self._cap.retrieve(image)
+
+    def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, prop: int) -> float:
+        return self._cap.get(prop)
+
+    def set(self, prop: int, value: float) -> bool:
+        return self._cap.set(prop, value)
+
+    def release(self):
+        self._cap.release()
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from ..core.config import settings
+
+
+def resize_jpeg(jpeg: bytes, width: int) -> bytes:
+    """
+    Downscale a JPEG to a width, keeping the aspect ratio.
+
+    Images already at most ``width`` wide are returned unchanged.
+    """
+    image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Invalid JPEG")
+    height, original_width = image.shape[:2]
+    if width >= original_width:
+        return jpeg
+    size = (width, max(round(height * width / original_width), 1))
+    _, buffer = cv2.imencode(".jpg", cv2.resize(image, size, interpolation=cv2.INTER_AREA))
+    return buffer.tobytes()
+
+
+class SnapshotCache:
+    """
+    LRU of resized snapshot encodes.
+
+    Keys include the frame sequence, so an entry is only ever reused for the
+    frame it was made from and a grid of pollers requesting the same width
+    resizes each frame once.
+    """
+
+    def __init__(self, maxsize: int = settings.SNAPSHOT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: bytes):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def resized(self, key: Hashable, jpeg: bytes, width: int) -> bytes:
+        """Return the cached resize for a key, encoding it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = resize_jpeg(jpeg, width)
+            self.put(key, value)
+        return value
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against a strong ETag."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+snapshot_cache = SnapshotCache()
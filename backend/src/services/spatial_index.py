@@ -0,0 +1,252 @@
+"""
+Grid index of detection boxes for "what was in this area during this time".
+
+Every detection box is entered into the cells of a multi-level grid that it
+covers: level 0 cells are SPATIAL_CELL_SIZE pixels wide and each level
+doubles the size, and a box goes to the smallest level where it spans at
+most 2 x 2 cells, so it never needs more than four index rows. Level, row
+and column are packed into one integer, and detection_cells is indexed on
+(camera_id, cell, timestamp, detection_id).
+
+An area query computes the cells of every level that overlap the bounding
+rectangle of its polygon. The database then does one index range scan on
+the time range per cell and never reads the detections outside the area or
+period. The few candidates from partly covered cells are tested exactly
+against the polygon here.
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from sqlalchemy import insert
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.metrics import Histogram
+from ..models.detection import Detection
+from ..models.detection_cell import DetectionCell
+from .events import Polygon
+from .events import point_in_polygon
+
+logger = logging.getLogger(__name__)
+
+AREA_QUERY_SECONDS = Histogram("carcara_area_query_seconds", "Time to answer a spatio-temporal detection query.")
+
+_GRID = 1 << 16  # Rows and columns per level; coordinates beyond the last cell share it
+_MAX_QUERY_CELLS = 1024  # Per level, a larger area scans the whole level by time instead
+
+
+def cell_key(level: int, row: int, column: int) -> int:
+    return (level * _GRID + row) * _GRID + column
+
+
+def _cell_range(low: float, high: float, size: int) -> Tuple[int, int]:
+    return min(max(int(low // size), 0), _GRID - 1), min(max(int(high // size), 0), _GRID - 1)
+
+
+def box_cells(bbox: Sequence[float]) -> List[int]:
+    """Return the cells of the smallest level at which the box spans at most 2 x 2 cells."""
+    x1, y1, x2, y2 = bbox
+    for level in range(settings.SPATIAL_LEVELS):
+        size = settings.SPATIAL_CELL_SIZE << level
+        first_column, last_column = _cell_range(x1, x2, size)
+        first_row, last_row = _cell_range(y1, y2, size)
+        if last_column - first_column <= 1 and last_row - first_row <= 1:
+            break
+    return [
+        cell_key(level, row, column)
+        for row in range(first_row, last_row + 1)
+        for column in range(first_column, last_column + 1)
+    ]
+
+
+def area_cells(x1: float, y1: float, x2: float, y2: float) -> Tuple[List[int], List[int]]:
+    """
+    Return the cells of every level that overlap a rectangle, i.e. where any box inside it may be stored.
+
+    Returns:
+        (cells, levels) where levels lists the levels at which the rectangle
+        covers more than _MAX_QUERY_CELLS cells; those are scanned whole.
+    """
+    cells = []
+    levels = []
+    for level in range(settings.SPATIAL_LEVELS):
+        size = settings.SPATIAL_CELL_SIZE << level
+        first_column, last_column = _cell_range(x1, x2, size)
+        first_row, last_row = _cell_range(y1, y2, size)
+        if (last_column - first_column + 1) * (last_row - first_row + 1) > _MAX_QUERY_CELLS:
+            levels.append(level)
+            continue
+        cells.extend(
+            cell_key(level, row, column)
+            for row in range(first_row, last_row + 1)
+            for column in range(first_column, last_column + 1)
+        )
+    return cells, levels
+
+
+def cell_rows(detection_ids: Iterable[int], rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Build the detection_cells rows of inserted detections; rows without a box are not indexed."""
+    return [
+        {
+            "detection_id": detection_id, "cell": cell,
+            "camera_id": row.get("camera_id"), "timestamp": row.get("timestamp"),
+        }
+        for detection_id, row in zip(detection_ids, rows)
+        if row.get("bbox") and len(row["bbox"]) == 4
+        for cell in box_cells(row["bbox"])
+    ]
+
+
+def insert_detections(db: Session, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    Bulk insert detections together with their index cells, without committing.
+
+    Returns:
+        The IDs of the inserted detections, in the order of the rows.
+    """
+    if not rows:
+        return []
+    for row in rows:
+        row.setdefault("timestamp", datetime.utcnow())  # The cells need the same time the column default would set
+    result = db.execute(insert(Detection).returning(Detection.id, sort_by_parameter_order=True), rows)
+    detection_ids = result.scalars().all()
+    cells = cell_rows(detection_ids, rows)
+    if cells:
+        db.execute(insert(DetectionCell), cells)
+    return detection_ids
+
+
+def index_detection(db: Session, detection: Detection):
+    """Add the index cells of a detection flushed through the ORM, without committing."""
+    cells = cell_rows(
+        [detection.id], [{"camera_id": detection.camera_id, "timestamp": detection.timestamp, "bbox": detection.bbox}]
+    )
+    if cells:
+        db.execute(insert(DetectionCell), cells)
+
+
+def _segments_cross(a, b, c, d) -> bool:
+    def side(p, q, r):
+        return (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+
+    return side(a, b, c) * side(a, b, d) <= 0 and side(c, d, a) * side(c, d, b) <= 0
+
+
+def box_intersects_polygon(bbox: Sequence[float], polygon: Polygon) -> bool:
+    """Whether a box and a polygon overlap, touching included."""
+    x1, y1, x2, y2 = bbox
+    corners = ((x1, y1), (x2, y1), (x2, y2), (x1, y2))
+    if any(point_in_polygon(x, y, polygon) for x, y in corners):
+        return True
+    if any(x1 <= x <= x2 and y1 <= y <= y2 for x, y in polygon):
+        return True
+    edges = list(zip(polygon, polygon[1:] + polygon[:1]))
+    box_edges = list(zip(corners, corners[1:] + corners[:1]))
+    return any(_segments_cross(a, b, c, d) for a, b in edges for c, d in box_edges)
+
+
+def query_area(db: Session, camera_id: int, polygon: Polygon, start: datetime, end: datetime,
+               class_name: Optional[str] = None, min_confidence: Optional[float] = None,
+               match: str = "intersects", limit: int = settings.SPATIAL_QUERY_MAX_RESULTS) -> Tuple[List, bool]:
+    """
+    Find the detections of a camera inside a polygon during [start, end), in time order.
+
+    Args:
+        match: "intersects" for boxes overlapping the polygon, "centre" for
+            boxes whose centre lies inside it
+
+    Returns:
+        (rows, truncated) where rows are (id, timestamp, stream_id,
+        frame_number, class_name, confidence, bbox) and truncated tells
+        whether more than ``limit`` detections matched.
+    """
+    started = time.perf_counter()
+    xs = [x for x, _ in polygon]
+    ys = [y for _, y in polygon]
+    cells, levels = area_cells(min(xs), min(ys), max(xs), max(ys))
+    in_area = [DetectionCell.cell.in_(cells)] if cells else []
+    in_area += [DetectionCell.cell.between(cell_key(level, 0, 0), cell_key(level + 1, 0, 0) - 1) for level in levels]
+    candidates = (
+        select(DetectionCell.detection_id)
+        .where(DetectionCell.camera_id == camera_id)
+        .where(or_(*in_area))
+        .where(DetectionCell.timestamp >= start)
+        .where(DetectionCell.timestamp < end)
+    )
+    statement = select(
+        Detection.id, Detection.timestamp, Detection.stream_id, Detection.frame_number,
+        Detection.class_name, Detection.confidence, Detection.bbox,
+    ).where(Detection.id.in_(candidates)).order_by(Detection.timestamp, Detection.id)
+    if class_name is not None:
+        statement = statement.where(Detection.class_name == class_name)
+    if min_confidence is not None:
+        statement = statement.where(Detection.confidence >= min_confidence)
+
+    matches = []
+    scanned = 0
+    truncated = False
+    for row in db.execute(statement.execution_options(yield_per=1000)):
+        scanned += 1
+        x1, y1, x2, y2 = row.bbox
+        if match == "centre":
+            inside = point_in_polygon((x1 + x2) / 2, (y1 + y2) / 2, polygon)
+        else:
+            inside = box_intersects_polygon(row.bbox, polygon)
+        if not inside:
+            continue
+        if len(matches) == limit:
+            truncated = True
+            break
+        matches.append(row)
+    elapsed = time.perf_counter() - started
+    AREA_QUERY_SECONDS.observe(elapsed)
+    logger.debug(f"Area query on camera {camera_id}: {len(matches)} of {scanned} candidates in {elapsed * 1000:.1f}ms")
+    return matches, truncated
+
+
+def index_unindexed(db: Session, batch_rows: int = settings.EXPORT_BATCH_ROWS) -> int:
+    """
+    Add the index cells of detections stored before the index existed.
+
+    Returns:
+        The number of detections indexed.
+    """
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Detection.id, Detection.camera_id, Detection.timestamp, Detection.bbox)
+            .where(Detection.id > last_id)
+            .where(~select(DetectionCell.detection_id).where(DetectionCell.detection_id == Detection.id).exists())
+            .order_by(Detection.id)
+            .limit(batch_rows)
+        ).all()
+        if not rows:
+            return indexed
+        last_id = rows[-1].id
+        cells = cell_rows((row.id for row in rows), (row._asdict() for row in rows))
+        if cells:
+            db.execute(insert(DetectionCell), cells)
+        db.commit()
+        indexed += len(rows)
+        logger.info(f"Indexed {indexed} detections")
+
+
+if __name__ == "__main__":
+    from ..db.session import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Indexed {index_unindexed(session)} detections")
+    finally:
+        session.close()
@@ -0,0 +1,136 @@
+"""
+Framed binary protocol for the stream WebSocket.
+
+Each binary message carries one frame::
+
+    header      22 bytes, little endian
+        magic       2s   b"CF"
+        version     u8   PROTOCOL_VERSION
+        flags       u8   FLAG_* bits
+        sequence    u32  frame sequence number, per camera
+        timestamp   f64  capture time, seconds since the epoch
+        count       u16  number of detection records
+        image_size  u32  length of the trailing image bytes
+    detections  count * 12 bytes
+        class_id    u16
+        score       u16  confidence scaled to 0..65535
+        x1, y1, x2, y2  4 * u16  box corners scaled to 0..65535 of the frame size
+        track_id    u32  only with FLAG_TRACKS, records are then 16 bytes
+    image       image_size bytes (JPEG)
+
+The detections belong to the frame they are sent with, so clients can draw
+overlays without the server re-encoding annotated frames.
+"""
+import struct
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+MAGIC = b"CF"
+PROTOCOL_VERSION = 1
+
+# The frame was analysed; without it the detection list is empty because detection was skipped
+FLAG_DETECTIONS = 0x01
+# Detection records carry a tracker ID; the boxes may be predicted between detection passes
+FLAG_TRACKS = 0x02
+
+HEADER = struct.Struct("<2sBBIdHI")
+DETECTION = struct.Struct("<HH4H")
+TRACKED_DETECTION = struct.Struct("<HH4HI")
+
+_SCALE = 65535
+
+
+def _quantize(value: float, size: float) -> int:
+    return min(max(int(round(value / size * _SCALE)), 0), _SCALE)
+
+
+def encode_frame_message(
+    sequence: int,
+    timestamp: float,
+    image: bytes,
+    frame_size: Tuple[int, int],
+    detections: Optional[List[Dict[str, Any]]] = None,
+) -> bytes:
+    """
+    Pack a frame and its detections into one binary message.
+
+    Args:
+        sequence: Frame sequence number
+        timestamp: Capture time in seconds since the epoch
+        image: Encoded image bytes
+        frame_size: (width, height) of the frame the boxes refer to
+        detections: Detections as returned by ObjectDetectionService.detect,
+            or None when detection did not run on this frame. When every
+            detection has a "track_id" the records carry it.
+
+    Returns:
+        The encoded message.
+    """
+    width, height = frame_size
+    flags = 0
+    records = []
+    if detections is not None:
+        flags |= FLAG_DETECTIONS
+        tracked = bool(detections) and all("track_id" in detection for detection in detections)
+        if tracked:
+            flags |= FLAG_TRACKS
+        for detection in detections:
+            x1, y1, x2, y2 = detection["bbox"]
+            fields = (
+                detection["class_id"],
+                _quantize(detection["confidence"], 1.0),
+                _quantize(x1, width),
+                _quantize(y1, height),
+                _quantize(x2, width),
+                _quantize(y2, height),
+            )
+            if tracked:
+                records.append(TRACKED_DETECTION.pack(*fields, detection["track_id"] & 0xFFFFFFFF))
+            else:
+                records.append(DETECTION.pack(*fields))
+    header = HEADER.pack(
+        MAGIC, PROTOCOL_VERSION, flags, sequence & 0xFFFFFFFF, timestamp, len(records), len(image)
+    )
+    return b"".join([header, *records, image])
+
+
+def decode_frame_message(message: bytes) -> Dict[str, Any]:
+    """
+    Unpack a message built by encode_frame_message.
+
+    Boxes are returned normalised to 0..1 of the frame size.
+
+    Raises:
+        ValueError: If the message is not a valid frame message.
+    """
+    if len(message) < HEADER.size:
+        raise ValueError("Message too short")
+    magic, version, flags, sequence, timestamp, count, image_size = HEADER.unpack_from(message)
+    if magic != MAGIC or version != PROTOCOL_VERSION:
+        raise ValueError("Unknown message format")
+    offset = HEADER.size
+    record = TRACKED_DETECTION if flags & FLAG_TRACKS else DETECTION
+    if len(message) != offset + count * record.size + image_size:
+        raise ValueError("Message length does not match header")
+
+    detections = []
+    for _ in range(count):
+        class_id, score, x1, y1, x2, y2, *track_id = record.unpack_from(message, offset)
+        offset += record.size
+        detection = {
+            "class_id": class_id,
+            "confidence": score / _SCALE,
+            "bbox": [x1 / _SCALE, y1 / _SCALE, x2 / _SCALE, y2 / _SCALE],
+        }
+        if track_id:
+            detection["track_id"] = track_id[0]
+        detections.append(detection)
+    return {
+        "sequence": sequence,
+        "timestamp": timestamp,
+        "detections": detections if flags & FLAG_DETECTIONS else None,
+        "image": message[offset:offset + image_size],
+    }
@@ -0,0 +1,550 @@
+import asyncio
+import logging
+import secrets
+import time
+from collections import defaultdict
+from datetime import datetime
+from threading import Event
+from threading import Lock
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import cv2
+from fastapi import HTTPException
+from fastapi import WebSocket
+from fastapi import WebSocketDisconnect
+
+from ..core.config import settings
+from ..core.metrics import Counter
+from ..core.metrics import Gauge
+from ..core.metrics import Histogram
+from ..core.tracing import frame_trace
+from ..core.tracing import span
+from ..models.track import Track
+from .config_events import ConfigChange
+from .config_events import config_listener
+from .config_events import load_config_row
+from .db_writer import BatchWriter
+from .detection import CameraService
+from .detection import get_detection_service
+from .events import event_bus
+from .frame_ring import FrameRing
+from .frame_ring import FrameSlot
+from .heatmaps import heatmap_store
+from .preroll import PrerollBuffer
+from .stream_protocol import encode_frame_message
+from .tracking import MultiObjectTracker
+
+logger = logging.getLogger(__name__)
+
+FRAMES_CAPTURED = Counter("carcara_frames_captured_total", "Frames decoded from the camera.", ("camera",))
+FRAMES_DROPPED = Counter(
+    "carcara_frames_dropped_total", "Frames skipped because every frame buffer was in use.", ("camera",)
+)
+JPEG_ENCODE_SECONDS = Histogram("carcara_jpeg_encode_seconds", "Time to JPEG encode a frame.", ("camera",))
+WS_SUBSCRIBERS = Gauge("carcara_ws_subscribers", "Attached WebSocket subscribers.", ("camera", "mode"))
+WS_BYTES_SENT = Counter("carcara_ws_bytes_sent_total", "Bytes sent to WebSocket subscribers.", ("camera", "mode"))
+WS_FRAMES_DROPPED = Counter(
+    "carcara_ws_frames_dropped_total", "Frames a WebSocket subscriber skipped because it was still sending older ones.",
+    ("camera", "mode"),
+)
+WS_SEND_LAG = Histogram(
+    "carcara_ws_send_lag_seconds", "Time from frame capture until it was sent to a subscriber.", ("camera",)
+)
+
+
+def detect_frame(frame) -> List[Dict[str, Any]]:
+    """Detect with the default model, resolving the service in the calling worker thread."""
+    return get_detection_service().detect(frame)
+
+
+class CameraStreamManager:
+    """
+    Shares one upstream capture between every WebSocket viewer of a camera.
+
+    Local cameras are keyed by device ID and RTSP cameras by URL, so a camera
+    is opened exactly once no matter how many subscribers are attached. A
+    single publisher task reads frames and fans them out; when an RTSP
+    connection drops it reconnects with exponential backoff while the
+    subscribers stay connected.
+
+    Frames are decoded in place into a FrameRing; detection and encoding
+    read the ring slot directly, and other consumers can borrow the latest
+    frame through ``ring.latest_frame()`` without copying it. The encoded
+    JPEGs of the last PREROLL_SECONDS are kept in ``preroll`` for clips and
+    the latest one as ``snapshot`` for the snapshot endpoint.
+
+    Every subscriber has its own sender task and a queue of at most
+    STREAM_SUBSCRIBER_QUEUE_SIZE frames. A subscriber that cannot keep up
+    skips its oldest queued frames, counted in carcara_ws_frames_dropped_total,
+    so it never holds up the capture or the other subscribers.
+
+    Subscribers either receive raw JPEG bytes or framed messages (see
+    stream_protocol) carrying the frame's sequence number, capture time and
+    detections. Detection runs on every frame while a framed subscriber that
+    asked for detections is attached, otherwise every DETECTION_INTERVAL frames while the event bus
+    wants the camera's detections for a live event subscriber or an active
+    alarm. Detections are published to the event bus and accumulated into
+    the camera's heatmaps.
+
+    With TRACKING_ENABLED, detection runs every DETECTION_INTERVAL frames
+    whenever the camera is streaming, a MultiObjectTracker predicts the boxes
+    in between, and each finished track is stored once as a Track row instead
+    of a box per frame.
+    """
+
+    def __init__(self, source: Union[int, str], camera_type: str = "local", camera_id: Optional[int] = None):
+        self.source = source
+        self.camera_type = camera_type
+        self.camera_id = camera_id
+        self.tracker: Optional[MultiObjectTracker] = MultiObjectTracker() if settings.TRACKING_ENABLED else None
+        self._detected_sequence = 0  # Sequence of the last frame detection ran on
+        self.streamer = None
+        self.publisher: Optional[asyncio.Task] = None
+        self._publishing = None  # Capture the current publisher reads from
+        self.subscribers = []
+        self.framed_subscribers = set()
+        self.detecting_subscribers = set()  # Framed subscribers that want detections on every frame
+        self._senders: Dict[WebSocket, Tuple[asyncio.Queue, asyncio.Task]] = {}
+        self.sequence = 0
+        self.ring = FrameRing()
+        self.preroll = PrerollBuffer()
+        self.snapshot: Optional[Tuple[int, bytes]] = None  # (sequence, JPEG) of the latest frame
+        self.token = secrets.token_hex(4)  # Distinguishes sequence numbers of different manager instances
+        self.frame_shape: Optional[Tuple[int, ...]] = None
+        self.lock = Lock()
+        self._starting = asyncio.Lock()  # Serialises opening the capture
+        self.status = "stopped"
+
+        # Metric children are resolved once, the per-frame path only updates them
+        label = self._label = camera_id if camera_id is not None else source
+        self._frames_captured = FRAMES_CAPTURED.labels(label)
+        self._frames_dropped = FRAMES_DROPPED.labels(label)
+        self._jpeg_encode_seconds = JPEG_ENCODE_SECONDS.labels(label)
+        self._send_lag = WS_SEND_LAG.labels(label)
+        self._bytes_sent = {False: WS_BYTES_SENT.labels(label, "jpeg"), True: WS_BYTES_SENT.labels(label, "framed")}
+        self._frames_skipped = {
+            False: WS_FRAMES_DROPPED.labels(label, "jpeg"), True: WS_FRAMES_DROPPED.labels(label, "framed")
+        }
+        WS_SUBSCRIBERS.labels(label, "jpeg").set_function(lambda: len(self.subscribers) - len(self.framed_subscribers))
+        WS_SUBSCRIBERS.labels(label, "framed").set_function(lambda: len(self.framed_subscribers))
+
+    async def start_stream(self):
+        """
+        Open the upstream capture unless it is already running.
+
+        Opening an RTSP stream can take seconds, so it runs in a worker
+        thread; concurrent calls wait for the first one. Add the subscriber
+        first, a capture opened after every subscriber left is released.
+        """
+        async with self._starting:
+            if self.streamer is not None:
+                return
+
+            cap = await asyncio.to_thread(CameraService.open_capture, self.source, self.camera_type)
+            if not cap.isOpened():
+                cap.release()
+                raise HTTPException(status_code=400, detail=f"Cannot open camera {self.source}")
+
+            with self.lock:
+                if not self.subscribers:
+                    # Stopped while opening
+                    cap.release()
+                    return
+                self.streamer = cap
+                self.status = "started"
+            logger.info(f"Started {self.camera_type} stream for camera {self.source}")
+
+    def ensure_publisher(self):
+        """Start the publisher task if no publisher is running."""
+        if self.publisher is None or self.publisher.done() or self._publishing is not self.streamer:
+            # Set now rather than when the task first runs, so a viewer joining meanwhile does not start another
+            self._publishing = self.streamer
+            self.publisher = asyncio.create_task(self.publish_frames())
+
+    def stop_stream(self):
+        """
+        Detach the capture and drop all subscribers.
+
+        A running publisher notices the capture was detached and releases it
+        once its pending read returns, so the capture is never released while
+        a worker thread is still reading from it.
+        """
+        logger.info(f"Stopping stream for camera {self.source} - subscribers {len(self.subscribers)}")
+        cap, self.streamer = self.streamer, None
+        self.subscribers = []
+        self.framed_subscribers.clear()
+        self.detecting_subscribers.clear()
+        for _, sender in self._senders.values():
+            sender.cancel()
+        self._senders.clear()
+        self.preroll.clear()
+        self.snapshot = None
+        self.status = "stopped"
+        if cap is not None and (self.publisher is None or self.publisher.done()):
+            cap.release()
+
+    def kill_stream(self):
+        """Forcefully stop the stream and remove all subscribers."""
+        with self.lock:
+            logger.info(f"Killing stream for camera {self.source}")
+            self.stop_stream()
+
+    async def _reconnect(self, cap: cv2.VideoCapture) -> Optional[cv2.VideoCapture]:
+        """
+        Reopen the upstream capture with exponential backoff.
+
+        Subscribers stay attached while reconnecting. Gives up only when the
+        stream is stopped or every subscriber has left.
+
+        Returns:
+            The new capture, or None if the stream was stopped meanwhile.
+        """
+        cap.release()
+        delay = settings.RTSP_RECONNECT_INITIAL_DELAY
+        while self.streamer is cap and self.subscribers:
+            logger.warning(f"Lost camera {self.source}, reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            new_cap = await asyncio.to_thread(CameraService.open_capture, self.source, self.camera_type)
+            if new_cap.isOpened() and self.streamer is cap:
+                self.streamer = new_cap
+                logger.info(f"Reconnected to camera {self.source}")
+                return new_cap
+            new_cap.release()
+            delay = min(delay * 2, settings.RTSP_RECONNECT_MAX_DELAY)
+        if self.streamer is cap:
+            self.streamer = None
+            self.status = "stopped"
+        return None
+
+    async def _read_frame(self, cap: cv2.VideoCapture) -> Tuple[bool, Optional[FrameSlot]]:
+        """
+        Decode the next frame in place into a ring slot.
+
+        Returns:
+            (ret, slot) where slot holds a writer reference, or is None when
+            the frame was dropped because every ring slot is still in use.
+        """
+        slot = self.ring.acquire_write(self.frame_shape) if self.frame_shape else None
+        if slot is None and self.frame_shape is not None:
+            # Consumers still hold every buffer, skip this frame without decoding it
+            self._frames_dropped.inc()
+            return await asyncio.to_thread(cap.grab), None
+
+        # Reading blocks at the source frame rate, keep it off the event loop
+        if slot is None:
+            ret, frame = await asyncio.to_thread(CameraService.read_frame, cap)
+        else:
+            ret, frame = await asyncio.to_thread(CameraService.read_frame, cap, slot.array)
+        if not ret:
+            if slot is not None:
+                self.ring.release(slot)
+            return False, None
+
+        if slot is None or frame is not slot.array:
+            # First frame or new resolution: size the ring, copying this frame once
+            if slot is not None:
+                self.ring.release(slot)
+            self.frame_shape = frame.shape
+            slot = self.ring.acquire_write(frame.shape, frame.dtype)
+            if slot is not None:
+                slot.array[...] = frame
+        return True, slot
+
+    async def publish_frames(self):
+        """Read frames from the upstream capture and fan them out to subscribers."""
+        cap = self._publishing = self.streamer
+        try:
+            while cap is not None and self.streamer is cap and self.subscribers:
+                with frame_trace("frame", camera=self._label, sequence=self.sequence + 1):
+                    ret, slot = await self._read_frame(cap)
+                    if self.streamer is not cap:
+                        if slot is not None:
+                            self.ring.release(slot)
+                        break
+                    if not ret:
+                        cap = self._publishing = await self._reconnect(cap)
+                        continue
+                    if slot is None:
+                        continue
+
+                    self.sequence += 1
+                    self._frames_captured.inc()
+                    captured_at = time.time()
+                    self.ring.publish(slot, self.sequence, captured_at)
+                    try:
+                        jpeg, framed = await self._encode(slot)
+                        self.preroll.append(slot.timestamp, jpeg)
+                        self.snapshot = (slot.sequence, jpeg)
+                    finally:
+                        self.ring.release(slot)
+
+                    self._fan_out(jpeg, framed, captured_at)
+        finally:
+            if self.tracker is not None:
+                # Tracks cannot continue across a gap in the stream
+                self._store_tracks(self.tracker.finish_all())
+            if cap is not None:
+                cap.release()
+                if self.streamer is cap:
+                    self.streamer = None
+                    self.status = "stopped"
+
+    def _fan_out(self, jpeg: bytes, framed: Optional[bytes], captured_at: float):
+        """Queue a frame for every subscriber in the format it asked for."""
+        with span("send", subscribers=len(self.subscribers)):
+            for subscriber, (queue, _) in list(self._senders.items()):
+                is_framed = subscriber in self.framed_subscribers
+                if queue.full():
+                    # Still sending older frames, skip the oldest rather than wait for the subscriber
+                    queue.get_nowait()
+                    self._frames_skipped[is_framed].inc()
+                queue.put_nowait((framed if is_framed else jpeg, captured_at))
+
+    async def _send_frames(self, websocket: WebSocket, queue: asyncio.Queue, is_framed: bool):
+        """Send the queued frames of one subscriber until it disconnects or is removed."""
+        try:
+            while True:
+                payload, captured_at = await queue.get()
+                await websocket.send_bytes(payload)
+                self._bytes_sent[is_framed].inc(len(payload))
+                self._send_lag.observe(time.time() - captured_at)
+        except (WebSocketDisconnect, RuntimeError):
+            # Remove disconnected subscriber
+            self._discard(websocket)
+
+    async def _track(self, slot: FrameSlot) -> List[Dict[str, Any]]:
+        """Detect every DETECTION_INTERVAL frames and let the tracker predict the others."""
+        if not self._detected_sequence or slot.sequence - self._detected_sequence >= settings.DETECTION_INTERVAL:
+            self._detected_sequence = slot.sequence
+            detections = await asyncio.to_thread(detect_frame, slot.array)
+            with span("track"):
+                tracks = self.tracker.update(detections, slot.timestamp)
+        else:
+            with span("track", predicted=True):
+                tracks = self.tracker.predict()
+        self._store_tracks(self.tracker.pop_finished())
+        return tracks
+
+    def _store_tracks(self, summaries: List[Dict[str, Any]]):
+        if self.camera_id is None:
+            return
+        for summary in summaries:
+            track_writer.add({
+                **summary,
+                "camera_id": self.camera_id,
+                "detection_model_name": settings.DEFAULT_MODEL,
+                "first_seen": datetime.utcfromtimestamp(summary["first_seen"]),
+                "last_seen": datetime.utcfromtimestamp(summary["last_seen"]),
+            })
+
+    async def _encode(self, slot: FrameSlot) -> Tuple[bytes, Optional[bytes]]:
+        """Encode a ring slot as JPEG and, for framed subscribers, as a frame message."""
+        frame = slot.array
+        detections = None
+        if self.tracker is not None:
+            detections = await self._track(slot)
+        elif self.detecting_subscribers:
+            detections = await asyncio.to_thread(detect_frame, frame)
+        elif event_bus.wants(self.camera_id) and slot.sequence - self._detected_sequence >= settings.DETECTION_INTERVAL:
+            # Only event subscribers or alarms need detections, every DETECTION_INTERVAL frames is enough
+            self._detected_sequence = slot.sequence
+            detections = await asyncio.to_thread(detect_frame, frame)
+        if detections is not None and self.camera_id is not None:
+            event_bus.publish_detections(self.camera_id, slot.sequence, slot.timestamp, detections)
+            heatmap_store.add_detections(self.camera_id, slot.timestamp, frame.shape, detections)
+
+        with span("encode"):
+            started = time.perf_counter()
+            _, buffer = cv2.imencode('.jpg', frame)
+            jpeg = buffer.tobytes()
+            self._jpeg_encode_seconds.observe(time.perf_counter() - started)
+        framed = None
+        if self.framed_subscribers:
+            height, width = frame.shape[:2]
+            framed = encode_frame_message(slot.sequence, slot.timestamp, jpeg, (width, height), detections)
+        return jpeg, framed
+
+    def add_subscriber(self, websocket: WebSocket, framed: bool = False, detect: bool = True):
+        """
+        Attach a viewer.
+
+        Args:
+            framed: Send frame messages instead of raw JPEGs
+            detect: For framed viewers, run detection on every frame; without it
+                the messages carry detections only of frames detected anyway
+        """
+        self.subscribers.append(websocket)  # Add WebSocket to the list
+        if framed:
+            self.framed_subscribers.add(websocket)
+            if detect:
+                self.detecting_subscribers.add(websocket)
+        queue = asyncio.Queue(maxsize=settings.STREAM_SUBSCRIBER_QUEUE_SIZE)
+        self._senders[websocket] = (queue, asyncio.create_task(self._send_frames(websocket, queue, framed)))
+
+    def _discard(self, websocket: WebSocket):
+        if websocket in self.subscribers:
+            self.subscribers.remove(websocket)  # Remove WebSocket from the list
+        self.framed_subscribers.discard(websocket)
+        self.detecting_subscribers.discard(websocket)
+        sender = self._senders.pop(websocket, None)
+        if sender is not None:
+            sender[1].cancel()
+
+    def remove_subscriber(self, websocket: WebSocket):
+        with self.lock:
+            logger.debug(f"Removing subscriber from camera {self.source} - subscribers {len(self.subscribers)}")
+            self._discard(websocket)
+            if not self.subscribers:
+                self.stop_stream()
+
+
+def stream_source_key(camera) -> Tuple[str, Union[int, str]]:
+    """
+    Return the manager registry key for a camera.
+
+    Synthetic cameras keep their source spec, e.g.
+    "synthetic://1280x720@30", in ``rtsp_url`` and are keyed like RTSP
+    cameras; file cameras are keyed by their file path.
+
+    Args:
+        camera: Camera model instance
+
+    Returns:
+        A ("local", device_id) or ("remote", rtsp_url or file_path) tuple.
+    """
+    if camera.camera_type == "local":
+        return "local", camera.device_id
+    if camera.camera_type == "file":
+        return "remote", camera.file_path
+    return "remote", camera.rtsp_url
+
+
+def get_stream_manager(camera) -> Optional[CameraStreamManager]:
+    """Return the running stream manager of a camera, if any."""
+    kind, source = stream_source_key(camera)
+    manager = camera_stream_managers[kind].get(source)
+    if manager is None or manager.streamer is None:
+        return None
+    return manager
+
+
+def find_stream_manager(camera_id: int) -> Optional[CameraStreamManager]:
+    """Return the running stream manager of a camera by its ID, if any."""
+    for kind in ("local", "remote"):
+        for manager in list(camera_stream_managers[kind].values()):
+            if manager.camera_id == camera_id and manager.streamer is not None:
+                return manager
+    return None
+
+
+async def restart_camera_streams(camera_id: int, camera) -> int:
+    """
+    Stop the streams of a camera that was deleted or whose source changed.
+
+    The subscribers, fMP4 viewers included, are disconnected with code 1012
+    (service restart), so clients reconnect and get a stream of the new
+    source.
+
+    Args:
+        camera_id: ID of the changed camera
+        camera: The camera as it is now, None if it was deleted
+
+    Returns:
+        The number of streams stopped.
+    """
+    current = (stream_source_key(camera), camera.camera_type) if camera is not None else None
+    stopped = 0
+    for kind in ("local", "remote"):
+        for source, manager in list(camera_stream_managers[kind].items()):
+            if manager.camera_id != camera_id or current == ((kind, source), manager.camera_type):
+                continue
+            with camera_stream_lockers[kind][source]:
+                if camera_stream_managers[kind].get(source) is manager:
+                    del camera_stream_managers[kind][source]
+                subscribers = list(manager.subscribers)
+                manager.kill_stream()
+            for websocket in subscribers:
+                try:
+                    await websocket.close(code=1012, reason="Camera configuration changed")
+                except Exception:
+                    pass  # Already gone
+            logger.info(f"Stopped stream of camera {camera_id} from {source} after a configuration change")
+            stopped += 1
+    current_url = camera.rtsp_url if camera is not None and camera.camera_type == "rtsp" else None
+    for source, manager in list(camera_stream_managers["fmp4"].items()):
+        if manager.camera_id != camera_id or source == current_url:
+            continue
+        with camera_stream_lockers["fmp4"][source]:
+            if camera_stream_managers["fmp4"].get(source) is manager:
+                del camera_stream_managers["fmp4"][source]
+        for subscriber in manager.subscribers:
+            subscriber.close()  # stream_fmp4 closes the WebSocket
+        await manager.stop_stream()
+        logger.info(f"Stopped fMP4 stream of camera {camera_id} from {source} after a configuration change")
+        stopped += 1
+    return stopped
+
+
+async def stop_all_streams():
+    """
+    Stop every stream at shutdown.
+
+    Waits for the publishers to exit, so the tracks still open are finished
+    and queued on ``track_writer`` before it is closed.
+    """
+    publishers = []
+    for kind in ("local", "remote"):
+        for source, manager in list(camera_stream_managers[kind].items()):
+            with camera_stream_lockers[kind][source]:
+                camera_stream_managers[kind].pop(source, None)
+                manager.kill_stream()
+            if manager.publisher is not None and not manager.publisher.done():
+                publishers.append(manager.publisher)
+    for source, manager in list(camera_stream_managers["fmp4"].items()):
+        camera_stream_managers["fmp4"].pop(source, None)
+        await manager.stop_stream()
+    if publishers:
+        # A publisher exits once its pending read returns
+        await asyncio.wait(publishers, timeout=5)
+
+
+async def apply_camera_change(change: ConfigChange):
+    """Restart the running streams of a changed camera, or of every camera after a resync."""
+    if change.id is not None:
+        camera_ids = {change.id}
+    else:
+        camera_ids = {
+            manager.camera_id
+            for kind in ("local", "remote", "fmp4")
+            for manager in list(camera_stream_managers[kind].values())
+            if manager.camera_id is not None
+        }
+    for camera_id in camera_ids:
+        camera = await asyncio.to_thread(load_config_row, "camera", camera_id)
+        await restart_camera_streams(camera_id, camera)
+
+
+config_listener.subscribe("camera", apply_camera_change)
+
+track_writer = BatchWriter(Track)
+
+camera_stream_managers = {
+    "local": defaultdict(list),
+    "remote": defaultdict(list),
+    "fmp4": defaultdict(list)
+}
+
+camera_stream_lockers = {
+    "local": defaultdict(Lock),
+    "remote": defaultdict(Lock),
+    "fmp4": defaultdict(Lock)
+}
+
+# Local devices the camera inventory is probing, each event is set once the probe closed the device.
+# Entries are added and removed under the device's stream lock, a stream must not open the device meanwhile.
+local_device_probes: Dict[int, Event] = {}
@@ -0,0 +1,145 @@
+import re
+import time
+from typing import Optional
+from typing import Tuple
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+_SIZE_PATTERN = re.compile(r"^(\d+)x(\d+)(?:@(\d+(?:\.\d+)?))?$")
+
+
+def parse_synthetic_source(source: str) -> dict:
+    """
+    Parse a synthetic source spec.
+
+    The spec is ``[synthetic://]WIDTHxHEIGHT[@FPS][?objects=N&seed=S&frames=F]``,
+    e.g. ``synthetic://1280x720@30?objects=5``. An FPS of 0 produces frames
+    as fast as they are read; ``frames`` ends the stream after that many
+    frames, otherwise it never ends.
+
+    Raises:
+        ValueError: If the spec is malformed.
+    """
+    parts = urlsplit(source if "://" in source else f"synthetic://{source}")
+    if parts.scheme != "synthetic":
+        raise ValueError(f"Not a synthetic source: {source}")
+    match = _SIZE_PATTERN.match(parts.netloc + parts.path)
+    if not match:
+        raise ValueError(f"Invalid synthetic source {source}, expected WIDTHxHEIGHT[@FPS]")
+    options = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+    return {
+        "width": int(match.group(1)),
+        "height": int(match.group(2)),
+        "fps": float(match.group(3) or 30),
+        "objects": int(options.get("objects", 3)),
+        "seed": int(options.get("seed", 0)),
+        "frames": int(options["frames"]) if "frames" in options else None,
+    }
+
+
+class SyntheticCapture:
+    """
+    Camera stand-in that renders deterministic frames.
+
+    Implements the parts of the ``cv2.VideoCapture`` interface the pipeline
+    uses, so benchmarks, load tests and development setups can stream
+    without a device or network. Each frame is a fixed noise background,
+    which JPEG encodes about as expensively as a real scene, with filled
+    boxes moving across it. The same spec and seed always produce the same
+    frames.
+    """
+
+    def __init__(self, source: str):
+        spec = parse_synthetic_source(source)
+        self.width = spec["width"]
+        self.height = spec["height"]
+        self.fps = spec["fps"]
+        self.max_frames = spec["frames"]
+        self.position = 0
+        self._opened = True
+        self._next_frame_at: Optional[float] = None
+
+        rng = np.random.default_rng(spec["seed"])
+        background = rng.integers(0, 256, (self.height // 8 + 1, self.width // 8 + 1, 3), dtype=np.uint8)
+        self._background = cv2.resize(background, (self.width, self.height), interpolation=cv2.INTER_LINEAR)
+        # Per object: start position, velocity in pixels per frame, size and colour
+        self._objects = [
+            (
+                rng.uniform(0, self.width), rng.uniform(0, self.height),
+                rng.uniform(-8, 8), rng.uniform(-8, 8),
+                int(rng.integers(self.width // 20 + 1, self.width // 6 + 2)),
+                int(rng.integers(self.height // 20 + 1, self.height // 4 + 2)),
+                tuple(int(value) for value in rng.integers(0, 256, 3)),
+            )
+            for _ in range(spec["objects"])
+        ]
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def grab(self) -> bool:
+        """Advance to the next frame, waiting for its due time when the FPS is limited."""
+        if not self._opened or (self.max_frames is not None and self.position >= self.max_frames):
+            return False
+        if self.fps > 0:
+            now = time.monotonic()
+            if self._next_frame_at is None:
+                self._next_frame_at = now
+            elif self._next_frame_at > now:
+                time.sleep(self._next_frame_at - now)
+            self._next_frame_at += 1 / self.fps
+        self.position += 1
+        return True
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """Render the current frame, into ``image`` when it has the frame's shape."""
+        if not self._opened or self.position == 0:
+            return False, None
+        shape = (self.height, self.width, 3)
+        if image is None or image.shape != shape or image.dtype != np.uint8:
+            image = np.empty(shape, dtype=np.uint8)
+        np.copyto(image, self._background)
+        frame_number = self.position - 1
+        for x, y, dx, dy, box_width, box_height, colour in self._objects:
+            # Bounce between the frame edges
+            left = int(self._bounce(x + dx * frame_number, self.width - box_width))
+            top = int(self._bounce(y + dy * frame_number, self.height - box_height))
+            cv2.rectangle(image, (left, top), (left + box_width, top + box_height), colour, -1)
+        return True, image
+
+    @staticmethod
+    def _bounce(position: float, limit: int) -> float:
+        if limit <= 0:
+            return 0
+        position %= 2 * limit
+        return position if position <= limit else 2 * limit - position
+
+    def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, prop: int) -> float:
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.max_frames or 0)
+        return 0.0
+
+    def set(self, prop: int, value: float) -> bool:
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = max(int(value), 0)
+            return True
+        return False
+
+    def release(self):
+        self._opened = False
@@ -0,0 +1,255 @@
+import itertools
+from typing import Any
+from typing import Dict
+from typing import List
+
+import numpy as np
+
+from ..core.config import settings
+
+# Constant velocity model over (cx, cy, w, h) and their velocities
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)
+_H = np.eye(4, 8)
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU of two sets of [x1, y1, x2, y2] boxes.
+
+    Returns:
+        An array of shape (len(boxes_a), len(boxes_b)).
+    """
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return intersection / np.maximum(area_a + area_b - intersection, 1e-9)
+
+
+def greedy_match(scores: np.ndarray, threshold: float):
+    """
+    Match rows to columns by descending score.
+
+    Returns:
+        (matches, unmatched rows, unmatched columns), matches as (row, column) pairs.
+    """
+    matches = []
+    rows, columns = set(range(scores.shape[0])), set(range(scores.shape[1]))
+    if scores.size:
+        for flat in np.argsort(-scores, axis=None):
+            row, column = divmod(int(flat), scores.shape[1])
+            if scores[row, column] < threshold:
+                break
+            if row in rows and column in columns:
+                matches.append((row, column))
+                rows.discard(row)
+                columns.discard(column)
+    return matches, sorted(rows), sorted(columns)
+
+
+def _to_xywh(bbox) -> np.ndarray:
+    x1, y1, x2, y2 = bbox
+    return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=float)
+
+
+class Track:
+    """A tracked object with a Kalman filtered box and a compact path summary."""
+
+    def __init__(self, track_id: int, detection: Dict[str, Any], timestamp: float):
+        self.track_id = track_id
+        self.class_id = detection["class_id"]
+        self.class_name = detection["class_name"]
+        self.confidence = detection["confidence"]
+        self.max_confidence = detection["confidence"]
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.hits = 1
+        self.lost_frames = 0  # Frames since the last matched detection
+        self.missed = False  # The latest detection pass did not match this track
+        self.path: List[List[float]] = []
+
+        measurement = _to_xywh(detection["bbox"])
+        self.mean = np.concatenate([measurement, np.zeros(4)])
+        scale = max(measurement[2], measurement[3], 1.0)
+        self.covariance = np.diag([scale] * 4 + [10 * scale] * 4) ** 2 / 100
+        self._record_path(timestamp)
+
+    @property
+    def bbox(self) -> List[float]:
+        cx, cy, w, h = self.mean[:4]
+        return [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+
+    def _noise(self, weight: float) -> np.ndarray:
+        scale = max(self.mean[2], self.mean[3], 1.0) * weight
+        return np.diag([scale] * 4)
+
+    def predict(self):
+        self.mean = _F @ self.mean
+        self.mean[2:4] = np.maximum(self.mean[2:4], 1.0)
+        process_noise = np.zeros((8, 8))
+        process_noise[:4, :4] = self._noise(0.05) ** 2
+        process_noise[4:, 4:] = self._noise(0.01) ** 2
+        self.covariance = _F @ self.covariance @ _F.T + process_noise
+
+    def update(self, detection: Dict[str, Any], timestamp: float):
+        measurement = _to_xywh(detection["bbox"])
+        innovation_covariance = _H @ self.covariance @ _H.T + self._noise(0.05) ** 2
+        gain = self.covariance @ _H.T @ np.linalg.inv(innovation_covariance)
+        self.mean = self.mean + gain @ (measurement - _H @ self.mean)
+        self.covariance = (np.eye(8) - gain @ _H) @ self.covariance
+
+        self.confidence = detection["confidence"]
+        self.max_confidence = max(self.max_confidence, detection["confidence"])
+        self.last_seen = timestamp
+        self.hits += 1
+        self.lost_frames = 0
+        self.missed = False
+        self._record_path(timestamp)
+
+    def _record_path(self, timestamp: float):
+        """Keep one centroid per TRACK_PATH_INTERVAL, halving the resolution when the path is full."""
+        if self.path and timestamp - self.path[-1][0] < settings.TRACK_PATH_INTERVAL:
+            return
+        cx, cy = self.mean[:2]
+        self.path.append([timestamp, round(float(cx), 1), round(float(cy), 1)])
+        if len(self.path) > settings.TRACK_PATH_MAX_POINTS:
+            self.path = self.path[::2] + ([self.path[-1]] if len(self.path) % 2 == 0 else [])
+
+    def as_detection(self) -> Dict[str, Any]:
+        return {
+            "bbox": self.bbox,
+            "confidence": self.confidence,
+            "class_name": self.class_name,
+            "class_id": self.class_id,
+            "track_id": self.track_id,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the persisted form of the track."""
+        return {
+            "track_id": self.track_id,
+            "class_name": self.class_name,
+            "confidence": self.max_confidence,
+            "hits": self.hits,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "path": self.path,
+        }
+
+
+class MultiObjectTracker:
+    """
+    ByteTrack-style multi-object tracker.
+
+    High confidence detections are matched to all tracks by IoU first; the
+    tracks left over then get a second chance against low confidence
+    detections, which keeps objects through partial occlusion. Only boxes of
+    the same class are matched. Between detection passes predict() advances
+    every track with its Kalman filter, so detection can run every Nth frame.
+    Tracks unseen for TRACK_MAX_LOST_FRAMES frames finish and are handed out
+    by pop_finished() for per-track persistence.
+    """
+
+    def __init__(
+        self,
+        high_threshold: float = settings.TRACK_HIGH_THRESHOLD,
+        low_threshold: float = settings.TRACK_LOW_THRESHOLD,
+        match_iou: float = settings.TRACK_MATCH_IOU,
+        max_lost_frames: int = settings.TRACK_MAX_LOST_FRAMES,
+        min_hits: int = settings.TRACK_MIN_HITS,
+    ):
+        self.high_threshold = high_threshold
+        self.low_threshold = low_threshold
+        self.match_iou = match_iou
+        self.max_lost_frames = max_lost_frames
+        self.min_hits = min_hits
+        self.tracks: List[Track] = []
+        self._finished: List[Track] = []
+        self._ids = itertools.count(1)
+
+    def predict(self) -> List[Dict[str, Any]]:
+        """Advance all tracks by one frame without a detection pass."""
+        for track in self.tracks:
+            track.predict()
+            track.lost_frames += 1
+        self._expire()
+        return self.active_tracks()
+
+    def update(self, detections: List[Dict[str, Any]], timestamp: float) -> List[Dict[str, Any]]:
+        """
+        Advance all tracks by one frame and associate a detection pass.
+
+        Args:
+            detections: Detections as returned by ObjectDetectionService.detect
+            timestamp: Capture time of the frame
+
+        Returns:
+            The confirmed tracks as detections with a track_id.
+        """
+        for track in self.tracks:
+            track.predict()
+
+        high = [d for d in detections if d["confidence"] >= self.high_threshold]
+        low = [d for d in detections if self.low_threshold <= d["confidence"] < self.high_threshold]
+
+        unmatched_tracks = self._associate(self.tracks, high, timestamp, new_tracks=True)
+        unmatched_tracks = self._associate(unmatched_tracks, low, timestamp, new_tracks=False)
+        for track in unmatched_tracks:
+            track.lost_frames += 1
+            track.missed = True
+        self._expire()
+        return self.active_tracks()
+
+    def _associate(self, tracks: List[Track], detections: List[Dict[str, Any]],
+                   timestamp: float, new_tracks: bool) -> List[Track]:
+        track_boxes = np.array([track.bbox for track in tracks]).reshape(-1, 4)
+        detection_boxes = np.array([d["bbox"] for d in detections], dtype=float).reshape(-1, 4)
+        scores = iou_matrix(track_boxes, detection_boxes)
+        if scores.size:
+            same_class = (
+                np.array([track.class_id for track in tracks])[:, None]
+                == np.array([d["class_id"] for d in detections])[None, :]
+            )
+            scores = scores * same_class
+
+        matches, unmatched_rows, unmatched_columns = greedy_match(scores, self.match_iou)
+        for row, column in matches:
+            tracks[row].update(detections[column], timestamp)
+        if new_tracks:
+            for column in unmatched_columns:
+                self.tracks.append(Track(next(self._ids), detections[column], timestamp))
+        return [tracks[row] for row in unmatched_rows]
+
+    def _expire(self):
+        alive = []
+        for track in self.tracks:
+            if track.lost_frames > self.max_lost_frames:
+                if track.hits >= self.min_hits:
+                    self._finished.append(track)
+            else:
+                alive.append(track)
+        self.tracks = alive
+
+    def active_tracks(self) -> List[Dict[str, Any]]:
+        """Return the confirmed tracks seen in the latest detection pass or predicted since."""
+        return [
+            track.as_detection() for track in self.tracks
+            if track.hits >= self.min_hits and not track.missed
+        ]
+
+    def pop_finished(self) -> List[Dict[str, Any]]:
+        """Return and forget the summaries of finished tracks."""
+        finished, self._finished = self._finished, []
+        return [track.summary() for track in finished]
+
+    def finish_all(self) -> List[Dict[str, Any]]:
+        """Finish every track, e.g. when the stream stops, and return all summaries."""
+        self._finished.extend(track for track in self.tracks if track.hits >= self.min_hits)
+        self.tracks = []
+        return self.pop_finished()
@@ -0,0 +1,216 @@
+import fcntl
+import os
+import struct
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+SYSFS_VIDEO4LINUX = "/sys/class/video4linux"
+UDEV_DATA_DIR = "/run/udev/data"
+
+# ioctl request encoding from <asm-generic/ioctl.h>
+_IOC_WRITE = 1
+_IOC_READ = 2
+
+
+def _ioc(direction: int, nr: int, size: int) -> int:
+    return (direction << 30) | (size << 16) | (ord("V") << 8) | nr
+
+
+# struct v4l2_capability: driver[16] card[32] bus_info[32] version capabilities device_caps reserved[3]
+V4L2_CAPABILITY = struct.Struct("<16s32s32sIII12x")
+# struct v4l2_fmtdesc: index type flags description[32] pixelformat mbus_code reserved[3]
+V4L2_FMTDESC = struct.Struct("<III32sII12x")
+# struct v4l2_frmsizeenum: index pixel_format type union{discrete|stepwise}[24] reserved[2]
+V4L2_FRMSIZEENUM = struct.Struct("<III24s8x")
+
+VIDIOC_QUERYCAP = _ioc(_IOC_READ, 0, V4L2_CAPABILITY.size)
+VIDIOC_ENUM_FMT = _ioc(_IOC_READ | _IOC_WRITE, 2, V4L2_FMTDESC.size)
+VIDIOC_ENUM_FRAMESIZES = _ioc(_IOC_READ | _IOC_WRITE, 74, V4L2_FRMSIZEENUM.size)
+
+V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+V4L2_BUF_TYPE_VIDEO_CAPTURE_MPLANE = 9
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_VIDEO_CAPTURE_MPLANE = 0x00001000
+V4L2_CAP_DEVICE_CAPS = 0x80000000
+V4L2_FRMSIZE_TYPE_DISCRETE = 1
+V4L2_FRMSIZE_TYPE_STEPWISE = 3
+
+# Enumeration stops at EINVAL; cap the loops in case a driver misbehaves
+_MAX_ENUM = 256
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _cstr(raw: bytes) -> str:
+    return raw.split(b"\0", 1)[0].decode(errors="replace").strip()
+
+
+def query_capabilities(fd: int) -> Dict[str, Any]:
+    """
+    Run VIDIOC_QUERYCAP on an open V4L2 device.
+
+    Returns:
+        Driver, card and bus info, whether the node captures video and
+        whether it does so only through the multi-planar API.
+    """
+    buffer = bytearray(V4L2_CAPABILITY.size)
+    fcntl.ioctl(fd, VIDIOC_QUERYCAP, buffer)
+    driver, card, bus_info, _, capabilities, device_caps = V4L2_CAPABILITY.unpack(buffer)
+    caps = device_caps if capabilities & V4L2_CAP_DEVICE_CAPS else capabilities
+    return {
+        "driver": _cstr(driver),
+        "card": _cstr(card),
+        "bus_info": _cstr(bus_info),
+        "is_capture": bool(caps & (V4L2_CAP_VIDEO_CAPTURE | V4L2_CAP_VIDEO_CAPTURE_MPLANE)),
+        "is_multiplanar": bool(caps & V4L2_CAP_VIDEO_CAPTURE_MPLANE) and not caps & V4L2_CAP_VIDEO_CAPTURE,
+    }
+
+
+def _ioctl_enum(fd: int, request: int, buffer: bytearray) -> bool:
+    try:
+        fcntl.ioctl(fd, request, buffer)
+        return True
+    except OSError:
+        return False
+
+
+def enumerate_frame_sizes(fd: int, buffer_type: int = V4L2_BUF_TYPE_VIDEO_CAPTURE) -> List[Tuple[int, int]]:
+    """
+    List the frame sizes of every capture pixel format with ENUM_FMT/ENUM_FRAMESIZES.
+
+    Stepwise ranges are reported by their minimum and maximum sizes.
+
+    Args:
+        buffer_type: V4L2_BUF_TYPE_VIDEO_CAPTURE_MPLANE for multi-planar devices
+
+    Returns:
+        A list of (width, height) tuples in driver order, per pixel format.
+    """
+    resolutions = []
+    for format_index in range(_MAX_ENUM):
+        fmtdesc = bytearray(V4L2_FMTDESC.pack(format_index, buffer_type, 0, b"", 0, 0))
+        if not _ioctl_enum(fd, VIDIOC_ENUM_FMT, fmtdesc):
+            break
+        pixel_format = V4L2_FMTDESC.unpack(fmtdesc)[4]
+
+        for size_index in range(_MAX_ENUM):
+            frmsize = bytearray(V4L2_FRMSIZEENUM.pack(size_index, pixel_format, 0, b""))
+            if not _ioctl_enum(fd, VIDIOC_ENUM_FRAMESIZES, frmsize):
+                break
+            _, _, size_type, union = V4L2_FRMSIZEENUM.unpack(frmsize)
+            if size_type == V4L2_FRMSIZE_TYPE_DISCRETE:
+                resolutions.append(struct.unpack_from("<II", union))
+            else:
+                min_w, max_w, _, min_h, max_h, _ = struct.unpack_from("<6I", union)
+                resolutions.extend([(min_w, min_h), (max_w, max_h)])
+                break
+    return resolutions
+
+
+def read_udev_properties(major_minor: str, udev_dir: str = UDEV_DATA_DIR) -> Dict[str, str]:
+    """
+    Read a character device's properties from the udev database.
+
+    Args:
+        major_minor: Device number as found in sysfs ``dev`` (e.g. "81:0")
+        udev_dir: udev database directory
+
+    Returns:
+        The ``E:`` properties (e.g. ID_VENDOR_ID) of the device.
+    """
+    properties = {}
+    content = _read_text(os.path.join(udev_dir, f"c{major_minor}"))
+    for line in (content or "").splitlines():
+        if line.startswith("E:") and "=" in line:
+            key, value = line[2:].split("=", 1)
+            properties[key] = value
+    return properties
+
+
+def _find_usb_id(device_dir: str) -> Optional[str]:
+    """Walk up the sysfs device tree to the USB device holding idVendor/idProduct."""
+    path = os.path.realpath(device_dir)
+    while path not in ("/", ""):
+        vendor = _read_text(os.path.join(path, "idVendor"))
+        product = _read_text(os.path.join(path, "idProduct"))
+        if vendor and product:
+            return f"{vendor}:{product}"
+        path = os.path.dirname(path)
+    return None
+
+
+def read_device_metadata(
+    device_id: int,
+    sysfs_dir: str = SYSFS_VIDEO4LINUX,
+    udev_dir: str = UDEV_DATA_DIR,
+    dev_dir: str = "/dev",
+) -> Optional[Dict[str, Any]]:
+    """
+    Collect a video device's metadata from sysfs, udev and V4L2 ioctls.
+
+    No subprocess is spawned and every source is read once per device. The
+    ioctls only query the device, they do not start streaming, so this is
+    safe while the camera is in use.
+
+    Args:
+        device_id: The ID of the video device (e.g., 0 for /dev/video0).
+
+    Returns:
+        A dictionary with name, physical_address, usb_id, friendly_name,
+        supported_resolutions and is_capture, or None if the device does not
+        exist. is_capture is None when the device could not be queried.
+    """
+    node_dir = os.path.join(sysfs_dir, f"video{device_id}")
+    if not os.path.isdir(node_dir):
+        return None
+
+    sysfs_root = os.path.dirname(os.path.dirname(os.path.normpath(sysfs_dir)))
+    devpath = os.path.realpath(node_dir)
+    if devpath.startswith(os.path.realpath(sysfs_root) + os.sep):
+        devpath = devpath[len(os.path.realpath(sysfs_root)):]
+
+    major_minor = _read_text(os.path.join(node_dir, "dev"))
+    udev = read_udev_properties(major_minor, udev_dir) if major_minor else {}
+
+    usb_id = None
+    if udev.get("ID_VENDOR_ID") and udev.get("ID_MODEL_ID"):
+        usb_id = f"{udev['ID_VENDOR_ID']}:{udev['ID_MODEL_ID']}"
+    else:
+        usb_id = _find_usb_id(os.path.join(node_dir, "device"))
+
+    metadata = {
+        "name": _read_text(os.path.join(node_dir, "name")) or f"Camera {device_id}",
+        "physical_address": devpath,
+        "usb_id": usb_id,
+        "friendly_name": udev.get("ID_MODEL_FROM_DATABASE") or udev.get("ID_MODEL"),
+        "supported_resolutions": [],
+        "is_capture": None,
+    }
+
+    try:
+        fd = os.open(os.path.join(dev_dir, f"video{device_id}"), os.O_RDWR | os.O_NONBLOCK)
+    except OSError:
+        return metadata
+    try:
+        capabilities = query_capabilities(fd)
+        metadata["name"] = capabilities["card"] or metadata["name"]
+        metadata["is_capture"] = capabilities["is_capture"]
+        if capabilities["is_capture"]:
+            buffer_type = (
+                V4L2_BUF_TYPE_VIDEO_CAPTURE_MPLANE if capabilities["is_multiplanar"] else V4L2_BUF_TYPE_VIDEO_CAPTURE
+            )
+            metadata["supported_resolutions"] = enumerate_frame_sizes(fd, buffer_type)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+    return metadata
@@ -0,0 +1,50 @@
+import struct
+from unittest import TestCase
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+from src.main import app
+
+
+class NotReadyPool:
+    """An inference pool whose workers have not loaded the model."""
+
+    @property
+    def class_names(self):
+        raise RuntimeError("No inference worker for yolov8n.pt has loaded the model")
+
+
+class DetectEndpointTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up resources shared across all tests."""
+        cls.client = TestClient(app)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Clean up resources shared across all tests."""
+        cls.client = None
+        super().tearDownClass()
+
+    def test_model_not_loaded_is_unavailable(self):
+        """Test that a batch request while the inference workers are not ready is answered with 503."""
+        # Arrange
+        image = cv2.imencode(".png", np.zeros((8, 8, 3), dtype=np.uint8))[1].tobytes()
+        body = struct.pack("<I", len(image)) + image
+
+        # Act
+        with patch("src.api.endpoints.detect.get_detection_service", return_value=NotReadyPool()):
+            response = self.client.post(
+                "/api/v1/detect/batch", content=body, headers={"Content-Type": "application/octet-stream"}
+            )
+
+        # Assert
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("has loaded the model", response.json()["detail"])
+
+        # Clean
+        # No specific cleanup required for this test.
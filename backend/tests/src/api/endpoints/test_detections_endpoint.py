@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+from fastapi.testclient import TestClient
+from src.db.session import get_db
+from src.main import app
+from src.models.camera import Camera
+from src.models.detection import Detection
+from src.models.detection_cell import DetectionCell
+from src.models.stream import Stream
+from src.services.config_cache import config_cache
+from src.services.spatial_index import query_area
+
+DETECTIONS = [{"class_name": "person", "confidence": 0.9, "bbox": [100.0, 50.0, 180.0, 250.0]}]
+
+
+class DetectionsEndpointTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up resources shared across all tests."""
+        cls.client = TestClient(app)
+        cls.db = next(get_db())
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Clean up resources shared across all tests."""
+        cls.client = None
+        cls.db = None
+        super().tearDownClass()
+
+    def setUp(self):
+        """Set up a camera and one of its streams."""
+        super().setUp()
+        config_cache.clear()
+        self.camera = Camera(name="Detected camera", camera_type="rtsp", rtsp_url="rtsp://camera/detected")
+        self.db.add(self.camera)
+        self.db.commit()
+        self.stream = Stream(camera_id=self.camera.id, status="active", stream_metadata={})
+        self.db.add(self.stream)
+        self.db.commit()
+
+    def tearDown(self) -> None:
+        """Clean up the detections, the stream and the camera."""
+        self.db.query(DetectionCell).filter_by(camera_id=self.camera.id).delete()
+        self.db.query(Detection).filter_by(camera_id=self.camera.id).delete()
+        self.db.delete(self.stream)
+        self.db.delete(self.camera)
+        self.db.commit()
+        super().tearDown()
+
+    def test_created_detection_is_indexed(self):
+        """Test that a detection made off the event loop is stored and found by an area query."""
+        # Arrange
+        payload = {"camera_id": self.camera.id, "stream_id": self.stream.id, "frame_number": 7}
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        loops = []
+
+        def detect(frame):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)  # Running in a worker thread
+            return DETECTIONS
+
+        # Act
+        with patch("src.api.endpoints.detections.CameraService.process_stream", return_value=frame), \
+                patch("src.api.endpoints.detections.detection_service.detect", side_effect=detect):
+            response = self.client.post("/api/v1/detections/", json=payload)
+        now = datetime.utcnow()
+        rows, truncated = query_area(
+            self.db, self.camera.id, [(90, 40), (200, 40), (200, 100), (90, 100)],
+            now - timedelta(minutes=1), now + timedelta(minutes=1),
+        )
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(loops, [None])
+        self.assertEqual(body["class_name"], "person")
+        self.assertEqual(body["metadata"], {"detections": DETECTIONS})
+        self.assertEqual([row.id for row in rows], [body["id"]])
+        self.assertFalse(truncated)
+
+        # Clean
+        # No specific cleanup required for this test.
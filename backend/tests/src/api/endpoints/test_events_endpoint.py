@@ -0,0 +1,78 @@
+import asyncio
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+from fastapi import WebSocketDisconnect
+from starlette.websockets import WebSocketState
+
+from src.api.endpoints.events import stream_events_ws
+from src.services.events import EventSubscription
+
+
+class FakeWebSocket:
+    """Disconnects when it is read, after a delay, recording what was sent before."""
+
+    def __init__(self, send_error: Exception = None, receive_delay: float = 0.0):
+        self.client_state = WebSocketState.CONNECTED
+        self.sent = []
+        self.send_error = send_error
+        self.receive_delay = receive_delay
+
+    async def accept(self):
+        pass
+
+    async def receive(self):
+        if self.receive_delay:
+            await asyncio.sleep(self.receive_delay)
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def send_text(self, text: str):
+        if self.send_error is not None:
+            raise self.send_error
+        self.sent.append(json.loads(text))
+
+    async def close(self, code: int = 1000, reason: str = None):
+        self.client_state = WebSocketState.DISCONNECTED
+
+
+def subscribe_with_alarm(event_filter) -> EventSubscription:
+    subscription = EventSubscription(event_filter)
+    subscription.offer({"type": "alarm", "alarm_id": 1, "camera_id": 1, "timestamp": 100.0})
+    return subscription
+
+
+class EventsWebSocketTests(TestCase):
+
+    def test_batch_taken_with_disconnect_is_sent(self):
+        """Test that a batch ready together with the client's message is sent, not dropped."""
+        # Arrange
+        websocket = FakeWebSocket()
+
+        # Act
+        with patch("src.api.endpoints.events.event_bus.subscribe", side_effect=subscribe_with_alarm):
+            asyncio.run(stream_events_ws(websocket, camera_id=None, class_name=None, db=None))
+
+        # Assert
+        self.assertEqual(len(websocket.sent), 1)
+        self.assertEqual(websocket.sent[0]["events"][0]["alarm_id"], 1)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_disconnect_while_sending_is_not_an_error(self):
+        """Test that a client gone during send_text ends the subscription without logging an error."""
+        # Arrange
+        websocket = FakeWebSocket(send_error=WebSocketDisconnect(code=1006), receive_delay=1.0)
+
+        # Act
+        with patch("src.api.endpoints.events.event_bus.subscribe", side_effect=subscribe_with_alarm), \
+                self.assertNoLogs("src.api.endpoints.events", level="ERROR"):
+            asyncio.run(stream_events_ws(websocket, camera_id=None, class_name=None, db=None))
+
+        # Assert
+        self.assertEqual(websocket.sent, [])
+        self.assertEqual(websocket.client_state, WebSocketState.DISCONNECTED)
+
+        # Clean
+        # No specific cleanup required for this test.
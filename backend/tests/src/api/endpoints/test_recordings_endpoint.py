@@ -0,0 +1,83 @@
+import os
+import stat
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from src.db.session import get_db
+from src.main import app
+from src.models.camera import Camera
+from src.services.config_cache import config_cache
+
+
+class RecordingsEndpointTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up resources shared across all tests."""
+        cls.db = next(get_db())
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Clean up resources shared across all tests."""
+        cls.db = None
+        super().tearDownClass()
+
+    def setUp(self):
+        """Set up a recordings directory and a stand-in for ffmpeg that runs until it is terminated."""
+        super().setUp()
+        config_cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.ffmpeg = os.path.join(self.directory.name, "ffmpeg")
+        with open(self.ffmpeg, "w") as file:
+            file.write("#!/bin/sh\nexec sleep 30\n")
+        os.chmod(self.ffmpeg, os.stat(self.ffmpeg).st_mode | stat.S_IEXEC)
+        self.camera = Camera(name="Recorded camera", camera_type="rtsp", rtsp_url="rtsp://camera/recorded")
+        self.db.add(self.camera)
+        self.db.commit()
+
+    def tearDown(self) -> None:
+        """Clean up the camera and the recordings directory."""
+        self.db.delete(self.camera)
+        self.db.commit()
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_start_and_stop_recording(self):
+        """Test that starting a recording runs a recorder on the server's event loop until it is stopped."""
+        # Arrange
+        url = f"/api/v1/recordings/{self.camera.id}"
+
+        # Act
+        with patch("src.services.recording.settings.FFMPEG_BINARY", self.ffmpeg), \
+                patch("src.services.recording.settings.RECORDINGS_DIR", self.directory.name), \
+                TestClient(app) as client:
+            started = client.post(f"{url}/start")
+            status = client.get(url)
+            stopped = client.post(f"{url}/stop")
+
+        # Assert
+        self.assertEqual(started.status_code, 200, started.text)
+        self.assertEqual(started.json()["status"], "recording")
+        self.assertEqual(status.json()["status"], "recording")
+        self.assertEqual(stopped.json()["status"], "stopped")
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_start_without_ffmpeg(self):
+        """Test that starting a recording without ffmpeg is refused."""
+        # Arrange
+        url = f"/api/v1/recordings/{self.camera.id}/start"
+
+        # Act
+        with patch("src.services.recording.settings.FFMPEG_BINARY", os.path.join(self.directory.name, "missing")):
+            response = TestClient(app).post(url)
+
+        # Assert
+        self.assertEqual(response.status_code, 400)
+
+        # Clean
+        # No specific cleanup required for this test.
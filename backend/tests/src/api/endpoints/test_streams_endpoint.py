@@ -6,6 +6,7 @@ from src.db.session import get_db
 from src.main import app
 from src.models.camera import Camera
 from src.models.stream import Stream
+from src.services.config_cache import config_cache
 
 
 class StreamsEndpointTests(TestCase):
@@ -27,6 +28,8 @@ class StreamsEndpointTests(TestCase):
     def setUp(self):
         """Set up resources for each individual test."""
         super().setUp()
+        # The tests write to the database directly, past the cache invalidation of the endpoints
+        config_cache.clear()
 
     def tearDown(self) -> None:
         """Clean up resources for each individual test."""
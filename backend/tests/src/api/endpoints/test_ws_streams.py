@@ -5,6 +5,7 @@ from src.db.session import get_db
 from src.main import app
 from src.models.camera import Camera
 from src.models.stream import Stream
+from src.services.config_cache import config_cache
 
 
 class WSStreamTests(TestCase):
@@ -25,6 +26,8 @@ class WSStreamTests(TestCase):
     def setUp(self):
         """Set up resources for each individual test."""
         super().setUp()
+        # The tests write to the database directly, past the cache invalidation of the endpoints
+        config_cache.clear()
 
     def tearDown(self) -> None:
         """Clean up resources for each individual test."""
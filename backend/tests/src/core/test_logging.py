@@ -0,0 +1,93 @@
+import json
+import logging
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.core.logging import JsonFormatter
+from src.core.logging import RateLimitFilter
+from src.core.logging import SampleFilter
+from src.core.logging import parse_logger_rates
+
+
+def make_record(level: int = logging.INFO, message: str = "frame %d", *args, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("src.services.streaming", level, "streaming.py", 10, message, args or (1,), None)
+    record.__dict__.update(extra)
+    return record
+
+
+class LoggingTests(TestCase):
+
+    def test_rate_limit_suppresses_and_reports_count(self):
+        """Test that records over the rate are dropped and the next one reports them."""
+        # Arrange
+        log_filter = RateLimitFilter(rate=1.0, burst=2)
+
+        # Act
+        with patch("src.core.logging.time.monotonic", return_value=100.0):
+            log_filter._updated = 100.0
+            passed = [log_filter.filter(make_record()) for _ in range(5)]
+            warning = log_filter.filter(make_record(logging.WARNING))
+        with patch("src.core.logging.time.monotonic", return_value=101.0):
+            record = make_record()
+            after_refill = log_filter.filter(record)
+
+        # Assert
+        self.assertEqual(passed, [True, True, False, False, False])
+        self.assertTrue(warning)
+        self.assertTrue(after_refill)
+        self.assertEqual(record.suppressed, 3)
+        self.assertEqual(record.getMessage(), "frame 1 (3 records suppressed)")
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_sampling_keeps_warnings(self):
+        """Test that sampling drops info records but never warnings."""
+        # Arrange
+        log_filter = SampleFilter(rate=0.0)
+
+        # Act
+        info = log_filter.filter(make_record())
+        warning = log_filter.filter(make_record(logging.WARNING))
+
+        # Assert
+        self.assertFalse(info)
+        self.assertTrue(warning)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_json_formatter_includes_extra_fields(self):
+        """Test that JSON output has the standard fields and values passed with extra."""
+        # Arrange
+        record = make_record(logging.ERROR, "camera %s lost", "4", camera_id=4)
+
+        # Act
+        entry = json.loads(JsonFormatter().format(record))
+
+        # Assert
+        self.assertEqual(entry["level"], "ERROR")
+        self.assertEqual(entry["logger"], "src.services.streaming")
+        self.assertEqual(entry["message"], "camera 4 lost")
+        self.assertEqual(entry["camera_id"], 4)
+        self.assertNotIn("args", entry)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_parse_logger_rates(self):
+        """Test parsing of logger=number lists."""
+        # Arrange
+        spec = "src.services.streaming=10, uvicorn.access=0.1,"
+
+        # Act
+        rates = parse_logger_rates(spec)
+
+        # Assert
+        self.assertEqual(rates, {"src.services.streaming": 10.0, "uvicorn.access": 0.1})
+        self.assertEqual(parse_logger_rates(""), {})
+        with self.assertRaises(ValueError):
+            parse_logger_rates("uvicorn.access")
+
+        # Clean
+        # No specific cleanup required for this test.
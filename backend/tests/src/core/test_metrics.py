@@ -0,0 +1,78 @@
+import threading
+from unittest import TestCase
+
+from src.core.metrics import Counter
+from src.core.metrics import Gauge
+from src.core.metrics import Histogram
+from src.core.metrics import Registry
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        """Set up resources for each individual test."""
+        super().setUp()
+        self.registry = Registry()
+
+    def test_counter_sums_increments_from_all_threads(self):
+        """Test that per-thread shards add up without losing updates."""
+        # Arrange
+        counter = Counter("frames_total", "Frames.", ("camera",), registry=self.registry)
+        child = counter.labels(1)
+
+        def work():
+            for _ in range(10000):
+                child.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+
+        # Act
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        self.assertEqual(child.value, 40000)
+        self.assertIs(counter.labels("1"), child)
+        self.assertIn('frames_total{camera="1"} 40000', self.registry.render())
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_histogram_exposition(self):
+        """Test that buckets are cumulative and include +Inf, sum and count."""
+        # Arrange
+        histogram = Histogram("latency_seconds", "Latency.", ("model",), buckets=(0.1, 1.0), registry=self.registry)
+
+        # Act
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.labels("yolo").observe(value)
+        output = self.registry.render()
+
+        # Assert
+        self.assertIn('latency_seconds_bucket{model="yolo",le="0.1"} 1', output)
+        self.assertIn('latency_seconds_bucket{model="yolo",le="1"} 3', output)
+        self.assertIn('latency_seconds_bucket{model="yolo",le="+Inf"} 4', output)
+        self.assertIn('latency_seconds_sum{model="yolo"} 6.05', output)
+        self.assertIn('latency_seconds_count{model="yolo"} 4', output)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_gauge_function_is_evaluated_at_scrape(self):
+        """Test that callback gauges report the current value."""
+        # Arrange
+        queue = [1, 2]
+        gauge = Gauge("queue_depth", "Depth.", registry=self.registry)
+        gauge.labels().set_function(lambda: len(queue))
+
+        # Act
+        queue.append(3)
+
+        # Assert
+        self.assertIn("queue_depth 3", self.registry.render())
+        self.assertIn("process_cpu_seconds_total", self.registry.render())
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,69 @@
+import asyncio
+from unittest import TestCase
+
+from src.core import tracing
+from src.core.tracing import frame_trace
+from src.core.tracing import span
+
+
+class TracingTests(TestCase):
+
+    def setUp(self):
+        """Set up resources for each individual test."""
+        super().setUp()
+        self.previous_rate = tracing.tracer.sample_rate
+        tracing.tracer.clear()
+
+    def tearDown(self):
+        """Clean up resources after each test."""
+        tracing.tracer.sample_rate = self.previous_rate
+        tracing.tracer.clear()
+        super().tearDown()
+
+    def test_sampled_frame_records_stages_across_threads(self):
+        """Test that spans in worker threads belong to the frame that started them."""
+        # Arrange
+        tracing.tracer.sample_rate = 1.0
+
+        def inference():
+            with span("inference"):
+                pass
+
+        async def run_frame():
+            with frame_trace("frame", camera=1, sequence=7):
+                await asyncio.to_thread(inference)
+                with span("encode"):
+                    pass
+
+        # Act
+        asyncio.run(run_frame())
+        events = [event for event in tracing.tracer.export_chrome_trace()["traceEvents"] if event["ph"] == "X"]
+
+        # Assert
+        self.assertEqual([event["name"] for event in events], ["inference", "encode", "frame"])
+        self.assertTrue(all(event["args"] == {"camera": 1, "sequence": 7} for event in events))
+        frame = events[-1]
+        for event in events[:-1]:
+            self.assertGreaterEqual(event["ts"], frame["ts"])
+            self.assertLessEqual(event["ts"] + event["dur"], frame["ts"] + frame["dur"])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_unsampled_frames_record_nothing(self):
+        """Test that stages are free when the frame is not sampled."""
+        # Arrange
+        tracing.tracer.sample_rate = 0.0
+
+        # Act
+        with frame_trace("frame"):
+            with span("encode"):
+                pass
+        with span("outside"):
+            pass
+
+        # Assert
+        self.assertEqual(len(tracing.tracer), 0)
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,160 @@
+import os
+import socket
+import subprocess
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from datetime import timedelta
+from unittest import TestCase
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from src.db import init_db  # noqa: F401, imports every model so the mappers can be configured
+from src.models.analysis_job import AnalysisJob
+from src.services.batch_analysis import BatchAnalysisService
+from src.services.batch_analysis import plan_chunks
+
+
+class FakeSession:
+    """Hands out one job and ignores commits, in place of a database session."""
+
+    def __init__(self, job: AnalysisJob):
+        self.job = job
+
+    def get(self, model, job_id):
+        return self.job
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    """Returns the given futures in submission order."""
+
+    def __init__(self, futures):
+        self.futures = iter(futures)
+        self.shutdown = MagicMock()
+
+    def submit(self, *args):
+        return next(self.futures)
+
+
+class BatchAnalysisTests(TestCase):
+
+    def test_chunks_start_at_keyframes(self):
+        """Test that chunks start at the first keyframe at least chunk_seconds after the previous start."""
+        # Arrange
+        keyframes = [0.0, 2.0, 4.0, 6.0, 8.0, 10.0, 12.0, 14.0]
+
+        # Act
+        chunks = plan_chunks(15.0, keyframes, 5.0)
+
+        # Assert
+        self.assertEqual(chunks, [(0.0, 6.0), (6.0, 12.0), (12.0, 15.0)])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_chunks_without_keyframes(self):
+        """Test fixed-time chunks when keyframes are unknown and a single chunk for unknown durations."""
+        # Arrange
+        duration = 25.0
+
+        # Act
+        chunks = plan_chunks(duration, None, 10.0)
+        unknown = plan_chunks(0.0, None, 10.0)
+
+        # Assert
+        self.assertEqual(chunks, [(0.0, 10.0), (10.0, 20.0), (20.0, 25.0)])
+        self.assertEqual(unknown, [(0.0, float("inf"))])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_job_progress_and_throughput(self):
+        """Test the progress and speed figures reported for a job."""
+        # Arrange
+        started = datetime(2026, 1, 1, 12, 0, 0)
+        job = AnalysisJob(
+            status="running",
+            duration=120.0,
+            video_seconds_processed=60.0,
+            frames_processed=1500,
+            started_at=started,
+            finished_at=started + timedelta(seconds=10),
+        )
+
+        # Act
+        progress = job.progress
+
+        # Assert
+        self.assertEqual(progress, 0.5)
+        self.assertEqual(job.frames_per_second, 150.0)
+        self.assertEqual(job.realtime_factor, 6.0)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_broken_pool_is_replaced_and_remaining_chunks_cancelled(self):
+        """Test that a job failing on a dead worker cancels its other chunks and drops the broken pool."""
+        # Arrange
+        job = AnalysisJob(id=1, file_path="video.mp4", detection_model_name="model", frame_step=1)
+        broken = Future()
+        broken.set_exception(BrokenProcessPool("A worker died"))
+        waiting = [Future(), Future()]
+        service = BatchAnalysisService(workers=1)
+        pool = service._executor = FakePool([broken] + waiting)
+        video = {"duration": 30.0, "fps": 25.0, "frames": 750, "keyframes": None}
+
+        # Act
+        with patch("src.services.batch_analysis.SessionLocal", return_value=FakeSession(job)), \
+                patch("src.services.batch_analysis.probe_video", return_value=video), \
+                patch("src.services.batch_analysis.settings.BATCH_CHUNK_SECONDS", 10.0):
+            service._run(1)
+
+        # Assert
+        self.assertEqual(job.status, "failed")
+        self.assertTrue(all(future.cancelled() for future in waiting))
+        self.assertIsNone(service._executor)
+        pool.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        self.assertEqual(service._running, set())
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_only_jobs_of_processes_that_are_gone_are_orphaned(self):
+        """Test that jobs of live workers are kept and jobs of exited or silent processes are orphaned."""
+        # Arrange
+        host = socket.gethostname()
+        exited = subprocess.Popen([sys.executable, "-c", "pass"])
+        exited.wait()
+        now = datetime.utcnow()
+        stale = now - timedelta(hours=1)
+        service = BatchAnalysisService(workers=1)
+        service._running.add(1)
+        jobs = {
+            "running here": AnalysisJob(id=1, owner=f"{host}:{os.getpid()}", heartbeat_at=now),
+            "left by this pid": AnalysisJob(id=2, owner=f"{host}:{os.getpid()}", heartbeat_at=now),
+            "other live worker": AnalysisJob(id=3, owner=f"{host}:{os.getppid()}", heartbeat_at=now),
+            "reused pid": AnalysisJob(id=8, owner=f"{host}:{os.getppid()}", heartbeat_at=stale),
+            "exited worker": AnalysisJob(id=4, owner=f"{host}:{exited.pid}", heartbeat_at=now),
+            "other host": AnalysisJob(id=5, owner="other-host:7", heartbeat_at=now),
+            "silent other host": AnalysisJob(id=6, owner="other-host:7", heartbeat_at=stale),
+            "pending": AnalysisJob(id=7, created_at=now),
+        }
+
+        # Act
+        orphaned = {name for name, job in jobs.items() if service._is_orphaned(job)}
+
+        # Assert
+        self.assertEqual(orphaned, {"left by this pid", "exited worker", "reused pid", "silent other host"})
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,72 @@
+import asyncio
+import struct
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from src.services.batch_detection import detect_uploads
+from src.services.batch_detection import split_length_prefixed
+
+
+class FakeDetectionService:
+    def __init__(self):
+        self.batches = []
+
+    def detect_batch(self, frames):
+        self.batches.append(len(frames))
+        return [
+            [{"bbox": [1.0, 2.0, float(frame.shape[1]), float(frame.shape[0])], "confidence": 0.9,
+              "class_name": "person", "class_id": 0}]
+            for frame in frames
+        ]
+
+
+def encode(width: int, height: int) -> bytes:
+    return cv2.imencode(".png", np.zeros((height, width, 3), dtype=np.uint8))[1].tobytes()
+
+
+class BatchDetectionTests(TestCase):
+
+    def test_split_length_prefixed(self):
+        """Test splitting a binary body into images and rejecting truncated bodies."""
+        # Arrange
+        body = struct.pack("<I", 3) + b"abc" + struct.pack("<I", 0) + struct.pack("<I", 2) + b"de"
+
+        # Act
+        images = split_length_prefixed(body)
+
+        # Assert
+        self.assertEqual([bytes(image) for image in images], [b"abc", b"", b"de"])
+        with self.assertRaises(ValueError):
+            split_length_prefixed(body + struct.pack("<I", 5) + b"xy")
+        with self.assertRaises(ValueError):
+            split_length_prefixed(body + b"\x01")
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_detect_uploads_batches_and_reports_bad_images(self):
+        """Test that images are analysed in batches and unreadable ones are reported, not analysed."""
+        # Arrange
+        service = FakeDetectionService()
+        uploads = [("a.png", encode(32, 16)), ("b.jpg", b"not an image"), (None, encode(8, 8))]
+
+        async def collect():
+            return [batch async for batch in detect_uploads(service, uploads, batch_size=2)]
+
+        # Act
+        batches = asyncio.run(collect())
+
+        # Assert
+        self.assertEqual(service.batches, [1, 1])
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        first, bad, last = batches[0] + batches[1]
+        self.assertEqual((first["index"], first["name"], first["width"], first["height"]), (0, "a.png", 32, 16))
+        self.assertEqual(first["x2"], [32.0])
+        self.assertEqual(bad["error"], "Not a readable image")
+        self.assertEqual(bad["class_id"], [])
+        self.assertEqual((last["index"], last["width"], last["error"]), (2, 8, None))
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,169 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.services.camera_inventory import CameraInventory
+from src.services.camera_inventory import parse_uevent
+from src.services.streaming import camera_stream_lockers
+from src.services.streaming import camera_stream_managers
+from src.services.streaming import local_device_probes
+
+METADATA = {
+    "name": "HD Webcam",
+    "physical_address": "/devices/pci0000:00/usb1/1-1/1-1:1.0/video4linux/video5",
+    "usb_id": "046d:0825",
+    "friendly_name": "Webcam C270",
+    "supported_resolutions": [(640, 480)],
+    "is_capture": True,
+}
+
+
+def uevent(action: str, devname: str, subsystem: str = "video4linux") -> bytes:
+    fields = [f"{action}@/devices/pci0000:00/usb1/1-1/1-1:1.0/video4linux/{devname}", f"ACTION={action}",
+              f"SUBSYSTEM={subsystem}", f"DEVNAME=/dev/{devname}", "SEQNUM=4711"]
+    return "\0".join(fields).encode()
+
+
+def probed(device_id: int):
+    return {
+        "device_id": device_id,
+        "resolution": (640, 480),
+        "physical_address": METADATA["physical_address"],
+        "usb_id": METADATA["usb_id"],
+    }
+
+
+class CameraInventoryTests(TestCase):
+
+    def setUp(self):
+        """Set up an inventory that is never started, probes are called directly."""
+        super().setUp()
+        self.inventory = CameraInventory(max_devices=8)
+
+    def tearDown(self) -> None:
+        """Remove the managers registered by the test."""
+        camera_stream_managers["local"].pop(5, None)
+        self.inventory._executor.shutdown()
+        super().tearDown()
+
+    def test_parse_uevent(self):
+        """Test that only add and remove events of video4linux nodes are reported."""
+        # Arrange
+        # No specific arrangement required for this test.
+
+        # Act
+        added = parse_uevent(uevent("add", "video5"))
+        removed = parse_uevent(uevent("remove", "video12"))
+        changed = parse_uevent(uevent("change", "video5"))
+        other_subsystem = parse_uevent(uevent("add", "sda", subsystem="block"))
+        media_node = parse_uevent(uevent("add", "media0"))
+
+        # Assert
+        self.assertEqual(added, ("add", 5))
+        self.assertEqual(removed, ("remove", 12))
+        self.assertIsNone(changed)
+        self.assertIsNone(other_subsystem)
+        self.assertIsNone(media_node)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_streaming_device_is_not_opened(self):
+        """Test that a device with an active manager is listed from its metadata and never probed."""
+        # Arrange
+        camera_stream_managers["local"][5] = SimpleNamespace(streamer=object(), subscribers=[object()])
+
+        # Act
+        metadata = patch("src.services.camera_inventory.CameraService.get_device_metadata", return_value=METADATA)
+        with patch("src.services.camera_inventory.CameraService.probe_local_camera") as probe, metadata as metadata:
+            self.inventory.probe(5)
+            self.inventory.probe(5)  # The entry is kept, metadata is not read again
+
+        # Assert
+        probe.assert_not_called()
+        metadata.assert_called_once_with(5)
+        cameras = self.inventory.snapshot()
+        self.assertEqual([camera["device_id"] for camera in cameras], [5])
+        self.assertEqual(cameras[0]["resolution"], [0, 0])
+        self.assertTrue(cameras[0]["is_available"])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_stopped_manager_does_not_block_probing(self):
+        """Test that a manager without a streamer does not keep the device from being probed."""
+        # Arrange
+        camera_stream_managers["local"][5] = SimpleNamespace(streamer=None, subscribers=[])
+
+        # Act
+        with patch("src.services.camera_inventory.CameraService.probe_local_camera", return_value=probed(5)):
+            self.inventory.probe(5)
+
+        # Assert
+        self.assertEqual(self.inventory.snapshot()[0]["resolution"], [640, 480])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_probe_marks_the_device_without_holding_the_stream_lock(self):
+        """Test that the device is marked as probed while it is open, and the stream lock stays free."""
+        # Arrange
+        lock = camera_stream_lockers["local"][5]
+        during_probe = []
+
+        def probe_local_camera(device_id):
+            locked = not lock.acquire(blocking=False)
+            if not locked:
+                lock.release()
+            during_probe.append((locked, device_id in local_device_probes))
+            return probed(device_id)
+
+        # Act
+        with patch("src.services.camera_inventory.CameraService.probe_local_camera", side_effect=probe_local_camera):
+            self.inventory.probe(5)
+
+        # Assert
+        self.assertEqual(during_probe, [(False, True)])
+        self.assertNotIn(5, local_device_probes)
+        self.assertEqual([camera["device_id"] for camera in self.inventory.snapshot()], [5])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_probe_waits_for_a_running_probe_of_the_device(self):
+        """Test that a second probe of a device only opens it once the first probe closed it."""
+        # Arrange
+        first_open = threading.Event()
+        release_first = threading.Event()
+        opens = []
+
+        def probe_local_camera(device_id):
+            opens.append(device_id)
+            if len(opens) == 1:
+                first_open.set()
+                release_first.wait(timeout=5)
+            return probed(device_id)
+
+        first = threading.Thread(target=self.inventory.probe, args=(5,))
+        second = threading.Thread(target=self.inventory.probe, args=(5,))
+
+        # Act
+        with patch("src.services.camera_inventory.CameraService.probe_local_camera", side_effect=probe_local_camera):
+            first.start()
+            first_open.wait(timeout=5)
+            second.start()
+            time.sleep(0.1)
+            opens_while_first_open = len(opens)
+            release_first.set()
+            first.join(timeout=5)
+            second.join(timeout=5)
+
+        # Assert
+        self.assertEqual(opens_while_first_open, 1)
+        self.assertEqual(opens, [5, 5])
+        self.assertNotIn(5, local_device_probes)
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import tempfile
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from src.services.clips import ClipService
+from src.services.clips import write_clip
+from src.services.events import AlarmRule
+from src.services.events import EventBus
+from src.services.preroll import PrerollBuffer
+
+
+def jpeg(value: int) -> bytes:
+    _, buffer = cv2.imencode(".jpg", np.full((48, 64, 3), value, dtype=np.uint8))
+    return buffer.tobytes()
+
+
+class FakeManager:
+    """A streaming camera with only a camera ID and a pre-roll buffer."""
+
+    def __init__(self, camera_id: int):
+        self.camera_id = camera_id
+        self.preroll = PrerollBuffer(max_seconds=60.0)
+
+
+class ClipsTests(TestCase):
+
+    def test_write_clip_plays_back_in_real_time(self):
+        """Test that a clip holds every decodable frame at the rate of the capture timestamps."""
+        # Arrange
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, "clip.mp4")
+        frames = [(100.0 + index * 0.1, jpeg(index * 20)) for index in range(11)]
+        frames.insert(5, (100.45, b"not a jpeg"))
+
+        # Act
+        fps = write_clip(path, frames)
+        capture = cv2.VideoCapture(path)
+        written = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        size = capture.get(cv2.CAP_PROP_FRAME_WIDTH), capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        capture.release()
+
+        # Assert
+        self.assertAlmostEqual(fps, 11 / 1.0)
+        self.assertEqual(written, 11)
+        self.assertEqual(size, (64, 48))
+
+        # Clean
+        directory.cleanup()
+
+    def test_save_adds_the_post_roll_to_the_snapshot(self):
+        """Test that a clip keeps its pre-roll snapshot and adds the frames captured until the post-roll ends."""
+        # Arrange
+        service = ClipService()
+        manager = FakeManager(camera_id=3)
+        event_time = time.time() - 10  # The post-roll is over, saving does not wait
+        for offset in range(-5, 6):
+            manager.preroll.append(event_time + offset, jpeg(0))
+        written = []
+
+        async def run():
+            service.trigger(manager, 11, event_time, pre_roll=2, post_roll=3)
+            manager.preroll.clear()  # Pre-roll frames aged out, the post-roll is still buffered
+            for offset in range(1, 6):
+                manager.preroll.append(event_time + offset, jpeg(0))
+            await asyncio.gather(*service._tasks)
+
+        # Act
+        with patch.object(ClipService, "_write", side_effect=lambda *args: written.append(args)):
+            asyncio.run(run())
+
+        # Assert
+        clip_id, camera_id, frames = written[0]
+        self.assertEqual((clip_id, camera_id), (11, 3))
+        self.assertEqual([round(timestamp - event_time) for timestamp, _ in frames], [-2, -1, 0, 1, 2, 3])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_fired_alarm_saves_a_clip(self):
+        """Test that an alarm firing on a streaming camera saves a clip linked to the alarm."""
+        # Arrange
+        service = ClipService()
+        manager = FakeManager(camera_id=1)
+        bus = EventBus()
+        bus._alarm_version = 0
+        bus._alarms = {1: [AlarmRule(7, "Gate", 1, "person", 0.6, None)]}
+        bus.on_alarm(service.trigger_alarm)
+        event_time = time.time() - 10
+        for offset in range(-3, 3):
+            manager.preroll.append(event_time + offset, jpeg(0))
+        person = {"class_name": "person", "class_id": 0, "confidence": 0.9, "bbox": [10, 10, 20, 20]}
+        written = []
+
+        async def run():
+            bus.publish_detections(1, 1, event_time, [person])
+            await asyncio.gather(*service._tasks)
+
+        # Act
+        with patch("src.services.events.config_cache.table_version", return_value=0), \
+                patch("src.services.clips.find_stream_manager", return_value=manager), \
+                patch("src.services.clips.settings.CLIP_POST_ROLL_SECONDS", 1.0), \
+                patch.object(ClipService, "_create", return_value=21) as create, \
+                patch.object(ClipService, "_write", side_effect=lambda *args: written.append(args)):
+            asyncio.run(run())
+
+        # Assert
+        create.assert_called_once_with(1, 7, event_time)
+        clip_id, camera_id, frames = written[0]
+        self.assertEqual((clip_id, camera_id), (21, 1))
+        self.assertEqual([round(timestamp - event_time) for timestamp, _ in frames], [-3, -2, -1, 0, 1])
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,102 @@
+from unittest import TestCase
+
+from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db import init_db  # noqa: F401, imports every model so the mappers can be configured
+from src.db.base_class import Base
+from src.models.camera import Camera
+from src.services.config_cache import ConfigCache
+
+
+class ConfigCacheTests(TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with two cameras and count its queries."""
+        super().setUp()
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.db.add_all([Camera(name="Gate", camera_type="rtsp"), Camera(name="Yard", camera_type="rtsp")])
+        self.db.commit()
+        self.queries = []
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self) -> None:
+        """Close the database."""
+        event.remove(self.engine, "before_cursor_execute", self._count)
+        self.db.close()
+        self.engine.dispose()
+        super().tearDown()
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries.append(statement)
+
+    def test_reads_are_served_from_memory(self):
+        """Test that the table is loaded once for lists and lookups."""
+        # Arrange
+        cache = ConfigCache()
+
+        # Act
+        names = [camera.name for camera in cache.list(self.db, "camera")]
+        camera = cache.get(self.db, "camera", 2)
+        again = cache.list(self.db, "camera")
+
+        # Assert
+        self.assertEqual(names, ["Gate", "Yard"])
+        self.assertEqual(camera.name, "Yard")
+        self.assertEqual(len(again), 2)
+        self.assertEqual(len(self.queries), 1)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_invalidation_reloads_only_that_row(self):
+        """Test that an invalidated row is reloaded by ID and its version bumped."""
+        # Arrange
+        cache = ConfigCache()
+        cache.list(self.db, "camera")
+        self.db.query(Camera).filter(Camera.id == 1).update({"name": "Front gate"})
+        self.db.commit()
+        self.queries.clear()
+
+        # Act
+        before = cache.get(self.db, "camera", 1).name
+        cache.invalidate("camera", 1)
+        after = cache.get(self.db, "camera", 1).name
+
+        # Assert
+        self.assertEqual(before, "Gate")
+        self.assertEqual(after, "Front gate")
+        self.assertEqual(cache.version("camera", 1), 1)
+        self.assertEqual(len(self.queries), 1)
+        self.assertIn("IN", self.queries[0])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_load_racing_an_invalidation_is_not_stored(self):
+        """Test that rows read while an invalidation happens are reloaded on the next read."""
+        # Arrange
+        cache = ConfigCache()
+
+        def invalidate(*args):
+            cache.invalidate("camera", 1)
+
+        event.listen(self.engine, "before_cursor_execute", invalidate)
+
+        # Act
+        first = cache.list(self.db, "camera")
+        event.remove(self.engine, "before_cursor_execute", invalidate)
+        self.queries.clear()
+        second = cache.list(self.db, "camera")
+
+        # Assert
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 2)
+        self.assertEqual(len(self.queries), 1)
+
+        # Clean
+        # No specific cleanup required for this test.
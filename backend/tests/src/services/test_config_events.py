@@ -0,0 +1,141 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.services.config_events import ConfigChange
+from src.services.config_events import ConfigListener
+from src.services.config_events import parse_notification
+from src.services.fmp4 import Fmp4StreamManager
+from src.services.streaming import camera_stream_managers
+from src.services.streaming import restart_camera_streams
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.closed_with = None
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed_with = code
+
+
+class FakeManager:
+    def __init__(self, camera_id: int, camera_type: str = "rtsp"):
+        self.camera_id = camera_id
+        self.camera_type = camera_type
+        self.subscribers = [FakeWebSocket()]
+        self.killed = False
+
+    def kill_stream(self):
+        self.killed = True
+        self.subscribers = []
+
+
+class ConfigEventsTests(TestCase):
+
+    def test_parse_notification(self):
+        """Test parsing the trigger payload and rejecting tables that are not cached."""
+        # Arrange
+        payload = json.dumps({"table": "roi", "op": "DELETE", "id": 7, "camera_id": 3, "at": 1700000000.5})
+
+        # Act
+        change = parse_notification(payload)
+
+        # Assert
+        self.assertEqual(change, ConfigChange("roi", "DELETE", 7, 3, 1700000000.5))
+        with self.assertRaises(ValueError):
+            parse_notification(json.dumps({"table": "detections", "id": 1}))
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_dispatch_invalidates_and_notifies_subscribers(self):
+        """Test that a change invalidates its cache row before plain and coroutine subscribers run."""
+        # Arrange
+        listener = ConfigListener()
+        seen = []
+
+        async def handle(change):
+            seen.append(("async", change.id))
+
+        listener.subscribe("camera", lambda change: seen.append(("sync", change.id)))
+        listener.subscribe("camera", handle)
+        listener.subscribe("alarm", lambda change: seen.append(("alarm", change.id)))
+
+        async def run():
+            listener.dispatch(ConfigChange("camera", "UPDATE", 4))
+            await asyncio.sleep(0)
+
+        # Act
+        with patch("src.services.config_events.config_cache") as cache:
+            asyncio.run(run())
+
+        # Assert
+        cache.invalidate.assert_called_once_with("camera", 4)
+        self.assertEqual(seen, [("sync", 4), ("async", 4)])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_restart_only_streams_whose_source_changed(self):
+        """Test that streams of a moved or deleted camera stop and their viewers are disconnected."""
+        # Arrange
+        moved, unchanged, deleted = FakeManager(1), FakeManager(2), FakeManager(3)
+        camera_stream_managers["remote"].update(
+            {"rtsp://old/1": moved, "rtsp://cam/2": unchanged, "rtsp://cam/3": deleted}
+        )
+        viewer = moved.subscribers[0]
+
+        async def run():
+            return [
+                await restart_camera_streams(1, SimpleNamespace(camera_type="rtsp", rtsp_url="rtsp://new/1")),
+                await restart_camera_streams(2, SimpleNamespace(camera_type="rtsp", rtsp_url="rtsp://cam/2")),
+                await restart_camera_streams(3, None),
+            ]
+
+        # Act
+        stopped = asyncio.run(run())
+
+        # Assert
+        self.assertEqual(stopped, [1, 0, 1])
+        self.assertTrue(moved.killed)
+        self.assertFalse(unchanged.killed)
+        self.assertEqual(viewer.closed_with, 1012)
+        self.assertEqual(set(camera_stream_managers["remote"]), {"rtsp://cam/2"})
+
+        # Clean
+        camera_stream_managers["remote"].clear()
+
+    def test_restart_stops_fmp4_streams_of_the_camera(self):
+        """Test that fMP4 viewers of a moved or deleted camera are told to disconnect and the remuxer stops."""
+        # Arrange
+        moved = Fmp4StreamManager("rtsp://old/1", 1)
+        unchanged = Fmp4StreamManager("rtsp://cam/2", 2)
+        deleted = Fmp4StreamManager("rtsp://cam/3", 3)
+        camera_stream_managers["fmp4"].update(
+            {"rtsp://old/1": moved, "rtsp://cam/2": unchanged, "rtsp://cam/3": deleted}
+        )
+        viewers = [moved.add_subscriber(), unchanged.add_subscriber(), deleted.add_subscriber()]
+
+        async def run():
+            return [
+                await restart_camera_streams(1, SimpleNamespace(camera_type="rtsp", rtsp_url="rtsp://new/1")),
+                await restart_camera_streams(2, SimpleNamespace(camera_type="rtsp", rtsp_url="rtsp://cam/2")),
+                await restart_camera_streams(3, None),
+            ]
+
+        # Act
+        stopped = asyncio.run(run())
+
+        # Assert
+        self.assertEqual(stopped, [1, 0, 1])
+        self.assertIsNone(viewers[0].queue.get_nowait())
+        self.assertTrue(viewers[1].queue.empty())
+        self.assertIsNone(viewers[2].queue.get_nowait())
+        self.assertEqual(moved.subscribers, [])
+        self.assertEqual(unchanged.subscribers, [viewers[1]])
+        self.assertEqual(set(camera_stream_managers["fmp4"]), {"rtsp://cam/2"})
+
+        # Clean
+        camera_stream_managers["fmp4"].clear()
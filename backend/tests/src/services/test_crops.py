@@ -0,0 +1,119 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from src.services.crops import CropStore
+from src.services.crops import crop_digest
+from src.services.crops import encode_crop
+
+
+def jpeg(value: int) -> bytes:
+    return cv2.imencode(".jpg", np.full((8, 8, 3), value, dtype=np.uint8))[1].tobytes()
+
+
+class CropStoreTests(TestCase):
+
+    def setUp(self):
+        """Set up a store in a temporary directory."""
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = CropStore(self.directory.name)
+
+    def tearDown(self) -> None:
+        """Close the store and remove the temporary directory."""
+        self.store.close()
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_identical_crops_are_stored_once(self):
+        """Test that a crop is addressed by its digest, stored once and read back from the pack."""
+        # Arrange
+        crops = [jpeg(value) for value in (10, 20, 10, 10, 30)]
+
+        # Act
+        digests = [self.store.put(crop) for crop in crops]
+        read = [self.store.get(bytes.fromhex(digest)) for digest in digests]
+
+        # Assert
+        self.assertEqual(digests[0], crop_digest(crops[0]).hex())
+        self.assertEqual(len(set(digests)), 3)
+        self.assertEqual(read, crops)
+        self.assertEqual(self.store._header["count"][0], 3)
+        stored = crops[:2] + crops[4:]
+        self.assertEqual(os.path.getsize(self.store.pack_path(0)), sum(20 + len(crop) for crop in stored))
+        self.assertIsNone(self.store.get(crop_digest(b"missing")))
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_index_grows_and_is_seen_by_another_process(self):
+        """Test that the index doubles when full, packs roll over, and another store instance sees new crops."""
+        # Arrange
+        crops = [jpeg(value) for value in range(40)]
+        other = CropStore(self.directory.name)
+        self.addCleanup(other.close)
+
+        # Act
+        with patch("src.services.crops.settings.CROP_INDEX_INITIAL_SLOTS", 8), \
+                patch("src.services.crops.settings.CROP_PACK_MAX_BYTES", 4000):
+            self.assertIsNone(other.get(crop_digest(crops[0])))  # Maps the first 8 slot index
+            digests = [bytes.fromhex(self.store.put(crop)) for crop in crops]
+            read = [other.get(digest) for digest in digests]
+            stored_again = other.put(crops[5])
+
+        # Assert
+        self.assertEqual(read, crops)
+        self.assertEqual(len(self.store._slots), 64)
+        self.assertEqual(len(other._slots), 64)
+        self.assertEqual(stored_again, digests[5].hex())
+        self.assertEqual(self.store._header["count"][0], 40)
+        self.assertGreater(self.store._header["pack"][0], 0)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_index_is_rebuilt_from_the_packs(self):
+        """Test that a removed index is rebuilt from the pack records and a torn last record is dropped."""
+        # Arrange
+        crops = [jpeg(value) for value in (1, 2, 3)]
+        digests = [bytes.fromhex(self.store.put(crop)) for crop in crops]
+        self.store.close()
+        os.remove(self.store.index_path)
+        with open(self.store.pack_path(0), "ab") as file:
+            file.write(crop_digest(b"torn") + (1000).to_bytes(4, "little") + b"partial")
+
+        # Act
+        reopened = CropStore(self.directory.name)
+        self.addCleanup(reopened.close)
+        read = [reopened.get(digest) for digest in digests]
+        added = reopened.put(jpeg(4))
+
+        # Assert
+        self.assertEqual(read, crops)
+        self.assertEqual(reopened._header["count"][0], 4)
+        self.assertEqual(reopened.get(bytes.fromhex(added)), jpeg(4))
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_encode_crop_pads_clips_and_downscales(self):
+        """Test that crops include padding within the frame and large boxes are downscaled."""
+        # Arrange
+        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+        # Act
+        small = cv2.imdecode(np.frombuffer(encode_crop(frame, [0, 100, 100, 200]), np.uint8), cv2.IMREAD_COLOR)
+        large = cv2.imdecode(np.frombuffer(encode_crop(frame, [0, 0, 1920, 1080]), np.uint8), cv2.IMREAD_COLOR)
+        outside = encode_crop(frame, [2000, 0, 2100, 100])
+
+        # Assert
+        self.assertEqual(small.shape, (120, 110, 3))  # 10 % on each side, clipped at the left edge
+        self.assertEqual(large.shape, (144, 256, 3))
+        self.assertIsNone(outside)
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+from src.db import init_db  # noqa: F401, imports every model so the mappers can be configured
+from src.models.track import Track
+from src.services.db_writer import BatchWriter
+
+
+class RecordingWriter(BatchWriter):
+    """Records the batches instead of inserting them."""
+
+    def __init__(self, **kwargs):
+        super().__init__(Track, **kwargs)
+        self.batches = []
+
+    def flush(self, rows):
+        if rows:
+            self.batches.append(rows)
+
+
+class BatchWriterTests(TestCase):
+
+    def test_close_inserts_queued_rows_and_stops_the_thread(self):
+        """Test that closing the writer inserts the rows still queued before its thread exits."""
+        # Arrange
+        writer = RecordingWriter(batch_size=2, flush_interval=60.0)
+        for number in range(5):
+            writer.add({"number": number})
+
+        # Act
+        writer.close(timeout=5)
+
+        # Assert
+        self.assertEqual([[row["number"] for row in batch] for batch in writer.batches], [[0, 1], [2, 3], [4]])
+        self.assertFalse(writer._thread.is_alive())
+
+        # Clean
+        # No specific cleanup required for this test.
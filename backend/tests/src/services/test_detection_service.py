@@ -1,10 +1,14 @@
+import threading
+import time
 from unittest import TestCase
+from unittest.mock import patch
 
 import cv2
 import numpy as np
 from src.core.config import settings
 from src.services.detection import CameraService
 from src.services.detection import ObjectDetectionService
+from src.services.detection import get_detection_service
 
 
 class ObjectDetectionServiceTests(TestCase):
@@ -95,3 +99,39 @@ class ObjectDetectionServiceTests(TestCase):
             # No specific cleanup required for this test.
         else:
             self.skipTest("No local cameras available for testing.")
+
+
+class GetDetectionServiceTests(TestCase):
+
+    def test_model_is_loaded_once_for_concurrent_and_default_calls(self):
+        """Test that concurrent first calls and calls naming the default model share one service."""
+        # Arrange
+        created = []
+
+        def slow_service(detection_model_name):
+            created.append(detection_model_name)
+            time.sleep(0.1)  # Loading takes a while, other first calls arrive meanwhile
+            return object()
+
+        services = []
+        threads = [
+            threading.Thread(target=lambda model=model: services.append(get_detection_service(model)))
+            for model in (None, settings.DEFAULT_MODEL, None)
+        ]
+
+        # Act
+        with patch("src.services.detection.ObjectDetectionService", side_effect=slow_service), \
+                patch("src.services.detection.settings.INFERENCE_WORKERS", 0), \
+                patch.dict("src.services.detection._detection_services", clear=True):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout=5)
+
+        # Assert
+        self.assertEqual(created, [settings.DEFAULT_MODEL])
+        self.assertEqual(len(services), 3)
+        self.assertTrue(all(service is services[0] for service in services))
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,103 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.services.events import AlarmRule
+from src.services.events import EventBus
+from src.services.events import EventFilter
+from src.services.events import to_polygon
+
+
+def detection(class_name: str, confidence: float, bbox):
+    return {"class_name": class_name, "class_id": 0, "confidence": confidence, "bbox": bbox}
+
+
+class EventsTests(TestCase):
+
+    def test_filter_by_class_confidence_and_region(self):
+        """Test that only detections of the class, above the confidence and centred in the ROI are selected."""
+        # Arrange
+        event_filter = EventFilter(
+            class_names=frozenset({"person"}),
+            min_confidence=0.5,
+            region=to_polygon([0, 0, 100, 0, 0, 100]),  # Triangle below the diagonal of a 100 px square
+        )
+        detections = [
+            detection("person", 0.9, [10, 10, 30, 30]),
+            detection("person", 0.9, [70, 70, 90, 90]),  # Centre outside the triangle
+            detection("person", 0.3, [10, 10, 30, 30]),
+            detection("car", 0.9, [10, 10, 30, 30]),
+        ]
+
+        # Act
+        selected = event_filter.select(detections)
+
+        # Assert
+        self.assertEqual(selected, detections[:1])
+        self.assertEqual(to_polygon([1, 2, 3, 4]), ((1, 2), (3, 2), (3, 4), (1, 4)))
+        self.assertIsNone(to_polygon([]))
+        with self.assertRaises(ValueError):
+            to_polygon([1, 2, 3, 4, 5])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_slow_subscriber_gets_one_coalesced_message(self):
+        """Test that frames published between reads arrive as one message, dropping the oldest past the limit."""
+        # Arrange
+        bus = EventBus()
+        bus._alarm_version = 0
+
+        async def run():
+            subscription = bus.subscribe(EventFilter(camera_ids=frozenset({1})))
+            for sequence in range(1, 6):
+                bus.publish_detections(1, sequence, 100.0 + sequence, [detection("car", 0.8, [0, 0, 10, 10])])
+            bus.publish_detections(2, 6, 106.0, [detection("car", 0.8, [0, 0, 10, 10])])
+            return await subscription.next_batch(timeout=1)
+
+        # Act
+        with patch("src.services.events.config_cache.table_version", return_value=0), \
+                patch("src.services.events.settings.EVENTS_MAX_PENDING", 3):
+            batch = asyncio.run(run())
+
+        # Assert
+        self.assertEqual([event["sequence"] for event in batch["events"]], [3, 4, 5])
+        self.assertEqual(batch["dropped"], 2)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_alarm_fires_once_per_cooldown(self):
+        """Test that a matching alarm fires, stays quiet during its cooldown and respects the subscriber filter."""
+        # Arrange
+        bus = EventBus()
+        bus._alarm_version = 0
+        bus._alarms = {1: [AlarmRule(7, "Gate", 1, "person", 0.6, to_polygon([0, 0, 50, 50]))]}
+        person = detection("person", 0.7, [10, 10, 20, 20])
+
+        async def run():
+            everything = bus.subscribe(EventFilter(types=frozenset({"alarm"})))
+            cars_only = bus.subscribe(EventFilter(class_names=frozenset({"car"})))
+            bus.publish_detections(1, 1, 100.0, [detection("person", 0.5, [10, 10, 20, 20])])
+            bus.publish_detections(1, 2, 101.0, [person])
+            bus.publish_detections(1, 3, 105.0, [person])
+            bus.publish_detections(1, 4, 112.0, [person])
+            wanted = bus.wants(1), bus.wants(2)
+            bus.unsubscribe(cars_only)
+            bus.unsubscribe(everything)
+            return await everything.next_batch(timeout=1), await cars_only.next_batch(timeout=0.01), wanted
+
+        # Act
+        with patch("src.services.events.config_cache.table_version", return_value=0), \
+                patch("src.services.events.settings.ALARM_COOLDOWN_SECONDS", 10.0):
+            alarms, cars, wanted = asyncio.run(run())
+
+        # Assert
+        fired = [(event["type"], event["sequence"]) for event in alarms["events"]]
+        self.assertEqual(fired, [("alarm", 2), ("alarm", 4)])
+        self.assertEqual(alarms["events"][0]["alarm_id"], 7)
+        self.assertIsNone(cars)
+        self.assertEqual(wanted, (True, True))  # Camera 2 only for the unfiltered subscriber
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+from datetime import datetime
+from datetime import timedelta
+from unittest import TestCase
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy import insert
+from sqlalchemy.pool import StaticPool
+
+from src.db import init_db  # noqa: F401, imports every model so the mappers can be configured
+from src.db.base_class import Base
+from src.models.detection import Detection
+from src.services.export import EXPORT_COLUMNS
+from src.services.export import encode_ndjson
+from src.services.export import export_detections
+from src.services.export import export_statement
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with five detections, one per second."""
+        super().setUp()
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(insert(Detection), [
+                {
+                    "camera_id": 1 + index % 2, "frame_number": index, "timestamp": START + timedelta(seconds=index),
+                    "detection_model_name": "yolov8n.pt", "confidence": 0.5, "class_name": 'say "cheese"',
+                    "bbox": [1.5, 2.0, 30.0, 40.0], "detection_metadata": {"class_id": 0},
+                }
+                for index in range(5)
+            ])
+        self.patcher = patch("src.services.export.engine", self.engine)
+        self.patcher.start()
+
+    def tearDown(self) -> None:
+        """Dispose of the database."""
+        self.patcher.stop()
+        self.engine.dispose()
+        super().tearDown()
+
+    def test_ndjson_lines_are_json_objects(self):
+        """Test that NDJSON lines parse back to the row values, with missing values as null."""
+        # Arrange
+        rows = [
+            (7, START, 1, None, 3, "yolov8n.pt", 'say "cheese"', 0.25, 1.5, 2.0, 30.0, 40.0, '{"class_id": 0}'),
+            (8, None, None, None, None, None, None, None, None, None, None, None, None),
+        ]
+
+        # Act
+        lines = encode_ndjson(rows, include_metadata=True).splitlines()
+
+        # Assert
+        first, second = (json.loads(line) for line in lines)
+        self.assertEqual(list(first)[:len(EXPORT_COLUMNS)], list(EXPORT_COLUMNS))
+        self.assertEqual(first["timestamp"], "2026-01-01T12:00:00")
+        self.assertEqual(first["class_name"], 'say "cheese"')
+        self.assertEqual((first["x1"], first["y2"]), (1.5, 40.0))
+        self.assertEqual(first["metadata"], {"class_id": 0})
+        self.assertIsNone(second["timestamp"])
+        self.assertIsNone(second["metadata"])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_export_filters_and_batches(self):
+        """Test that the export honours the filters and the half-open time range across batches."""
+        # Arrange
+        statement = export_statement(camera_id=1, start=START, end=START + timedelta(seconds=4))
+
+        # Act
+        chunks = list(export_detections(statement, "csv", batch_rows=1))
+
+        # Assert
+        rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+        self.assertEqual(len(chunks), 3)  # Header and one chunk per row
+        self.assertEqual([row["frame_number"] for row in rows], ["0", "2"])
+        self.assertEqual(rows[0]["x2"], "30.0")
+
+        # Clean
+        # No specific cleanup required for this test.
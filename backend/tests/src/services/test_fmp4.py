@@ -0,0 +1,187 @@
+import asyncio
+import os
+import stat
+import struct
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.services.fmp4 import SAMPLE_IS_NON_SYNC
+from src.services.fmp4 import Fmp4StreamManager
+from src.services.fmp4 import Fmp4Subscriber
+from src.services.fmp4 import codec_mime_type
+from src.services.fmp4 import fragment_starts_with_keyframe
+
+SYNC = 0x02000000  # sample_depends_on 2: an I-frame
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type: bytes, flags: int, payload: bytes) -> bytes:
+    return box(box_type, struct.pack(">I", flags) + payload)
+
+
+def fragment(tfhd: bytes, trun: bytes) -> bytes:
+    return box(b"moof", box(b"mfhd", bytes(8)) + box(b"traf", tfhd + trun)) + box(b"mdat", b"h264")
+
+
+class Fmp4HelperTests(TestCase):
+
+    def test_fragment_starts_with_keyframe(self):
+        """Test that the first sample flags come from trun first-sample, per-sample or tfhd default flags."""
+        # Arrange
+        tfhd = full_box(b"tfhd", 0, struct.pack(">I", 1))
+        tfhd_default_sync = full_box(b"tfhd", 0x28, struct.pack(">III", 1, 3000, SYNC))
+        tfhd_default_non_sync = full_box(b"tfhd", 0x28, struct.pack(">III", 1, 3000, SAMPLE_IS_NON_SYNC))
+        trun_plain = full_box(b"trun", 0x001, struct.pack(">Ii", 1, 120))
+
+        def trun_first(flags):
+            return full_box(b"trun", 0x005, struct.pack(">IiI", 1, 120, flags))
+
+        def trun_per_sample(flags):
+            return full_box(b"trun", 0x701, struct.pack(">IiIII", 1, 120, 3000, 4, flags))
+
+        # Act
+        first_sync = fragment_starts_with_keyframe(fragment(tfhd, trun_first(SYNC)))
+        first_non_sync = fragment_starts_with_keyframe(fragment(tfhd_default_sync, trun_first(SAMPLE_IS_NON_SYNC)))
+        per_sample_sync = fragment_starts_with_keyframe(fragment(tfhd_default_non_sync, trun_per_sample(SYNC)))
+        default_sync = fragment_starts_with_keyframe(fragment(tfhd_default_sync, trun_plain))
+        default_non_sync = fragment_starts_with_keyframe(fragment(tfhd_default_non_sync, trun_plain))
+        no_flags = fragment_starts_with_keyframe(fragment(tfhd, trun_plain))
+        no_moof = fragment_starts_with_keyframe(box(b"mdat", b"h264"))
+
+        # Assert
+        self.assertTrue(first_sync)
+        self.assertFalse(first_non_sync)
+        self.assertTrue(per_sample_sync)
+        self.assertTrue(default_sync)
+        self.assertFalse(default_non_sync)
+        self.assertFalse(no_flags)
+        self.assertFalse(no_moof)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_codec_mime_type(self):
+        """Test that the codec string uses the avcC profile, compatibility and level, with a fallback."""
+        # Arrange
+        avcc = box(b"avcC", bytes([1, 0x64, 0x00, 0x1F, 0xFF]))
+        init_segment = box(b"ftyp", b"isom") + box(b"moov", box(b"avc1", avcc))
+
+        # Act
+        mime_type = codec_mime_type(init_segment)
+        fallback = codec_mime_type(box(b"ftyp", b"isom"))
+
+        # Assert
+        self.assertEqual(mime_type, 'video/mp4; codecs="avc1.64001f"')
+        self.assertEqual(fallback, 'video/mp4; codecs="avc1.42e01e"')
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_subscriber_that_falls_behind_resumes_at_keyframe(self):
+        """Test that a full queue is emptied and fragments are dropped until the next keyframe."""
+        # Arrange
+        subscriber = Fmp4Subscriber(maxsize=2)
+        subscriber.offer(b"key-1", True)
+        subscriber.offer(b"delta-1", False)
+
+        # Act
+        subscriber.offer(b"delta-2", False)  # Full: backlog dropped
+        subscriber.offer(b"delta-3", False)
+        subscriber.offer(b"key-2", True)
+        subscriber.offer(b"delta-4", False)
+        queued = [subscriber.queue.get_nowait() for _ in range(subscriber.queue.qsize())]
+
+        # Assert
+        self.assertEqual(queued, [b"key-2", b"delta-4"])
+        self.assertFalse(subscriber.waiting_keyframe)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+
+class Fmp4StreamManagerTests(TestCase):
+
+    def test_stop_clears_the_cache_and_waits_for_the_reader(self):
+        """Test that stopping ends the remuxing task and a restart does not see the previous run's init segment."""
+        # Arrange
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        ffmpeg = os.path.join(directory.name, "ffmpeg")
+        with open(ffmpeg, "w") as file:
+            file.write("#!/bin/sh\nexec sleep 30\n")
+        os.chmod(ffmpeg, stat.S_IRWXU)
+
+        async def run():
+            manager = Fmp4StreamManager("rtsp://camera/stream")
+            await manager.start_stream()
+            first_reader = manager.reader
+            await asyncio.sleep(0.1)
+            manager._set_init_segment(b"old-init")
+            manager.gop = [b"old-key"]
+            await manager.stop_stream()
+            stopped = (first_reader.done(), manager.init_ready.is_set(), manager.init_segment, manager.gop)
+            await manager.start_stream()
+            restarted = (manager.reader is not first_reader, manager.init_ready.is_set(), manager.init_segment)
+            await manager.stop_stream()
+            return stopped, restarted
+
+        # Act
+        with patch("src.services.fmp4.settings.FFMPEG_BINARY", ffmpeg):
+            stopped, restarted = asyncio.run(run())
+
+        # Assert
+        self.assertEqual(stopped, (True, False, None, []))
+        self.assertEqual(restarted, (True, False, None))
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_restarted_remuxer_resets_viewers_and_the_reconnect_delay(self):
+        """Test that every ffmpeg run with output restarts at the initial delay and re-initialises viewers."""
+        # Arrange
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        init_segment = box(b"ftyp", b"isom") + box(b"moov", b"")
+        tfhd = full_box(b"tfhd", 0, struct.pack(">I", 1))
+        keyframe = fragment(tfhd, full_box(b"trun", 0x005, struct.pack(">IiI", 1, 120, SYNC)))
+        output = os.path.join(directory.name, "output.mp4")
+        with open(output, "wb") as file:
+            file.write(init_segment + keyframe)
+        ffmpeg = os.path.join(directory.name, "ffmpeg")
+        with open(ffmpeg, "w") as file:
+            file.write(f"#!/bin/sh\nexec cat {output}\n")  # Same init segment every run, then the stream drops
+        os.chmod(ffmpeg, stat.S_IRWXU)
+
+        delays = []
+        real_sleep = asyncio.sleep
+        manager = Fmp4StreamManager("rtsp://camera/stream")
+
+        async def sleep(delay):
+            delays.append(delay)
+            if len(delays) == 3:
+                manager.status = "stopped"
+            await real_sleep(0)
+
+        async def run():
+            await manager.start_stream()
+            await manager.init_ready.wait()
+            subscriber = manager.add_subscriber()
+            await asyncio.wait_for(manager.reader, timeout=10)
+            return [subscriber.queue.get_nowait() for _ in range(subscriber.queue.qsize())]
+
+        # Act
+        with patch("src.services.fmp4.settings.FFMPEG_BINARY", ffmpeg), \
+                patch("src.services.fmp4.settings.RTSP_RECONNECT_INITIAL_DELAY", 0.5), \
+                patch("src.services.fmp4.asyncio.sleep", side_effect=sleep):
+            queued = asyncio.run(run())
+
+        # Assert
+        self.assertEqual(delays, [0.5, 0.5, 0.5])
+        self.assertEqual(queued, [init_segment, keyframe])
+
+        # Clean
+        # No specific cleanup required for this test.
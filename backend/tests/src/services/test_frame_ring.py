@@ -0,0 +1,74 @@
+from unittest import TestCase
+
+from src.services.frame_ring import FrameRing
+
+
+class FrameRingTests(TestCase):
+
+    def setUp(self):
+        """Set up resources for each individual test."""
+        super().setUp()
+        self.ring = FrameRing(size=3)
+        self.shape = (4, 6, 3)
+
+    def _write(self, sequence: int):
+        slot = self.ring.acquire_write(self.shape)
+        slot.array[...] = sequence
+        self.ring.publish(slot, sequence, float(sequence))
+        self.ring.release(slot)
+        return slot
+
+    def test_buffers_are_reused_without_allocation(self):
+        """Test that writes cycle through the preallocated buffers."""
+        # Arrange
+        self._write(1)
+        buffers = {id(slot.array) for slot in self.ring.slots}
+
+        # Act
+        for sequence in range(2, 10):
+            self._write(sequence)
+
+        # Assert
+        self.assertEqual({id(slot.array) for slot in self.ring.slots}, buffers)
+        with self.ring.latest_frame() as slot:
+            self.assertEqual(slot.sequence, 9)
+            self.assertTrue((slot.array == 9).all())
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_referenced_frames_are_not_overwritten(self):
+        """Test that a frame held by a reader keeps its content."""
+        # Arrange
+        self._write(1)
+        held = self.ring.acquire_latest()
+
+        # Act
+        for sequence in range(2, 8):
+            self._write(sequence)
+
+        # Assert
+        self.assertEqual(held.sequence, 1)
+        self.assertTrue((held.array == 1).all())
+
+        # Clean
+        self.ring.release(held)
+
+    def test_write_is_dropped_when_all_slots_are_held(self):
+        """Test that capture drops a frame instead of overwriting held buffers."""
+        # Arrange
+        held = []
+        for sequence in range(1, 4):
+            self._write(sequence)
+            held.append(self.ring.acquire_latest())
+
+        # Act
+        slot = self.ring.acquire_write(self.shape)
+
+        # Assert
+        self.assertIsNone(slot)
+        self.assertEqual(self.ring.drops, 1)
+
+        # Clean
+        for slot in held:
+            self.ring.release(slot)
@@ -0,0 +1,103 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from src.services.heatmaps import DAY
+from src.services.heatmaps import HOUR
+from src.services.heatmaps import HeatmapStore
+from src.services.heatmaps import plan_buckets
+from src.services.heatmaps import render_heatmap
+
+MIDNIGHT = 20454 * DAY  # 2026-01-01 UTC
+
+
+class HeatmapTests(TestCase):
+
+    def setUp(self):
+        """Set up a store in a temporary directory."""
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = HeatmapStore(self.directory.name)
+
+    def tearDown(self) -> None:
+        """Remove the temporary directory."""
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_range_is_covered_by_days_and_edge_hours(self):
+        """Test that whole days use their daily grid and only the partial days at the edges use hours."""
+        # Arrange
+        start = MIDNIGHT - 2 * HOUR - 600
+        end = MIDNIGHT + 2 * DAY + HOUR + 1
+
+        # Act
+        hours, days = plan_buckets(start, end)
+
+        # Assert
+        first_hour = MIDNIGHT // HOUR
+        self.assertEqual(days, [MIDNIGHT // DAY, MIDNIGHT // DAY + 1])
+        self.assertEqual(hours, [first_hour - 3, first_hour - 2, first_hour - 1, first_hour + 48, first_hour + 49])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_query_sums_checkpointed_grids_of_every_writer(self):
+        """Test that boxes accumulate per class and bucket and a range sums this and other writers' grids."""
+        # Arrange
+        frame = (640, 360)
+        self.store.add(7, MIDNIGHT + 10, frame, [("person", [0, 0, 20, 10])], 0.5)
+        self.store.add(7, MIDNIGHT + HOUR + 10, frame, [("person", [0, 0, 20, 10]), ("car", [630, 350, 640, 360])], 1.0)
+        self.store.add(7, MIDNIGHT + DAY + 10, frame, [("person", [0, 0, 20, 10])], 2.0)
+        self.store.add(8, MIDNIGHT + 10, frame, [("person", [0, 0, 20, 10])], 4.0)
+        self.store.flush()
+        other = HeatmapStore(self.directory.name)
+        other.writer = "worker-2"
+        other.add(7, MIDNIGHT + 20, frame, [("person", [0, 0, 5, 5])], 8.0)
+
+        # Act
+        first_hour = self.store.query(7, MIDNIGHT, MIDNIGHT + 600, "person")
+        day = self.store.query(7, MIDNIGHT - HOUR, MIDNIGHT + DAY + 1, "person")  # An hour, a day and an hour
+        everything = self.store.query(7, MIDNIGHT, MIDNIGHT + 2 * DAY)
+        other.flush()
+        with_other = self.store.query(7, MIDNIGHT, MIDNIGHT + HOUR, "person")
+        files = sorted(os.listdir(os.path.join(self.directory.name, "7", "person")))
+
+        # Assert
+        self.assertEqual(first_hour.shape, (36, 64))
+        self.assertEqual(first_hour[0, :3].tolist(), [0.5, 0.5, 0.0])  # A 20 x 10 px box covers two 10 px cells
+        self.assertEqual(first_hour[1, 0], 0.0)
+        self.assertEqual(day[0, 0], 3.5)
+        self.assertEqual(everything[0, 0], 3.5)
+        self.assertEqual(everything[-1, -1], 1.0)
+        self.assertEqual(with_other[0, 0], 8.5)
+        self.assertIn(f"h{MIDNIGHT // HOUR}-worker-2.npy", files)
+        self.assertEqual(self.store._grids, {})  # Nothing written since the last checkpoint stays in memory
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_render_overlay_and_blended_png(self):
+        """Test that the heatmap renders as a transparent overlay or blended onto a frame."""
+        # Arrange
+        grid = np.zeros((36, 64), dtype=np.float32)
+        grid[10:20, 30:40] = 100.0
+        frame = np.full((90, 160, 3), 40, dtype=np.uint8)
+
+        # Act
+        overlay = cv2.imdecode(np.frombuffer(render_heatmap(grid, 320, 180), np.uint8), cv2.IMREAD_UNCHANGED)
+        blended = cv2.imdecode(np.frombuffer(render_heatmap(grid, 320, 180, frame), np.uint8), cv2.IMREAD_UNCHANGED)
+        empty = cv2.imdecode(np.frombuffer(render_heatmap(np.zeros((36, 64)), 64, 36), np.uint8), cv2.IMREAD_UNCHANGED)
+
+        # Assert
+        self.assertEqual(overlay.shape, (180, 320, 4))
+        self.assertEqual(overlay[0, 0, 3], 0)
+        self.assertGreater(overlay[75, 175, 3], 100)
+        self.assertEqual(blended.shape, (180, 320, 3))
+        self.assertEqual(blended[0, 0].tolist(), [40, 40, 40])
+        self.assertEqual(int(empty[..., 3].max()), 0)
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,138 @@
+import os
+import time
+from multiprocessing import shared_memory
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+
+from src.services.inference_pool import InferencePool
+from src.services.inference_pool import parse_cpu_sets
+
+CRASH_VALUE = 200  # Frames of this value crash the worker of generation 0
+
+
+def stub_worker(generation, detection_model_name, cpus, slot_names, tasks, results):
+    """Answer each frame with its first pixel value and the worker's generation, without a model."""
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    results.send(("ready", generation, {0: "stub"}))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        request_id, slot, shape, dtype = task
+        value = int(np.ndarray(shape, dtype=dtype, buffer=slots[slot].buf).flat[0])
+        if value == CRASH_VALUE + generation:
+            os._exit(1)
+        results.send(("result", request_id, [{"value": value, "generation": generation}]))
+    for shm in slots:
+        shm.close()
+
+
+def crashing_worker(generation, detection_model_name, cpus, slot_names, tasks, results):
+    """Exit before reporting ready, like a worker that cannot load its model."""
+    os._exit(1)
+
+
+class StubPool(InferencePool):
+    _worker_target = staticmethod(stub_worker)
+
+
+class CrashingPool(InferencePool):
+    _worker_target = staticmethod(crashing_worker)
+
+
+def wait_for(condition, timeout: float = 30.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+class ParseCpuSetsTests(TestCase):
+
+    def test_parse_cpu_sets(self):
+        """Test that ranges and lists are parsed per worker and reused round-robin for more workers."""
+        # Arrange
+        spec = "0-1;2,3"
+
+        # Act
+        cpu_sets = parse_cpu_sets(spec, 3)
+
+        # Assert
+        self.assertEqual(cpu_sets, [{0, 1}, {2, 3}, {0, 1}])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+
+class InferencePoolTests(TestCase):
+
+    def setUp(self):
+        """Check workers often so crashes are noticed quickly."""
+        super().setUp()
+        interval = patch("src.services.inference_pool.settings.INFERENCE_SUPERVISE_INTERVAL", 0.02)
+        interval.start()
+        self.addCleanup(interval.stop)
+
+    def test_crashed_request_is_rerouted_and_answered_once(self):
+        """Test that the frame of a crashed worker is answered once by another worker and the crashed one restarts."""
+        # Arrange
+        pool = StubPool(detection_model_name="stub", workers=2, max_frame_bytes=64)
+        self.addCleanup(pool.close)
+        finished = []
+        finish = pool._finish
+
+        def counting_finish(request_id):
+            request = finish(request_id)
+            if request is not None:
+                finished.append(request_id)
+            return request
+
+        pool._finish = counting_finish
+        self.assertEqual(pool.class_names, {0: "stub"})
+
+        # Act
+        crashing = pool.submit(np.full((2, 2, 3), CRASH_VALUE, dtype=np.uint8))
+        rerouted = crashing.result(timeout=30)
+        restarted = wait_for(lambda: pool._generations[0] == 2)
+        after_restart = pool.detect_batch([np.full((2, 2, 3), value, dtype=np.uint8) for value in (1, 2, 3)])
+
+        # Assert
+        self.assertEqual(rerouted, [{"value": CRASH_VALUE, "generation": 1}])
+        self.assertEqual(finished[0], 0)
+        self.assertEqual(len(finished), len(set(finished)))
+        self.assertTrue(restarted)
+        self.assertEqual([result[0]["value"] for result in after_restart], [1, 2, 3])
+        self.assertEqual(pool._in_flight, {})
+        self.assertEqual(pool._free_slots.qsize(), len(pool._slots))
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_worker_crashing_on_startup_is_restarted_after_a_capped_delay(self):
+        """Test that a worker dying before it is ready waits before each restart and requests wait for it."""
+        # Arrange
+        with patch("src.services.inference_pool.settings.INFERENCE_RESTART_INITIAL_DELAY", 60.0), \
+                patch("src.services.inference_pool.settings.INFERENCE_RESTART_MAX_DELAY", 90.0):
+            pool = CrashingPool(detection_model_name="stub", workers=1, max_frame_bytes=64)
+            self.addCleanup(pool.close)
+
+            # Act
+            crashed = wait_for(lambda: pool._processes[0] is None)
+            future = pool.submit(np.zeros((2, 2, 3), dtype=np.uint8))
+            time.sleep(0.2)
+
+        # Assert
+        self.assertTrue(crashed)
+        self.assertEqual(pool._generations[0], 0)  # Not restarted within the delay
+        self.assertEqual(pool._restart_delays[0], 90.0)
+        self.assertFalse(future.done())
+        self.assertIsNone(pool._in_flight[0].generation)
+        self.assertFalse(pool.wait_ready(0))
+
+        # Clean
+        pool.close()
+        self.assertRaises(RuntimeError, future.result, 1)
@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+from src.services.preroll import PrerollBuffer
+
+
+class PrerollBufferTests(TestCase):
+
+    def test_frames_older_than_window_are_evicted(self):
+        """Test that the buffer only keeps the configured number of seconds."""
+        # Arrange
+        buffer = PrerollBuffer(max_seconds=2.0, max_bytes=1024)
+
+        # Act
+        for step in range(10):
+            buffer.append(100.0 + step * 0.5, b"x")
+
+        # Assert
+        self.assertEqual([timestamp for timestamp, _ in buffer.since(0)], [102.5, 103.0, 103.5, 104.0, 104.5])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_byte_budget_is_enforced(self):
+        """Test that the oldest frames are dropped once the byte budget is exceeded."""
+        # Arrange
+        buffer = PrerollBuffer(max_seconds=60.0, max_bytes=25)
+
+        # Act
+        for step in range(5):
+            buffer.append(float(step), bytes(10))
+
+        # Assert
+        self.assertEqual(buffer.size, 20)
+        self.assertEqual([timestamp for timestamp, _ in buffer.since(0)], [3.0, 4.0])
+
+        # Clean
+        # No specific cleanup required for this test.
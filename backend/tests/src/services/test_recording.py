@@ -0,0 +1,163 @@
+import asyncio
+import os
+import stat
+import tempfile
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.services.recording import CameraRecorder
+from src.services.recording import RecordingService
+from src.services.recording import SegmentIndex
+
+
+class SegmentIndexTests(TestCase):
+
+    def setUp(self):
+        """Set up resources for each individual test."""
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = SegmentIndex(os.path.join(self.directory.name, "index.bin"))
+        # Three 60 s segments with a gap between the second and third
+        self.index.append(1000.0, 1060.0, 0)
+        self.index.append(1060.0, 1120.0, 1)
+        self.index.append(1200.0, 1260.0, 2)
+
+    def tearDown(self):
+        """Clean up resources after each test."""
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_find_segment_at_timestamp(self):
+        """Test that a timestamp resolves to the segment recording at that time."""
+        # Arrange
+        # No specific arrangement required for this test.
+
+        # Act
+        inside = self.index.find(1065.0)
+        boundary = self.index.find(1060.0)
+        gap = self.index.find(1150.0)
+        before = self.index.find(10.0)
+
+        # Assert
+        self.assertEqual(int(inside["number"]), 1)
+        self.assertEqual(int(boundary["number"]), 1)
+        self.assertIsNone(gap)
+        self.assertIsNone(before)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_overlapping_range(self):
+        """Test that a range query returns every segment intersecting it."""
+        # Arrange
+        # No specific arrangement required for this test.
+
+        # Act
+        records = self.index.overlapping(1100.0, 1210.0)
+
+        # Assert
+        self.assertEqual(list(records["number"]), [1, 2])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_index_picks_up_appended_segments(self):
+        """Test that readers see segments appended after the file was mapped."""
+        # Arrange
+        self.index.records()
+
+        # Act
+        self.index.append(1260.0, 1320.0, 3)
+
+        # Assert
+        self.assertEqual(int(self.index.find(1300.0)["number"]), 3)
+        self.assertEqual(self.index.next_number(), 4)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+
+class CameraRecorderTests(TestCase):
+
+    def setUp(self):
+        """Set up a recordings directory."""
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Clean up resources after each test."""
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_recorder_that_cannot_run_ffmpeg_is_failed(self):
+        """Test that a missing ffmpeg is refused up front and a recorder whose task dies reports failed."""
+        # Arrange
+        recorder = CameraRecorder(1, "rtsp://camera/1")
+        recorder.directory = self.directory.name
+
+        async def run():
+            recorder.start()
+            started = recorder.status
+            await asyncio.gather(recorder.task, return_exceptions=True)
+            return started
+
+        # Act
+        with patch("src.services.recording.settings.FFMPEG_BINARY", "/nonexistent/ffmpeg"):
+            with self.assertRaises(ValueError):
+                recorder.start()
+        with patch("src.services.recording.shutil.which", return_value="/usr/bin/ffmpeg"), \
+                patch("src.services.recording.asyncio.create_subprocess_exec", side_effect=PermissionError("denied")):
+            started = asyncio.run(run())
+
+        # Assert
+        self.assertEqual(started, "recording")
+        self.assertEqual(recorder.status, "failed")
+
+        # Clean
+        # No specific cleanup required for this test.
+
+
+class RecordingServiceTests(TestCase):
+
+    def setUp(self):
+        """Set up a recordings directory and a stand-in for ffmpeg that runs until it is terminated."""
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.ffmpeg = os.path.join(self.directory.name, "ffmpeg")
+        with open(self.ffmpeg, "w") as file:
+            file.write("#!/bin/sh\nexec sleep 30\n")
+        os.chmod(self.ffmpeg, stat.S_IRWXU)
+
+    def tearDown(self):
+        """Clean up resources after each test."""
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_changed_url_stops_the_old_recorder_first(self):
+        """Test that restarting a camera with a new URL ends the old ffmpeg before the new one starts."""
+        # Arrange
+        service = RecordingService()
+        old = SimpleNamespace(id=1, camera_type="rtsp", rtsp_url="rtsp://camera/old")
+        new = SimpleNamespace(id=1, camera_type="rtsp", rtsp_url="rtsp://camera/new")
+
+        async def run():
+            first = await service.start_camera(old)
+            await asyncio.sleep(0.1)
+            old_process = first.process
+            second = await service.start_camera(new)
+            replaced = (old_process.returncode is not None, first.status, first.task.done(), second.status)
+            await service.stop_all()
+            return replaced
+
+        # Act
+        with patch("src.services.recording.settings.FFMPEG_BINARY", self.ffmpeg), \
+                patch("src.services.recording.settings.RECORDINGS_DIR", self.directory.name):
+            replaced = asyncio.run(run())
+
+        # Assert
+        self.assertEqual(replaced, (True, "stopped", True, "recording"))
+        self.assertEqual(service.recorders, {})
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+import cv2
+import numpy as np
+from src.services.snapshots import SnapshotCache
+from src.services.snapshots import etag_matches
+
+
+class SnapshotCacheTests(TestCase):
+
+    def setUp(self):
+        """Set up resources for each individual test."""
+        super().setUp()
+        self.jpeg = cv2.imencode(".jpg", np.zeros((480, 640, 3), dtype=np.uint8))[1].tobytes()
+
+    def test_resize_keeps_aspect_ratio_and_is_cached(self):
+        """Test that a resized encode is computed once per key."""
+        # Arrange
+        cache = SnapshotCache(maxsize=4)
+
+        # Act
+        first = cache.resized(("camera", 1, 160), self.jpeg, 160)
+        second = cache.resized(("camera", 1, 160), self.jpeg, 160)
+
+        # Assert
+        self.assertIs(first, second)
+        image = cv2.imdecode(np.frombuffer(first, dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(image.shape[:2], (120, 160))
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the cache stays within its size."""
+        # Arrange
+        cache = SnapshotCache(maxsize=2)
+        cache.put("a", b"a")
+        cache.put("b", b"b")
+        cache.get("a")
+
+        # Act
+        cache.put("c", b"c")
+
+        # Assert
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), b"a")
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_etag_matching(self):
+        """Test If-None-Match lists, weak validators and the wildcard."""
+        # Arrange
+        etag = '"1-ab-7-0"'
+
+        # Act / Assert
+        self.assertTrue(etag_matches('"x", "1-ab-7-0"', etag))
+        self.assertTrue(etag_matches('W/"1-ab-7-0"', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"1-ab-8-0"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+        # Clean
+        # No specific cleanup required for this test.
@@ -0,0 +1,109 @@
+from datetime import datetime
+from datetime import timedelta
+from unittest import TestCase
+
+from sqlalchemy import create_engine
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db import init_db  # noqa: F401, imports every model so the mappers can be configured
+from src.db.base_class import Base
+from src.models.detection import Detection
+from src.models.detection_cell import DetectionCell
+from src.services.events import to_polygon
+from src.services.spatial_index import box_cells
+from src.services.spatial_index import index_unindexed
+from src.services.spatial_index import insert_detections
+from src.services.spatial_index import query_area
+
+START = datetime(2026, 1, 1, 14, 0, 0)
+
+
+def row(camera_id: int, minute: int, bbox, class_name: str = "person"):
+    return {
+        "camera_id": camera_id, "frame_number": minute, "timestamp": START + timedelta(minutes=minute),
+        "detection_model_name": "yolov8n.pt", "confidence": 0.8, "class_name": class_name, "bbox": bbox,
+    }
+
+
+class SpatialIndexTests(TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database."""
+        super().setUp()
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self) -> None:
+        """Close the database."""
+        self.db.close()
+        self.engine.dispose()
+        super().tearDown()
+
+    def test_boxes_use_at_most_four_cells(self):
+        """Test that small and large boxes each land in at most 2 x 2 cells of their level."""
+        # Arrange
+        boxes = [[0, 0, 10, 10], [60, 60, 70, 70], [100, 100, 1900, 1000], [-50, -50, 5, 5]]
+
+        # Act
+        cells = [box_cells(bbox) for bbox in boxes]
+
+        # Assert
+        self.assertEqual([len(box) for box in cells], [1, 4, 2, 1])
+        self.assertEqual(cells[0], [0])
+        self.assertNotEqual(cells[2][0] >> 32, 0)  # A coarser level
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_polygon_and_time_query(self):
+        """Test that only boxes of the camera overlapping the polygon within the time range are returned."""
+        # Arrange
+        insert_detections(self.db, [
+            row(7, 10, [100, 100, 150, 200]),  # Inside
+            row(7, 20, [300, 50, 420, 80]),  # Crosses the diagonal
+            row(7, 30, [500, 100, 550, 200]),  # Right of the area
+            row(7, 30, [0, 0, 1920, 1080]),  # Covers the whole frame, and the area
+            row(7, 90, [100, 100, 150, 200]),  # After the range
+            row(8, 10, [100, 100, 150, 200]),  # Another camera
+            row(7, 40, [100, 100, 150, 200], "car"),
+            row(7, 50, [250, 250, 300, 300]),  # Inside the bounding box, outside the triangle
+        ])
+        self.db.commit()
+        triangle = to_polygon([0, 0, 400, 0, 0, 400])
+
+        # Act
+        rows, truncated = query_area(self.db, 7, triangle, START, START + timedelta(hours=1), class_name="person")
+        centres, _ = query_area(self.db, 7, triangle, START, START + timedelta(hours=1), match="centre")
+        limited, limited_truncated = query_area(self.db, 7, triangle, START, START + timedelta(hours=1), limit=1)
+
+        # Assert
+        self.assertEqual([row.frame_number for row in rows], [10, 20, 30])
+        self.assertFalse(truncated)
+        self.assertEqual([row.frame_number for row in centres], [10, 40])
+        self.assertEqual(len(limited), 1)
+        self.assertTrue(limited_truncated)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_index_detections_stored_before_the_index(self):
+        """Test that detections without cells are indexed once."""
+        # Arrange
+        self.db.execute(insert(Detection), [row(1, minute, [10, 10, 20, 20]) for minute in range(5)])
+        self.db.commit()
+
+        # Act
+        indexed = index_unindexed(self.db, batch_rows=2)
+        again = index_unindexed(self.db)
+
+        # Assert
+        self.assertEqual((indexed, again), (5, 0))
+        self.assertEqual(self.db.scalar(select(func.count()).select_from(DetectionCell)), 5)
+
+        # Clean
+        # No specific cleanup required for this test.
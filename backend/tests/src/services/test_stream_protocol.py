@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+from src.services.stream_protocol import HEADER
+from src.services.stream_protocol import decode_frame_message
+from src.services.stream_protocol import encode_frame_message
+
+
+class StreamProtocolTests(TestCase):
+
+    def test_round_trip_with_detections(self):
+        """Test that a frame message keeps its metadata, boxes and image."""
+        # Arrange
+        detections = [
+            {"bbox": [64.0, 48.0, 320.0, 240.0], "confidence": 0.75, "class_name": "person", "class_id": 0},
+            {"bbox": [0.0, 0.0, 640.0, 480.0], "confidence": 1.0, "class_name": "car", "class_id": 2},
+        ]
+
+        # Act
+        message = encode_frame_message(42, 1700000000.25, b"jpeg-bytes", (640, 480), detections)
+        decoded = decode_frame_message(message)
+
+        # Assert
+        self.assertEqual(decoded["sequence"], 42)
+        self.assertEqual(decoded["timestamp"], 1700000000.25)
+        self.assertEqual(decoded["image"], b"jpeg-bytes")
+        self.assertEqual([d["class_id"] for d in decoded["detections"]], [0, 2])
+        self.assertAlmostEqual(decoded["detections"][0]["confidence"], 0.75, places=4)
+        for actual, expected in zip(decoded["detections"][0]["bbox"], [0.1, 0.1, 0.5, 0.5]):
+            self.assertAlmostEqual(actual, expected, places=4)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_frame_without_detection_pass(self):
+        """Test that skipped detection is distinguishable from an empty result."""
+        # Arrange
+        # No specific arrangement required for this test.
+
+        # Act
+        skipped = decode_frame_message(encode_frame_message(1, 0.0, b"x", (10, 10), None))
+        empty = decode_frame_message(encode_frame_message(1, 0.0, b"x", (10, 10), []))
+
+        # Assert
+        self.assertIsNone(skipped["detections"])
+        self.assertEqual(empty["detections"], [])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_truncated_message_is_rejected(self):
+        """Test that a message shorter than its header claims is rejected."""
+        # Arrange
+        message = encode_frame_message(1, 0.0, b"image", (10, 10), [])
+
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            decode_frame_message(message[:HEADER.size + 2])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_round_trip_with_track_ids(self):
+        """Test that tracked detections carry their track IDs."""
+        # Arrange
+        detections = [{"bbox": [0.0, 0.0, 5.0, 5.0], "confidence": 0.5, "class_name": "person", "class_id": 0,
+                       "track_id": 7}]
+
+        # Act
+        decoded = decode_frame_message(encode_frame_message(3, 0.0, b"x", (10, 10), detections))
+
+        # Assert
+        self.assertEqual(decoded["detections"][0]["track_id"], 7)
+        self.assertEqual(decoded["image"], b"x")
+
+        # Clean
+        # No specific cleanup required for this test.
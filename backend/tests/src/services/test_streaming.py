@@ -0,0 +1,228 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import numpy as np
+
+from src.services.stream_protocol import decode_frame_message
+from src.services.streaming import WS_FRAMES_DROPPED
+from src.services.streaming import CameraStreamManager
+from src.services.streaming import camera_stream_managers
+from src.services.streaming import stop_all_streams
+
+URL = "rtsp://camera.local/stream"
+
+
+class FakeCapture:
+    """A capture that opens or not, and delivers frames until ``reads`` is used up."""
+
+    def __init__(self, opened: bool = True, reads: int = 1_000_000):
+        self.opened = opened
+        self.reads = reads
+        self.released = False
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self, image=None):
+        if self.reads <= 0:
+            return False, None
+        self.reads -= 1
+        frame = np.full((4, 4, 3), 128, dtype=np.uint8)
+        if image is not None:
+            image[...] = frame
+            return True, image
+        return True, frame
+
+    def grab(self):
+        return self.read()[0]
+
+    def release(self):
+        self.released = True
+
+
+class FakeWebSocket:
+    """Records frames and stops the stream once it has received enough of them."""
+
+    def __init__(self, manager: CameraStreamManager, frames: int):
+        self.manager = manager
+        self.frames = frames
+        self.received = []
+
+    async def send_bytes(self, payload: bytes):
+        self.received.append(payload)
+        if len(self.received) == self.frames:
+            self.manager.kill_stream()
+
+
+class StalledWebSocket:
+    """Never finishes sending, like a viewer whose connection stopped draining."""
+
+    def __init__(self):
+        self.sending = 0
+
+    async def send_bytes(self, payload: bytes):
+        self.sending += 1
+        await asyncio.Event().wait()
+
+
+class CameraStreamManagerTests(TestCase):
+
+    def tearDown(self) -> None:
+        """Remove the managers registered by the test."""
+        camera_stream_managers["remote"].pop(URL, None)
+        super().tearDown()
+
+    def test_lost_connection_reconnects_with_backoff(self):
+        """Test that a dropped RTSP stream is reopened with doubling capped delays by the same manager."""
+        # Arrange
+        failed_opens = 4
+        first = FakeCapture(reads=2)  # Connection drops after two frames
+        captures = [first] + [FakeCapture(opened=False) for _ in range(failed_opens)] + [FakeCapture()]
+        opened = iter(captures)
+
+        def open_capture(source, camera_type):
+            return next(opened)
+
+        delays = []
+        real_sleep = asyncio.sleep
+
+        async def sleep(delay):
+            delays.append(delay)
+            await real_sleep(0)
+
+        manager = CameraStreamManager(URL, "rtsp")
+        camera_stream_managers["remote"][URL] = manager
+        viewers = [FakeWebSocket(manager, frames=5), FakeWebSocket(manager, frames=6)]
+
+        async def run():
+            for viewer in viewers:
+                manager.add_subscriber(viewer)
+            await manager.start_stream()
+            manager.ensure_publisher()
+            manager.ensure_publisher()  # A second viewer joining does not start another publisher
+            await asyncio.wait_for(manager.publisher, timeout=10)
+
+        # Act
+        with patch("src.services.streaming.CameraService.open_capture", side_effect=open_capture) as opens, \
+                patch("src.services.streaming.asyncio.sleep", side_effect=sleep), \
+                patch("src.services.streaming.settings.RTSP_RECONNECT_INITIAL_DELAY", 0.5), \
+                patch("src.services.streaming.settings.RTSP_RECONNECT_MAX_DELAY", 2.0):
+            asyncio.run(run())
+
+        # Assert
+        self.assertEqual(delays, [0.5, 1.0, 2.0, 2.0, 2.0])
+        self.assertEqual(opens.call_count, len(captures))
+        self.assertEqual(len(viewers[0].received), 5)
+        self.assertLessEqual(len(viewers[1].received), 5)
+        self.assertGreaterEqual(manager.sequence, 5)
+        self.assertTrue(all(capture.released for capture in captures))
+        self.assertIs(camera_stream_managers["remote"][URL], manager)
+        self.assertEqual(manager.status, "stopped")
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_framed_viewer_without_detect_does_not_run_detection(self):
+        """Test that framed messages carry sequence numbers without detection unless a viewer asks for it."""
+        # Arrange
+        service = MagicMock()
+        service.detect.return_value = []
+
+        async def run(detect: bool) -> FakeWebSocket:
+            manager = CameraStreamManager(URL, "rtsp")
+            viewer = FakeWebSocket(manager, frames=3)
+            manager.add_subscriber(viewer, framed=True, detect=detect)
+            await manager.start_stream()
+            manager.ensure_publisher()
+            await asyncio.wait_for(manager.publisher, timeout=10)
+            return viewer
+
+        # Act
+        with patch("src.services.streaming.CameraService.open_capture", side_effect=lambda *args: FakeCapture()), \
+                patch("src.services.streaming.get_detection_service", return_value=service):
+            without = asyncio.run(run(detect=False))
+            detect_calls_without = service.detect.call_count
+            with_detect = asyncio.run(run(detect=True))
+
+        # Assert
+        messages = [decode_frame_message(message) for message in without.received]
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(all(message["detections"] is None for message in messages))
+        self.assertEqual(detect_calls_without, 0)
+        self.assertGreaterEqual(service.detect.call_count, 3)
+        self.assertEqual(decode_frame_message(with_detect.received[0])["detections"], [])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_slow_viewer_skips_frames_without_stalling_others(self):
+        """Test that a viewer that stops reading only drops its own frames while the others keep receiving."""
+        # Arrange
+        manager = CameraStreamManager(URL, "rtsp", camera_id=9000)
+        fast = FakeWebSocket(manager, frames=20)
+        slow = StalledWebSocket()
+        dropped = WS_FRAMES_DROPPED.labels(9000, "jpeg")
+        dropped_before = dropped.value
+
+        async def run():
+            manager.add_subscriber(slow)
+            manager.add_subscriber(fast)
+            await manager.start_stream()
+            manager.ensure_publisher()
+            await asyncio.wait_for(manager.publisher, timeout=10)
+
+        # Act
+        with patch("src.services.streaming.CameraService.open_capture", side_effect=lambda *args: FakeCapture()), \
+                patch("src.services.streaming.settings.STREAM_SUBSCRIBER_QUEUE_SIZE", 2):
+            asyncio.run(run())
+
+        # Assert
+        self.assertEqual(len(fast.received), 20)
+        self.assertEqual(slow.sending, 1)
+        self.assertGreaterEqual(dropped.value - dropped_before, 20 - 1 - 2)
+        self.assertEqual(manager._senders, {})
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_stop_all_streams_stores_open_tracks(self):
+        """Test that stopping every stream at shutdown waits for the publisher, which stores its open tracks."""
+        # Arrange
+        service = MagicMock()
+        service.detect.return_value = []
+        manager = CameraStreamManager(URL, "rtsp", camera_id=9001)
+        manager.tracker = MagicMock()
+        manager.tracker.update.return_value = []
+        manager.tracker.predict.return_value = []
+        manager.tracker.pop_finished.return_value = []
+        manager.tracker.finish_all.return_value = [{"first_seen": 100.0, "last_seen": 105.0}]
+        camera_stream_managers["remote"][URL] = manager
+        viewer = FakeWebSocket(manager, frames=1_000_000)
+
+        async def run():
+            manager.add_subscriber(viewer)
+            await manager.start_stream()
+            manager.ensure_publisher()
+            while len(viewer.received) < 3:
+                await asyncio.sleep(0.01)
+            await stop_all_streams()
+            return manager.publisher.done()
+
+        # Act
+        with patch("src.services.streaming.CameraService.open_capture", side_effect=lambda *args: FakeCapture()), \
+                patch("src.services.streaming.get_detection_service", return_value=service), \
+                patch("src.services.streaming.event_bus"), \
+                patch("src.services.streaming.heatmap_store"), \
+                patch("src.services.streaming.track_writer") as track_writer:
+            publisher_done = asyncio.run(run())
+
+        # Assert
+        self.assertTrue(publisher_done)
+        self.assertNotIn(URL, camera_stream_managers["remote"])
+        track_writer.add.assert_called_once()
+        self.assertEqual(track_writer.add.call_args.args[0]["camera_id"], 9001)
+
+        # Clean
+        # No specific cleanup required for this test.
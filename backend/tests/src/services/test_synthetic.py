@@ -0,0 +1,72 @@
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from src.services.detection import CameraService
+from src.services.synthetic import SyntheticCapture
+from src.services.synthetic import parse_synthetic_source
+
+
+class SyntheticCaptureTests(TestCase):
+
+    def test_parse_source_spec(self):
+        """Test that size, frame rate and options are parsed with and without the scheme."""
+        # Arrange
+        spec = "synthetic://320x240@15?objects=2&frames=10"
+
+        # Act
+        parsed = parse_synthetic_source(spec)
+        bare = parse_synthetic_source("64x48")
+
+        # Assert
+        self.assertEqual(parsed, {"width": 320, "height": 240, "fps": 15.0, "objects": 2, "seed": 0, "frames": 10})
+        self.assertEqual((bare["width"], bare["height"], bare["fps"], bare["frames"]), (64, 48, 30.0, None))
+        with self.assertRaises(ValueError):
+            parse_synthetic_source("rtsp://camera/stream")
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_frames_are_deterministic_and_decoded_in_place(self):
+        """Test that the same spec renders identical frames into the caller's buffer."""
+        # Arrange
+        first = CameraService.open_capture("synthetic://160x120@0?seed=7", "synthetic")
+        second = SyntheticCapture("synthetic://160x120@0?seed=7")
+        buffer = np.zeros((120, 160, 3), dtype=np.uint8)
+
+        # Act
+        frames = [first.read()[1] for _ in range(3)]
+        ret, frame = second.read(buffer)
+        second.read(buffer)
+        second.read(buffer)
+
+        # Assert
+        self.assertTrue(ret)
+        self.assertIs(frame, buffer)
+        self.assertTrue(np.array_equal(buffer, frames[2]))
+        self.assertFalse(np.array_equal(frames[0], frames[2]))
+
+        # Clean
+        first.release()
+        second.release()
+
+    def test_stream_ends_after_frame_limit(self):
+        """Test that a frames option ends the stream and release closes it."""
+        # Arrange
+        cap = SyntheticCapture("synthetic://32x32@0?frames=2")
+
+        # Act
+        reads = [cap.read()[0] for _ in range(3)]
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        rewound = cap.read()[0]
+        cap.release()
+
+        # Assert
+        self.assertEqual(reads, [True, True, False])
+        self.assertTrue(rewound)
+        self.assertFalse(cap.isOpened())
+        self.assertEqual(cap.get(cv2.CAP_PROP_FRAME_WIDTH), 32.0)
+
+        # Clean
+        # No specific cleanup required for this test.
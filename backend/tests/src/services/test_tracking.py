@@ -0,0 +1,85 @@
+from unittest import TestCase
+
+from src.services.tracking import MultiObjectTracker
+
+
+def _detection(x: float, confidence: float = 0.9, class_id: int = 0):
+    return {"bbox": [x, 100.0, x + 50.0, 200.0], "confidence": confidence, "class_name": "person", "class_id": class_id}
+
+
+class MultiObjectTrackerTests(TestCase):
+
+    def setUp(self):
+        """Set up resources for each individual test."""
+        super().setUp()
+        self.tracker = MultiObjectTracker(high_threshold=0.6, low_threshold=0.1, match_iou=0.3,
+                                          max_lost_frames=5, min_hits=2)
+
+    def test_moving_object_keeps_its_track_id(self):
+        """Test that a smoothly moving object is matched to one persistent track."""
+        # Arrange
+        positions = [10.0 * step for step in range(10)]
+
+        # Act
+        results = [self.tracker.update([_detection(x)], float(step)) for step, x in enumerate(positions)]
+
+        # Assert
+        self.assertEqual(results[0], [])  # Not confirmed before min_hits
+        self.assertEqual({track["track_id"] for result in results[1:] for track in result}, {1})
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_prediction_between_detection_passes(self):
+        """Test that predict() moves a track along its estimated velocity."""
+        # Arrange
+        for step in range(6):
+            self.tracker.update([_detection(20.0 * step)], float(step))
+
+        # Act
+        predicted = self.tracker.predict()
+
+        # Assert
+        self.assertEqual(len(predicted), 1)
+        self.assertGreater(predicted[0]["bbox"][0], 100.0)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_low_confidence_detection_continues_track(self):
+        """Test that the second association stage matches low confidence boxes to existing tracks only."""
+        # Arrange
+        self.tracker.update([_detection(0.0)], 0.0)
+        self.tracker.update([_detection(5.0)], 1.0)
+
+        # Act
+        tracks = self.tracker.update([_detection(10.0, confidence=0.3), _detection(400.0, confidence=0.3)], 2.0)
+
+        # Assert
+        self.assertEqual([track["track_id"] for track in tracks], [1])
+        self.assertEqual(len(self.tracker.tracks), 1)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_finished_track_summary(self):
+        """Test that a lost track is summarised once with its lifetime and path."""
+        # Arrange
+        for step in range(3):
+            self.tracker.update([_detection(10.0 * step)], 100.0 + step)
+
+        # Act
+        for _ in range(6):
+            self.tracker.update([], 200.0)
+        finished = self.tracker.pop_finished()
+
+        # Assert
+        self.assertEqual(len(finished), 1)
+        self.assertEqual(finished[0]["first_seen"], 100.0)
+        self.assertEqual(finished[0]["last_seen"], 102.0)
+        self.assertEqual(finished[0]["hits"], 3)
+        self.assertEqual(len(finished[0]["path"]), 3)
+        self.assertEqual(self.tracker.pop_finished(), [])
+
+        # Clean
+        # No specific cleanup required for this test.
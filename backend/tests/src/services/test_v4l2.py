@@ -0,0 +1,129 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.services import v4l2
+
+
+class V4L2MetadataTests(TestCase):
+
+    def setUp(self):
+        """Build a fake sysfs tree and udev database for one USB camera."""
+        super().setUp()
+        self.root = tempfile.TemporaryDirectory()
+        base = self.root.name
+        self.sysfs_dir = os.path.join(base, "sys", "class", "video4linux")
+        self.udev_dir = os.path.join(base, "run", "udev", "data")
+        usb_device = os.path.join(base, "sys", "devices", "pci0000:00", "usb1", "1-1")
+        node = os.path.join(usb_device, "1-1:1.0", "video4linux", "video0")
+        os.makedirs(node)
+        os.makedirs(self.sysfs_dir)
+        os.makedirs(self.udev_dir)
+        os.symlink(node, os.path.join(self.sysfs_dir, "video0"))
+        os.symlink(os.path.join(usb_device, "1-1:1.0"), os.path.join(node, "device"))
+        self._write(os.path.join(node, "name"), "HD Webcam\n")
+        self._write(os.path.join(node, "dev"), "81:0\n")
+        self._write(os.path.join(usb_device, "idVendor"), "046d\n")
+        self._write(os.path.join(usb_device, "idProduct"), "0825\n")
+
+    def tearDown(self) -> None:
+        """Remove the fake tree."""
+        self.root.cleanup()
+        super().tearDown()
+
+    @staticmethod
+    def _write(path: str, content: str):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_ioctl_request_numbers(self):
+        """Test that ioctl requests match the kernel header values."""
+        # Arrange
+        # No specific arrangement required for this test.
+
+        # Act / Assert
+        self.assertEqual(v4l2.VIDIOC_QUERYCAP, 0x80685600)
+        self.assertEqual(v4l2.VIDIOC_ENUM_FMT, 0xC0405602)
+        self.assertEqual(v4l2.VIDIOC_ENUM_FRAMESIZES, 0xC02C564A)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_metadata_from_sysfs(self):
+        """Test reading name, physical address and USB ID without the udev database."""
+        # Arrange
+        # No specific arrangement required for this test.
+
+        # Act
+        metadata = v4l2.read_device_metadata(0, self.sysfs_dir, self.udev_dir, dev_dir=self.root.name)
+
+        # Assert
+        self.assertEqual(metadata["name"], "HD Webcam")
+        self.assertEqual(metadata["usb_id"], "046d:0825")
+        self.assertEqual(metadata["physical_address"], "/devices/pci0000:00/usb1/1-1/1-1:1.0/video4linux/video0")
+        self.assertIsNone(metadata["friendly_name"])
+        self.assertIsNone(metadata["is_capture"])
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_metadata_prefers_udev_database(self):
+        """Test that udev properties provide the friendly name and USB ID."""
+        # Arrange
+        self._write(
+            os.path.join(self.udev_dir, "c81:0"),
+            "S:v4l/by-id/usb-cam\nE:ID_VENDOR_ID=046d\nE:ID_MODEL_ID=0826\n"
+            "E:ID_MODEL=Webcam_C270\nE:ID_MODEL_FROM_DATABASE=Webcam C270\n",
+        )
+
+        # Act
+        metadata = v4l2.read_device_metadata(0, self.sysfs_dir, self.udev_dir, dev_dir=self.root.name)
+
+        # Assert
+        self.assertEqual(metadata["usb_id"], "046d:0826")
+        self.assertEqual(metadata["friendly_name"], "Webcam C270")
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_missing_device(self):
+        """Test that a device absent from sysfs yields None."""
+        # Arrange
+        # No specific arrangement required for this test.
+
+        # Act
+        metadata = v4l2.read_device_metadata(7, self.sysfs_dir, self.udev_dir, dev_dir=self.root.name)
+
+        # Assert
+        self.assertIsNone(metadata)
+
+        # Clean
+        # No specific cleanup required for this test.
+
+    def test_capture_capabilities(self):
+        """Test that single and multi-planar capture nodes are capture devices, read from the device caps."""
+        # Arrange
+        def querycap(device_caps: int):
+            def ioctl(fd, request, buffer):
+                buffer[:] = v4l2.V4L2_CAPABILITY.pack(
+                    b"uvcvideo", b"HD Webcam", b"usb-1", 0, v4l2.V4L2_CAP_DEVICE_CAPS | 0x1001, device_caps
+                )
+            return ioctl
+
+        # Act
+        results = {}
+        for name, device_caps in (("single", 0x1), ("multiplanar", 0x1000), ("metadata", 0x00800000)):
+            with patch("src.services.v4l2.fcntl.ioctl", side_effect=querycap(device_caps)):
+                results[name] = v4l2.query_capabilities(0)
+
+        # Assert
+        self.assertEqual(results["single"]["card"], "HD Webcam")
+        self.assertTrue(results["single"]["is_capture"])
+        self.assertFalse(results["single"]["is_multiplanar"])
+        self.assertTrue(results["multiplanar"]["is_capture"])
+        self.assertTrue(results["multiplanar"]["is_multiplanar"])
+        self.assertFalse(results["metadata"]["is_capture"])
+
+        # Clean
+        # No specific cleanup required for this test.